@@ -1,7 +1,7 @@
 # backend/apps/agenda/admin.py
 
 from django.contrib import admin
-from .models import Event
+from .models import CalendarFeed, Event, Notification, Reminder
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
@@ -15,4 +15,27 @@ class EventAdmin(admin.ModelAdmin):
         ('Date et heure', {'fields': ('start_date', 'start_time', 'all_day', 'end_date', 'end_time')}),
         ('Lieu et lien', {'fields': ('location', 'dossier')}),
         ('Description', {'fields': ('description',)}),
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(CalendarFeed)
+class CalendarFeedAdmin(admin.ModelAdmin):
+    list_display = ('user', 'created_at')
+    search_fields = ('user__username', 'user__email')
+    readonly_fields = ('token', 'created_at')
+
+
+@admin.register(Reminder)
+class ReminderAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'event', 'dossier', 'occurrence_at', 'next_fire_at', 'last_fired_at', 'fire_count')
+    list_filter = ('kind',)
+    raw_id_fields = ('event', 'dossier')
+    readonly_fields = ('occurrence_at', 'next_fire_at', 'last_fired_at', 'fire_count')
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ('title', 'user', 'created_at', 'read_at')
+    list_filter = ('read_at',)
+    search_fields = ('title', 'user__username')
+    raw_id_fields = ('user', 'event', 'dossier')
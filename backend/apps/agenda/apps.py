@@ -2,4 +2,8 @@ from django.apps import AppConfig
 
 class AgendaConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
-    name = "apps.agenda"
\ No newline at end of file
+    name = "apps.agenda"
+
+    def ready(self):
+        # Invalidation des flux iCalendar avec l'accès aux dossiers
+        import apps.agenda.signals  # noqa: F401
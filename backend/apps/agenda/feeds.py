@@ -0,0 +1,281 @@
+"""
+Flux iCalendar (.ics) personnel, accessible par jeton (abonnement depuis un téléphone).
+
+Contenu : événements créés par l'utilisateur ou liés à ses dossiers
+(DossierMembership), agenda du cabinet (événements sans dossier) et échéances
+critiques de ses dossiers ouverts. Les séries récurrentes sont exportées
+telles quelles (RRULE/EXDATE), sans développement.
+
+Chaque flux a une version conservée en cache, qui sert d'ETag :
+- `invalidate_feeds` la renouvelle pour des utilisateurs (événement ou
+  dossier modifié, adhésions resynchronisées : signal access_invalidated de
+  apps/dossiers/access.py, voir signals.py) ;
+- `invalidate_all_feeds` renouvelle la génération commune (agenda du cabinet).
+Tant que la version ne change pas, le contenu est servi depuis le cache et un
+If-None-Match identique reçoit un 304 sans requête SQL.
+"""
+import uuid
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+CACHE_KEY_PREFIX = 'agenda:ics'
+CACHE_TIMEOUT = getattr(settings, 'AGENDA_FEED_CACHE_TIMEOUT', 60 * 60 * 24)
+
+# Historique exporté (les séries récurrentes en cours restent incluses)
+FEED_PAST_DAYS = 180
+
+# Jeton inconnu : réponse négative mise en cache (appareils qui insistent)
+UNKNOWN_TOKEN_TIMEOUT = 60 * 5
+
+PRODID = '-//Cabinet Kiaba//Agenda//FR'
+
+FEED_EVENT_FIELDS = (
+    'id', 'title', 'type', 'start_date', 'start_time', 'end_date', 'end_time', 'all_day',
+    'location', 'description', 'updated_at', 'recurrence_rule', 'recurrence_exceptions',
+    'dossier__reference_code',
+)
+
+
+# ─── Versions et invalidation ───
+
+def _version_key(user_id) -> str:
+    return f"{CACHE_KEY_PREFIX}:version:{user_id}"
+
+
+def _generation_key() -> str:
+    return f"{CACHE_KEY_PREFIX}:generation"
+
+
+def _token_key(token) -> str:
+    return f"{CACHE_KEY_PREFIX}:token:{token}"
+
+
+def _current(key) -> str:
+    """Version courante ; une version absente (invalidée ou évincée) est renouvelée"""
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, uuid.uuid4().hex[:12], None)
+        value = cache.get(key)
+    return value
+
+
+def feed_etag(user_id) -> str:
+    """ETag du flux : génération commune, version de l'utilisateur et jour (fenêtre glissante)"""
+    return f'"{_current(_generation_key())}-{_current(_version_key(user_id))}-{timezone.localdate():%Y%m%d}"'
+
+
+def content_key(user_id, etag) -> str:
+    return f"{CACHE_KEY_PREFIX}:content:{user_id}:{etag.strip(chr(34))}"
+
+
+def _delete_after_commit(keys):
+    cache.delete_many(keys)
+    # Seconde invalidation après commit (même raison que invalidate_user_access)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def invalidate_feeds(*user_ids) -> None:
+    """Renouvelle la version du flux des utilisateurs donnés (identifiants ou instances)"""
+    keys = [_version_key(getattr(user, 'pk', user)) for user in user_ids if user is not None]
+    if keys:
+        _delete_after_commit(keys)
+
+
+def invalidate_all_feeds() -> None:
+    """Agenda du cabinet modifié : tous les flux sont à régénérer"""
+    _delete_after_commit([_generation_key()])
+
+
+def invalidate_dossier_feeds(dossier_ids, extra_users=()) -> None:
+    """Flux des membres des dossiers donnés (et d'utilisateurs supplémentaires)"""
+    from apps.dossiers.models import DossierMembership
+
+    user_ids = set(filter(None, extra_users))
+    dossier_ids = [pk for pk in dossier_ids if pk]
+    if dossier_ids:
+        user_ids.update(
+            DossierMembership.objects.filter(dossier_id__in=dossier_ids).values_list('user_id', flat=True)
+        )
+    invalidate_feeds(*user_ids)
+
+
+# ─── Jetons ───
+
+def resolve_token(token):
+    """Identifiant de l'utilisateur du jeton (None si inconnu), mis en cache"""
+    from .models import CalendarFeed
+
+    cached = cache.get(_token_key(token))
+    if cached is not None:
+        return cached or None
+
+    user_id = (
+        CalendarFeed.objects.filter(token=token, user__is_active=True)
+        .values_list('user_id', flat=True).first()
+    )
+    if user_id is None:
+        cache.set(_token_key(token), '', UNKNOWN_TOKEN_TIMEOUT)
+        return None
+    cache.set(_token_key(token), str(user_id), CACHE_TIMEOUT)
+    return str(user_id)
+
+
+def is_token_active(token) -> bool:
+    """Vérification en base, faite à chaque régénération (compte désactivé, jeton révoqué)"""
+    from .models import CalendarFeed
+
+    return CalendarFeed.objects.filter(token=token, user__is_active=True).exists()
+
+
+def forget_token(token) -> None:
+    cache.delete(_token_key(token))
+
+
+# ─── Rendu ───
+
+def escape_text(value) -> str:
+    """Échappement des valeurs TEXT (RFC 5545 §3.3.11)"""
+    return (
+        str(value or '').replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n').replace('\r', '')
+    )
+
+
+def fold(line: str) -> str:
+    """Pliage des lignes à 75 octets (RFC 5545 §3.1), sans couper un caractère UTF-8"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts, current, size, limit = [], [], 0, 75
+    for char in line:
+        length = len(char.encode('utf-8'))
+        if size + length > limit:
+            parts.append(''.join(current))
+            current, size, limit = [], 0, 74  # La ligne de continuation commence par une espace
+        current.append(char)
+        size += length
+    parts.append(''.join(current))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def fold_all(lines) -> bytes:
+    return ''.join(fold(line) for line in lines).encode('utf-8')
+
+
+def _utc(value) -> str:
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _local(day, time) -> str:
+    """Date + heure locales du cabinet → UTC"""
+    return _utc(timezone.make_aware(datetime.combine(day, time)))
+
+
+def _event_lines(row, stamp):
+    lines = [
+        'BEGIN:VEVENT',
+        f"UID:event-{row['id']}@kiaba",
+        f"DTSTAMP:{stamp}",
+        f"LAST-MODIFIED:{_utc(row['updated_at'])}",
+    ]
+    end_date = row['end_date'] or row['start_date']
+    if not row['all_day'] and row['start_time']:
+        lines.append(f"DTSTART:{_local(row['start_date'], row['start_time'])}")
+        if row['end_time']:
+            lines.append(f"DTEND:{_local(end_date, row['end_time'])}")
+    else:
+        # DTEND exclusif pour les journées entières
+        lines.append(f"DTSTART;VALUE=DATE:{row['start_date']:%Y%m%d}")
+        lines.append(f"DTEND;VALUE=DATE:{end_date + timedelta(days=1):%Y%m%d}")
+
+    if row['recurrence_rule']:
+        lines.append(f"RRULE:{row['recurrence_rule']}")
+        exceptions = row['recurrence_exceptions'] or []
+        if exceptions:
+            value_type = '' if not row['all_day'] and row['start_time'] else ';VALUE=DATE'
+            for day in exceptions:
+                day = datetime.strptime(str(day)[:10], '%Y-%m-%d').date()
+                value = day.strftime('%Y%m%d') if value_type else _local(day, row['start_time'])
+                lines.append(f"EXDATE{value_type}:{value}")
+
+    summary = row['title']
+    if row['dossier__reference_code']:
+        summary = f"{summary} [{row['dossier__reference_code']}]"
+    lines.append(f"SUMMARY:{escape_text(summary)}")
+    lines.append(f"CATEGORIES:{escape_text(row['type'])}")
+    if row['location']:
+        lines.append(f"LOCATION:{escape_text(row['location'])}")
+    if row['description']:
+        lines.append(f"DESCRIPTION:{escape_text(row['description'])}")
+    lines.append('END:VEVENT')
+    return lines
+
+
+def _deadline_lines(row, stamp):
+    summary = f"Échéance : {row['reference_code']} - {row['title']}"
+    return [
+        'BEGIN:VEVENT',
+        f"UID:deadline-{row['id']}@kiaba",
+        f"DTSTAMP:{stamp}",
+        f"DTSTART;VALUE=DATE:{row['critical_deadline']:%Y%m%d}",
+        f"DTEND;VALUE=DATE:{row['critical_deadline'] + timedelta(days=1):%Y%m%d}",
+        f"SUMMARY:{escape_text(summary)}",
+        'CATEGORIES:ECHEANCE',
+        'END:VEVENT',
+    ]
+
+
+def render_feed(user_id):
+    """Flux iCalendar de l'utilisateur, produit par morceaux (un par événement)"""
+    from apps.dossiers.models import Dossier, DossierMembership
+    from .models import Event
+
+    since = timezone.localdate() - timedelta(days=FEED_PAST_DAYS)
+    stamp = _utc(timezone.now())
+    dossier_ids = DossierMembership.objects.filter(user_id=user_id).values('dossier_id')
+
+    yield fold_all([
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f"PRODID:{PRODID}",
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Agenda du cabinet',
+        f"X-WR-TIMEZONE:{settings.TIME_ZONE}",
+    ])
+
+    events = (
+        Event.objects.overlapping(start=since)
+        .filter(Q(created_by_id=user_id) | Q(dossier__isnull=True) | Q(dossier_id__in=dossier_ids))
+        .order_by('start_date').values(*FEED_EVENT_FIELDS)
+    )
+    for row in events.iterator(chunk_size=500):
+        yield fold_all(_event_lines(row, stamp))
+
+    deadlines = (
+        Dossier.objects.filter(
+            pk__in=dossier_ids,
+            critical_deadline__gte=since,
+            status__in=[Dossier.Status.OPEN, Dossier.Status.PENDING],
+        )
+        .order_by('critical_deadline').values('id', 'reference_code', 'title', 'critical_deadline')
+    )
+    for row in deadlines.iterator(chunk_size=500):
+        yield fold_all(_deadline_lines(row, stamp))
+
+    yield fold_all(['END:VCALENDAR'])
+
+
+def stream_and_cache(user_id, etag):
+    """Diffuse le flux tout en le mémorisant pour les requêtes suivantes"""
+    chunks = []
+    for chunk in render_feed(user_id):
+        chunks.append(chunk)
+        yield chunk
+    cache.set(content_key(user_id, etag), b''.join(chunks), CACHE_TIMEOUT)
@@ -0,0 +1,57 @@
+# backend/apps/agenda/management/commands/send_reminders.py
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.agenda import reminders
+
+
+class Command(BaseCommand):
+    help = (
+        "Envoie les rappels d'événements et alertes d'échéances échus (in-app, e-mail) "
+        "puis les replanifie. À lancer périodiquement, ou en continu avec --loop"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=reminders.BATCH_SIZE,
+            help=f'Nombre de rappels traités par transaction (défaut: {reminders.BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Tourner en continu (worker)'
+        )
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=60,
+            help='Secondes entre deux passages avec --loop (défaut: 60)'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recalculer tous les rappels (après migration ou import massif), sans rattrapage'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            events, deadlines = reminders.rebuild(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Rappels recalculés : {events} événement(s), {deadlines} échéance(s)"
+            ))
+            return
+
+        channels = reminders.get_channels()
+        while True:
+            processed, delivered = reminders.process_due(batch_size=options['batch_size'], channels=channels)
+            if processed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"✅ {processed} rappel(s) traité(s), {delivered} notification(s) envoyée(s)"
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,26 @@
+from django.db import migrations, models
+
+
+def fill_end_dates(apps, schema_editor):
+    """Événements sans date de fin : fin = début (voir Event.save)"""
+    Event = apps.get_model('agenda', 'Event')
+    Event.objects.filter(end_date__isnull=True).update(end_date=models.F('start_date'))
+
+
+class Migration(migrations.Migration):
+    """
+    Filtrage du calendrier par chevauchement de fenêtre :
+    end_date toujours renseignée et index composite (end_date, start_date).
+    """
+
+    dependencies = [
+        ('agenda', '0002_event_priority_reminder'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_end_dates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['end_date', 'start_date'], name='agenda_event_range_idx'),
+        ),
+    ]
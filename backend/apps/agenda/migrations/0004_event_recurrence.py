@@ -0,0 +1,34 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Événements récurrents : règle RRULE et dates exclues stockées sur la ligne,
+    fin de série calculée et indexée pour le filtrage du calendrier.
+    """
+
+    dependencies = [
+        ('agenda', '0003_event_range_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_rule',
+            field=models.CharField(blank=True, help_text='Sous-ensemble RRULE (RFC 5545), ex. FREQ=WEEKLY;BYDAY=TU;COUNT=10', max_length=255, verbose_name='Règle de récurrence'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_exceptions',
+            field=models.JSONField(blank=True, default=list, help_text='Occurrences annulées (dates ISO)', verbose_name='Dates exclues'),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='recurrence_until',
+            field=models.DateField(blank=True, editable=False, help_text='Fin de la dernière occurrence, vide si la série est illimitée (calculé)', null=True, verbose_name='Fin de la série'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('recurrence_rule', ''), _negated=True), fields=['recurrence_until', 'start_date'], name='agenda_event_series_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    """
+    Rappels précalculés (next_fire_at indexé) et notifications in-app.
+    Rappels existants : python manage.py send_reminders --rebuild
+    """
+
+    dependencies = [
+        ('dossiers', '0006_dossier_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('agenda', '0005_calendarfeed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=255, verbose_name='Titre')),
+                ('message', models.TextField(blank=True, verbose_name='Message')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Créée le')),
+                ('read_at', models.DateTimeField(blank=True, null=True, verbose_name='Lue le')),
+                ('dossier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='dossiers.dossier', verbose_name='Dossier')),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='notifications', to='agenda.event', verbose_name='Événement')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL, verbose_name='Destinataire')),
+            ],
+            options={
+                'verbose_name': 'Notification',
+                'verbose_name_plural': 'Notifications',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Reminder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('EVENT', "Rappel d'événement"), ('DEADLINE', 'Échéance critique')], max_length=10, verbose_name='Type')),
+                ('occurrence_at', models.DateTimeField(verbose_name='Occurrence visée')),
+                ('next_fire_at', models.DateTimeField(blank=True, null=True, verbose_name='Prochain envoi')),
+                ('last_fired_at', models.DateTimeField(blank=True, null=True, verbose_name='Dernier envoi')),
+                ('fire_count', models.PositiveIntegerField(default=0, verbose_name='Envois')),
+                ('dossier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='deadline_reminders', to='dossiers.dossier', verbose_name='Dossier')),
+                ('event', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reminders', to='agenda.event', verbose_name='Événement')),
+            ],
+            options={
+                'verbose_name': 'Rappel',
+                'verbose_name_plural': 'Rappels',
+                'indexes': [models.Index(condition=models.Q(('next_fire_at__isnull', False)), fields=['next_fire_at'], name='agenda_reminder_due_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(condition=models.Q(('event__isnull', False)), fields=('event',), name='agenda_reminder_unique_event'),
+        ),
+        migrations.AddConstraint(
+            model_name='reminder',
+            constraint=models.UniqueConstraint(condition=models.Q(('dossier__isnull', False)), fields=('dossier',), name='agenda_reminder_unique_dossier'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at'], name='agenda_notif_user_idx'),
+        ),
+    ]
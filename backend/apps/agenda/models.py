@@ -1,14 +1,41 @@
 # backend/apps/agenda/models.py
 
 import uuid
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from apps.dossiers.models import Dossier  # Optionnel : lien avec dossier
+from apps.core.utils import generate_secure_token
+from . import recurrence
 
 User = get_user_model()
 
+class EventQuerySet(models.QuerySet):
+
+    def overlapping(self, start=None, end=None):
+        """
+        Événements dont l'intervalle [start_date, end_date] chevauche la fenêtre.
+        end_date étant toujours renseignée (voir save), la condition est servie
+        par l'index composite (end_date, start_date).
+
+        Les séries récurrentes sont retenues si elles ont commencé avant la fin de
+        la fenêtre et ne sont pas terminées (recurrence_until) avant son début ;
+        leurs occurrences sont ensuite développées en Python (voir recurrence.py).
+        """
+        qs = self
+        if start is not None:
+            qs = qs.filter(
+                Q(recurrence_rule='', end_date__gte=start)
+                | (~Q(recurrence_rule='') & (Q(recurrence_until__isnull=True) | Q(recurrence_until__gte=start)))
+            )
+        if end is not None:
+            qs = qs.filter(start_date__lte=end)
+        return qs
+
+
 class Event(models.Model):
     """
     Événement calendrier du cabinet : audience, RDV, formalité, congé...
@@ -21,6 +48,29 @@ class Event(models.Model):
         CONGE = 'CONGE', _("Congé / Absence")
         AUTRE = 'AUTRE', _("Autre événement")
 
+    class Priority(models.TextChoices):
+        LOW = 'LOW', _("Faible")
+        NORMAL = 'NORMAL', _("Normal")
+        HIGH = 'HIGH', _("Haute")
+        URGENT = 'URGENT', _("Urgente")
+
+    class Reminder(models.TextChoices):
+        NONE = 'NONE', _("Aucun")
+        MIN_15 = '15MIN', _("15 minutes avant")
+        MIN_30 = '30MIN', _("30 minutes avant")
+        HOUR_1 = '1H', _("1 heure avant")
+        HOURS_24 = '24H', _("24 heures avant")
+
+    # Couleurs FullCalendar par type (calculées sans requête)
+    COLORS = {
+        EventType.AUDIENCE: '#D32F2F',
+        EventType.RDV: '#1A237E',
+        EventType.FORMALITE: '#FF8F00',
+        EventType.CONGE: '#616161',
+        EventType.AUTRE: '#1976D2',
+    }
+    DEFAULT_COLOR = '#1976D2'
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     title = models.CharField(max_length=255, verbose_name=_("Titre"))
@@ -38,6 +88,41 @@ class Event(models.Model):
     end_date = models.DateField(null=True, blank=True, verbose_name=_("Date de fin"))
     end_time = models.TimeField(null=True, blank=True, verbose_name=_("Heure de fin"))
 
+    priority = models.CharField(
+        max_length=10,
+        choices=Priority.choices,
+        default=Priority.NORMAL,
+        verbose_name=_("Priorité")
+    )
+    reminder = models.CharField(
+        max_length=10,
+        choices=Reminder.choices,
+        default=Reminder.NONE,
+        blank=True,
+        verbose_name=_("Rappel")
+    )
+
+    # Récurrence : une seule ligne par série, développée à la lecture
+    recurrence_rule = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name=_("Règle de récurrence"),
+        help_text=_("Sous-ensemble RRULE (RFC 5545), ex. FREQ=WEEKLY;BYDAY=TU;COUNT=10")
+    )
+    recurrence_exceptions = models.JSONField(
+        default=list,
+        blank=True,
+        verbose_name=_("Dates exclues"),
+        help_text=_("Occurrences annulées (dates ISO)")
+    )
+    recurrence_until = models.DateField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name=_("Fin de la série"),
+        help_text=_("Fin de la dernière occurrence, vide si la série est illimitée (calculé)")
+    )
+
     location = models.CharField(max_length=255, blank=True, verbose_name=_("Lieu"))
     description = models.TextField(blank=True, verbose_name=_("Description / Notes"))
 
@@ -63,6 +148,8 @@ class Event(models.Model):
     created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Créé le"))
     updated_at = models.DateTimeField(auto_now=True, verbose_name=_("Mis à jour le"))
 
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Événement calendrier")
         verbose_name_plural = _("Événements calendrier")
@@ -71,6 +158,13 @@ class Event(models.Model):
             models.Index(fields=['start_date']),
             models.Index(fields=['type']),
             models.Index(fields=['dossier']),
+            # Recherche par chevauchement de fenêtre (calendrier)
+            models.Index(fields=['end_date', 'start_date'], name='agenda_event_range_idx'),
+            models.Index(
+                fields=['recurrence_until', 'start_date'],
+                name='agenda_event_series_idx',
+                condition=~Q(recurrence_rule=''),
+            ),
         ]
 
     def __str__(self):
@@ -83,14 +177,196 @@ class Event(models.Model):
             return False
         return timezone.now().date() > self.start_date
 
+    @property
+    def is_recurring(self):
+        return bool(self.recurrence_rule)
+
+    def occurrences(self, start=None, end=None):
+        """(début, fin) de chaque occurrence chevauchant la fenêtre"""
+        return recurrence.occurrences(
+            self.recurrence_rule, self.start_date, self.end_date, self.recurrence_exceptions, start, end
+        )
+
     @property
     def color(self):
         """Couleur pour FullCalendar"""
-        colors = {
-            self.EventType.AUDIENCE: '#D32F2F',
-            self.EventType.RDV: '#1A237E',
-            self.EventType.FORMALITE: '#FF8F00',
-            self.EventType.CONGE: '#616161',
-            self.EventType.AUTRE: '#1976D2',
-        }
-        return colors.get(self.type, '#1976D2')
\ No newline at end of file
+        return self.color_for(self.type)
+
+    @classmethod
+    def color_for(cls, event_type):
+        return cls.COLORS.get(event_type, cls.DEFAULT_COLOR)
+
+    def clean(self):
+        super().clean()
+        try:
+            self.recurrence_rule = recurrence.normalize_rule(self.recurrence_rule)
+            if self.recurrence_rule and self.start_date:
+                recurrence.check_span(self.recurrence_rule, self.start_date)
+            recurrence.parse_exceptions(self.recurrence_exceptions)
+        except ValueError as e:
+            raise ValidationError({'recurrence_rule': str(e)})
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        computed = set()
+        # Événement d'un jour : fin = début, pour que le filtrage par fenêtre reste indexable
+        if self.start_date and not self.end_date:
+            self.end_date = self.start_date
+            computed.add('end_date')
+        if update_fields is None or computed or {'recurrence_rule', 'recurrence_exceptions', 'start_date', 'end_date'} & set(update_fields):
+            self.recurrence_rule = recurrence.normalize_rule(self.recurrence_rule)
+            self.recurrence_until = self._compute_recurrence_until()
+            computed |= {'recurrence_rule', 'recurrence_until'}
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | computed
+        super().save(*args, **kwargs)
+
+    def _compute_recurrence_until(self):
+        """Fin de la dernière occurrence d'une série bornée (None : illimitée ou non récurrente)"""
+        if not self.recurrence_rule or not self.start_date:
+            return None
+        exceptions = recurrence.parse_exceptions(self.recurrence_exceptions)
+        last = recurrence.last_occurrence(self.recurrence_rule, self.start_date, exceptions)
+        if last is None:
+            return None
+        return recurrence.shift(last, self.end_date - self.start_date)
+
+
+class CalendarFeedManager(models.Manager):
+
+    def for_user(self, user):
+        feed, _ = self.get_or_create(user=user, defaults={'token': generate_secure_token()})
+        return feed
+
+    def rotate(self, user):
+        """Nouveau jeton : l'ancienne URL d'abonnement cesse de fonctionner"""
+        from .feeds import forget_token
+
+        feed = self.for_user(user)
+        forget_token(feed.token)
+        feed.token = generate_secure_token()
+        feed.save(update_fields=['token'])
+        return feed
+
+
+class CalendarFeed(models.Model):
+    """
+    Jeton d'abonnement au flux iCalendar personnel (voir feeds.py).
+    Le jeton vaut authentification : il se régénère depuis l'API.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='calendar_feed',
+        verbose_name=_("Utilisateur")
+    )
+    token = models.CharField(max_length=64, unique=True, verbose_name=_("Jeton"))
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Créé le"))
+
+    objects = CalendarFeedManager()
+
+    class Meta:
+        verbose_name = _("Flux iCalendar")
+        verbose_name_plural = _("Flux iCalendar")
+
+    def __str__(self):
+        return f"Flux iCalendar de {self.user}"
+
+
+class Reminder(models.Model):
+    """
+    Prochain rappel d'un événement (champ reminder) ou d'une échéance critique
+    de dossier. next_fire_at est précalculé et indexé : le worker
+    (commande send_reminders) ne lit que les rappels échus. Vide = plus rien à envoyer.
+    Les destinataires sont résolus à l'envoi (intervenants du moment).
+    """
+    class Kind(models.TextChoices):
+        EVENT = 'EVENT', _("Rappel d'événement")
+        DEADLINE = 'DEADLINE', _("Échéance critique")
+
+    kind = models.CharField(max_length=10, choices=Kind.choices, verbose_name=_("Type"))
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='reminders',
+        verbose_name=_("Événement")
+    )
+    dossier = models.ForeignKey(
+        'dossiers.Dossier',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='deadline_reminders',
+        verbose_name=_("Dossier")
+    )
+    occurrence_at = models.DateTimeField(verbose_name=_("Occurrence visée"))
+    next_fire_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Prochain envoi"))
+    last_fired_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Dernier envoi"))
+    fire_count = models.PositiveIntegerField(default=0, verbose_name=_("Envois"))
+
+    class Meta:
+        verbose_name = _("Rappel")
+        verbose_name_plural = _("Rappels")
+        indexes = [
+            # Parcours par plage des rappels échus (next_fire_at <= maintenant)
+            models.Index(
+                fields=['next_fire_at'],
+                name='agenda_reminder_due_idx',
+                condition=Q(next_fire_at__isnull=False),
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['event'], condition=Q(event__isnull=False), name='agenda_reminder_unique_event'
+            ),
+            models.UniqueConstraint(
+                fields=['dossier'], condition=Q(dossier__isnull=False), name='agenda_reminder_unique_dossier'
+            ),
+        ]
+
+    def __str__(self):
+        target = self.event or self.dossier
+        return f"{self.get_kind_display()} : {target} ({self.next_fire_at})"
+
+
+class Notification(models.Model):
+    """Notification in-app (canal des rappels, voir reminders.py)"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications',
+        verbose_name=_("Destinataire")
+    )
+    title = models.CharField(max_length=255, verbose_name=_("Titre"))
+    message = models.TextField(blank=True, verbose_name=_("Message"))
+    event = models.ForeignKey(
+        Event,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='notifications',
+        verbose_name=_("Événement")
+    )
+    dossier = models.ForeignKey(
+        'dossiers.Dossier',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='notifications',
+        verbose_name=_("Dossier")
+    )
+    created_at = models.DateTimeField(default=timezone.now, verbose_name=_("Créée le"))
+    read_at = models.DateTimeField(null=True, blank=True, verbose_name=_("Lue le"))
+
+    class Meta:
+        verbose_name = _("Notification")
+        verbose_name_plural = _("Notifications")
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='agenda_notif_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.title} → {self.user}"
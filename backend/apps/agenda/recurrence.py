@@ -0,0 +1,167 @@
+"""
+Récurrence des événements (sous-ensemble RRULE de la RFC 5545).
+
+Une série est stockée sur une seule ligne Event (règle + dates exclues) et
+n'est développée qu'à la lecture, dans la fenêtre demandée. Le développement
+est une fonction pure mémoïsée par (règle, début, exceptions, fenêtre) : la
+clé change avec la règle, aucune invalidation n'est nécessaire.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from itertools import islice
+
+from dateutil.rrule import rrulestr
+
+# Parties RRULE acceptées
+ALLOWED_PARTS = {'FREQ', 'INTERVAL', 'COUNT', 'UNTIL', 'BYDAY', 'BYMONTHDAY', 'BYMONTH', 'BYSETPOS', 'WKST'}
+ALLOWED_FREQUENCIES = {'DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY'}
+
+# Garde-fous contre les séries démesurées (MAX_COUNT borne aussi les séries UNTIL)
+MAX_COUNT = 1000
+MAX_OCCURRENCES_PER_WINDOW = 1000
+
+# Fenêtre de développement quand le calendrier ne fournit pas de borne de fin
+DEFAULT_WINDOW_DAYS = 366
+
+
+def normalize_rule(rule: str) -> str:
+    """
+    Valide et normalise une règle ("RRULE:" facultatif, majuscules, UNTIL en date).
+
+    Raises:
+        ValueError: règle hors du sous-ensemble supporté
+    """
+    rule = (rule or '').strip().upper()
+    if rule.startswith('RRULE:'):
+        rule = rule[len('RRULE:'):]
+    if not rule:
+        return ''
+
+    parts = {}
+    for item in rule.split(';'):
+        name, sep, value = item.partition('=')
+        if not sep or not value:
+            raise ValueError(f"Élément de règle invalide : « {item} »")
+        if name not in ALLOWED_PARTS:
+            raise ValueError(f"Élément de règle non supporté : {name}")
+        parts[name] = value
+
+    if parts.get('FREQ') not in ALLOWED_FREQUENCIES:
+        raise ValueError(f"FREQ attendu parmi {', '.join(sorted(ALLOWED_FREQUENCIES))}")
+    if 'COUNT' in parts and 'UNTIL' in parts:
+        raise ValueError("COUNT et UNTIL ne peuvent pas être combinés")
+    if 'COUNT' in parts and not (parts['COUNT'].isdigit() and 0 < int(parts['COUNT']) <= MAX_COUNT):
+        raise ValueError(f"COUNT doit être compris entre 1 et {MAX_COUNT}")
+    if 'UNTIL' in parts:
+        # Événements à la journée : seule la date de fin compte (évite le mélange naïf/UTC)
+        match = re.match(r'^(\d{8})(T\d{6}Z?)?$', parts['UNTIL'])
+        if not match:
+            raise ValueError("UNTIL attendu au format AAAAMMJJ")
+        parts['UNTIL'] = match.group(1)
+
+    normalized = ';'.join(f"{name}={value}" for name, value in parts.items())
+    try:
+        _build(normalized, date(2000, 1, 1))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Règle de récurrence invalide : {e}")
+    return normalized
+
+
+def check_span(rule: str, dtstart: date) -> None:
+    """
+    Une série UNTIL ne peut pas dépasser MAX_COUNT occurrences, comme COUNT.
+
+    Raises:
+        ValueError: série trop longue
+    """
+    if 'UNTIL=' not in rule:
+        return
+    if sum(1 for _ in islice(_build(rule, dtstart), MAX_COUNT + 1)) > MAX_COUNT:
+        raise ValueError(f"La série dépasse {MAX_COUNT} occurrences : avancez la date UNTIL")
+
+
+def shift(day: date, delta: timedelta) -> date:
+    """day + delta, borné aux dates représentables"""
+    try:
+        return day + delta
+    except OverflowError:
+        return date.max if delta > timedelta(0) else date.min
+
+
+def _build(rule: str, dtstart: date):
+    return rrulestr(rule, dtstart=datetime.combine(dtstart, time.min))
+
+
+def _until(rule: str):
+    match = re.search(r'UNTIL=(\d{8})', rule)
+    return datetime.strptime(match.group(1), '%Y%m%d').date() if match else None
+
+
+@lru_cache(maxsize=4096)
+def expand(rule: str, dtstart: date, exceptions: tuple, window_start: date, window_end: date) -> tuple:
+    """Dates de début des occurrences comprises dans [window_start, window_end]"""
+    excluded = set(exceptions)
+    occurrences = []
+    for occurrence in _build(rule, dtstart).xafter(
+        datetime.combine(window_start, time.min), inc=True
+    ):
+        day = occurrence.date()
+        if day > window_end or len(occurrences) >= MAX_OCCURRENCES_PER_WINDOW:
+            break
+        if day not in excluded:
+            occurrences.append(day)
+    return tuple(occurrences)
+
+
+@lru_cache(maxsize=1024)
+def last_occurrence(rule: str, dtstart: date, exceptions: tuple):
+    """Dernière occurrence d'une série bornée (COUNT/UNTIL), None si la série est infinie"""
+    if 'COUNT=' not in rule and 'UNTIL=' not in rule:
+        return None
+    excluded = set(exceptions)
+    last, seen = dtstart, 0
+    for occurrence in islice(_build(rule, dtstart), MAX_COUNT + 1):
+        seen += 1
+        if occurrence.date() not in excluded:
+            last = occurrence.date()
+    if seen > MAX_COUNT:
+        # Série UNTIL antérieure au plafond : borne supérieure, sans tout développer
+        return max(_until(rule), dtstart)
+    return last
+
+
+def parse_exceptions(values) -> tuple:
+    """Dates exclues (liste de chaînes ISO ou de dates) → tuple trié de dates"""
+    days = set()
+    for value in values or []:
+        days.add(value if isinstance(value, date) else date.fromisoformat(str(value)[:10]))
+    return tuple(sorted(days))
+
+
+def occurrences(rule, start_date, end_date, exceptions, window_start=None, window_end=None):
+    """
+    Occurrences (début, fin) d'un événement chevauchant la fenêtre.
+    Un événement simple (sans règle) est retourné tel quel.
+    """
+    end_date = end_date or start_date
+    if not rule:
+        return [(start_date, end_date)]
+
+    duration = end_date - start_date
+    window_start = window_start or start_date
+    window_end = window_end or shift(window_start, timedelta(days=DEFAULT_WINDOW_DAYS))
+    # Une occurrence commencée avant la fenêtre peut encore la chevaucher
+    days = expand(rule, start_date, parse_exceptions(exceptions), shift(window_start, -duration), window_end)
+    return [(day, shift(day, duration)) for day in days]
+
+
+def next_occurrence(rule, start_date, exceptions, after):
+    """Première occurrence postérieure ou égale à la date `after` (None : série terminée)"""
+    if not rule:
+        return start_date if start_date >= after else None
+    excluded = set(parse_exceptions(exceptions))
+    for occurrence in _build(rule, start_date).xafter(datetime.combine(after, time.min), inc=True):
+        if occurrence.date() not in excluded:
+            return occurrence.date()
+    return None
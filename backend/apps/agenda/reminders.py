@@ -0,0 +1,434 @@
+"""
+Rappels d'événements et alertes d'échéances critiques des dossiers.
+
+- `schedule_event` / `schedule_deadline` : (re)calculent le Reminder d'un
+  événement ou d'un dossier (appelés par les signaux, voir dossiers/signals.py) ;
+- `process_due` : dépile les rappels échus par lots, par parcours de plage sur
+  l'index partiel next_fire_at, les distribue via les canaux configurés puis les
+  replanifie (occurrence suivante d'une série, palier suivant d'une échéance) ;
+- `rebuild` : recalcul complet par lots (commande send_reminders --rebuild).
+
+Les canaux (AGENDA_REMINDER_CHANNELS : chemins de classes ReminderChannel)
+reçoivent toutes les notifications d'un lot en un appel.
+"""
+import logging
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+from django.utils.module_loading import import_string
+
+from . import recurrence
+
+logger = logging.getLogger(__name__)
+
+# Délai entre le rappel et le début de l'occurrence (valeurs de Event.reminder)
+REMINDER_OFFSETS = {
+    '15MIN': timedelta(minutes=15),
+    '30MIN': timedelta(minutes=30),
+    '1H': timedelta(hours=1),
+    '24H': timedelta(hours=24),
+}
+
+# Paliers d'alerte avant une échéance critique (en jours)
+DEADLINE_ALERT_DAYS = getattr(settings, 'AGENDA_DEADLINE_ALERT_DAYS', (7, 1, 0))
+
+# Heure des alertes d'échéance, et heure retenue pour les événements à la journée
+ALERT_TIME = time(8, 0)
+
+# Au-delà de ce retard sur l'occurrence, un rappel échu n'est plus envoyé
+LATE_TOLERANCE = timedelta(hours=1)
+
+DEFAULT_CHANNELS = (
+    'apps.agenda.reminders.InAppChannel',
+    'apps.agenda.reminders.EmailChannel',
+)
+
+BATCH_SIZE = 500
+
+
+# ─── Calcul des prochains envois ───
+
+def _local(day, at):
+    return timezone.make_aware(datetime.combine(day, at))
+
+
+def _occurrence_start(event, day):
+    timed = not event.all_day and event.start_time
+    if not timed:
+        return _local(day, ALERT_TIME)
+    # Instance créée avec une heure en chaîne (non relue depuis la base)
+    at = event.start_time if isinstance(event.start_time, time) else parse_time(event.start_time)
+    return _local(day, at)
+
+
+def next_event_occurrence(event, after):
+    """Début de la première occurrence de l'événement strictement postérieure à `after`"""
+    if event.reminder not in REMINDER_OFFSETS or not event.start_date:
+        return None
+    day = timezone.localdate(after)
+    while True:
+        day = recurrence.next_occurrence(
+            event.recurrence_rule, event.start_date, event.recurrence_exceptions, day
+        )
+        if day is None:
+            return None
+        start = _occurrence_start(event, day)
+        if start > after:
+            return start
+        day += timedelta(days=1)
+
+
+def deadline_occurrence(dossier):
+    from apps.dossiers.models import Dossier
+
+    if not dossier.critical_deadline or dossier.status not in (Dossier.Status.OPEN, Dossier.Status.PENDING):
+        return None
+    return _local(dossier.critical_deadline, ALERT_TIME)
+
+
+def next_deadline_fire(occurrence, after=None):
+    """Premier palier d'alerte postérieur à `after` (None : le premier palier, même passé)"""
+    for days in sorted(DEADLINE_ALERT_DAYS, reverse=True):
+        fire = occurrence - timedelta(days=days)
+        if after is None or fire > after:
+            return fire
+    return None
+
+
+def _event_reminder(event, existing, now):
+    """Reminder (non enregistré) du prochain rappel, ou None"""
+    from .models import Reminder
+
+    after = now
+    if existing is not None and existing.last_fired_at and existing.occurrence_at > now:
+        # Occurrence déjà rappelée : passer à la suivante
+        after = existing.occurrence_at
+    occurrence = next_event_occurrence(event, after)
+    if occurrence is None:
+        return None
+    return Reminder(
+        kind=Reminder.Kind.EVENT, event=event, occurrence_at=occurrence,
+        next_fire_at=occurrence - REMINDER_OFFSETS[event.reminder],
+    )
+
+
+def _deadline_reminder(dossier, existing, now, catch_up=True):
+    """
+    Reminder du prochain palier d'une échéance. Avec catch_up, un palier déjà
+    passé mais jamais envoyé part immédiatement (échéance saisie tardivement).
+    """
+    from .models import Reminder
+
+    occurrence = deadline_occurrence(dossier)
+    if occurrence is None or occurrence + LATE_TOLERANCE < now:
+        return None
+    if existing is not None and existing.occurrence_at == occurrence and existing.last_fired_at:
+        after = existing.last_fired_at
+    else:
+        after = None if catch_up else now
+    fire = next_deadline_fire(occurrence, after)
+    if fire is None:
+        return None
+    return Reminder(kind=Reminder.Kind.DEADLINE, dossier=dossier, occurrence_at=occurrence, next_fire_at=fire)
+
+
+def _store(lookup, reminder, existing):
+    from .models import Reminder
+
+    if reminder is None:
+        if existing is not None:
+            existing.delete()
+        return None
+    if existing is None:
+        reminder.save()
+        return reminder
+    changed = (existing.occurrence_at, existing.next_fire_at) != (reminder.occurrence_at, reminder.next_fire_at)
+    if changed:
+        if existing.occurrence_at != reminder.occurrence_at:
+            existing.last_fired_at = None
+        existing.occurrence_at, existing.next_fire_at = reminder.occurrence_at, reminder.next_fire_at
+        Reminder.objects.filter(**lookup).update(
+            occurrence_at=existing.occurrence_at,
+            next_fire_at=existing.next_fire_at,
+            last_fired_at=existing.last_fired_at,
+        )
+    return existing
+
+
+def schedule_event(event, now=None):
+    """Recalcule le rappel d'un événement (création, modification)"""
+    from .models import Reminder
+
+    now = now or timezone.now()
+    existing = Reminder.objects.filter(event=event).first()
+    return _store({'event': event}, _event_reminder(event, existing, now), existing)
+
+
+def schedule_deadline(dossier, now=None):
+    """Recalcule l'alerte d'échéance critique d'un dossier"""
+    from .models import Reminder
+
+    now = now or timezone.now()
+    existing = Reminder.objects.filter(dossier=dossier).first()
+    return _store({'dossier': dossier}, _deadline_reminder(dossier, existing, now), existing)
+
+
+def schedule_new_deadlines(dossiers, now=None, batch_size=BATCH_SIZE):
+    """
+    Alertes d'échéance de dossiers créés en masse (bulk_create, sans signal post_save) :
+    aucun rappel n'existe encore, insertion par lots.
+    """
+    now = now or timezone.now()
+    return _bulk_create(
+        (_deadline_reminder(dossier, None, now) for dossier in dossiers if dossier.critical_deadline),
+        batch_size,
+    )
+
+
+def rebuild(batch_size=BATCH_SIZE, now=None):
+    """
+    Recalcul complet des rappels. Sans rattrapage : les paliers déjà passés
+    ne sont pas renvoyés.
+
+    Returns:
+        (rappels d'événements, alertes d'échéance) créés
+    """
+    from apps.dossiers.models import Dossier
+    from .models import Event, Reminder
+
+    now = now or timezone.now()
+    today = timezone.localdate(now)
+    Reminder.objects.all().delete()
+
+    events = (
+        Event.objects.filter(reminder__in=list(REMINDER_OFFSETS))
+        .overlapping(start=today)
+        .only('id', 'start_date', 'start_time', 'all_day', 'reminder', 'recurrence_rule', 'recurrence_exceptions')
+    )
+    created_events = _bulk_create(
+        (_event_reminder(event, None, now) for event in events.iterator(chunk_size=batch_size)), batch_size
+    )
+
+    dossiers = Dossier.objects.filter(
+        critical_deadline__gte=today, status__in=[Dossier.Status.OPEN, Dossier.Status.PENDING]
+    ).only('id', 'critical_deadline', 'status')
+    created_deadlines = _bulk_create(
+        (_deadline_reminder(dossier, None, now, catch_up=False) for dossier in dossiers.iterator(chunk_size=batch_size)),
+        batch_size,
+    )
+    return created_events, created_deadlines
+
+
+def _bulk_create(reminders, batch_size):
+    from .models import Reminder
+
+    total = 0
+    batch = []
+    for reminder in reminders:
+        if reminder is None:
+            continue
+        batch.append(reminder)
+        if len(batch) >= batch_size:
+            total += len(Reminder.objects.bulk_create(batch))
+            batch = []
+    if batch:
+        total += len(Reminder.objects.bulk_create(batch))
+    return total
+
+
+# ─── Canaux de distribution ───
+
+class ReminderChannel:
+    """
+    Canal de distribution des rappels. `deliver` reçoit la liste des notifications
+    d'un lot (dicts : user_id, email, title, message, event_id, dossier_id).
+    """
+    name = None
+
+    def deliver(self, notices):
+        raise NotImplementedError
+
+
+class InAppChannel(ReminderChannel):
+    """Notifications consultables dans l'application (une insertion par lot)"""
+    name = 'inapp'
+
+    def deliver(self, notices):
+        from .models import Notification
+
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=notice['user_id'],
+                title=notice['title'][:255],
+                message=notice['message'],
+                event_id=notice['event_id'],
+                dossier_id=notice['dossier_id'],
+            )
+            for notice in notices
+        ], batch_size=BATCH_SIZE)
+
+
+class EmailChannel(ReminderChannel):
+    """
+    Courriels, une connexion SMTP par lot. En développement, pointer EMAIL_HOST
+    vers un serveur SMTP local de test (ex. python -m aiosmtpd -n -l localhost:1025).
+    """
+    name = 'email'
+
+    def deliver(self, notices):
+        messages = [
+            EmailMessage(subject=notice['title'], body=notice['message'], to=[notice['email']])
+            for notice in notices if notice['email']
+        ]
+        if messages:
+            with get_connection() as mail_connection:
+                mail_connection.send_messages(messages)
+
+
+def get_channels():
+    paths = getattr(settings, 'AGENDA_REMINDER_CHANNELS', DEFAULT_CHANNELS)
+    return [import_string(path)() for path in paths]
+
+
+# ─── Worker ───
+
+def _recipients(batch):
+    """Destinataires par rappel : intervenants actifs de l'événement ou du dossier (deux requêtes)"""
+    from django.contrib.auth import get_user_model
+    from apps.dossiers.models import Dossier
+
+    by_reminder = {}
+    dossier_ids = set()
+    for reminder in batch:
+        dossier = reminder.dossier if reminder.dossier_id else (reminder.event.dossier if reminder.event_id else None)
+        user_ids = {dossier.responsible_id} if dossier is not None else set()
+        if reminder.event_id:
+            user_ids.add(reminder.event.created_by_id)
+        if dossier is not None:
+            dossier_ids.add(dossier.pk)
+        by_reminder[reminder.pk] = (dossier.pk if dossier is not None else None, user_ids)
+
+    assigned = {}
+    if dossier_ids:
+        for dossier_id, user_id in Dossier.assigned_users.through.objects.filter(
+            dossier_id__in=dossier_ids
+        ).values_list('dossier_id', 'user_id'):
+            assigned.setdefault(dossier_id, set()).add(user_id)
+
+    all_ids = set()
+    for pk, (dossier_id, user_ids) in by_reminder.items():
+        user_ids |= assigned.get(dossier_id, set())
+        user_ids.discard(None)
+        all_ids |= user_ids
+    emails = dict(
+        get_user_model().objects.filter(pk__in=all_ids, is_active=True).values_list('pk', 'email')
+    )
+    return {
+        pk: [(user_id, emails[user_id]) for user_id in user_ids if user_id in emails]
+        for pk, (_, user_ids) in by_reminder.items()
+    }
+
+
+def _content(reminder, now):
+    """(titre, message) d'un rappel"""
+    if reminder.event_id:
+        event = reminder.event
+        when = timezone.localtime(reminder.occurrence_at)
+        message = f"{event.get_type_display()} : {event.title}\nLe {when:%d/%m/%Y}"
+        if not event.all_day and event.start_time:
+            message += f" à {when:%H:%M}"
+        if event.location:
+            message += f"\nLieu : {event.location}"
+        if event.dossier_id:
+            message += f"\nDossier : {event.dossier.reference_code}"
+        return f"Rappel : {event.title}", message
+
+    dossier = reminder.dossier
+    days = (dossier.critical_deadline - timezone.localdate(now)).days
+    remaining = "aujourd'hui" if days <= 0 else f"dans {days} jour(s)"
+    return (
+        f"Échéance {remaining} : {dossier.reference_code}",
+        f"Échéance critique du dossier « {dossier.title} » le {dossier.critical_deadline:%d/%m/%Y}.",
+    )
+
+
+def _reschedule(reminder, now):
+    """Prochain envoi après une distribution (ou un rappel trop tardif)"""
+    if reminder.event_id:
+        occurrence = next_event_occurrence(reminder.event, max(reminder.occurrence_at, now))
+        if occurrence is None:
+            reminder.next_fire_at = None
+        else:
+            reminder.occurrence_at = occurrence
+            reminder.next_fire_at = occurrence - REMINDER_OFFSETS[reminder.event.reminder]
+    else:
+        reminder.next_fire_at = next_deadline_fire(reminder.occurrence_at, now)
+
+
+def process_batch(batch, channels, now):
+    """Distribue un lot de rappels échus puis les replanifie. Retourne le nombre de notifications"""
+    from .models import Reminder
+
+    recipients = _recipients(batch)
+    notices = []
+    for reminder in batch:
+        if reminder.occurrence_at + LATE_TOLERANCE >= now:
+            title, message = _content(reminder, now)
+            for user_id, email in recipients[reminder.pk]:
+                notices.append({
+                    'user_id': user_id,
+                    'email': email,
+                    'title': title,
+                    'message': message,
+                    'event_id': reminder.event_id,
+                    'dossier_id': reminder.dossier_id or (reminder.event.dossier_id if reminder.event_id else None),
+                })
+            reminder.last_fired_at = now
+            reminder.fire_count += 1
+        _reschedule(reminder, now)
+
+    for channel in channels:
+        try:
+            channel.deliver(notices)
+        except Exception:
+            # Un canal défaillant (SMTP indisponible) ne bloque ni les autres ni la replanification
+            logger.exception("Échec de distribution des rappels (canal %s)", channel.name)
+
+    Reminder.objects.bulk_update(batch, ['occurrence_at', 'next_fire_at', 'last_fired_at', 'fire_count'])
+    return len(notices)
+
+
+def process_due(now=None, batch_size=BATCH_SIZE, channels=None):
+    """
+    Traite tous les rappels échus, lot par lot (une transaction par lot).
+    Plusieurs workers peuvent tourner sous PostgreSQL (SKIP LOCKED).
+
+    Returns:
+        (rappels traités, notifications distribuées)
+    """
+    from .models import Reminder
+
+    now = now or timezone.now()
+    channels = get_channels() if channels is None else channels
+    processed = delivered = 0
+    while True:
+        with transaction.atomic():
+            due = (
+                Reminder.objects.filter(next_fire_at__lte=now)
+                .select_related('event__dossier', 'dossier')
+                .order_by('next_fire_at')
+            )
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True, of=('self',))
+            batch = list(due[:batch_size])
+            if not batch:
+                break
+            delivered += process_batch(batch, channels, now)
+        processed += len(batch)
+        if len(batch) < batch_size:
+            break
+    return processed, delivered
@@ -0,0 +1,255 @@
+"""
+Moteur de planification : occupation des intervenants, conflits d'agenda,
+disponibilités communes.
+
+Intervenants d'un événement : son créateur, le responsable et les
+collaborateurs assignés du dossier lié. Pour une fenêtre donnée, `Schedule`
+charge en deux requêtes les événements de tous les utilisateurs demandés et
+range, par utilisateur, les intervalles occupés triés par début avec le
+maximum cumulé des fins : la recherche de chevauchements se fait par
+dichotomie (O(log n + k)), sans nouvelle requête.
+
+Les heures sont locales au cabinet (datetimes naïfs, comme Event).
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from . import recurrence
+
+# Plage de travail prise en compte pour les créneaux libres
+WORKDAY_START = time(8, 0)
+WORKDAY_END = time(18, 0)
+WORKING_DAYS = {0, 1, 2, 3, 4}  # Lundi → vendredi
+
+# Granularité des créneaux proposés
+SLOT_STEP_MINUTES = 15
+
+# Limites des requêtes de disponibilité
+MAX_USERS = 20
+MAX_WINDOW_DAYS = 62
+
+# Occurrences d'une série vérifiées à la création (au-delà : non contrôlées)
+CONFLICT_HORIZON_DAYS = 180
+
+SCHEDULE_FIELDS = (
+    'id', 'title', 'type', 'start_date', 'start_time', 'end_date', 'end_time', 'all_day',
+    'recurrence_rule', 'recurrence_exceptions', 'created_by_id', 'dossier_id', 'dossier__responsible_id',
+)
+
+
+def is_blocking(event_type, all_day) -> bool:
+    """
+    Les formalités et « autres » à la journée sont des rappels (TRANSP:TRANSPARENT) :
+    elles n'occupent pas l'agenda. Audiences, rendez-vous et congés bloquent.
+    """
+    from .models import Event
+
+    return not (all_day and event_type in (Event.EventType.FORMALITE, Event.EventType.AUTRE))
+
+
+def occurrence_intervals(row, window_start, window_end):
+    """
+    Intervalles [début, fin) occupés par un événement (dict de champs) dans la fenêtre de dates.
+    Journée entière : de 0 h au lendemain de la date de fin.
+    """
+    timed = not row['all_day'] and row['start_time'] and row['end_time']
+    intervals = []
+    for start_date, end_date in recurrence.occurrences(
+        row.get('recurrence_rule'), row['start_date'], row['end_date'],
+        row.get('recurrence_exceptions'), window_start, window_end,
+    ):
+        if timed:
+            start = datetime.combine(start_date, row['start_time'])
+            end = datetime.combine(end_date, row['end_time'])
+        else:
+            start = datetime.combine(start_date, time.min)
+            end = datetime.combine(end_date + timedelta(days=1), time.min)
+        if end > start:
+            intervals.append((start, end))
+    return intervals
+
+
+def event_user_ids(created_by_id, dossier=None) -> set:
+    """Intervenants d'un événement : créateur, responsable et collaborateurs du dossier"""
+    user_ids = {created_by_id} if created_by_id else set()
+    if dossier is not None:
+        user_ids.add(dossier.responsible_id)
+        user_ids.update(dossier.assigned_users.values_list('pk', flat=True))
+    return {str(pk) for pk in user_ids if pk}
+
+
+def merge(intervals):
+    """Union d'intervalles triés par début"""
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class UserSchedule:
+    """Intervalles occupés d'un utilisateur, triés par début"""
+
+    def __init__(self, entries):
+        self.entries = sorted(entries, key=lambda entry: (entry[0], entry[1]))
+        self.starts = [entry[0] for entry in self.entries]
+        # Fin maximale des entrées [0..i] : borne l'exploration vers la gauche
+        self.max_ends = []
+        for _, end, _ in self.entries:
+            self.max_ends.append(max(end, self.max_ends[-1]) if self.max_ends else end)
+
+    def overlapping(self, start, end):
+        """Entrées (début, fin, ligne) chevauchant [start, end)"""
+        index = bisect_left(self.starts, end) - 1
+        hits = []
+        while index >= 0 and self.max_ends[index] > start:
+            entry = self.entries[index]
+            if entry[1] > start:
+                hits.append(entry)
+            index -= 1
+        hits.reverse()
+        return hits
+
+    def busy(self):
+        return merge((start, end) for start, end, _ in self.entries)
+
+
+class Schedule:
+    """Occupation d'un groupe d'utilisateurs sur une fenêtre de dates"""
+
+    def __init__(self, user_ids, window_start, window_end, entries):
+        self.user_ids = [str(pk) for pk in user_ids]
+        self.window_start = window_start
+        self.window_end = window_end
+        self.users = {user_id: UserSchedule(entries.get(user_id, [])) for user_id in self.user_ids}
+
+    @classmethod
+    def load(cls, user_ids, window_start, window_end, exclude_event=None):
+        """Charge les événements bloquants des utilisateurs (deux requêtes)"""
+        from apps.dossiers.models import Dossier
+        from .models import Event
+
+        user_ids = {str(pk) for pk in user_ids}
+        Assignment = Dossier.assigned_users.through
+        qs = Event.objects.overlapping(window_start, window_end).filter(
+            Q(created_by_id__in=user_ids)
+            | Q(dossier__responsible_id__in=user_ids)
+            | Q(dossier_id__in=Assignment.objects.filter(user_id__in=user_ids).values('dossier_id'))
+        )
+        if exclude_event is not None:
+            qs = qs.exclude(pk=exclude_event)
+        rows = [row for row in qs.values(*SCHEDULE_FIELDS) if is_blocking(row['type'], row['all_day'])]
+
+        assigned = defaultdict(set)
+        dossier_ids = {row['dossier_id'] for row in rows if row['dossier_id']}
+        if dossier_ids:
+            for dossier_id, user_id in Assignment.objects.filter(
+                dossier_id__in=dossier_ids, user_id__in=user_ids
+            ).values_list('dossier_id', 'user_id'):
+                assigned[dossier_id].add(str(user_id))
+
+        entries = defaultdict(list)
+        for row in rows:
+            involved = {str(row['created_by_id']), str(row['dossier__responsible_id'])} | assigned[row['dossier_id']]
+            intervals = occurrence_intervals(row, window_start, window_end)
+            for user_id in involved & user_ids:
+                entries[user_id].extend((start, end, row) for start, end in intervals)
+        return cls(user_ids, window_start, window_end, entries)
+
+    def conflicts(self, intervals, user_ids=None):
+        """Chevauchements entre des intervalles candidats et l'occupation des utilisateurs"""
+        found = []
+        for user_id in user_ids or self.user_ids:
+            schedule = self.users.get(str(user_id))
+            if schedule is None:
+                continue
+            for start, end in intervals:
+                for busy_start, busy_end, row in schedule.overlapping(start, end):
+                    found.append({
+                        'user': str(user_id),
+                        'event': row,
+                        'start': max(start, busy_start),
+                        'end': min(end, busy_end),
+                    })
+        return found
+
+    def busy(self, user_id):
+        return self.users[str(user_id)].busy()
+
+    def free_slots(self, user_ids=None, day_start=WORKDAY_START, day_end=WORKDAY_END, not_before=None):
+        """Créneaux libres communs (jours ouvrés, plage de travail), triés"""
+        busy = merge(sorted(
+            interval for user_id in (user_ids or self.user_ids) for interval in self.busy(user_id)
+        ))
+        slots = []
+        day = self.window_start
+        while day <= self.window_end:
+            if day.weekday() in WORKING_DAYS:
+                cursor = datetime.combine(day, day_start)
+                closing = datetime.combine(day, day_end)
+                if not_before is not None and cursor < not_before:
+                    cursor = _round_up(not_before)
+                index = max(bisect_left(busy, (cursor, cursor)) - 1, 0)
+                for busy_start, busy_end in busy[index:]:
+                    if busy_start >= closing:
+                        break
+                    if busy_start > cursor:
+                        slots.append((cursor, min(busy_start, closing)))
+                    cursor = max(cursor, busy_end)
+                if cursor < closing:
+                    slots.append((cursor, closing))
+            day += timedelta(days=1)
+        return slots
+
+    def first_common_slot(self, duration, user_ids=None, **kwargs):
+        """Premier créneau d'au moins `duration` où tous les utilisateurs sont libres"""
+        for start, end in self.free_slots(user_ids, **kwargs):
+            if end - start >= duration:
+                return start, start + duration
+        return None
+
+
+def _round_up(moment):
+    """Arrondi au pas des créneaux suivant"""
+    moment = moment.replace(second=0, microsecond=0)
+    overflow = moment.minute % SLOT_STEP_MINUTES
+    if overflow:
+        moment += timedelta(minutes=SLOT_STEP_MINUTES - overflow)
+    return moment
+
+
+def check_event_conflicts(event, user_ids):
+    """
+    Conflits d'un événement (instance non forcément enregistrée) avec l'agenda
+    de ses intervenants. Les séries sont contrôlées sur CONFLICT_HORIZON_DAYS.
+    """
+    if not event.start_date or not is_blocking(event.type, event.all_day):
+        return []
+    row = {
+        'start_date': event.start_date,
+        'end_date': event.end_date or event.start_date,
+        'start_time': event.start_time,
+        'end_time': event.end_time,
+        'all_day': event.all_day,
+        'recurrence_rule': event.recurrence_rule,
+        'recurrence_exceptions': event.recurrence_exceptions,
+    }
+    window_start = max(event.start_date, timezone.localdate()) if event.recurrence_rule else event.start_date
+    if event.recurrence_rule:
+        window_end = window_start + timedelta(days=CONFLICT_HORIZON_DAYS)
+    else:
+        window_end = row['end_date']
+    intervals = occurrence_intervals(row, window_start, window_end)
+    if not intervals or not user_ids:
+        return []
+
+    exclude = None if event._state.adding else event.pk
+    schedule = Schedule.load(user_ids, window_start, window_end, exclude_event=exclude)
+    return schedule.conflicts(intervals)
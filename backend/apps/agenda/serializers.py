@@ -4,7 +4,8 @@
 # ============================================================================
 
 from rest_framework import serializers
-from .models import Event
+from .models import Event, Notification
+from . import recurrence
 from apps.dossiers.serializers import DossierListSerializer
 from apps.users.serializers import UserMinimalSerializer
 from apps.dossiers.models import Dossier
@@ -47,12 +48,15 @@ class EventSerializer(serializers.ModelSerializer):
             'dossier_info',   # Read-only (objet complet)
             'priority',       # AJOUTÉ
             'reminder',       # AJOUTÉ
+            'recurrence_rule',
+            'recurrence_exceptions',
+            'recurrence_until',
             'created_by', 
             'created_at', 
             'updated_at', 
             'color'
         ]
-        read_only_fields = ['created_by', 'created_at', 'updated_at', 'color']
+        read_only_fields = ['created_by', 'created_at', 'updated_at', 'color', 'recurrence_until']
 
     def create(self, validated_data):
         """
@@ -60,6 +64,20 @@ class EventSerializer(serializers.ModelSerializer):
         """
         validated_data['created_by'] = self.context['request'].user
         return super().create(validated_data)
+
+    def validate_recurrence_rule(self, value):
+        try:
+            return recurrence.normalize_rule(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate_recurrence_exceptions(self, value):
+        if not isinstance(value, list):
+            raise serializers.ValidationError("Liste de dates attendue")
+        try:
+            return [day.isoformat() for day in recurrence.parse_exceptions(value)]
+        except (TypeError, ValueError):
+            raise serializers.ValidationError("Dates au format AAAA-MM-JJ attendues")
     
     def validate(self, data):
         """
@@ -81,5 +99,26 @@ class EventSerializer(serializers.ModelSerializer):
                 raise serializers.ValidationError({
                     'end_time': 'L\'heure de fin doit être après l\'heure de début'
                 })
+
+        rule = data.get('recurrence_rule', getattr(self.instance, 'recurrence_rule', ''))
+        start_date = data.get('start_date', getattr(self.instance, 'start_date', None))
+        if rule and start_date:
+            try:
+                recurrence.check_span(rule, start_date)
+            except ValueError as e:
+                raise serializers.ValidationError({'recurrence_rule': str(e)})
         
-        return data
\ No newline at end of file
+        return data
+
+
+class NotificationSerializer(serializers.ModelSerializer):
+    """Notifications in-app (rappels d'événements, alertes d'échéance)"""
+    is_read = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Notification
+        fields = ['id', 'title', 'message', 'event', 'dossier', 'created_at', 'read_at', 'is_read']
+        read_only_fields = fields
+
+    def get_is_read(self, obj):
+        return obj.read_at is not None
@@ -0,0 +1,14 @@
+"""
+Abonnements de l'agenda aux événements des autres applications.
+"""
+from django.dispatch import receiver
+
+from apps.dossiers.access import access_invalidated
+
+from .feeds import invalidate_feeds
+
+
+@receiver(access_invalidated)
+def access_changed(sender, user_ids, **kwargs):
+    # Le flux iCalendar dépend des mêmes adhésions que l'accès aux dossiers
+    invalidate_feeds(*user_ids)
@@ -1,5 +1,7 @@
 import uuid
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -7,7 +9,7 @@ from django.contrib.auth import get_user_model
 from apps.agenda.models import Event
 from apps.dossiers.models import Dossier
 from apps.clients.models import Client # Importation du modèle Client
-from datetime import date
+from datetime import date, timedelta
 
 User = get_user_model()
 
@@ -76,8 +78,8 @@ class EventAPITest(APITestCase):
         self.client_obj = Client.objects.create(
             client_type='MORALE',
             company_name='Test SARL',
-            rccm='LBV/2026/B/0000',
-            nif='2026000000',
+            rccm='GA-LBV-2026-B12-00001',
+            nif='202600-A',
             phone_primary='+24166000002'
         )
 
@@ -124,4 +126,215 @@ class EventAPITest(APITestCase):
         )
         url = reverse('event-calendar')
         response = self.client.get(url)
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_calendar_range_overlap_single_query(self):
+        Event.objects.create(
+            title="Session arbitrale", type='AUDIENCE',
+            start_date=date(2026, 1, 28), end_date=date(2026, 2, 3), created_by=self.user
+        )
+        Event.objects.create(
+            title="Signature", type='FORMALITE', start_date=date(2026, 2, 10),
+            all_day=False, start_time='09:00', end_time='10:00', created_by=self.user, dossier=self.dossier
+        )
+        Event.objects.create(title="Hors fenêtre", type='RDV', start_date=date(2026, 3, 10), created_by=self.user)
+        url = reverse('event-calendar')
+        self.client.get(url)  # Cache des dossiers accessibles
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'start': '2026-02-01T00:00:00+01:00', 'end': '2026-03-01'})
+        # Hors SAVEPOINT de ATOMIC_REQUESTS
+        self.assertEqual(len([q for q in queries if q['sql'].startswith('SELECT')]), 1)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = {event['title']: event for event in response.data}
+        self.assertEqual(set(events), {"Session arbitrale", "Signature"})
+        # Fin exclusive pour les journées entières, couleur sans requête
+        self.assertEqual(events["Session arbitrale"]['end'], str(date(2026, 2, 3) + timedelta(days=1)))
+        self.assertEqual(events["Session arbitrale"]['backgroundColor'], '#D32F2F')
+        self.assertEqual(events["Signature"]['start'], "2026-02-10T09:00:00")
+
+        response = self.client.get(url, {'start': '2026-02-01', 'end': '2026-03-01', 'dossier': str(self.dossier.id)})
+        self.assertEqual([event['title'] for event in response.data], ["Signature"])
+
+        response = self.client.get(url, {'start': 'demain'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_calendar_expands_recurring_series_in_window(self):
+        # Audience hebdomadaire illimitée commencée bien avant la fenêtre, une séance annulée
+        weekly = Event.objects.create(
+            title="Audience hebdomadaire", type='AUDIENCE', start_date=date(2024, 1, 2),
+            recurrence_rule='rrule:freq=weekly;byday=tu', recurrence_exceptions=['2026-02-10'],
+            created_by=self.user
+        )
+        self.assertEqual(weekly.recurrence_rule, 'FREQ=WEEKLY;BYDAY=TU')
+        self.assertIsNone(weekly.recurrence_until)
+        # Série bornée terminée avant la fenêtre
+        monthly = Event.objects.create(
+            title="Dépôt mensuel", type='FORMALITE', start_date=date(2025, 1, 15),
+            recurrence_rule='FREQ=MONTHLY;COUNT=3', created_by=self.user
+        )
+        self.assertEqual(monthly.recurrence_until, date(2025, 3, 15))
+
+        response = self.client.get(reverse('event-calendar'), {'start': '2026-02-01', 'end': '2026-02-28'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        starts = [event['start'] for event in response.data]
+        self.assertEqual(starts, ['2026-02-03', '2026-02-17', '2026-02-24'])
+        self.assertEqual({event['groupId'] for event in response.data}, {str(weekly.id)})
+        self.assertEqual(Event.objects.count(), 2)
+
+        response = self.client.post(reverse('event-list'), {
+            'title': "Série invalide", 'type': 'RDV', 'start_date': '2026-02-01', 'all_day': True,
+            'recurrence_rule': 'FREQ=HOURLY',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recurrence_rule', response.data['validation_errors'])
+
+        response = self.client.post(reverse('event-list'), {
+            'title': "Série sans fin", 'type': 'RDV', 'start_date': '2026-02-01', 'all_day': True,
+            'recurrence_rule': 'FREQ=DAILY;UNTIL=99991231',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recurrence_rule', response.data['validation_errors'])
+
+    def test_long_series_bounds_stay_cheap(self):
+        # Lignes antérieures au plafond : enregistrées sans développer ni déborder
+        event = Event.objects.create(
+            title="Permanence", type='RDV', start_date=date(2026, 1, 1), end_date=date(2026, 1, 2),
+            recurrence_rule='FREQ=DAILY;UNTIL=99991231', created_by=self.user
+        )
+        self.assertEqual(event.recurrence_until, date.max)
+        self.assertEqual(len(event.occurrences(date(2026, 1, 10), date(2026, 1, 20))), 12)
+
+    def test_access_change_renews_feed_version(self):
+        from apps.agenda import feeds
+        from apps.dossiers.access import invalidate_user_access
+
+        etag = feeds.feed_etag(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            invalidate_user_access(self.user)
+        self.assertNotEqual(feeds.feed_etag(self.user.pk), etag)
+
+    def test_ics_feed_etag_and_regeneration(self):
+        today = date.today()
+        event = Event.objects.create(
+            title="Audience; renvoi", type='AUDIENCE', start_date=today + timedelta(days=3),
+            dossier=self.dossier, created_by=self.user, recurrence_rule='FREQ=WEEKLY;COUNT=4'
+        )
+        self.dossier.critical_deadline = today + timedelta(days=10)
+        self.dossier.save()
+
+        url = self.client.get(reverse('event-feed')).data['url']
+        self.client.force_authenticate(user=None)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn("SUMMARY:Audience\; renvoi [API-2026-0001]", body)
+        self.assertIn("RRULE:FREQ=WEEKLY;COUNT=4", body)
+        self.assertIn(f"UID:deadline-{self.dossier.id}@kiaba", body)
+        etag = response['ETag']
+
+        # Appareil à jour : 304 sans requête SQL ; sinon contenu servi depuis le cache
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(self.client.get(url).content.decode(), body)
+        self.assertEqual([q for q in queries if q['sql'].startswith('SELECT')], [])
+
+        event.title = "Audience reportée"
+        event.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn("Audience reportée", b''.join(response.streaming_content).decode())
+
+        # Jeton régénéré : l'ancienne URL ne répond plus
+        self.client.force_authenticate(user=self.user)
+        new_url = self.client.post(reverse('event-feed')).data['url']
+        self.assertNotEqual(new_url, url)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_scheduling_conflicts_and_common_slot(self):
+        colleague = User.objects.create_user(
+            username='collegue', password='apipass123', role='AVOCAT', professional_id='API/2026/003'
+        )
+        self.dossier.assigned_users.add(colleague)
+        monday = date(2027, 3, 1)
+        # Le collaborateur plaide de 9 h à 11 h ; une formalité à la journée ne bloque pas
+        Event.objects.create(
+            title="Plaidoirie", type='AUDIENCE', start_date=monday, all_day=False,
+            start_time='09:00', end_time='11:00', created_by=colleague
+        )
+        Event.objects.create(title="Dépôt greffe", type='FORMALITE', start_date=monday, created_by=self.user)
+
+        payload = {
+            'title': "Audience dossier", 'type': 'AUDIENCE', 'start_date': str(monday), 'all_day': False,
+            'start_time': '10:30', 'end_time': '12:00', 'dossier': str(self.dossier.id),
+        }
+        response = self.client.post(reverse('event-list'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(len(response.data['conflicts']), 1)
+        conflict = response.data['conflicts'][0]
+        self.assertEqual(conflict['user'], str(colleague.pk))
+        self.assertEqual(conflict['title'], "Plaidoirie")
+        self.assertEqual((conflict['start'], conflict['end']), ('2027-03-01T10:30:00', '2027-03-01T11:00:00'))
+
+        response = self.client.post(reverse('event-list'), {**payload, 'confirm_conflicts': True}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        users = f"{self.user.pk},{colleague.pk}"
+        response = self.client.get(reverse('event-free-busy'), {'users': users, 'start': str(monday), 'end': str(monday)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['busy'][str(self.user.pk)], [
+            {'start': '2027-03-01T10:30:00', 'end': '2027-03-01T12:00:00'},
+        ])
+        self.assertEqual(response.data['free'][0], {'start': '2027-03-01T08:00:00', 'end': '2027-03-01T09:00:00'})
+
+        response = self.client.get(reverse('event-first-slot'), {'users': users, 'start': str(monday), 'duration': 90})
+        self.assertEqual(response.data, {'start': '2027-03-01T12:00:00', 'end': '2027-03-01T13:30:00'})
+
+        response = self.client.get(reverse('event-first-slot'), {'users': f"{self.user.pk},{uuid.uuid4()}"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_reminders_fire_in_batches_and_reschedule(self):
+        from django.core import mail
+        from django.utils import timezone
+        from apps.agenda import reminders
+        from apps.agenda.models import Notification, Reminder
+
+        colleague = User.objects.create_user(
+            username='collegue', email='collegue@cabinet.ga', password='apipass123',
+            role='AVOCAT', professional_id='API/2026/004'
+        )
+        self.dossier.assigned_users.add(colleague)
+        tomorrow = timezone.localdate() + timedelta(days=1)
+        event = Event.objects.create(
+            title="Audience hebdomadaire", type='AUDIENCE', start_date=tomorrow, all_day=False,
+            start_time='10:00', end_time='11:00', reminder='1H', dossier=self.dossier,
+            recurrence_rule='FREQ=WEEKLY;COUNT=2', created_by=self.user
+        )
+        reminder = Reminder.objects.get(event=event)
+        self.assertEqual(timezone.localtime(reminder.next_fire_at).hour, 9)
+
+        # Échéance dans 3 jours : le palier J-7 déjà passé part au prochain passage
+        self.dossier.critical_deadline = timezone.localdate() + timedelta(days=3)
+        self.dossier.save()
+        deadline = Reminder.objects.get(dossier=self.dossier)
+        self.assertLessEqual(deadline.next_fire_at, timezone.now())
+
+        now = reminder.next_fire_at + timedelta(minutes=1)
+        processed, delivered = reminders.process_due(now=now, batch_size=1)
+        self.assertEqual((processed, delivered), (2, 4))
+        self.assertEqual(Notification.objects.filter(user=colleague).count(), 2)
+        self.assertEqual(len(mail.outbox), 2)  # Seul le collaborateur a une adresse
+
+        # Série : occurrence suivante ; échéance : palier J-1
+        reminder.refresh_from_db()
+        self.assertEqual(timezone.localtime(reminder.occurrence_at).date(), tomorrow + timedelta(days=7))
+        deadline.refresh_from_db()
+        self.assertEqual(
+            timezone.localtime(deadline.next_fire_at).date(), self.dossier.critical_deadline - timedelta(days=1)
+        )
+        self.assertEqual(reminders.process_due(now=now), (0, 0))
+
+        response = self.client.get(reverse('notification-list'), {'unread': 1})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results'] if 'results' in response.data else response.data), 2)
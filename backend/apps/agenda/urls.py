@@ -2,11 +2,14 @@
 
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import EventViewSet
+from .views import EventViewSet, NotificationViewSet, ics_feed
 
 router = DefaultRouter()
+# Avant l'enregistrement à la racine, dont la route détail capterait "notifications/"
+router.register(r'notifications', NotificationViewSet, basename='notification')
 router.register(r'', EventViewSet, basename='event')
 
 urlpatterns = [
+    path('ics/<str:token>.ics', ics_feed, name='agenda-ics-feed'),
     path('', include(router.urls)),
 ]
\ No newline at end of file
@@ -1,12 +1,131 @@
 # backend/apps/agenda/views.py
 
-from rest_framework import viewsets, permissions
+import uuid
+from datetime import timedelta
+
+from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.core.cache import cache
+from django.db.models import Q
+from django.http import Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.urls import reverse
 from django.utils import timezone
-from .models import Event
-from .serializers import EventSerializer
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_GET
+from .models import CalendarFeed, Event, Notification
+from . import feeds, recurrence, scheduling
+from .serializers import EventSerializer, NotificationSerializer
 from apps.audit.utils import log_action
+from apps.core.exceptions import SchedulingConflictError
+from apps.dossiers.access import filter_by_accessible_dossiers, get_accessible_dossier_ids
+from apps.dossiers.models import DossierMembership
+
+
+# Champs lus par le calendrier (une seule requête, sans instancier de modèles)
+CALENDAR_FIELDS = (
+    'id', 'title', 'type', 'priority', 'start_date', 'start_time', 'end_date', 'end_time',
+    'all_day', 'location', 'description', 'dossier_id', 'dossier__reference_code',
+    'recurrence_rule', 'recurrence_exceptions',
+)
+
+
+def parse_calendar_bound(value):
+    """Borne de fenêtre FullCalendar : date ou date-heure ISO (seule la date compte)"""
+    if not value:
+        return None
+    parsed = parse_datetime(value) or parse_date(value[:10])
+    if parsed is None:
+        raise ValueError(value)
+    return parsed.date() if hasattr(parsed, 'date') else parsed
+
+
+def format_calendar_event(row, start_date=None, end_date=None):
+    """
+    Ligne .values() → objet événement FullCalendar.
+    start_date/end_date : dates d'une occurrence d'une série récurrente.
+    """
+    start_date = start_date or row['start_date']
+    end_date = end_date or row['end_date']
+    timed = not row['all_day'] and row['start_time']
+    start = f"{start_date}T{row['start_time']}" if timed else str(start_date)
+    end = None
+    if timed and row['end_time']:
+        end = f"{end_date}T{row['end_time']}"
+    elif not timed and end_date and end_date > start_date:
+        # Journées entières : FullCalendar attend une fin exclusive
+        end = str(end_date + timedelta(days=1))
+
+    event = {
+        'id': row['id'],
+        'title': row['title'],
+        'start': start,
+        'end': end,
+        'allDay': not timed,
+        'backgroundColor': Event.color_for(row['type']),
+        'extendedProps': {
+            'type': row['type'],
+            'priority': row['priority'],
+            'location': row['location'],
+            'description': row['description'],
+            'dossier': row['dossier_id'],
+            'dossier_reference': row['dossier__reference_code'],
+        }
+    }
+    if row.get('recurrence_rule'):
+        # Occurrences d'une même série : identifiant propre, regroupées par groupId
+        event['id'] = f"{row['id']}_{start_date:%Y%m%d}"
+        event['groupId'] = str(row['id'])
+        event['extendedProps']['recurrence_rule'] = row['recurrence_rule']
+    return event
+
+
+def expand_calendar_rows(rows, start=None, end=None):
+    """Événements FullCalendar de la fenêtre, séries récurrentes développées à la volée"""
+    events = []
+    for row in rows:
+        if not row['recurrence_rule']:
+            events.append(format_calendar_event(row))
+            continue
+        for occurrence_start, occurrence_end in recurrence.occurrences(
+            row['recurrence_rule'], row['start_date'], row['end_date'],
+            row['recurrence_exceptions'], start, end,
+        ):
+            events.append(format_calendar_event(row, occurrence_start, occurrence_end))
+    events.sort(key=lambda event: event['start'])
+    return events
+
+
+def parse_availability_params(params):
+    """
+    Paramètres des endpoints de disponibilité : users (UUID séparés par des virgules),
+    start/end (dates, semaine courante par défaut).
+
+    Raises:
+        ValueError: paramètre manquant ou invalide
+    """
+    from django.contrib.auth import get_user_model
+
+    user_ids = [str(uuid.UUID(value)) for value in params.get('users', '').split(',') if value.strip()]
+    if not user_ids:
+        raise ValueError("users est obligatoire")
+    if len(user_ids) > scheduling.MAX_USERS:
+        raise ValueError(f"{scheduling.MAX_USERS} utilisateurs au maximum")
+    found = get_user_model().objects.filter(pk__in=user_ids, is_active=True).count()
+    if found != len(set(user_ids)):
+        raise ValueError("utilisateur inconnu ou inactif")
+
+    start = parse_calendar_bound(params.get('start')) or timezone.localdate()
+    end = parse_calendar_bound(params.get('end')) or start + timedelta(days=6)
+    if end < start or (end - start).days > scheduling.MAX_WINDOW_DAYS:
+        raise ValueError(f"fenêtre invalide (au plus {scheduling.MAX_WINDOW_DAYS} jours)")
+    return user_ids, start, end
+
+
+def format_interval(start, end):
+    return {'start': start.isoformat(), 'end': end.isoformat()}
+
 
 class EventViewSet(viewsets.ModelViewSet):
     queryset = Event.objects.all()
@@ -14,24 +133,98 @@ class EventViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_queryset(self):
-        return Event.objects.select_related('dossier', 'created_by')
+        """
+        Événements des dossiers accessibles, événements sans dossier (agenda
+        du cabinet) et événements créés par l'utilisateur.
+        """
+        user = self.request.user
+        qs = Event.objects.select_related('dossier', 'created_by')
+        return filter_by_accessible_dossiers(
+            qs, user, extra=Q(dossier__isnull=True) | Q(created_by=user)
+        )
+
+    def create(self, request, *args, **kwargs):
+        try:
+            return super().create(request, *args, **kwargs)
+        except SchedulingConflictError as exc:
+            return self._conflict_response(exc)
+
+    def update(self, request, *args, **kwargs):
+        try:
+            return super().update(request, *args, **kwargs)
+        except SchedulingConflictError as exc:
+            return self._conflict_response(exc)
+
+    @staticmethod
+    def _conflict_response(exc):
+        return Response({
+            'error': True,
+            'status_code': exc.status_code,
+            'message': str(exc.detail),
+            'error_code': exc.default_code,
+            'conflicts': exc.conflicts,
+        }, status=exc.status_code)
+
+    def check_schedule(self, serializer):
+        """
+        Conflits d'agenda des intervenants (créateur, responsable et collaborateurs
+        du dossier). Passer "confirm_conflicts": true pour enregistrer malgré tout.
+        """
+        if str(self.request.data.get('confirm_conflicts', '')).lower() in ('true', '1'):
+            return
+        instance = serializer.instance
+        values = {} if instance is None else {
+            field.attname: getattr(instance, field.attname) for field in Event._meta.concrete_fields
+        }
+        candidate = Event(**values)
+        candidate._state.adding = instance is None
+        for field, value in serializer.validated_data.items():
+            setattr(candidate, field, value)
+        created_by_id = instance.created_by_id if instance is not None else self.request.user.pk
+
+        user_ids = scheduling.event_user_ids(created_by_id, candidate.dossier)
+        conflicts = scheduling.check_event_conflicts(candidate, user_ids)
+        if conflicts:
+            raise SchedulingConflictError(self._format_conflicts(conflicts))
+
+    def _format_conflicts(self, conflicts):
+        """Titres masqués pour les événements de dossiers non accessibles (secret professionnel)"""
+        user = self.request.user
+        accessible = get_accessible_dossier_ids(user)
+        formatted = []
+        for conflict in conflicts:
+            row = conflict['event']
+            visible = (
+                accessible is None or row['dossier_id'] is None
+                or row['dossier_id'] in accessible or row['created_by_id'] == user.pk
+            )
+            formatted.append({
+                'user': conflict['user'],
+                'event_id': str(row['id']) if visible else None,
+                'title': row['title'] if visible else "Occupé",
+                'type': row['type'],
+                **format_interval(conflict['start'], conflict['end']),
+            })
+        return formatted
 
     def perform_create(self, serializer):
+        self.check_schedule(serializer)
         event = serializer.save()
         log_action(
             user=self.request.user,
             obj=event,
-            action='CREATE',
+            action_type='CREATE',
             description=f"Création événement : {event.title}",
             request=self.request
         )
 
     def perform_update(self, serializer):
+        self.check_schedule(serializer)
         event = serializer.save()
         log_action(
             user=self.request.user,
             obj=event,
-            action='UPDATE',
+            action_type='UPDATE',
             description=f"Modification événement : {event.title}",
             request=self.request
         )
@@ -40,7 +233,7 @@ class EventViewSet(viewsets.ModelViewSet):
         log_action(
             user=self.request.user,
             obj=instance,
-            action='DELETE',
+            action_type='DELETE',
             description=f"Suppression événement : {instance.title}",
             request=self.request
         )
@@ -48,39 +241,167 @@ class EventViewSet(viewsets.ModelViewSet):
 
     @action(detail=False, methods=['get'])
     def calendar(self, request):
-        """Endpoint optimisé pour FullCalendar"""
-        start = request.query_params.get('start')
-        end = request.query_params.get('end')
-
-        qs = self.get_queryset()
-        if start:
-            qs = qs.filter(start_date__gte=start)
-        if end:
-            qs = qs.filter(start_date__lte=end)
-
-        events = qs.values(
-            'id', 'title', 'type', 'start_date', 'start_time', 'all_day',
-            'location', 'description', 'dossier_id'
+        """
+        Endpoint optimisé pour FullCalendar (une seule requête).
+        GET /agenda/calendar/?start=2026-02-01&end=2026-03-15
+        
+        Filtres optionnels :
+        - dossier=<uuid>
+        - user=<id> : événements créés par l'utilisateur ou liés à ses dossiers
+        - type=AUDIENCE,RDV
+        
+        Les événements sur plusieurs jours commencés avant la fenêtre sont inclus.
+        Les séries récurrentes sont développées dans la fenêtre (un an sans borne de fin).
+        """
+        params = request.query_params
+        try:
+            start = parse_calendar_bound(params.get('start'))
+            end = parse_calendar_bound(params.get('end'))
+            dossier_id = uuid.UUID(params['dossier']) if params.get('dossier') else None
+            user_id = uuid.UUID(params['user']) if params.get('user') else None
+        except ValueError as e:
+            return Response({'detail': f"Paramètre invalide : {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        qs = self.get_queryset().overlapping(start, end)
+
+        if dossier_id:
+            qs = qs.filter(dossier_id=dossier_id)
+        if user_id:
+            qs = qs.filter(
+                Q(created_by_id=user_id)
+                | Q(dossier_id__in=DossierMembership.objects.filter(user_id=user_id).values('dossier_id'))
+            )
+        if params.get('type'):
+            qs = qs.filter(type__in=params['type'].split(','))
+
+        rows = qs.order_by('start_date', 'start_time').values(*CALENDAR_FIELDS)
+        return Response(expand_calendar_rows(rows, start, end))
+
+    @action(detail=False, methods=['get'], url_path='free-busy')
+    def free_busy(self, request):
+        """
+        Occupation (sans détail) d'un groupe d'utilisateurs et créneaux libres communs.
+        GET /agenda/free-busy/?users=<uuid>,<uuid>&start=2026-03-02&end=2026-03-06
+        """
+        try:
+            user_ids, start, end = parse_availability_params(request.query_params)
+        except ValueError as e:
+            return Response({'detail': f"Paramètre invalide : {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        schedule = scheduling.Schedule.load(user_ids, start, end)
+        return Response({
+            'start': start,
+            'end': end,
+            'busy': {user_id: [format_interval(*interval) for interval in schedule.busy(user_id)] for user_id in user_ids},
+            'free': [format_interval(*slot) for slot in schedule.free_slots()],
+        })
+
+    @action(detail=False, methods=['get'], url_path='first-slot')
+    def first_slot(self, request):
+        """
+        Premier créneau commun d'une durée donnée (minutes, 60 par défaut),
+        en jours ouvrés et heures de bureau, à partir de maintenant.
+        GET /agenda/first-slot/?users=<uuid>,<uuid>&duration=90&start=2026-03-02
+        """
+        try:
+            user_ids, start, end = parse_availability_params(request.query_params)
+            duration = int(request.query_params.get('duration', 60))
+            if duration <= 0:
+                raise ValueError("duration doit être positive")
+        except ValueError as e:
+            return Response({'detail': f"Paramètre invalide : {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        schedule = scheduling.Schedule.load(user_ids, start, end)
+        slot = schedule.first_common_slot(
+            timedelta(minutes=duration),
+            not_before=timezone.localtime().replace(tzinfo=None),
         )
+        if slot is None:
+            return Response({'detail': "Aucun créneau commun sur la période"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(format_interval(*slot))
 
-        formatted_events = []
-        for e in events:
-            start_str = str(e['start_date'])
-            if e['start_time'] and not e['all_day']:
-                start_str += f"T{e['start_time']}"
-
-            formatted_events.append({
-                'id': e['id'],
-                'title': e['title'],
-                'start': start_str,
-                'allDay': e['all_day'],
-                'backgroundColor': Event.objects.get(id=e['id']).color,
-                'extendedProps': {
-                    'type': e['type'],
-                    'location': e['location'],
-                    'description': e['description'],
-                    'dossier': e['dossier_id']
-                }
-            })
+    @action(detail=False, methods=['get', 'post'])
+    def feed(self, request):
+        """
+        URL d'abonnement au flux iCalendar personnel.
+        GET : URL courante (créée au besoin) ; POST : nouveau jeton, l'ancienne URL est révoquée.
+        """
+        if request.method == 'POST':
+            calendar_feed = CalendarFeed.objects.rotate(request.user)
+            log_action(
+                user=request.user,
+                obj=calendar_feed,
+                action_type='UPDATE',
+                description="Régénération du jeton du flux iCalendar",
+                request=request
+            )
+        else:
+            calendar_feed = CalendarFeed.objects.for_user(request.user)
+        url = request.build_absolute_uri(reverse('agenda-ics-feed', args=[calendar_feed.token]))
+        return Response({'url': url, 'webcal_url': url.replace('https://', 'webcal://').replace('http://', 'webcal://')})
+
+
+class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Notifications in-app de l'utilisateur connecté.
+    ?unread=1 : seulement les non lues.
+    """
+    serializer_class = NotificationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        qs = Notification.objects.filter(user=self.request.user)
+        if self.request.query_params.get('unread') in ('1', 'true'):
+            qs = qs.filter(read_at__isnull=True)
+        return qs
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, pk=None):
+        notification = self.get_object()
+        if notification.read_at is None:
+            notification.read_at = timezone.now()
+            notification.save(update_fields=['read_at'])
+        return Response(self.get_serializer(notification).data)
+
+    @action(detail=False, methods=['post'], url_path='read-all')
+    def read_all(self, request):
+        updated = Notification.objects.filter(user=request.user, read_at__isnull=True).update(read_at=timezone.now())
+        return Response({'updated': updated})
+
+
+FEED_CONTENT_TYPE = 'text/calendar; charset=utf-8'
+
+
+def _feed_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, max-age=300'
+    return response
+
+
+@require_GET
+def ics_feed(request, token):
+    """
+    Flux iCalendar personnel (authentification par jeton dans l'URL).
+    Le contenu est régénéré seulement si la version du flux a changé ;
+    un If-None-Match à jour reçoit un 304 sans requête SQL.
+    """
+    user_id = feeds.resolve_token(token)
+    if user_id is None:
+        raise Http404
+
+    etag = feeds.feed_etag(user_id)
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+        return _feed_headers(HttpResponseNotModified(), etag)
+
+    content = cache.get(feeds.content_key(user_id, etag))
+    if content is not None:
+        return _feed_headers(HttpResponse(content, content_type=FEED_CONTENT_TYPE), etag)
+
+    if not feeds.is_token_active(token):
+        feeds.forget_token(token)
+        raise Http404
 
-        return Response(formatted_events)
\ No newline at end of file
+    response = StreamingHttpResponse(feeds.stream_and_cache(user_id, etag), content_type=FEED_CONTENT_TYPE)
+    response['Content-Disposition'] = 'inline; filename="agenda.ics"'
+    return _feed_headers(response, etag)
@@ -0,0 +1,285 @@
+"""
+Détection d'anomalies en flux sur le journal d'audit.
+
+Chaque entrée écrite passe, après commit, par le détecteur (voir watch(),
+appelé par chain.insert et AuditLog.save). Pour chaque règle qui la
+concerne, l'état de sa clé (utilisateur, IP ou dossier) est mis à jour en
+temps constant : cinq nombres par (règle, clé), aucun historique d'entrées.
+
+- Compteur glissant : deux fenêtres fixes, courante et précédente ;
+  estimation = précédente × part de la fenêtre glissante qu'elle couvre
+  encore + courante.
+- Ligne de base : moyenne mobile exponentielle des fenêtres écoulées
+  (taux habituel de la clé), amortie sur les fenêtres sans activité.
+
+Une règle se déclenche quand l'estimation atteint son seuil absolu, ou
+quand elle dépasse `factor` fois la ligne de base tout en atteignant
+`min_count`. Une alerte au plus par (règle, clé) et par fenêtre. L'alerte
+est une entrée ANOMALY du journal (chaînée, non observée elle-même) et un
+message temps réel au groupe staff ; GET /audit/alerts/ en donne le fil.
+
+État en mémoire du processus (LRU borné) par défaut ; AUDIT_ANOMALY_STORE='cache'
+le partage entre processus via le cache Django (Redis en production).
+Règles : DEFAULT_RULES, complétées ou remplacées par AUDIT_ANOMALY_RULES.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+ALERT_ACTION = 'ANOMALY'
+CACHE_KEY_PREFIX = 'audit:anomaly'
+
+SCOPES = {
+    'user': 'user_id',
+    'ip': 'ip_address',
+    'dossier': 'dossier_id',
+}
+
+DEFAULT_RULES = {
+    'mass_download': {
+        'actions': ['DOWNLOAD'], 'scope': 'user', 'window': 600, 'threshold': 100,
+        'factor': 5, 'min_count': 30,
+        'label': "téléchargements par un utilisateur",
+    },
+    'permission_denied_burst': {
+        'actions': ['PERMISSION_DENIED'], 'scope': 'user', 'window': 300, 'threshold': 20,
+        'label': "accès refusés pour un utilisateur",
+    },
+    'ip_permission_denied_burst': {
+        'actions': ['PERMISSION_DENIED'], 'scope': 'ip', 'window': 300, 'threshold': 30,
+        'label': "accès refusés depuis une adresse IP",
+    },
+    'login_failed_burst': {
+        'actions': ['LOGIN_FAILED'], 'scope': 'ip', 'window': 300, 'threshold': 10,
+        'label': "échecs de connexion depuis une adresse IP",
+    },
+    'dossier_read_spike': {
+        'actions': ['READ', 'DOWNLOAD'], 'scope': 'dossier', 'window': 3600, 'threshold': 500,
+        'factor': 10, 'min_count': 50,
+        'label': "consultations d'un dossier",
+    },
+}
+
+# Index de l'état d'une clé
+WINDOW, PREVIOUS, CURRENT, BASELINE, ALERTED = range(5)
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    actions: frozenset
+    scope: str
+    window: int
+    threshold: int
+    factor: float = 0
+    min_count: int = 0
+    alpha: float = 0.1
+    label: str = ''
+
+    @classmethod
+    def from_config(cls, name, config):
+        config = dict(config)
+        if config.get('scope') not in SCOPES:
+            raise ValueError(f"Règle d'anomalie {name} : portée inconnue {config.get('scope')}")
+        config['actions'] = frozenset(config.get('actions', ()))
+        return cls(name=name, **config)
+
+    def key(self, entry):
+        return getattr(entry, SCOPES[self.scope], None)
+
+
+def load_rules(overrides=None):
+    """Règles par défaut complétées par AUDIT_ANOMALY_RULES ({nom: config}, None : règle désactivée)"""
+    configured = dict(DEFAULT_RULES)
+    if overrides is None:
+        overrides = getattr(settings, 'AUDIT_ANOMALY_RULES', {})
+    for name, config in overrides.items():
+        if config is None:
+            configured.pop(name, None)
+        else:
+            configured[name] = {**configured.get(name, {}), **config}
+    return [Rule.from_config(name, config) for name, config in configured.items()]
+
+
+class MemoryStore:
+    """États par (règle, clé), en mémoire du processus, bornés par LRU"""
+
+    def __init__(self, max_keys=50000):
+        self.max_keys = max_keys
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, rule, key):
+        with self._lock:
+            state = self._states.get((rule.name, key))
+            if state is not None:
+                self._states.move_to_end((rule.name, key))
+            return state
+
+    def set(self, rule, key, state):
+        with self._lock:
+            self._states[(rule.name, key)] = state
+            self._states.move_to_end((rule.name, key))
+            if len(self._states) > self.max_keys:
+                self._states.popitem(last=False)
+
+
+class CacheStore:
+    """États partagés entre processus via le cache Django (mises à jour non atomiques : estimation)"""
+
+    def get(self, rule, key):
+        return cache.get(f"{CACHE_KEY_PREFIX}:{rule.name}:{key}")
+
+    def set(self, rule, key, state):
+        # Conservé le temps que la ligne de base devienne négligeable
+        cache.set(f"{CACHE_KEY_PREFIX}:{rule.name}:{key}", state, timeout=int(rule.window / rule.alpha) * 5)
+
+
+def advance(state, rule, moment: float):
+    """Compte une entrée à l'instant moment (secondes epoch) ; renvoie (état, estimation glissante)"""
+    window = int(moment // rule.window)
+    if state is None:
+        state = [window, 0, 0, None, -1]
+    elif window > state[WINDOW]:
+        closed, elapsed = state[CURRENT], window - state[WINDOW]
+        baseline = state[BASELINE]
+        baseline = closed if baseline is None else baseline + rule.alpha * (closed - baseline)
+        # Fenêtres écoulées sans activité : O(1) quel que soit leur nombre
+        baseline *= (1 - rule.alpha) ** (elapsed - 1)
+        state = [window, closed if elapsed == 1 else 0, 0, baseline, state[ALERTED]]
+    state[CURRENT] += 1
+    covered = 1 - (moment % rule.window) / rule.window
+    return state, state[PREVIOUS] * covered + state[CURRENT]
+
+
+def triggered(state, rule, estimate) -> bool:
+    if state[ALERTED] == state[WINDOW]:
+        return False
+    if estimate >= rule.threshold:
+        return True
+    baseline = state[BASELINE]
+    return bool(
+        rule.factor and baseline is not None and estimate >= rule.min_count
+        and estimate > rule.factor * max(baseline, 1)
+    )
+
+
+class Detector:
+    """Applique les règles à un flux d'entrées d'audit ; renvoie les alertes (entrées non sauvegardées)"""
+
+    def __init__(self, rules=None, store=None):
+        self.rules = load_rules() if rules is None else rules
+        self.store = store or MemoryStore()
+        self._by_action = {}
+        for rule in self.rules:
+            for action_type in rule.actions:
+                self._by_action.setdefault(action_type, []).append(rule)
+
+    def observe(self, entries) -> list:
+        alerts = []
+        for entry in entries:
+            rules = self._by_action.get(entry.action_type)
+            if not rules:
+                continue
+            moment = entry.timestamp.timestamp()
+            for rule in rules:
+                key = rule.key(entry)
+                if key is None:
+                    continue
+                state, estimate = advance(self.store.get(rule, key), rule, moment)
+                if triggered(state, rule, estimate):
+                    state[ALERTED] = state[WINDOW]
+                    alerts.append(self.alert(rule, key, entry, estimate, state[BASELINE]))
+                self.store.set(rule, key, state)
+        return alerts
+
+    @staticmethod
+    def alert(rule, key, entry, estimate, baseline):
+        """Entrée ANOMALY rattachée à l'entrée déclenchante (même objet, utilisateur et IP)"""
+        from .models import AuditLog
+
+        minutes = rule.window // 60
+        alert = AuditLog(
+            user_id=entry.user_id,
+            content_type_id=entry.content_type_id,
+            object_id=entry.object_id,
+            object_repr=entry.object_repr,
+            dossier_id=entry.dossier_id,
+            action_type=ALERT_ACTION,
+            description=f"Anomalie : {round(estimate)} {rule.label or rule.name} en {minutes} min",
+            changes={
+                'rule': rule.name,
+                'scope': rule.scope,
+                'key': str(key),
+                'count': round(estimate, 1),
+                'threshold': rule.threshold,
+                'baseline': None if baseline is None else round(baseline, 2),
+                'window_seconds': rule.window,
+            },
+            ip_address=entry.ip_address,
+            request_path=entry.request_path,
+        )
+        alert._anonymized = True
+        return alert
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'AUDIT_ANOMALY_DETECTION', True)
+
+
+_detector = None
+_detector_lock = threading.Lock()
+
+
+def get_detector() -> Detector:
+    global _detector
+    with _detector_lock:
+        if _detector is None:
+            if getattr(settings, 'AUDIT_ANOMALY_STORE', 'memory') == 'cache':
+                store = CacheStore()
+            else:
+                store = MemoryStore(getattr(settings, 'AUDIT_ANOMALY_MAX_KEYS', 50000))
+            _detector = Detector(store=store)
+        return _detector
+
+
+def emit(alerts) -> None:
+    """Écrit les alertes au journal et les signale au groupe staff"""
+    from apps.core import realtime
+
+    from .writer import write_many
+
+    write_many(alerts)
+    for alert in alerts:
+        realtime.publish_staff(
+            'audit.anomaly', id=alert.pk, rule=alert.changes['rule'], key=alert.changes['key'],
+            count=alert.changes['count'], dossier=alert.dossier_id, description=alert.description,
+        )
+
+
+def process(entries) -> list:
+    try:
+        alerts = get_detector().observe(entries)
+        if alerts:
+            emit(alerts)
+        return alerts
+    except Exception:
+        # La détection ne doit jamais perturber l'écriture du journal
+        logger.exception("Échec de la détection d'anomalies sur %s entrées d'audit", len(entries))
+        return []
+
+
+def watch(entries) -> None:
+    """Soumet au détecteur, après commit, des entrées qui viennent d'être insérées"""
+    if not is_enabled():
+        return
+    entries = [entry for entry in entries if entry.action_type != ALERT_ACTION]
+    if entries:
+        transaction.on_commit(lambda: process(entries))
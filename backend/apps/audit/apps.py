@@ -0,0 +1,13 @@
+"""
+Configuration de l'application Audit.
+"""
+from django.apps import AppConfig
+
+
+class AuditConfig(AppConfig):
+    name = 'apps.audit'
+    verbose_name = "Audit - Journal d'activité"
+
+    def ready(self):
+        # Échecs de connexion (détection d'anomalies)
+        import apps.audit.signals  # noqa: F401
@@ -0,0 +1,277 @@
+"""
+Chaîne d'intégrité du journal d'audit (preuve de non-altération).
+
+Chaque entrée porte l'empreinte HMAC-SHA256 de son contenu et de l'empreinte
+de l'entrée précédente de sa chaîne : modifier, supprimer ou insérer une
+ligne a posteriori rompt la chaîne. La clé (AUDIT_CHAIN_KEY) n'est pas en
+base : un accès à la seule base ne suffit pas à recalculer la chaîne.
+
+Pour ne pas sérialiser tous les écrivains, le journal est réparti en
+AUDIT_CHAIN_SHARDS chaînes indépendantes. Chaque thread écrivain (requête
+en mode strict, thread du writer sinon) se voit attribuer une chaîne fixe :
+un lot ne verrouille que cette tête (AuditChainHead), et deux écrivains ne
+se disputent une tête que s'ils partagent la même chaîne.
+Des points de contrôle périodiques (AuditCheckpoint) figent les têtes de
+toutes les chaînes dans une racine de Merkle, elle-même chaînée au point
+précédent : la vérification traite ensuite chaque segment
+[point de contrôle, point suivant] d'une chaîne indépendamment, en parallèle.
+"""
+import hashlib
+import hmac
+import ipaddress
+import itertools
+import json
+import os
+import threading
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+
+GENESIS = '0' * 64
+
+# Champs couverts par l'empreinte (attnames, communs aux instances et à .values())
+HASHED_FIELDS = (
+    'id', 'timestamp', 'user_id', 'content_type_id', 'object_id', 'object_repr',
+    'dossier_id', 'action_type', 'description', 'changes', 'sensitive_fields_hash',
+    'ip_address', 'user_agent', 'request_path', 'session_key',
+    'chain_shard', 'chain_seq', 'prev_hash',
+)
+
+# Champs couverts avant que dossier_id (droits de lecture, exports) ne soit haché :
+# chaînage initial (migration 0007) et re-chaînage (migration 0011)
+LEGACY_HASHED_FIELDS = tuple(field for field in HASHED_FIELDS if field != 'dossier_id')
+
+
+def get_key() -> bytes:
+    return (getattr(settings, 'AUDIT_CHAIN_KEY', None) or settings.SECRET_KEY).encode()
+
+
+def shard_count() -> int:
+    return max(int(getattr(settings, 'AUDIT_CHAIN_SHARDS', 16)), 1)
+
+
+def shard_for(entry_id, shards=None) -> int:
+    """Répartition par id (chaînage initial des entrées existantes, migration 0007)"""
+    return entry_id.int % (shards or shard_count())
+
+
+_writer = threading.local()
+_writer_slots = itertools.count()
+
+
+def writer_shard(shards=None) -> int:
+    """Chaîne attribuée au thread courant : stable, répartie entre threads et processus"""
+    slot = getattr(_writer, 'slot', None)
+    if slot is None or slot[0] != os.getpid():
+        # Après un fork, le thread hérite de l'attribution du parent : nouvelle chaîne
+        slot = _writer.slot = (os.getpid(), os.getpid() + next(_writer_slots))
+    return slot[1] % (shards or shard_count())
+
+
+def _canonical(values: dict, fields=HASHED_FIELDS) -> bytes:
+    """Sérialisation stable d'une entrée, identique avant et après passage en base"""
+    data = {}
+    for field in fields:
+        value = values.get(field)
+        if field == 'timestamp' and value is not None:
+            value = value.astimezone(dt_timezone.utc).isoformat(timespec='microseconds')
+        elif field == 'ip_address' and value:
+            try:
+                value = ipaddress.ip_address(value).compressed
+            except ValueError:
+                # Valeur déjà invalide à l'écriture : hachée telle quelle
+                value = str(value)
+        elif field in ('id', 'user_id', 'object_id', 'content_type_id') and value is not None:
+            value = str(value)
+        data[field] = value
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str).encode()
+
+
+def compute_hash(values: dict, key: bytes = None, fields=HASHED_FIELDS) -> str:
+    return hmac.new(key or get_key(), _canonical(values, fields), hashlib.sha256).hexdigest()
+
+
+def _values(entry) -> dict:
+    return {field: getattr(entry, field) for field in HASHED_FIELDS}
+
+
+def _lock_heads(shards):
+    """Verrouille (dans l'ordre, sans interblocage) les têtes des chaînes concernées"""
+    from .models import AuditChainHead
+
+    shards = sorted(set(shards))
+    heads = {head.shard: head for head in AuditChainHead.objects.select_for_update().filter(shard__in=shards)}
+    missing = [shard for shard in shards if shard not in heads]
+    if missing:
+        AuditChainHead.objects.bulk_create(
+            [AuditChainHead(shard=shard) for shard in missing], ignore_conflicts=True
+        )
+        heads.update({
+            head.shard: head
+            for head in AuditChainHead.objects.select_for_update().filter(shard__in=missing)
+        })
+    return heads
+
+
+def seal(entries) -> None:
+    """
+    Chaîne des entrées non encore insérées, toutes sur la chaîne de l'écrivain.
+    À appeler dans la transaction de l'insertion : la tête reste verrouillée
+    jusqu'au commit.
+    """
+    if not entries:
+        return
+    key = get_key()
+    shard = writer_shard()
+    for entry in entries:
+        entry.chain_shard = shard
+    heads = _lock_heads([shard])
+    for entry in entries:
+        head = heads[entry.chain_shard]
+        entry.chain_seq = head.seq + 1
+        entry.prev_hash = head.last_hash
+        entry.entry_hash = compute_hash(_values(entry), key)
+        head.seq, head.last_hash = entry.chain_seq, entry.entry_hash
+    for head in heads.values():
+        head.save(update_fields=['seq', 'last_hash', 'updated_at'])
+
+
+def insert(entries):
+    """
+    Chaîne et insère un lot d'entrées (bulk_create) dans une même transaction ;
+    agrégats et détection d'anomalies après commit.
+    """
+    from .anomalies import watch
+    from .models import AuditLog
+    from .rollups import record
+
+    with transaction.atomic():
+        seal(entries)
+        created = AuditLog.objects.bulk_create(entries)
+        record(created)
+        watch(created)
+        return created
+
+
+# ─── Points de contrôle ───────────────────────────────────────────────────────
+
+def merkle_root(leaves) -> str:
+    level = [hashlib.sha256(leaf.encode()).digest() for leaf in leaves] or [bytes(32)]
+    while len(level) > 1:
+        if len(level) % 2:
+            level.append(level[-1])
+        level = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level), 2)]
+    return level[0].hex()
+
+
+def checkpoint_root(heads: dict, previous_root: str) -> str:
+    """Racine de Merkle des têtes {shard: [seq, hash]}, chaînée au point précédent"""
+    ordered = sorted(heads.items(), key=lambda item: int(item[0]))
+    leaves = [f'{shard}:{seq}:{last_hash}' for shard, (seq, last_hash) in ordered]
+    return merkle_root(leaves + [f'previous:{previous_root}'])
+
+
+def sign(root: str, key: bytes = None) -> str:
+    return hmac.new(key or get_key(), root.encode(), hashlib.sha256).hexdigest()
+
+
+def create_checkpoint():
+    """Fige l'état de toutes les chaînes (verrou bref sur les têtes)"""
+    from .models import AuditChainHead, AuditCheckpoint
+
+    with transaction.atomic():
+        heads = {
+            str(head.shard): [head.seq, head.last_hash]
+            for head in AuditChainHead.objects.select_for_update().order_by('shard')
+        }
+        previous = AuditCheckpoint.objects.order_by('-created_at', '-pk').first()
+        previous_root = previous.merkle_root if previous else GENESIS
+        root = checkpoint_root(heads, previous_root)
+        return AuditCheckpoint.objects.create(
+            heads=heads, previous_root=previous_root, merkle_root=root, signature=sign(root),
+        )
+
+
+# ─── Vérification ─────────────────────────────────────────────────────────────
+
+def verify_checkpoints(checkpoints, key: bytes = None) -> list:
+    """Cohérence des points de contrôle (racines, signatures, chaînage, têtes croissantes)"""
+    key = key or get_key()
+    problems = []
+    previous_root, previous_heads = GENESIS, {}
+    for checkpoint in checkpoints:
+        label = f"point de contrôle #{checkpoint.pk} ({checkpoint.created_at:%Y-%m-%d %H:%M})"
+        if checkpoint.previous_root != previous_root:
+            problems.append(f"{label} : chaînage rompu avec le point précédent")
+        if checkpoint_root(checkpoint.heads, checkpoint.previous_root) != checkpoint.merkle_root:
+            problems.append(f"{label} : racine de Merkle incohérente avec les têtes")
+        if not hmac.compare_digest(sign(checkpoint.merkle_root, key), checkpoint.signature):
+            problems.append(f"{label} : signature invalide")
+        for shard, (seq, _) in checkpoint.heads.items():
+            if seq < previous_heads.get(shard, 0):
+                problems.append(f"{label} : la chaîne {shard} a reculé ({previous_heads[shard]} → {seq})")
+        previous_root, previous_heads = checkpoint.merkle_root, {s: h[0] for s, h in checkpoint.heads.items()}
+    return problems
+
+
+def segments(checkpoints, heads) -> list:
+    """
+    Découpe chaque chaîne aux points de contrôle :
+    [(shard, seq de départ, empreinte de départ, seq de fin, empreinte attendue en fin)]
+
+    Les entrées purgées par la rétention (rang <= head.purged_seq) sont
+    écartées : le premier segment conservé part de la première entrée
+    restante (empreinte de départ None : son lien amont n'est plus vérifiable).
+    """
+    bounds = {}
+    for checkpoint in checkpoints:
+        for shard, (seq, last_hash) in checkpoint.heads.items():
+            bounds.setdefault(int(shard), {})[seq] = last_hash
+    purged = {}
+    for head in heads:
+        bounds.setdefault(head.shard, {})[head.seq] = head.last_hash
+        purged[head.shard] = head.purged_seq
+
+    result = []
+    for shard, marks in sorted(bounds.items()):
+        floor = purged.get(shard, 0)
+        start_seq, start_hash = 0, GENESIS
+        for seq in sorted(marks):
+            if seq > start_seq and seq > floor:
+                if start_seq < floor:
+                    result.append((shard, floor, None, seq, marks[seq]))
+                else:
+                    result.append((shard, start_seq, start_hash, seq, marks[seq]))
+            start_seq, start_hash = seq, marks[seq]
+    return result
+
+
+def verify_segment(shard, start_seq, start_hash, end_seq, end_hash, key: bytes = None, chunk_size=2000) -> list:
+    """Recalcule un segment de chaîne ; liste des anomalies (vide si intact)"""
+    from .models import AuditLog
+
+    key = key or get_key()
+    problems = []
+    expected_seq, previous = start_seq + 1, start_hash
+    rows = (
+        AuditLog.objects.filter(chain_shard=shard, chain_seq__gt=start_seq, chain_seq__lte=end_seq)
+        .order_by('chain_seq').values(*HASHED_FIELDS, 'entry_hash')
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        seq = row['chain_seq']
+        if seq < expected_seq:
+            problems.append(f"chaîne {shard} #{seq} : entrée en double ({row['id']})")
+            continue
+        if seq != expected_seq:
+            problems.append(f"chaîne {shard} : entrée(s) {expected_seq}–{seq - 1} manquante(s)")
+        if previous is not None and row['prev_hash'] != previous:
+            problems.append(f"chaîne {shard} #{seq} : lien rompu avec l'entrée précédente")
+        if not hmac.compare_digest(compute_hash(row, key), row['entry_hash']):
+            problems.append(f"chaîne {shard} #{seq} : contenu modifié (entrée {row['id']})")
+        expected_seq, previous = seq + 1, row['entry_hash']
+    if expected_seq <= end_seq:
+        problems.append(f"chaîne {shard} : entrée(s) {expected_seq}–{end_seq} manquante(s)")
+    elif previous != end_hash:
+        problems.append(f"chaîne {shard} #{end_seq} : empreinte différente du point de contrôle")
+    return problems
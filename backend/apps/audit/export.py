@@ -0,0 +1,213 @@
+"""
+Export en flux du journal d'audit (demandes du barreau, de l'autorité de
+protection des données, commissaires aux comptes).
+
+Les entrées sont lues par curseur serveur (QuerySet.iterator) par paquets
+et écrites au fil de l'eau en CSV ou JSONL : la mémoire reste constante
+quel que soit le volume. Un export par dossier ou par client inclut les
+entrées des objets rattachés (documents, sous-dossiers, événements,
+dossiers du client), retrouvés par le dossier de rattachement dénormalisé
+(AuditLog.dossier_id).
+
+Options :
+- signature : dernière ligne portant le HMAC-SHA256 (AUDIT_EXPORT_KEY) de
+  tout ce qui précède et le nombre d'entrées, vérifiable par le cabinet
+  (verify_signature) en cas de contestation ;
+- chiffrement par phrase secrète : première ligne « GEDAUDIT-ENC1 <sel> <itérations> »,
+  puis un jeton Fernet par bloc (clé dérivée par PBKDF2-SHA256) ; voir decrypt_lines().
+
+Chaque ligne exportée porte son rang et son empreinte de chaîne (chain.py) :
+le destinataire peut rapprocher l'export du journal vérifié.
+"""
+import base64
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import AuditLog
+
+FORMATS = ('csv', 'jsonl')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+
+CHUNK_SIZE = 64 * 1024
+DB_CHUNK_SIZE = 2000
+
+ENCRYPTION_MAGIC = b'GEDAUDIT-ENC1'
+KDF_ITERATIONS = 390000
+MIN_PASSPHRASE_LENGTH = 12
+
+# Colonnes exportées (ni user_agent, ni clé de session, ni hash des champs sensibles)
+COLUMNS = (
+    'timestamp', 'id', 'user_id', 'username', 'action_type', 'content_type', 'object_id',
+    'object_repr', 'description', 'changes', 'ip_address', 'request_path',
+    'chain_shard', 'chain_seq', 'entry_hash',
+)
+_VALUES = (
+    'timestamp', 'id', 'user_id', 'user__username', 'action_type', 'content_type__app_label',
+    'content_type__model', 'object_id', 'object_repr', 'description', 'changes', 'ip_address',
+    'request_path', 'chain_shard', 'chain_seq', 'entry_hash',
+)
+
+
+def related_filter(dossier_ids=None, client_ids=None) -> Q:
+    """Entrées des dossiers/clients et de leurs objets rattachés (sous-requêtes, rien en mémoire)"""
+    from apps.clients.models import Client
+    from apps.dossiers.models import Dossier
+
+    condition = Q(pk__in=[])
+    if client_ids:
+        condition |= Q(content_type=ContentType.objects.get_for_model(Client), object_id__in=client_ids)
+        condition |= Q(dossier_id__in=Dossier.objects.filter(client_id__in=client_ids).values('pk'))
+    if dossier_ids:
+        condition |= Q(dossier_id__in=dossier_ids)
+    return condition
+
+
+def build_queryset(dossier=None, client=None, user=None, action_types=None, since=None, until=None):
+    qs = AuditLog.objects.between(since, until)
+    if dossier or client:
+        qs = qs.filter(related_filter(
+            dossier_ids=[dossier] if dossier else None,
+            client_ids=[client] if client else None,
+        ))
+    if user:
+        qs = qs.filter(user_id=user)
+    if action_types:
+        qs = qs.filter(action_type__in=action_types)
+    return qs.order_by('timestamp', 'id').values(*_VALUES)
+
+
+def _record(row) -> dict:
+    return {
+        'timestamp': timezone.localtime(row['timestamp']).isoformat(),
+        'id': str(row['id']),
+        'user_id': str(row['user_id']) if row['user_id'] else '',
+        'username': row['user__username'] or '',
+        'action_type': row['action_type'],
+        'content_type': f"{row['content_type__app_label']}.{row['content_type__model']}",
+        'object_id': str(row['object_id']),
+        'object_repr': row['object_repr'],
+        'description': row['description'],
+        'changes': row['changes'] or {},
+        'ip_address': row['ip_address'] or '',
+        'request_path': row['request_path'],
+        'chain_shard': row['chain_shard'],
+        'chain_seq': row['chain_seq'],
+        'entry_hash': row['entry_hash'],
+    }
+
+
+def iter_rows(queryset, fmt='csv', counter=None):
+    """Octets CSV/JSONL par blocs d'environ CHUNK_SIZE ; counter['rows'] compte les entrées"""
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(COLUMNS)
+    rows = 0
+    for row in queryset.iterator(chunk_size=DB_CHUNK_SIZE):
+        record = _record(row)
+        if writer:
+            record['changes'] = json.dumps(record['changes'], ensure_ascii=False, cls=DjangoJSONEncoder)
+            writer.writerow([record[column] for column in COLUMNS])
+        else:
+            buffer.write(json.dumps(record, ensure_ascii=False, cls=DjangoJSONEncoder))
+            buffer.write('\n')
+        rows += 1
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    if counter is not None:
+        counter['rows'] = rows
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def get_signing_key() -> bytes:
+    key = getattr(settings, 'AUDIT_EXPORT_KEY', None) or getattr(settings, 'AUDIT_CHAIN_KEY', None)
+    return (key or settings.SECRET_KEY).encode()
+
+
+def signature_line(digest: str, rows: int, fmt: str) -> bytes:
+    if fmt == 'csv':
+        return f"# HMAC-SHA256={digest}; entrees={rows}\n".encode()
+    trailer = {'signature': {'algorithm': 'HMAC-SHA256', 'digest': digest, 'entries': rows}}
+    return (json.dumps(trailer) + '\n').encode()
+
+
+def signed(chunks, fmt, counter, key=None):
+    """Ajoute la ligne de signature (HMAC de tous les octets qui précèdent)"""
+    mac = hmac.new(key or get_signing_key(), digestmod=hashlib.sha256)
+    for chunk in chunks:
+        mac.update(chunk)
+        yield chunk
+    yield signature_line(mac.hexdigest(), counter.get('rows', 0), fmt)
+
+
+def verify_signature(data: bytes, key=None) -> bool:
+    """Contrôle d'un export signé (contenu complet, déchiffré)"""
+    end = data.rstrip(b'\n').rfind(b'\n') + 1
+    body, text = data[:end], data[end:].decode().strip()
+    if text.startswith('# HMAC-SHA256='):
+        digest = text.split('=', 1)[1].split(';', 1)[0]
+    else:
+        digest = json.loads(text).get('signature', {}).get('digest', '')
+    expected = hmac.new(key or get_signing_key(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, digest)
+
+
+def _fernet(passphrase: str, salt: bytes, iterations=KDF_ITERATIONS):
+    from cryptography.fernet import Fernet
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+    return Fernet(base64.urlsafe_b64encode(kdf.derive(passphrase.encode())))
+
+
+def encrypted(chunks, passphrase: str):
+    """Un jeton Fernet par bloc (authentifiable isolément) : pas de chiffrement du flux entier en mémoire"""
+    salt = os.urandom(16)
+    cipher = _fernet(passphrase, salt)
+    yield b' '.join([ENCRYPTION_MAGIC, base64.urlsafe_b64encode(salt), str(KDF_ITERATIONS).encode()]) + b'\n'
+    for chunk in chunks:
+        yield cipher.encrypt(chunk) + b'\n'
+
+
+def decrypt_lines(lines, passphrase: str):
+    """Inverse de encrypted() : itère sur les blocs en clair"""
+    lines = iter(lines)
+    magic, salt, iterations = next(lines).split()
+    if magic != ENCRYPTION_MAGIC:
+        raise ValueError("Fichier non reconnu (en-tête GEDAUDIT-ENC1 attendu)")
+    cipher = _fernet(passphrase, base64.urlsafe_b64decode(salt), int(iterations))
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield cipher.decrypt(line)
+
+
+def stream(queryset, fmt='csv', sign=False, passphrase=None):
+    """Flux complet : lignes, signature éventuelle, chiffrement éventuel"""
+    counter = {}
+    chunks = iter_rows(queryset, fmt, counter)
+    if sign:
+        chunks = signed(chunks, fmt, counter)
+    if passphrase:
+        chunks = encrypted(chunks, passphrase)
+    return chunks
+
+
+def filename(fmt, passphrase=None) -> str:
+    suffix = '.enc' if passphrase else ''
+    return f"journal_audit_{timezone.now():%Y%m%d_%H%M}.{fmt}{suffix}"
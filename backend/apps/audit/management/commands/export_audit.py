@@ -0,0 +1,85 @@
+# backend/apps/audit/management/commands/export_audit.py
+
+import os
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.audit import export as audit_export
+
+
+class Command(BaseCommand):
+    help = (
+        "Exporte le journal d'audit en flux (CSV ou JSONL, signé, chiffré en option) "
+        "pour les demandes du barreau ou de l'autorité de protection des données. "
+        "Avec --decrypt : déchiffre un export chiffré"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dossier', help='Dossier (UUID) et objets rattachés')
+        parser.add_argument('--client', help='Client (UUID), ses dossiers et objets rattachés')
+        parser.add_argument('--user', help='Utilisateur auteur des actions (UUID)')
+        parser.add_argument('--action', action='append', dest='actions', help="Type d'action (option répétable)")
+        parser.add_argument('--since', help='Début (date-heure ISO, incluse)')
+        parser.add_argument('--until', help='Fin (date-heure ISO, exclue)')
+        parser.add_argument('--format', choices=audit_export.FORMATS, default='csv')
+        parser.add_argument('--no-sign', action='store_true', help='Sans ligne de signature')
+        parser.add_argument(
+            '--passphrase-env',
+            help="Variable d'environnement contenant la phrase secrète (chiffrement / déchiffrement)"
+        )
+        parser.add_argument('--output', '-o', help='Fichier de sortie (défaut : sortie standard)')
+        parser.add_argument('--decrypt', metavar='FICHIER', help='Déchiffrer un export chiffré')
+
+    def handle(self, *args, **options):
+        passphrase = None
+        if options['passphrase_env']:
+            passphrase = os.environ.get(options['passphrase_env'])
+            if not passphrase or len(passphrase) < audit_export.MIN_PASSPHRASE_LENGTH:
+                raise CommandError(
+                    f"Phrase secrète absente ou trop courte ({audit_export.MIN_PASSPHRASE_LENGTH} caractères minimum)"
+                )
+
+        if options['decrypt']:
+            if not passphrase:
+                raise CommandError("--passphrase-env est requis pour déchiffrer")
+            with open(options['decrypt'], 'rb') as source:
+                self._write(audit_export.decrypt_lines(source, passphrase), options['output'])
+            return
+
+        queryset = audit_export.build_queryset(
+            dossier=options['dossier'],
+            client=options['client'],
+            user=options['user'],
+            action_types=options['actions'],
+            since=self._moment(options['since']),
+            until=self._moment(options['until']),
+        )
+        chunks = audit_export.stream(
+            queryset, options['format'], sign=not options['no_sign'], passphrase=passphrase
+        )
+        self._write(chunks, options['output'])
+        if options['output']:
+            self.stdout.write(self.style.SUCCESS(f"✅ Export écrit dans {options['output']}"))
+
+    def _write(self, chunks, output):
+        target = open(output, 'wb') if output else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                target.write(chunk)
+        finally:
+            if output:
+                target.close()
+            else:
+                target.flush()
+
+    @staticmethod
+    def _moment(value):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is None:
+            raise CommandError(f"Date-heure invalide : {value}")
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
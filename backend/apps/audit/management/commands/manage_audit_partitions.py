@@ -0,0 +1,66 @@
+# backend/apps/audit/management/commands/manage_audit_partitions.py
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.audit import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Crée les partitions mensuelles à venir du journal d'audit et applique la rétention "
+        "en détachant/supprimant les partitions expirées (PostgreSQL). À planifier chaque jour"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            default=3,
+            help='Nombre de mois futurs à préparer (défaut: 3)'
+        )
+        parser.add_argument(
+            '--retention-months',
+            type=int,
+            default=getattr(settings, 'AUDIT_RETENTION_MONTHS', None),
+            help='Durée de conservation en mois (défaut: AUDIT_RETENTION_MONTHS ; 0 : aucune purge)'
+        )
+        parser.add_argument(
+            '--detach-only',
+            action='store_true',
+            help='Détacher les partitions expirées sans les supprimer (archivage préalable)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher les partitions expirées sans rien modifier'
+        )
+
+    def handle(self, *args, **options):
+        if not partitions.is_partitioned():
+            self.stdout.write(self.style.WARNING(
+                "⚠️ Journal d'audit non partitionné (PostgreSQL requis, migration audit 0006) : rien à faire"
+            ))
+            return
+
+        retention = options['retention_months']
+        if options['dry_run']:
+            expired = partitions.expired_partitions(retention) if retention else []
+            self.stdout.write(f"Partitions expirées : {', '.join(expired) or 'aucune'}")
+            return
+
+        with transaction.atomic():
+            created = partitions.ensure_partitions(months_ahead=options['months_ahead'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(created)} partition(s) créée(s){' : ' + ', '.join(created) if created else ''}"
+        ))
+
+        if not retention:
+            return
+        with transaction.atomic():
+            removed = partitions.drop_expired(retention, detach_only=options['detach_only'])
+        verb = 'détachée(s)' if options['detach_only'] else 'supprimée(s)'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(removed)} partition(s) expirée(s) {verb}{' : ' + ', '.join(removed) if removed else ''}"
+        ))
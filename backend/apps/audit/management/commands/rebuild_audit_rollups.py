@@ -0,0 +1,56 @@
+# backend/apps/audit/management/commands/rebuild_audit_rollups.py
+
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from apps.audit import partitions, rollups
+from apps.audit.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les agrégats horaires et journaliers du journal d'audit "
+        "(remplissage de l'historique, correction après un échec d'agrégation), mois par mois"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', help='Premier jour (AAAA-MM-JJ, défaut : première entrée du journal)')
+        parser.add_argument('--until', help='Dernier jour exclu (AAAA-MM-JJ, défaut : demain)')
+
+    def handle(self, *args, **options):
+        first = AuditLog.objects.order_by('timestamp').values_list('timestamp', flat=True).first()
+        if first is None and not options['since']:
+            self.stdout.write(self.style.WARNING("⚠️ Journal d'audit vide : rien à agréger"))
+            return
+
+        since = self._day(options['since']) if options['since'] else rollups.bucket_start(first, rollups.DAY)
+        until = (
+            self._day(options['until']) if options['until']
+            else rollups.bucket_start(timezone.now(), rollups.DAY) + timedelta(days=1)
+        )
+        if since >= until:
+            raise CommandError("--since doit précéder --until")
+
+        total = 0
+        start = since
+        while start < until:
+            # Un mois par transaction : verrous et journal de transaction bornés
+            end = min(self._day(partitions.add_months(partitions.month_start(start), 1)), until)
+            with transaction.atomic():
+                created = rollups.rebuild(start, end)
+            total += created
+            self.stdout.write(f"{start:%Y-%m-%d} → {end:%Y-%m-%d} : {created} agrégat(s)")
+            start = end
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {total} agrégat(s) recalculé(s)"))
+
+    @staticmethod
+    def _day(value):
+        day = parse_date(value) if isinstance(value, str) else value
+        if day is None:
+            raise CommandError(f"Date invalide : {value}")
+        return timezone.make_aware(datetime(day.year, day.month, day.day))
@@ -0,0 +1,84 @@
+# backend/apps/audit/management/commands/verify_audit_chain.py
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from apps.audit import chain
+from apps.audit.models import AuditChainHead, AuditCheckpoint, AuditLog
+
+
+def _init_worker():
+    """Processus de vérification : Django initialisé, connexion à la base propre au processus"""
+    django.setup()
+
+
+def _verify(segment, key):
+    """Exécuté dans le pool : recalcul HMAC d'un segment (limité par le GIL, d'où les processus)"""
+    return chain.verify_segment(*segment, key=key)
+
+
+class Command(BaseCommand):
+    help = (
+        "Vérifie la chaîne d'intégrité du journal d'audit, segment par segment entre points "
+        "de contrôle, en parallèle. Avec --checkpoint : enregistre un point de contrôle (à planifier)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--checkpoint',
+            action='store_true',
+            help='Enregistrer un point de contrôle des chaînes puis quitter'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Processus de vérification en parallèle (défaut: 4)'
+        )
+
+    def handle(self, *args, **options):
+        if options['checkpoint']:
+            checkpoint = chain.create_checkpoint()
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Point de contrôle #{checkpoint.pk} : racine {checkpoint.merkle_root}"
+            ))
+            return
+
+        started = time.monotonic()
+        key = chain.get_key()
+        checkpoints = list(AuditCheckpoint.objects.order_by('created_at', 'pk'))
+        heads = list(AuditChainHead.objects.all())
+        problems = chain.verify_checkpoints(checkpoints, key)
+
+        unchained = AuditLog.objects.filter(chain_seq__isnull=True).count()
+        if unchained:
+            problems.append(f"{unchained} entrée(s) hors chaîne (insérées sans passer par l'application)")
+        for head in heads:
+            if AuditLog.objects.filter(chain_shard=head.shard, chain_seq__gt=head.seq).exists():
+                problems.append(f"chaîne {head.shard} : entrée(s) au-delà de la tête #{head.seq}")
+
+        segments = chain.segments(checkpoints, heads)
+        if options['workers'] > 1 and len(segments) > 1:
+            # Les processus ouvrent leurs propres connexions : rien à hériter du parent
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=options['workers'], initializer=_init_worker) as pool:
+                for found in pool.map(_verify, segments, [key] * len(segments)):
+                    problems.extend(found)
+        else:
+            for segment in segments:
+                problems.extend(chain.verify_segment(*segment, key=key))
+
+        checked = sum(end - start for _, start, _, end, _ in segments)
+        elapsed = time.monotonic() - started
+        if problems:
+            for problem in problems:
+                self.stdout.write(self.style.ERROR(f"❌ {problem}"))
+            raise CommandError(f"Journal d'audit altéré : {len(problems)} anomalie(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Journal d'audit intact : {checked} entrée(s), {len(segments)} segment(s), "
+            f"{len(checkpoints)} point(s) de contrôle ({elapsed:.1f} s)"
+        ))
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+    """
+    Horodatage fixé à la construction de l'entrée (default) et non plus à
+    l'INSERT (auto_now_add) : l'écriture peut être différée et groupée.
+    """
+
+    dependencies = [
+        ("audit", "0004_alter_auditlog_action_type"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="auditlog",
+            name="timestamp",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now, editable=False, verbose_name="Horodatage"
+            ),
+        ),
+    ]
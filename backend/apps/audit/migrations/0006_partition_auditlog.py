@@ -0,0 +1,104 @@
+from django.db import migrations
+
+from apps.audit import partitions
+
+REBUILT = f'{partitions.PARENT}_rebuilt'
+
+
+def _definitions(cursor):
+    """Index secondaires et clés étrangères de la table actuelle, à recréer à l'identique"""
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'p'",
+        [partitions.PARENT],
+    )
+    primary_key = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+        [partitions.PARENT],
+    )
+    # Sur une table partitionnée, indexdef vaut « CREATE INDEX ... ON ONLY ... »
+    indexes = [
+        definition.replace(' ON ONLY ', ' ON ')
+        for name, definition in cursor.fetchall() if name != primary_key
+    ]
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = to_regclass(%s) AND contype = 'f'",
+        [partitions.PARENT],
+    )
+    foreign_keys = cursor.fetchall()
+    return indexes, foreign_keys
+
+
+def _swap(schema_editor, create_sql, primary_key, before_copy=None):
+    quote = schema_editor.quote_name
+    with schema_editor.connection.cursor() as cursor:
+        indexes, foreign_keys = _definitions(cursor)
+        cursor.execute(create_sql)
+        if before_copy:
+            before_copy(cursor)
+        cursor.execute(f"INSERT INTO {quote(REBUILT)} SELECT * FROM {quote(partitions.PARENT)}")
+        cursor.execute(f"DROP TABLE {quote(partitions.PARENT)}")
+        cursor.execute(f"ALTER TABLE {quote(REBUILT)} RENAME TO {quote(partitions.PARENT)}")
+        cursor.execute(
+            f"ALTER TABLE {quote(partitions.PARENT)} ADD CONSTRAINT {quote(partitions.PARENT + '_pkey')} "
+            f"PRIMARY KEY ({primary_key})"
+        )
+        for definition in indexes:
+            cursor.execute(definition)
+        for name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(partitions.PARENT)} ADD CONSTRAINT {quote(name)} {definition}")
+
+
+def partition_auditlog(apps, schema_editor):
+    connection = schema_editor.connection
+    if not partitions.is_supported(connection) or partitions.is_partitioned(connection):
+        return
+    quote = schema_editor.quote_name
+
+    def create_partitions(cursor):
+        cursor.execute(
+            f"CREATE TABLE {quote(partitions.DEFAULT_PARTITION)} PARTITION OF {quote(REBUILT)} DEFAULT"
+        )
+        cursor.execute(f"SELECT min(timestamp) FROM {quote(partitions.PARENT)}")
+        oldest = cursor.fetchone()[0]
+        partitions.ensure_partitions(start=oldest, connection=connection, parent=REBUILT)
+
+    _swap(
+        schema_editor,
+        f"CREATE TABLE {quote(REBUILT)} (LIKE {quote(partitions.PARENT)} INCLUDING DEFAULTS) "
+        f"PARTITION BY RANGE (timestamp)",
+        'id, timestamp',
+        before_copy=create_partitions,
+    )
+
+
+def unpartition_auditlog(apps, schema_editor):
+    connection = schema_editor.connection
+    if not partitions.is_partitioned(connection):
+        return
+    quote = schema_editor.quote_name
+    # Les partitions déjà détachées par la rétention ne sont pas réintégrées
+    _swap(
+        schema_editor,
+        f"CREATE TABLE {quote(REBUILT)} (LIKE {quote(partitions.PARENT)} INCLUDING DEFAULTS)",
+        'id',
+    )
+
+
+class Migration(migrations.Migration):
+    """
+    Partitionnement mensuel de audit_auditlog sur timestamp (PostgreSQL ;
+    sans effet sous SQLite). La table est reconstruite : partition par défaut,
+    une partition par mois depuis la plus ancienne entrée jusqu'à trois mois
+    à venir, copie des lignes, puis index et clés étrangères recréés sous
+    leurs noms d'origine. Voir apps/audit/partitions.py.
+    """
+
+    dependencies = [
+        ("audit", "0005_alter_auditlog_timestamp"),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_auditlog, unpartition_auditlog),
+    ]
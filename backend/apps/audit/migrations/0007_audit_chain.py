@@ -0,0 +1,108 @@
+from django.db import migrations, models
+import django.utils.timezone
+
+from apps.audit import chain
+
+
+def chain_existing_entries(apps, schema_editor):
+    """Chaîne les entrées existantes, dans l'ordre chronologique"""
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    AuditChainHead = apps.get_model('audit', 'AuditChainHead')
+
+    key = chain.get_key()
+    shards = chain.shard_count()
+    heads = {shard: [0, chain.GENESIS] for shard in range(shards)}
+    # dossier_id n'existe qu'à partir de 0008 (re-chaînage en 0011)
+    fields = [field for field in chain.LEGACY_HASHED_FIELDS if field not in ('chain_shard', 'chain_seq', 'prev_hash')]
+    batch = []
+    for row in AuditLog.objects.order_by('timestamp', 'id').values(*fields).iterator(chunk_size=2000):
+        shard = chain.shard_for(row['id'], shards)
+        seq, previous = heads[shard]
+        row.update(chain_shard=shard, chain_seq=seq + 1, prev_hash=previous)
+        entry_hash = chain.compute_hash(row, key, chain.LEGACY_HASHED_FIELDS)
+        heads[shard] = [seq + 1, entry_hash]
+        batch.append(AuditLog(
+            id=row['id'], chain_shard=shard, chain_seq=seq + 1, prev_hash=previous, entry_hash=entry_hash,
+        ))
+        if len(batch) >= 2000:
+            AuditLog.objects.bulk_update(batch, ['chain_shard', 'chain_seq', 'prev_hash', 'entry_hash'])
+            batch = []
+    if batch:
+        AuditLog.objects.bulk_update(batch, ['chain_shard', 'chain_seq', 'prev_hash', 'entry_hash'])
+
+    AuditChainHead.objects.bulk_create([
+        AuditChainHead(shard=shard, seq=seq, last_hash=last_hash)
+        for shard, (seq, last_hash) in heads.items()
+    ])
+
+
+class Migration(migrations.Migration):
+    """
+    Chaîne d'intégrité du journal d'audit (voir apps/audit/chain.py) :
+    empreinte chaînée par entrée, têtes des chaînes et points de contrôle.
+    Les entrées existantes sont chaînées à la migration : elles ne sont
+    garanties qu'à partir de cette date.
+    """
+
+    dependencies = [
+        ("audit", "0006_partition_auditlog"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditlog",
+            name="chain_shard",
+            field=models.PositiveSmallIntegerField(editable=False, null=True, verbose_name="Chaîne"),
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="chain_seq",
+            field=models.BigIntegerField(editable=False, null=True, verbose_name="Rang dans la chaîne"),
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="prev_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name="Empreinte précédente"),
+        ),
+        migrations.AddField(
+            model_name="auditlog",
+            name="entry_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64, verbose_name="Empreinte"),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(fields=["chain_shard", "chain_seq"], name="audit_chain_idx"),
+        ),
+        migrations.CreateModel(
+            name="AuditChainHead",
+            fields=[
+                ("shard", models.PositiveSmallIntegerField(primary_key=True, serialize=False, verbose_name="Chaîne")),
+                ("seq", models.BigIntegerField(default=0, verbose_name="Rang de la dernière entrée")),
+                ("last_hash", models.CharField(default="0" * 64, max_length=64, verbose_name="Dernière empreinte")),
+                ("purged_seq", models.BigIntegerField(default=0, help_text="Dernier rang supprimé par la rétention (partitions expirées)", verbose_name="Rang purgé")),
+                ("updated_at", models.DateTimeField(auto_now=True, verbose_name="Mise à jour")),
+            ],
+            options={
+                "verbose_name": "Tête de chaîne d'audit",
+                "verbose_name_plural": "Têtes de chaînes d'audit",
+                "ordering": ["shard"],
+            },
+        ),
+        migrations.CreateModel(
+            name="AuditCheckpoint",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now, verbose_name="Créé le")),
+                ("heads", models.JSONField(default=dict, help_text="{chaîne: [rang, empreinte]}", verbose_name="Têtes")),
+                ("previous_root", models.CharField(max_length=64, verbose_name="Racine précédente")),
+                ("merkle_root", models.CharField(max_length=64, verbose_name="Racine de Merkle")),
+                ("signature", models.CharField(max_length=64, verbose_name="Signature")),
+            ],
+            options={
+                "verbose_name": "Point de contrôle d'audit",
+                "verbose_name_plural": "Points de contrôle d'audit",
+                "ordering": ["created_at"],
+            },
+        ),
+        migrations.RunPython(chain_existing_entries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+# Objets rattachés à un dossier par une clé étrangère `dossier`
+RELATED_MODELS = (
+    ('documents', 'Document'),
+    ('documents', 'Folder'),
+    ('agenda', 'Event'),
+    ('agenda', 'Reminder'),
+)
+
+
+def fill_dossier_id(apps, schema_editor):
+    """Renseigne le dossier des entrées existantes (sous-requêtes, rien en mémoire)"""
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+
+    content_type = ContentType.objects.filter(app_label='dossiers', model='dossier').first()
+    if content_type:
+        AuditLog.objects.filter(content_type=content_type).update(dossier_id=models.F('object_id'))
+
+    for app_label, model_name in RELATED_MODELS:
+        content_type = ContentType.objects.filter(app_label=app_label, model=model_name.lower()).first()
+        if not content_type:
+            continue
+        Model = apps.get_model(app_label, model_name)
+        AuditLog.objects.filter(content_type=content_type, dossier_id__isnull=True).update(
+            dossier_id=Subquery(Model.objects.filter(pk=OuterRef('object_id')).values('dossier_id')[:1])
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Chronologies d'audit par objet et par dossier : dossier de rattachement
+    dénormalisé et index composites (objet ou dossier, timestamp décroissant, id)
+    servant directement la pagination par curseur, sans tri.
+    L'index (content_type, object_id) est remplacé par l'index de chronologie,
+    qui le couvre.
+    """
+
+    dependencies = [
+        ("audit", "0007_audit_chain"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("documents", "0003_folder_materialized_path"),
+        ("agenda", "0006_reminder_notification"),
+        ("dossiers", "0006_dossier_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="auditlog",
+            name="dossier_id",
+            field=models.UUIDField(blank=True, editable=False, null=True, verbose_name="Dossier"),
+        ),
+        migrations.RemoveIndex(
+            model_name="auditlog",
+            name="audit_audit_content_4c2ead_idx",
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                fields=["content_type", "object_id", "-timestamp", "-id"], name="audit_object_timeline_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="auditlog",
+            index=models.Index(
+                condition=models.Q(("dossier_id__isnull", False)),
+                fields=["dossier_id", "-timestamp", "-id"],
+                name="audit_dossier_timeline_idx",
+            ),
+        ),
+        migrations.RunPython(fill_dossier_id, migrations.RunPython.noop),
+    ]
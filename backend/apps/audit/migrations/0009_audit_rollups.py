@@ -0,0 +1,99 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+ACTION_TYPES = [
+    ("CREATE", "Création"),
+    ("READ", "Lecture"),
+    ("UPDATE", "Modification"),
+    ("DELETE", "Suppression"),
+    ("DOWNLOAD", "Téléchargement"),
+    ("UPLOAD", "Upload"),
+    ("RESTORE", "Restauration"),
+    ("INTEGRITY_CHECK", "Vérification Intégrité"),
+    ("INTEGRITY_FAILURE", "Échec Intégrité"),
+    ("LOGIN", "Connexion"),
+    ("LOGOUT", "Déconnexion"),
+    ("LOGIN_FAILED", "Échec Connexion"),
+    ("PERMISSION_DENIED", "Accès Refusé"),
+]
+GRANULARITIES = [("hour", "Heure"), ("day", "Jour")]
+
+
+class Migration(migrations.Migration):
+    """
+    Agrégats horaires et journaliers du journal d'audit (voir apps/audit/rollups.py),
+    tenus à jour à l'écriture. L'historique est rempli par la commande
+    rebuild_audit_rollups.
+    """
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("audit", "0008_audit_timeline"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AuditRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("granularity", models.CharField(choices=GRANULARITIES, max_length=4, verbose_name="Granularité")),
+                ("bucket", models.DateTimeField(verbose_name="Début de période")),
+                ("user_id", models.UUIDField(blank=True, null=True, verbose_name="Utilisateur")),
+                ("action_type", models.CharField(choices=ACTION_TYPES, max_length=20, verbose_name="Type d'action")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="Nombre")),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="contenttypes.contenttype",
+                        verbose_name="Type d'objet",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Agrégat d'audit",
+                "verbose_name_plural": "Agrégats d'audit",
+                "ordering": ["granularity", "bucket"],
+                "indexes": [
+                    models.Index(fields=["granularity", "user_id", "bucket"], name="audit_rollup_user_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("user_id__isnull", False)),
+                        fields=("granularity", "bucket", "user_id", "action_type", "content_type"),
+                        name="audit_rollup_user_uniq",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("user_id__isnull", True)),
+                        fields=("granularity", "bucket", "action_type", "content_type"),
+                        name="audit_rollup_system_uniq",
+                    ),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="AuditIpRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("granularity", models.CharField(choices=GRANULARITIES, max_length=4, verbose_name="Granularité")),
+                ("bucket", models.DateTimeField(verbose_name="Début de période")),
+                ("ip_address", models.GenericIPAddressField(verbose_name="Adresse IP")),
+                ("action_type", models.CharField(choices=ACTION_TYPES, max_length=20, verbose_name="Type d'action")),
+                ("count", models.PositiveIntegerField(default=0, verbose_name="Nombre")),
+            ],
+            options={
+                "verbose_name": "Agrégat d'audit par IP",
+                "verbose_name_plural": "Agrégats d'audit par IP",
+                "ordering": ["granularity", "bucket"],
+                "indexes": [
+                    models.Index(fields=["granularity", "action_type", "bucket"], name="audit_ip_rollup_action_idx"),
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("granularity", "bucket", "ip_address", "action_type"),
+                        name="audit_ip_rollup_uniq",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+from django.db import migrations, models
+
+ACTION_TYPES = [
+    ("CREATE", "Création"),
+    ("READ", "Lecture"),
+    ("UPDATE", "Modification"),
+    ("DELETE", "Suppression"),
+    ("DOWNLOAD", "Téléchargement"),
+    ("UPLOAD", "Upload"),
+    ("RESTORE", "Restauration"),
+    ("INTEGRITY_CHECK", "Vérification Intégrité"),
+    ("INTEGRITY_FAILURE", "Échec Intégrité"),
+    ("LOGIN", "Connexion"),
+    ("LOGOUT", "Déconnexion"),
+    ("LOGIN_FAILED", "Échec Connexion"),
+    ("PERMISSION_DENIED", "Accès Refusé"),
+    ("CONSENT", "Consentement"),
+    ("ANOMALY", "Anomalie Détectée"),
+]
+
+
+class Migration(migrations.Migration):
+    """
+    Type d'action ANOMALY (alertes du détecteur, voir apps/audit/anomalies.py) ;
+    CONSENT, utilisé par les clients, est rétabli dans les choix du modèle.
+    """
+
+    dependencies = [
+        ("audit", "0009_audit_rollups"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name=model_name,
+            name="action_type",
+            field=models.CharField(choices=ACTION_TYPES, max_length=20, verbose_name="Type d'action"),
+        )
+        for model_name in ("auditlog", "auditrollup", "auditiprollup")
+    ]
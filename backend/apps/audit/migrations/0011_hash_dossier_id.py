@@ -0,0 +1,86 @@
+from django.db import migrations
+
+from apps.audit import chain
+
+
+def rechain_with_dossier(apps, schema_editor):
+    """
+    Recalcule les empreintes avec dossier_id, chaîne par chaîne. Chaque entrée
+    est d'abord vérifiée avec l'ancien jeu de champs : une chaîne déjà altérée
+    n'est pas re-signée (la migration échoue, verify_audit_chain la localise).
+    """
+    AuditLog = apps.get_model('audit', 'AuditLog')
+    AuditChainHead = apps.get_model('audit', 'AuditChainHead')
+    AuditCheckpoint = apps.get_model('audit', 'AuditCheckpoint')
+
+    key = chain.get_key()
+    checkpoints = list(AuditCheckpoint.objects.order_by('created_at', 'pk'))
+    # Empreintes figées par les points de contrôle : (chaîne, rang) → nouvelle empreinte
+    marks = {(int(shard), seq): None for checkpoint in checkpoints for shard, (seq, _) in checkpoint.heads.items()}
+    problems = []
+
+    for head in AuditChainHead.objects.order_by('shard'):
+        rows = (
+            AuditLog.objects.filter(chain_shard=head.shard, chain_seq__isnull=False)
+            .order_by('chain_seq').values(*chain.HASHED_FIELDS, 'entry_hash')
+        )
+        old_previous = new_previous = None
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            if chain.compute_hash(row, key, chain.LEGACY_HASHED_FIELDS) != row['entry_hash'] or (
+                old_previous is not None and row['prev_hash'] != old_previous
+            ):
+                problems.append(f"chaîne {head.shard} #{row['chain_seq']}")
+                continue
+            old_previous = row['entry_hash']
+            if new_previous is not None:
+                row['prev_hash'] = new_previous
+            new_previous = row['entry_hash'] = chain.compute_hash(row, key)
+            if (head.shard, row['chain_seq']) in marks:
+                marks[(head.shard, row['chain_seq'])] = new_previous
+            batch.append(AuditLog(id=row['id'], prev_hash=row['prev_hash'], entry_hash=row['entry_hash']))
+            if len(batch) >= 2000:
+                AuditLog.objects.bulk_update(batch, ['prev_hash', 'entry_hash'])
+                batch = []
+        if batch:
+            AuditLog.objects.bulk_update(batch, ['prev_hash', 'entry_hash'])
+        if new_previous is not None:
+            head.last_hash = new_previous
+            head.save(update_fields=['last_hash'])
+
+    if problems:
+        raise RuntimeError(
+            f"Journal d'audit altéré ({len(problems)} entrée(s), dont {', '.join(problems[:5])}) : "
+            "re-chaînage refusé, lancer verify_audit_chain"
+        )
+
+    # Points de contrôle re-signés sur les nouvelles empreintes (entrées purgées : inchangées)
+    previous_root = chain.GENESIS
+    for checkpoint in checkpoints:
+        checkpoint.heads = {
+            shard: [seq, marks.get((int(shard), seq)) or last_hash]
+            for shard, (seq, last_hash) in checkpoint.heads.items()
+        }
+        checkpoint.previous_root = previous_root
+        checkpoint.merkle_root = chain.checkpoint_root(checkpoint.heads, previous_root)
+        checkpoint.signature = chain.sign(checkpoint.merkle_root, key)
+        checkpoint.save(update_fields=['heads', 'previous_root', 'merkle_root', 'signature'])
+        previous_root = checkpoint.merkle_root
+
+
+class Migration(migrations.Migration):
+    """
+    dossier_id entre dans l'empreinte chaînée : il décide de la chronologie
+    d'un dossier et du contenu des exports, il ne doit pas pouvoir être réécrit
+    en base sans rompre la chaîne. Les entrées existantes sont vérifiées puis
+    re-chaînées ; les racines des points de contrôle changent (à reconsigner
+    hors de la base si elles l'étaient).
+    """
+
+    dependencies = [
+        ("audit", "0010_audit_anomaly_action"),
+    ]
+
+    operations = [
+        migrations.RunPython(rechain_with_dossier, migrations.RunPython.noop),
+    ]
@@ -6,17 +6,69 @@ import uuid
 import json
 from typing import Optional, Dict, Any
 
-from django.db import models
+from django.db import models, transaction
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.conf import settings
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 
+class AuditQuerySet(models.QuerySet):
+    """QuerySet personnalisé pour requêtes d'audit courantes"""
+    
+    def for_object(self, obj):
+        """Tous les logs pour un objet spécifique"""
+        content_type = ContentType.objects.get_for_model(obj.__class__)
+        return self.filter(content_type=content_type, object_id=obj.pk)
+    
+    def for_dossier(self, dossier):
+        """Logs d'un dossier et de ses objets rattachés (documents, sous-dossiers, événements…)"""
+        return self.filter(dossier_id=getattr(dossier, 'pk', dossier))
+    
+    def for_user(self, user):
+        """Tous les logs d'un utilisateur"""
+        return self.filter(user=user)
+    
+    def recent(self, days=7):
+        """Logs des N derniers jours (seules les partitions concernées sont lues)"""
+        from datetime import timedelta
+        
+        cutoff = timezone.now() - timedelta(days=days)
+        return self.filter(timestamp__gte=cutoff)
+    
+    def between(self, start=None, end=None):
+        """
+        Logs d'une période [start, end[. Toujours borner les recherches dans le
+        temps : sous PostgreSQL, seules les partitions mensuelles de la période
+        sont parcourues (voir partitions.py).
+        """
+        qs = self
+        if start is not None:
+            qs = qs.filter(timestamp__gte=start)
+        if end is not None:
+            qs = qs.filter(timestamp__lt=end)
+        return qs
+    
+    def by_action(self, action_type):
+        """Filtrer par type d'action"""
+        return self.filter(action_type=action_type)
+    
+    def security_events(self):
+        """Événements de sécurité uniquement"""
+        security_actions = [
+            'LOGIN_FAILED', 'PERMISSION_DENIED', 'INTEGRITY_FAILURE', 'ANOMALY'
+        ]
+        return self.filter(action_type__in=security_actions)
+
+
 class AuditLog(models.Model):
     """
     Journal d'audit complet avec anonymisation automatique des champs sensibles.
     Conforme RGPD - aucune donnée personnelle en clair.
+    
+    Sous PostgreSQL, la table est partitionnée par mois sur timestamp
+    (clé primaire réelle : id + timestamp), voir partitions.py.
     """
     
     ACTION_TYPES = [
@@ -33,6 +85,8 @@ class AuditLog(models.Model):
         ('LOGOUT', 'Déconnexion'),
         ('LOGIN_FAILED', 'Échec Connexion'),
         ('PERMISSION_DENIED', 'Accès Refusé'),
+        ('CONSENT', 'Consentement'),
+        ('ANOMALY', 'Anomalie Détectée'),
     ]
     
     # Champs sensibles à anonymiser automatiquement
@@ -62,6 +116,8 @@ class AuditLog(models.Model):
     object_id = models.UUIDField(verbose_name="ID de l'objet")
     content_object = GenericForeignKey('content_type', 'object_id')
     object_repr = models.CharField(max_length=255, verbose_name="Représentation")
+    # Dossier de rattachement, dénormalisé (ni clé étrangère ni champ chaîné) : chronologie par dossier
+    dossier_id = models.UUIDField(null=True, blank=True, editable=False, verbose_name="Dossier")
     
     # Action
     action_type = models.CharField(
@@ -97,8 +153,16 @@ class AuditLog(models.Model):
     request_path = models.CharField(max_length=500, blank=True, verbose_name="Chemin requête")
     session_key = models.CharField(max_length=40, blank=True, verbose_name="Clé de session")
     
-    # Timestamp
-    timestamp = models.DateTimeField(auto_now_add=True, verbose_name="Horodatage")
+    # Chaîne d'intégrité (voir chain.py) : renseignée à l'insertion
+    chain_shard = models.PositiveSmallIntegerField(null=True, editable=False, verbose_name="Chaîne")
+    chain_seq = models.BigIntegerField(null=True, editable=False, verbose_name="Rang dans la chaîne")
+    prev_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Empreinte précédente")
+    entry_hash = models.CharField(max_length=64, blank=True, editable=False, verbose_name="Empreinte")
+    
+    objects = AuditQuerySet.as_manager()
+    
+    # Timestamp (fixé à la construction : l'écriture peut être différée, voir writer.py)
+    timestamp = models.DateTimeField(default=timezone.now, editable=False, verbose_name="Horodatage")
     
     class Meta:
         db_table = 'audit_auditlog'
@@ -107,10 +171,17 @@ class AuditLog(models.Model):
         ordering = ['-timestamp']
         indexes = [
             models.Index(fields=['user', 'timestamp']),
-            models.Index(fields=['content_type', 'object_id']),
+            models.Index(
+                fields=['content_type', 'object_id', '-timestamp', '-id'], name='audit_object_timeline_idx'
+            ),
+            models.Index(
+                fields=['dossier_id', '-timestamp', '-id'], name='audit_dossier_timeline_idx',
+                condition=models.Q(dossier_id__isnull=False),
+            ),
             models.Index(fields=['action_type', 'timestamp']),
             models.Index(fields=['ip_address']),
             models.Index(fields=['timestamp']),
+            models.Index(fields=['chain_shard', 'chain_seq'], name='audit_chain_idx'),
         ]
     
     def __str__(self):
@@ -118,12 +189,24 @@ class AuditLog(models.Model):
         return f"{self.timestamp} - {username} - {self.action_type} - {self.object_repr}"
     
     def save(self, *args, **kwargs):
-        """Anonymisation automatique avant sauvegarde"""
-        if self.changes:
+        """Anonymisation automatique avant sauvegarde, chaînage à l'insertion (agrégats après commit)"""
+        if self.changes and not getattr(self, '_anonymized', False):
             self.changes, self.sensitive_fields_hash = self._anonymize_sensitive_data(
                 self.changes
             )
-        super().save(*args, **kwargs)
+            self._anonymized = True
+        if not self._state.adding:
+            super().save(*args, **kwargs)
+            return
+        from .anomalies import watch
+        from .chain import seal
+        from .rollups import record
+        
+        with transaction.atomic():
+            seal([self])
+            super().save(*args, **kwargs)
+            record([self])
+            watch([self])
     
     def _anonymize_sensitive_data(self, data: Dict[str, Any]) -> tuple[Dict[str, Any], Dict[str, str]]:
         """
@@ -186,6 +269,31 @@ class AuditLog(models.Model):
         Returns:
             Instance AuditLog créée
         """
+        return cls.objects.create(**cls._entry_data(user, obj, action_type, description, changes, request))
+    
+    @classmethod
+    def build_entry(cls, user, obj, action_type: str, description: str = "",
+                    changes: Optional[Dict] = None, request=None) -> 'AuditLog':
+        """
+        Construit une entrée d'audit non sauvegardée, déjà anonymisée
+        (destinée à bulk_create, qui n'appelle pas save()).
+        """
+        entry = cls(**cls._entry_data(user, obj, action_type, description, changes, request))
+        if entry.changes:
+            entry.changes, entry.sensitive_fields_hash = entry._anonymize_sensitive_data(entry.changes)
+        entry._anonymized = True
+        return entry
+    
+    @staticmethod
+    def _dossier_of(obj):
+        """Dossier de rattachement de l'objet audité (le dossier lui-même, ou son FK dossier)"""
+        if obj._meta.label == 'dossiers.Dossier':
+            return obj.pk
+        return getattr(obj, 'dossier_id', None)
+    
+    @classmethod
+    def _entry_data(cls, user, obj, action_type, description, changes, request) -> Dict[str, Any]:
+        """Champs d'une entrée d'audit (contexte de requête inclus si disponible)"""
         content_type = ContentType.objects.get_for_model(obj.__class__)
         
         log_data = {
@@ -193,6 +301,7 @@ class AuditLog(models.Model):
             'content_type': content_type,
             'object_id': obj.pk,
             'object_repr': str(obj)[:255],
+            'dossier_id': cls._dossier_of(obj),
             'action_type': action_type,
             'description': description,
             'changes': changes or {},
@@ -204,20 +313,17 @@ class AuditLog(models.Model):
                 'ip_address': cls._get_client_ip(request),
                 'user_agent': request.META.get('HTTP_USER_AGENT', '')[:1000],
                 'request_path': request.path[:500],
-                'session_key': request.session.session_key if hasattr(request, 'session') else '',
+                'session_key': (getattr(request, 'session', None) and request.session.session_key) or '',
             })
         
-        return cls.objects.create(**log_data)
+        return log_data
     
     @staticmethod
     def _get_client_ip(request) -> Optional[str]:
-        """Extraction de l'IP réelle du client (gestion proxy)"""
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0].strip()
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
+        """Extraction de l'IP réelle du client (gestion proxy, valeurs invalides écartées)"""
+        from apps.core.utils import get_client_ip
+
+        return get_client_ip(request)
     
     def get_changes_display(self) -> str:
         """Formatage lisible des changements"""
@@ -234,37 +340,116 @@ class AuditLog(models.Model):
         return "\n".join(lines)
 
 
-class AuditQuerySet(models.QuerySet):
-    """QuerySet personnalisé pour requêtes d'audit courantes"""
+class AuditChainHead(models.Model):
+    """Dernière entrée de chaque chaîne d'audit (verrouillée à chaque insertion)"""
     
-    def for_object(self, obj):
-        """Tous les logs pour un objet spécifique"""
-        content_type = ContentType.objects.get_for_model(obj.__class__)
-        return self.filter(content_type=content_type, object_id=obj.pk)
+    shard = models.PositiveSmallIntegerField(primary_key=True, verbose_name="Chaîne")
+    seq = models.BigIntegerField(default=0, verbose_name="Rang de la dernière entrée")
+    last_hash = models.CharField(max_length=64, default='0' * 64, verbose_name="Dernière empreinte")
+    purged_seq = models.BigIntegerField(
+        default=0,
+        verbose_name="Rang purgé",
+        help_text="Dernier rang supprimé par la rétention (partitions expirées)"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Mise à jour")
     
-    def for_user(self, user):
-        """Tous les logs d'un utilisateur"""
-        return self.filter(user=user)
+    class Meta:
+        verbose_name = "Tête de chaîne d'audit"
+        verbose_name_plural = "Têtes de chaînes d'audit"
+        ordering = ['shard']
     
-    def recent(self, days=7):
-        """Logs des N derniers jours"""
-        from django.utils import timezone
-        from datetime import timedelta
-        
-        cutoff = timezone.now() - timedelta(days=days)
-        return self.filter(timestamp__gte=cutoff)
+    def __str__(self):
+        return f"Chaîne {self.shard} #{self.seq}"
+
+
+class AuditCheckpoint(models.Model):
+    """
+    Point de contrôle : têtes de toutes les chaînes à un instant, résumées par
+    une racine de Merkle chaînée au point précédent et signée (HMAC).
+    La racine peut être consignée hors de la base (registre, e-mail) pour
+    rendre détectable la suppression des derniers points.
+    """
     
-    def by_action(self, action_type):
-        """Filtrer par type d'action"""
-        return self.filter(action_type=action_type)
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Créé le")
+    heads = models.JSONField(default=dict, verbose_name="Têtes", help_text="{chaîne: [rang, empreinte]}")
+    previous_root = models.CharField(max_length=64, verbose_name="Racine précédente")
+    merkle_root = models.CharField(max_length=64, verbose_name="Racine de Merkle")
+    signature = models.CharField(max_length=64, verbose_name="Signature")
     
-    def security_events(self):
-        """Événements de sécurité uniquement"""
-        security_actions = [
-            'LOGIN_FAILED', 'PERMISSION_DENIED', 'INTEGRITY_FAILURE'
+    class Meta:
+        verbose_name = "Point de contrôle d'audit"
+        verbose_name_plural = "Points de contrôle d'audit"
+        ordering = ['created_at']
+    
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M} - {self.merkle_root[:12]}"
+
+
+
+class AuditRollup(models.Model):
+    """
+    Agrégat du journal d'audit par période (heure ou jour) × utilisateur ×
+    type d'action × type d'objet, tenu à jour à chaque écriture (rollups.py).
+    Utilisateur en UUID simple : l'agrégat survit à la suppression du compte.
+    """
+    
+    GRANULARITIES = [
+        ('hour', 'Heure'),
+        ('day', 'Jour'),
+    ]
+    
+    granularity = models.CharField(max_length=4, choices=GRANULARITIES, verbose_name="Granularité")
+    bucket = models.DateTimeField(verbose_name="Début de période")
+    user_id = models.UUIDField(null=True, blank=True, verbose_name="Utilisateur")
+    action_type = models.CharField(max_length=20, choices=AuditLog.ACTION_TYPES, verbose_name="Type d'action")
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, verbose_name="Type d'objet")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre")
+    
+    class Meta:
+        verbose_name = "Agrégat d'audit"
+        verbose_name_plural = "Agrégats d'audit"
+        ordering = ['granularity', 'bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'user_id', 'action_type', 'content_type'],
+                condition=models.Q(user_id__isnull=False),
+                name='audit_rollup_user_uniq',
+            ),
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'action_type', 'content_type'],
+                condition=models.Q(user_id__isnull=True),
+                name='audit_rollup_system_uniq',
+            ),
         ]
-        return self.filter(action_type__in=security_actions)
+        indexes = [
+            models.Index(fields=['granularity', 'user_id', 'bucket'], name='audit_rollup_user_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} - {self.action_type} : {self.count}"
 
 
-# Attacher le QuerySet personnalisé
-AuditLog.objects = AuditQuerySet.as_manager()
+class AuditIpRollup(models.Model):
+    """Agrégat du journal d'audit par période × adresse IP × type d'action (voir rollups.py)"""
+    
+    granularity = models.CharField(max_length=4, choices=AuditRollup.GRANULARITIES, verbose_name="Granularité")
+    bucket = models.DateTimeField(verbose_name="Début de période")
+    ip_address = models.GenericIPAddressField(verbose_name="Adresse IP")
+    action_type = models.CharField(max_length=20, choices=AuditLog.ACTION_TYPES, verbose_name="Type d'action")
+    count = models.PositiveIntegerField(default=0, verbose_name="Nombre")
+    
+    class Meta:
+        verbose_name = "Agrégat d'audit par IP"
+        verbose_name_plural = "Agrégats d'audit par IP"
+        ordering = ['granularity', 'bucket']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['granularity', 'bucket', 'ip_address', 'action_type'], name='audit_ip_rollup_uniq',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['granularity', 'action_type', 'bucket'], name='audit_ip_rollup_action_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.granularity} {self.bucket:%Y-%m-%d %H:%M} - {self.ip_address} {self.action_type} : {self.count}"
@@ -0,0 +1,183 @@
+"""
+Partitionnement mensuel de audit_auditlog (PostgreSQL uniquement).
+
+La table est partitionnée par plage sur `timestamp` : une partition par mois
+(audit_auditlog_yAAAAmMM, bornes en heure locale du cabinet) et une partition
+par défaut qui recueille les lignes hors des partitions créées. Chaque
+partition porte ses propres index, plus petits ; les requêtes bornées
+dans le temps (recent(), between()) n'en parcourent qu'une partie
+(partition pruning). La rétention se fait en détachant/supprimant des
+partitions entières, sans DELETE massif.
+
+La clé primaire devient (id, timestamp) : PostgreSQL impose que la clé de
+partition fasse partie de toute contrainte d'unicité. L'id reste un UUID4.
+
+Les partitions à venir sont créées par la commande manage_audit_partitions
+(à planifier chaque jour ou chaque semaine).
+"""
+import re
+from datetime import date, datetime
+
+from django.db import connection as default_connection
+from django.utils import timezone
+
+PARENT = 'audit_auditlog'
+DEFAULT_PARTITION = f'{PARENT}_default'
+PARTITION_RE = re.compile(rf'^{PARENT}_y(\d{{4}})m(\d{{2}})$')
+
+
+def month_start(value) -> date:
+    if isinstance(value, datetime):
+        value = timezone.localtime(value) if timezone.is_aware(value) else value
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f'{PARENT}_y{month.year:04d}m{month.month:02d}'
+
+
+def _bound(month: date) -> str:
+    """Borne de partition : minuit local du premier jour du mois"""
+    return timezone.make_aware(datetime(month.year, month.month, 1)).isoformat()
+
+
+def is_supported(connection=None) -> bool:
+    return (connection or default_connection).vendor == 'postgresql'
+
+
+def is_partitioned(connection=None) -> bool:
+    connection = connection or default_connection
+    if not is_supported(connection):
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s))",
+            [PARENT],
+        )
+        return cursor.fetchone()[0]
+
+
+def existing_partitions(connection=None) -> dict:
+    """Partitions mensuelles rattachées : {premier jour du mois: nom}"""
+    connection = connection or default_connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [PARENT],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = PARTITION_RE.match(name)
+        if match:
+            months[date(int(match.group(1)), int(match.group(2)), 1)] = name
+    return months
+
+
+def create_partition(month: date, connection=None, parent=PARENT) -> bool:
+    """
+    Crée la partition d'un mois si elle n'existe pas.
+    Les lignes du mois déjà tombées dans la partition par défaut y sont déplacées
+    (sinon PostgreSQL refuse la nouvelle partition).
+    """
+    connection = connection or default_connection
+    month = month_start(month)
+    name = partition_name(month)
+    lower, upper = _bound(month), _bound(add_months(month, 1))
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [name])
+        if cursor.fetchone()[0]:
+            return False
+
+        cursor.execute("SELECT to_regclass(%s) IS NOT NULL", [DEFAULT_PARTITION])
+        has_default = cursor.fetchone()[0]
+        stray = False
+        if has_default:
+            cursor.execute(
+                f"SELECT EXISTS (SELECT 1 FROM {quote(DEFAULT_PARTITION)} "
+                f"WHERE timestamp >= %s AND timestamp < %s)",
+                [lower, upper],
+            )
+            stray = cursor.fetchone()[0]
+
+        if not stray:
+            cursor.execute(
+                f"CREATE TABLE {quote(name)} PARTITION OF {quote(parent)} "
+                f"FOR VALUES FROM (%s) TO (%s)",
+                [lower, upper],
+            )
+            return True
+
+        cursor.execute(
+            f"CREATE TABLE {quote(name)} (LIKE {quote(parent)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} "
+            f"WHERE timestamp >= %s AND timestamp < %s RETURNING *) "
+            f"INSERT INTO {quote(name)} SELECT * FROM moved",
+            [lower, upper],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(parent)} ATTACH PARTITION {quote(name)} FOR VALUES FROM (%s) TO (%s)",
+            [lower, upper],
+        )
+    return True
+
+
+def ensure_partitions(months_ahead=3, start=None, connection=None, parent=PARENT) -> list:
+    """Crée les partitions du mois de `start` (défaut : mois courant) à months_ahead mois plus tard"""
+    first = month_start(start or timezone.now())
+    last = add_months(month_start(timezone.now()), months_ahead)
+    created = []
+    month = first
+    while month <= last:
+        if create_partition(month, connection, parent=parent):
+            created.append(partition_name(month))
+        month = add_months(month, 1)
+    return created
+
+
+def expired_partitions(retention_months: int, connection=None) -> list:
+    """Partitions dont tout le mois est antérieur à la période de rétention"""
+    cutoff = add_months(month_start(timezone.now()), -retention_months)
+    return [
+        name for month, name in sorted(existing_partitions(connection).items())
+        if month < cutoff
+    ]
+
+
+def _record_purge(cursor, name, quote):
+    """Rangs de chaîne quittant le journal (voir chain.py) : leur absence ne sera pas une anomalie"""
+    from .models import AuditChainHead
+
+    cursor.execute(
+        f"SELECT chain_shard, max(chain_seq) FROM {quote(name)} "
+        f"WHERE chain_seq IS NOT NULL GROUP BY chain_shard"
+    )
+    for shard, seq in cursor.fetchall():
+        AuditChainHead.objects.filter(shard=shard, purged_seq__lt=seq).update(purged_seq=seq)
+
+
+def drop_expired(retention_months: int, detach_only=False, connection=None) -> list:
+    """
+    Applique la rétention : détache (et supprime, sauf detach_only) les partitions expirées.
+    Une partition détachée reste une table ordinaire, archivable (pg_dump -t) avant suppression.
+    """
+    connection = connection or default_connection
+    quote = connection.ops.quote_name
+    names = expired_partitions(retention_months, connection)
+    with connection.cursor() as cursor:
+        for name in names:
+            _record_purge(cursor, name, quote)
+            cursor.execute(f"ALTER TABLE {quote(PARENT)} DETACH PARTITION {quote(name)}")
+            if not detach_only:
+                cursor.execute(f"DROP TABLE {quote(name)}")
+    return names
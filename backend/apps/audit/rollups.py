@@ -0,0 +1,158 @@
+"""
+Agrégats pré-calculés du journal d'audit pour les tableaux de bord de sécurité.
+
+Deux tables, chacune à l'heure et au jour (périodes en heure locale du cabinet) :
+- AuditRollup   : utilisateur × type d'action × type d'objet ;
+- AuditIpRollup : adresse IP × type d'action.
+
+Elles sont incrémentées au commit de la transaction qui insère les entrées
+(lot du writer ou entrée isolée, voir chain.insert et AuditLog.save), dans
+une transaction courte : en mode strict, les lignes d'agrégat ne restent
+pas verrouillées jusqu'à la fin de la requête. Chaque lot est d'abord
+regroupé par clé, puis une mise à jour par clé distincte. Un échec
+d'agrégation (ou un arrêt entre les deux commits) est journalisé sans
+bloquer l'écriture du journal ; la commande rebuild_audit_rollups recalcule
+alors la période concernée (et remplit l'historique).
+
+Les lectures somment toujours `count` : un tableau de bord lit quelques
+milliers de lignes au lieu de parcourir audit_auditlog.
+"""
+import logging
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+HOUR = 'hour'
+DAY = 'day'
+GRANULARITIES = (HOUR, DAY)
+
+BATCH_SIZE = 2000
+
+
+def is_enabled() -> bool:
+    return getattr(settings, 'AUDIT_ROLLUPS_ENABLED', True)
+
+
+def bucket_start(moment, granularity):
+    """Début de la période (heure ou jour local) contenant moment"""
+    start = timezone.localtime(moment).replace(minute=0, second=0, microsecond=0)
+    return start.replace(hour=0) if granularity == DAY else start
+
+
+def _keys(entries):
+    """Incréments {(modèle, clé)} d'un lot d'entrées"""
+    from .models import AuditIpRollup, AuditRollup
+
+    counts = Counter()
+    for entry in entries:
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(entry.timestamp, granularity)
+            counts[(AuditRollup, (
+                ('granularity', granularity), ('bucket', bucket), ('user_id', entry.user_id),
+                ('action_type', entry.action_type), ('content_type_id', entry.content_type_id),
+            ))] += 1
+            if entry.ip_address:
+                counts[(AuditIpRollup, (
+                    ('granularity', granularity), ('bucket', bucket),
+                    ('ip_address', entry.ip_address), ('action_type', entry.action_type),
+                ))] += 1
+    return counts
+
+
+def _increment(model, key: dict, count: int) -> None:
+    if model.objects.filter(**key).update(count=F('count') + count):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(count=count, **key)
+    except IntegrityError:
+        # Créée entre-temps par un autre processus
+        model.objects.filter(**key).update(count=F('count') + count)
+
+
+def apply(entries) -> int:
+    """Incrémente les agrégats des entrées ; renvoie le nombre de lignes touchées"""
+    counts = _keys(entries)
+    # Ordre stable : deux lots concurrents verrouillent les lignes dans le même ordre
+    for (model, key), count in sorted(counts.items(), key=lambda item: (item[0][0].__name__, str(item[0][1]))):
+        _increment(model, dict(key), count)
+    return len(counts)
+
+
+def record(entries) -> None:
+    """Agrège, après commit, des entrées qui viennent d'être insérées"""
+    if not entries or not is_enabled():
+        return
+    entries = list(entries)
+    transaction.on_commit(lambda: _record(entries))
+
+
+def _record(entries) -> None:
+    try:
+        with transaction.atomic():
+            apply(entries)
+    except Exception:
+        logger.exception("Échec de l'agrégation de %s entrées d'audit (rebuild_audit_rollups)", len(entries))
+
+
+def rebuild(since, until) -> int:
+    """
+    Recalcule les agrégats de [since, until[ depuis audit_auditlog (GROUP BY en base).
+    Les bornes doivent tomber sur des débuts de jour local.
+    """
+    from .models import AuditIpRollup, AuditLog, AuditRollup
+
+    tzinfo = timezone.get_current_timezone()
+    entries = AuditLog.objects.between(since, until)
+    sources = (
+        (AuditRollup, entries, ('user_id', 'action_type', 'content_type_id')),
+        (AuditIpRollup, entries.filter(ip_address__isnull=False), ('ip_address', 'action_type')),
+    )
+    created = 0
+    for model, queryset, dimensions in sources:
+        model.objects.filter(bucket__gte=since, bucket__lt=until).delete()
+        for granularity in GRANULARITIES:
+            rows = (
+                queryset.annotate(period=Trunc('timestamp', granularity, tzinfo=tzinfo))
+                .values('period', *dimensions)
+                .annotate(total=Count('id'))
+                .order_by()
+            )
+            batch = []
+            for row in rows.iterator(chunk_size=BATCH_SIZE):
+                batch.append(model(
+                    granularity=granularity, bucket=row.pop('period'), count=row.pop('total'), **row
+                ))
+                if len(batch) >= BATCH_SIZE:
+                    model.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            model.objects.bulk_create(batch)
+            created += len(batch)
+    return created
+
+
+def default_since(granularity):
+    """Fenêtre par défaut des tableaux de bord : 48 heures à l'heure, 92 jours au jour"""
+    window = timedelta(hours=48) if granularity == HOUR else timedelta(days=92)
+    return bucket_start(timezone.now() - window, granularity)
+
+
+def summarize(queryset, dimensions, since=None, until=None):
+    """Sommes par période et dimensions demandées, sur [since, until["""
+    if since is not None:
+        queryset = queryset.filter(bucket__gte=since)
+    if until is not None:
+        queryset = queryset.filter(bucket__lt=until)
+    return (
+        queryset.values('bucket', *dimensions)
+        .annotate(total=Sum('count'))
+        .order_by('bucket', *dimensions)
+    )
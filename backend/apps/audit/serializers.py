@@ -1,4 +1,5 @@
 # audit/serializers.py
+from django.contrib.contenttypes.models import ContentType
 from rest_framework import serializers
 from .models import AuditLog
 
@@ -19,4 +20,58 @@ class AuditLogSerializer(serializers.ModelSerializer):
             'content_type', 'object_id', 'changes', 'description',
             'ip_address', 'request_path', 'timestamp'
         ]
-        read_only_fields = '__all__'  # Jamais modifiable via API
\ No newline at end of file
+        read_only_fields = fields  # Jamais modifiable via API
+
+
+class AuditTimelineSerializer(AuditLogSerializer):
+    """
+    Entrée de chronologie (objet ou dossier), ouverte au responsable du dossier :
+    ni adresse IP ni chemin de requête.
+    """
+    content_type = serializers.SerializerMethodField()
+
+    class Meta(AuditLogSerializer.Meta):
+        fields = [
+            'id', 'user', 'user_name', 'user_username',
+            'action_type', 'action_display', 'object_repr',
+            'content_type', 'object_id', 'changes', 'description', 'timestamp'
+        ]
+        read_only_fields = fields
+
+    def get_content_type(self, obj):
+        content_type = ContentType.objects.get_for_id(obj.content_type_id)
+        return f"{content_type.app_label}.{content_type.model}"
+
+class AuditExportSerializer(serializers.Serializer):
+    """
+    Paramètres de l'export du journal d'audit.
+    Utilisé pour l'endpoint POST /audit/export/
+    """
+
+    dossier = serializers.UUIDField(required=False)
+    client = serializers.UUIDField(required=False)
+    user = serializers.UUIDField(required=False)
+    action_types = serializers.ListField(
+        child=serializers.ChoiceField(choices=[code for code, _ in AuditLog.ACTION_TYPES]),
+        required=False,
+        allow_empty=False
+    )
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    format = serializers.ChoiceField(choices=['csv', 'jsonl'], default='csv')
+    sign = serializers.BooleanField(default=True)
+    passphrase = serializers.CharField(required=False, write_only=True, trim_whitespace=False)
+
+    def validate_passphrase(self, value):
+        from .export import MIN_PASSPHRASE_LENGTH
+
+        if len(value) < MIN_PASSPHRASE_LENGTH:
+            raise serializers.ValidationError(
+                f"La phrase secrète doit contenir au moins {MIN_PASSPHRASE_LENGTH} caractères"
+            )
+        return value
+
+    def validate(self, attrs):
+        if attrs.get('since') and attrs.get('until') and attrs['since'] >= attrs['until']:
+            raise serializers.ValidationError("'since' doit précéder 'until'")
+        return attrs
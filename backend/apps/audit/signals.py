@@ -0,0 +1,14 @@
+"""
+Événements d'authentification journalisés (voir anomalies.py : règle
+login_failed_burst). Les refus d'accès (403) sont journalisés par le
+gestionnaire d'exceptions DRF (apps/core/exceptions.py).
+"""
+from django.contrib.auth.signals import user_login_failed
+from django.dispatch import receiver
+
+from .utils import log_login_failed
+
+
+@receiver(user_login_failed)
+def login_failed(sender, credentials, request=None, **kwargs):
+    log_login_failed(credentials, request)
@@ -0,0 +1,457 @@
+import csv
+import io
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import RequestFactory, TestCase, override_settings
+from rest_framework.test import APITestCase
+
+from apps.audit import anomalies, chain, export as audit_export, partitions, writer as audit_writer
+from apps.audit.models import AuditChainHead, AuditIpRollup, AuditLog, AuditRollup
+from apps.audit.utils import log_action, log_bulk_action
+from apps.clients.models import Client
+from apps.documents.models import Folder
+from apps.dossiers.models import Dossier
+
+User = get_user_model()
+
+
+class AuditWriterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='auditeur',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='AUD/2026/001'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Paul',
+            last_name='Mba',
+            phone_primary='+24177000030',
+        )
+        self.writer = audit_writer.AuditWriter(maxsize=2, batch_size=10, autostart=False)
+        patcher = mock.patch.object(audit_writer, 'writer', self.writer)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _log(self, action_type='UPDATE'):
+        return log_action(
+            user=self.user,
+            obj=self.client_obj,
+            action_type=action_type,
+            changes={'email': 'paul@example.ga', 'city': 'Libreville'},
+        )
+
+    @override_settings(AUDIT_WRITE_MODE='on_commit')
+    def test_on_commit_batches_and_counts_drops(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._log()
+        # Rien n'est écrit ni mis en file avant le commit
+        self.assertEqual(self.writer.metrics()['queue_depth'], 0)
+        for callback in callbacks:
+            callback()
+        # Les événements de sécurité n'attendent pas le commit
+        self._log('PERMISSION_DENIED')
+        self._log('LOGIN_FAILED')
+
+        metrics = self.writer.metrics()
+        self.assertEqual((metrics['queue_depth'], metrics['dropped']), (2, 1))
+        self.assertFalse(AuditLog.objects.exists())
+
+        self.assertEqual(self.writer.flush(), 2)
+        entry = AuditLog.objects.get(action_type='UPDATE')
+        self.assertEqual(entry.changes['email'], '***REDACTED***')
+        self.assertTrue(entry.verify_sensitive_field('email', 'paul@example.ga'))
+        self.assertEqual(self.writer.metrics()['written'], 2)
+
+    def test_strict_writes_in_request_transaction(self):
+        entry = self._log()
+        self.assertTrue(AuditLog.objects.filter(pk=entry.pk).exists())
+        # L'anonymisation n'est pas rejouée sur la valeur déjà masquée
+        self.assertTrue(entry.verify_sensitive_field('email', 'paul@example.ga'))
+        self.assertEqual(self.writer.metrics()['enqueued'], 0)
+
+
+class AuditPartitionTest(TestCase):
+    def test_month_arithmetic_and_names(self):
+        self.assertEqual(partitions.add_months(date(2026, 11, 1), 3), date(2027, 2, 1))
+        self.assertEqual(partitions.add_months(date(2026, 1, 1), -1), date(2025, 12, 1))
+        self.assertEqual(partitions.partition_name(date(2027, 2, 1)), 'audit_auditlog_y2027m02')
+        # Bornes en heure locale du cabinet (UTC+1)
+        self.assertEqual(partitions._bound(date(2026, 10, 1)), '2026-10-01T00:00:00+01:00')
+
+    def test_command_is_noop_without_postgresql(self):
+        out = io.StringIO()
+        call_command('manage_audit_partitions', stdout=out)
+        self.assertIn('non partitionné', out.getvalue())
+
+
+class AuditChainTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='chaine',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='AUD/2026/002'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Jeanne',
+            last_name='Ondo',
+            phone_primary='+24177000031',
+        )
+
+    def _verify(self):
+        out = io.StringIO()
+        call_command('verify_audit_chain', workers=1, stdout=out)
+        return out.getvalue()
+
+    @override_settings(AUDIT_CHAIN_SHARDS=2)
+    def test_chain_detects_tampering_between_checkpoints(self):
+        entries = [
+            log_action(user=self.user, obj=self.client_obj, action_type='UPDATE', changes={'city': f'Ville {i}'})
+            for i in range(6)
+        ]
+        call_command('verify_audit_chain', checkpoint=True, stdout=io.StringIO())
+        log_bulk_action(user=self.user, objects=[self.client_obj] * 4, action_type='READ')
+
+        self.assertEqual(sum(AuditChainHead.objects.values_list('seq', flat=True)), 10)
+        self.assertIn('intact : 10 entrée(s)', self._verify())
+
+        # Modification directe en base d'une entrée antérieure au point de contrôle
+        AuditLog.objects.filter(pk=entries[2].pk).update(description='Corrigé')
+        with self.assertRaisesMessage(CommandError, '1 anomalie(s)'):
+            self._verify()
+
+        # Suppression : trou dans la chaîne
+        AuditLog.objects.filter(pk=entries[2].pk).delete()
+        with self.assertRaises(CommandError):
+            self._verify()
+
+    def test_dossier_id_is_covered_by_the_chain(self):
+        entry = log_action(user=self.user, obj=self.client_obj, action_type='READ')
+        head = AuditChainHead.objects.get(shard=entry.chain_shard)
+        segment = (entry.chain_shard, entry.chain_seq - 1, entry.prev_hash, head.seq, head.last_hash)
+        self.assertEqual(chain.verify_segment(*segment), [])
+
+        dossier = Dossier.objects.create(
+            title="Dossier détourné", client=self.client_obj, responsible=self.user, category='CONTENTIEUX'
+        )
+        AuditLog.objects.filter(pk=entry.pk).update(dossier_id=dossier.pk)
+        self.assertEqual(len(chain.verify_segment(*segment)), 1)
+
+    def test_migration_rechains_legacy_hashes(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        log_bulk_action(user=self.user, objects=[self.client_obj] * 3, action_type='READ')
+        # Empreintes calculées sans dossier_id, comme avant la migration
+        head = AuditChainHead.objects.get(shard=chain.writer_shard())
+        previous = chain.GENESIS
+        for entry in AuditLog.objects.filter(chain_shard=head.shard).order_by('chain_seq'):
+            entry.prev_hash = previous
+            previous = entry.entry_hash = chain.compute_hash(chain._values(entry), fields=chain.LEGACY_HASHED_FIELDS)
+            AuditLog.objects.filter(pk=entry.pk).update(prev_hash=entry.prev_hash, entry_hash=entry.entry_hash)
+        AuditChainHead.objects.filter(pk=head.pk).update(last_hash=previous)
+        call_command('verify_audit_chain', checkpoint=True, stdout=io.StringIO())
+        with self.assertRaises(CommandError):
+            self._verify()
+
+        import_module('apps.audit.migrations.0011_hash_dossier_id').rechain_with_dossier(apps, None)
+        self.assertIn('intact : 3 entrée(s)', self._verify())
+
+    def test_batch_is_sealed_on_the_writer_chain(self):
+        import threading
+
+        entries = log_bulk_action(user=self.user, objects=[self.client_obj] * 5, action_type='READ')
+        self.assertEqual({entry.chain_shard for entry in entries}, {chain.writer_shard()})
+        head = AuditChainHead.objects.get(shard=chain.writer_shard())
+        self.assertEqual([entry.chain_seq for entry in entries], list(range(head.seq - 4, head.seq + 1)))
+
+        shards = []
+        thread = threading.Thread(target=lambda: shards.append(chain.writer_shard()))
+        thread.start()
+        thread.join()
+        self.assertNotEqual(shards[0], chain.writer_shard())
+
+    def test_forged_forwarded_for_falls_back_to_remote_addr(self):
+        request = RequestFactory().get('/api/clients/', HTTP_X_FORWARDED_FOR='garbage, 10.0.0.1', REMOTE_ADDR='10.0.0.9')
+        entry = log_action(user=self.user, obj=self.client_obj, action_type='READ', request=request)
+        self.assertEqual(entry.ip_address, '10.0.0.9')
+
+        values = {field: getattr(entry, field, None) for field in ('id', 'timestamp')}
+        values['ip_address'] = 'garbage'
+        self.assertEqual(len(chain.compute_hash(values, key=b'k')), 64)
+
+
+class AuditExportTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='controleur', password='testpass123', role='AVOCAT', is_staff=True,
+            professional_id='AUD/2026/003'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Luc',
+            last_name='Essono',
+            phone_primary='+24177000032',
+        )
+        self.other = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Anne',
+            last_name='Moussavou',
+            phone_primary='+24177000033',
+        )
+        self.dossier = Dossier.objects.create(
+            title="Succession Essono", client=self.client_obj, responsible=self.admin, category='CONTENTIEUX'
+        )
+        self.folder = Folder.objects.create(name="Pièces", dossier=self.dossier, created_by=self.admin)
+        for obj in (self.dossier, self.folder, self.other):
+            log_action(user=self.admin, obj=obj, action_type='UPDATE', changes={'email': 'x@example.ga'})
+        self.client.force_authenticate(user=self.admin)
+
+    def _export(self, **payload):
+        response = self.client.post('/api/audit/export/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_dossier_export_includes_related_objects_and_is_signed(self):
+        data = self._export(dossier=str(self.dossier.pk), format='jsonl', action_types=['UPDATE'])
+        lines = [json.loads(line) for line in data.splitlines()]
+        self.assertEqual(
+            {line['object_id'] for line in lines[:-1]}, {str(self.dossier.pk), str(self.folder.pk)}
+        )
+        self.assertEqual(lines[0]['changes']['email'], '***REDACTED***')
+        self.assertEqual(lines[-1]['signature']['entries'], 2)
+        self.assertTrue(audit_export.verify_signature(data))
+        self.assertFalse(audit_export.verify_signature(data.replace(b'UPDATE', b'READ', 1)))
+        # L'export est journalisé
+        self.assertTrue(AuditLog.objects.filter(description="Export du journal d'audit").exists())
+
+    def test_encrypted_csv_export_round_trip(self):
+        passphrase = 'phrase secrète du barreau'
+        data = self._export(client=str(self.client_obj.pk), passphrase=passphrase)
+        self.assertTrue(data.startswith(audit_export.ENCRYPTION_MAGIC))
+        self.assertNotIn(b'Succession', data)
+        plain = b''.join(audit_export.decrypt_lines(io.BytesIO(data), passphrase))
+        self.assertTrue(audit_export.verify_signature(plain))
+        rows = list(csv.DictReader(io.StringIO(plain.decode())))
+        # Dossier et sous-dossier du client (l'autre client est exclu), l'export
+        # lui-même (journalisé sur le client), puis la ligne de signature
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[2]['description'], "Export du journal d'audit")
+        self.assertNotIn(str(self.other.pk), plain.decode())
+
+
+class AuditTimelineTest(APITestCase):
+    def setUp(self):
+        self.lawyer = User.objects.create_user(
+            username='responsable', password='testpass123', role='AVOCAT', professional_id='AUD/2026/004'
+        )
+        self.outsider = User.objects.create_user(
+            username='confrere', password='testpass123', role='AVOCAT', professional_id='AUD/2026/005'
+        )
+        client_obj = Client.objects.create(
+            client_type='PHYSIQUE', first_name='Paul', last_name='Ndong', phone_primary='+24177000034',
+        )
+        self.dossier = Dossier.objects.create(
+            title="Bail Ndong", client=client_obj, responsible=self.lawyer, category='CONTENTIEUX'
+        )
+        self.folder = Folder.objects.create(name="Courriers", dossier=self.dossier, created_by=self.lawyer)
+        for index in range(3):
+            log_action(user=self.lawyer, obj=self.folder, action_type='UPDATE', description=f"Modification {index}")
+        log_action(user=self.lawyer, obj=self.dossier, action_type='UPDATE')
+
+    def _pages(self, url):
+        results = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            results.extend(response.data['results'])
+            url = response.data['next']
+        return results
+
+    def test_dossier_timeline_is_paginated_by_cursor_for_the_responsible(self):
+        self.client.force_authenticate(user=self.lawyer)
+        results = self._pages(f'/api/audit/timeline/dossier/{self.dossier.pk}/?limit=2')
+        expected = list(
+            AuditLog.objects.for_dossier(self.dossier).order_by('-timestamp', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual([entry['id'] for entry in results], [str(pk) for pk in expected])
+        self.assertGreaterEqual(len(results), 4)
+        self.assertIn(str(self.folder.pk), {entry['object_id'] for entry in results})
+        self.assertNotIn('ip_address', results[0])
+
+    def test_object_timeline(self):
+        self.client.force_authenticate(user=self.lawyer)
+        results = self._pages(
+            f'/api/audit/timeline/?content_type=documents.folder&object_id={self.folder.pk}&limit=2'
+        )
+        descriptions = [entry['description'] for entry in results if entry['action_type'] == 'UPDATE']
+        self.assertEqual(descriptions, ["Modification 2", "Modification 1", "Modification 0"])
+        self.assertEqual({entry['content_type'] for entry in results}, {'documents.folder'})
+
+    def test_timeline_is_refused_to_other_users(self):
+        self.client.force_authenticate(user=self.outsider)
+        response = self.client.get(f'/api/audit/timeline/dossier/{self.dossier.pk}/')
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(
+            f'/api/audit/timeline/?content_type=documents.folder&object_id={self.folder.pk}'
+        )
+        self.assertEqual(response.status_code, 403)
+        # Le reste du journal reste réservé aux administrateurs
+        self.assertEqual(self.client.get('/api/audit/').status_code, 403)
+
+
+class AuditRollupTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='securite', password='testpass123', role='AVOCAT', is_staff=True,
+            professional_id='AUD/2026/006'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE', first_name='Rose', last_name='Obame', phone_primary='+24177000035',
+        )
+        request = RequestFactory().get('/api/auth/login/', REMOTE_ADDR='10.0.0.7')
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(3):
+                log_action(user=None, obj=self.client_obj, action_type='LOGIN_FAILED', request=request)
+            log_bulk_action(self.admin, [self.client_obj] * 2, 'DOWNLOAD')
+
+    def _snapshot(self):
+        rows = list(
+            AuditRollup.objects.values_list('granularity', 'bucket', 'user_id', 'action_type', 'content_type', 'count')
+        ) + list(
+            AuditIpRollup.objects.values_list('granularity', 'bucket', 'ip_address', 'action_type', 'count')
+        )
+        return sorted(rows, key=str)
+
+    def test_rollups_follow_writes_and_match_rebuild(self):
+        for granularity in ('hour', 'day'):
+            rollup = AuditRollup.objects.get(
+                granularity=granularity, user_id=self.admin.pk, action_type='DOWNLOAD'
+            )
+            self.assertEqual(rollup.count, 2)
+            self.assertEqual(
+                AuditIpRollup.objects.get(granularity=granularity, ip_address='10.0.0.7').count, 3
+            )
+        incremental = self._snapshot()
+        AuditRollup.objects.all().delete()
+        AuditIpRollup.objects.all().delete()
+        call_command('rebuild_audit_rollups', stdout=io.StringIO())
+        self.assertEqual(self._snapshot(), incremental)
+
+    def test_rollup_endpoints(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/audit/rollups/?granularity=hour&group_by=action_type')
+        self.assertEqual(response.status_code, 200)
+        counts = {row['action_type']: row['count'] for row in response.data['results']}
+        self.assertEqual(counts['LOGIN_FAILED'], 3)
+        self.assertEqual(counts['DOWNLOAD'], 2)
+
+        response = self.client.get('/api/audit/rollups/ip/?action_type=LOGIN_FAILED&min_count=3')
+        self.assertEqual(
+            [(row['ip_address'], row['count']) for row in response.data['results']], [('10.0.0.7', 3)]
+        )
+        response = self.client.get('/api/audit/rollups/ip/?action_type=LOGIN_FAILED&min_count=4')
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(self.client.get('/api/audit/rollups/?group_by=ip').status_code, 400)
+
+
+class AnomalyDetectorTest(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_user(
+            username='vigie', password='testpass123', role='AVOCAT', is_staff=True,
+            professional_id='AUD/2026/007'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE', first_name='Marc', last_name='Nze', phone_primary='+24177000036',
+        )
+        self.start = datetime(2026, 3, 2, 9, 0, tzinfo=dt_timezone.utc)
+
+    def _entries(self, count, offset_seconds=0, action_type='DOWNLOAD'):
+        return [
+            AuditLog(
+                user_id=self.admin.pk, object_id=self.client_obj.pk, action_type=action_type,
+                timestamp=self.start + timedelta(seconds=offset_seconds + index),
+            )
+            for index in range(count)
+        ]
+
+    def test_threshold_alerts_once_per_window(self):
+        rule = anomalies.Rule('burst', frozenset({'DOWNLOAD'}), 'user', window=600, threshold=3)
+        detector = anomalies.Detector(rules=[rule], store=anomalies.MemoryStore())
+        alerts = detector.observe(self._entries(5))
+        self.assertEqual(len(alerts), 1)
+        self.assertEqual(alerts[0].action_type, 'ANOMALY')
+        self.assertEqual(alerts[0].changes['count'], 3)
+        # Autres actions ignorées ; nouvelle fenêtre : le compteur glissant garde la précédente
+        self.assertEqual(detector.observe(self._entries(5, action_type='READ')), [])
+        self.assertEqual(len(detector.observe(self._entries(1, offset_seconds=610))), 1)
+
+    def test_baseline_spike(self):
+        rule = anomalies.Rule(
+            'spike', frozenset({'DOWNLOAD'}), 'user', window=60, threshold=1000, factor=3, min_count=5
+        )
+        detector = anomalies.Detector(rules=[rule], store=anomalies.MemoryStore())
+        for minute in range(5):
+            self.assertEqual(detector.observe(self._entries(2, offset_seconds=minute * 60)), [])
+        alerts = detector.observe(self._entries(8, offset_seconds=5 * 60 + 30))
+        self.assertEqual(len(alerts), 1)
+        self.assertAlmostEqual(alerts[0].changes['baseline'], 2, places=0)
+
+    @override_settings(AUDIT_ANOMALY_RULES={'mass_download': {'threshold': 3}})
+    def test_alerts_are_logged_and_listed(self):
+        with mock.patch.object(anomalies, '_detector', None):
+            with self.captureOnCommitCallbacks(execute=True):
+                log_bulk_action(self.admin, [self.client_obj] * 3, 'DOWNLOAD')
+        alert = AuditLog.objects.get(action_type='ANOMALY')
+        self.assertEqual(alert.changes['rule'], 'mass_download')
+        self.assertEqual(alert.user, self.admin)
+
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get('/api/audit/alerts/?rule=mass_download')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['id'] for entry in response.data['results']], [str(alert.pk)])
+
+    @override_settings(AUDIT_ANOMALY_RULES={
+        'login_failed_burst': {'threshold': 3}, 'permission_denied_burst': {'threshold': 3},
+    })
+    def test_login_failures_and_denials_drive_alerts(self):
+        lawyer = User.objects.create_user(
+            username='stagiaire', password='testpass123', role='AVOCAT', professional_id='AUD/2026/008'
+        )
+        queued = audit_writer.AuditWriter(autostart=False)
+        with mock.patch.object(anomalies, '_detector', None), mock.patch.object(audit_writer, 'writer', queued):
+            for _ in range(3):
+                response = self.client.post(
+                    '/api/token/', {'username': 'vigie', 'password': 'faux'}, REMOTE_ADDR='10.0.0.66'
+                )
+                self.assertEqual(response.status_code, 401)
+            self.client.force_authenticate(user=lawyer)
+            for _ in range(3):
+                self.assertEqual(self.client.get('/api/audit/alerts/').status_code, 403)
+            # Hors de la transaction annulée de chaque requête
+            self.assertFalse(AuditLog.objects.filter(action_type__in=['LOGIN_FAILED', 'PERMISSION_DENIED']).exists())
+            with self.captureOnCommitCallbacks(execute=True):
+                queued.flush()
+
+        failed = AuditLog.objects.filter(action_type='LOGIN_FAILED')
+        self.assertEqual({(entry.object_id, entry.ip_address) for entry in failed}, {(self.admin.pk, '10.0.0.66')})
+        # Identifiant inconnu (mot de passe saisi par erreur) : jamais en clair
+        self.client.force_authenticate(user=None)
+        with mock.patch.object(audit_writer, 'writer', queued):
+            self.client.post('/api/token/', {'username': 'S3cret!pass', 'password': 'x'})
+            queued.flush()
+        unknown = AuditLog.objects.filter(action_type='LOGIN_FAILED').exclude(object_id=self.admin.pk).get()
+        self.assertNotIn('S3cret', unknown.description + unknown.object_repr)
+        self.assertIn('compte inconnu (inconnu-', unknown.description)
+        self.assertEqual(AuditLog.objects.filter(action_type='PERMISSION_DENIED', user=lawyer).count(), 3)
+        rules = set(AuditLog.objects.filter(action_type='ANOMALY').values_list('changes__rule', flat=True))
+        self.assertEqual(rules, {'login_failed_burst', 'permission_denied_burst'})
+
@@ -4,6 +4,7 @@ Utilitaires d'audit et middleware pour traçabilité automatique.
 from typing import Optional, Dict, Any
 from django.utils.deprecation import MiddlewareMixin
 from .models import AuditLog
+from . import writer
 
 
 def log_action(user, obj, action_type: str, description: str = "",
@@ -20,15 +21,102 @@ def log_action(user, obj, action_type: str, description: str = "",
             action_type='CREATE',
             description='Upload du document contrat.pdf'
         )
+    
+    L'écriture suit settings.AUDIT_WRITE_MODE (voir writer.py) : l'entrée
+    retournée n'est pas forcément encore en base.
     """
-    return AuditLog.log_action(
+    return writer.write(AuditLog.build_entry(
         user=user,
         obj=obj,
         action_type=action_type,
         description=description,
         changes=changes,
         request=request
-    )
+    ))
+
+
+def log_bulk_action(user, objects, action_type: str, description: str = "",
+                    changes: Optional[Dict] = None, request=None):
+    """
+    Crée une entrée d'audit par objet en une seule insertion (opérations en masse).
+    
+    Usage:
+        log_bulk_action(
+            user=request.user,
+            objects=dossiers,
+            action_type='ASSIGN_USER',
+            description='Affectation de 8 collaborateurs'
+        )
+    """
+    entries = [
+        AuditLog.build_entry(
+            user=user,
+            obj=obj,
+            action_type=action_type,
+            description=description,
+            changes=changes,
+            request=request
+        )
+        for obj in objects
+    ]
+    return writer.write_many(entries)
+
+
+def _account(username: str):
+    """Compte visé par un identifiant ; instance non sauvegardée si aucun compte ne correspond"""
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    account = User.objects.filter(**{User.USERNAME_FIELD: username}).first() if username else None
+    return account or User(**{User.USERNAME_FIELD: username[:150]})
+
+
+def _pseudonym(identifier: str) -> str:
+    """
+    Empreinte courte et à clé d'un identifiant inconnu : un mot de passe saisi
+    dans le champ identifiant ne doit pas apparaître au journal (ni être
+    retrouvable par dictionnaire), les tentatives restent regroupables.
+    """
+    import hashlib
+    import hmac
+    from django.conf import settings
+
+    return hmac.new(settings.SECRET_KEY.encode(), identifier.encode(), hashlib.sha256).hexdigest()[:12]
+
+
+def log_login_failed(credentials: Dict[str, Any], request=None):
+    """Échec d'authentification (signal user_login_failed), rattaché au compte visé"""
+    from django.contrib.auth import get_user_model
+
+    User = get_user_model()
+    username = str((credentials or {}).get(User.USERNAME_FIELD) or '')
+    account = _account(username)
+    if account._state.adding:
+        label = f"inconnu-{_pseudonym(username)}"
+        account = User(**{User.USERNAME_FIELD: label})
+        description = f"Échec de connexion : compte inconnu ({label})"
+    else:
+        description = f"Échec de connexion : {username}"
+    return writer.write_detached(AuditLog.build_entry(
+        user=None,
+        obj=account,
+        action_type='LOGIN_FAILED',
+        description=description[:500],
+        request=request
+    ))
+
+
+def log_permission_denied(request, detail: str = ""):
+    """Requête refusée (403), rattachée à l'utilisateur authentifié s'il y en a un"""
+    user = getattr(request, 'user', None)
+    authenticated = bool(user and user.is_authenticated)
+    return writer.write_detached(AuditLog.build_entry(
+        user=user if authenticated else None,
+        obj=user if authenticated else _account(''),
+        action_type='PERMISSION_DENIED',
+        description=f"Accès refusé : {request.method} {request.path} {detail}".strip()[:500],
+        request=request
+    ))
 
 
 class AuditMiddleware(MiddlewareMixin):
@@ -95,7 +183,7 @@ class AuditMiddleware(MiddlewareMixin):
             obj = getattr(request, '_audit_object', None)
             
             if obj:
-                AuditLog.log_action(
+                log_action(
                     user=request.user,
                     obj=obj,
                     action_type=action_type,
@@ -173,8 +261,8 @@ class AuditableMixin:
     
     def perform_update(self, serializer):
         """Override pour auditer les modifications"""
-        # Récupérer les changements
-        old_instance = self.get_object()
+        # Valeurs avant save() (qui modifie serializer.instance en place)
+        old_instance = serializer.instance
         old_data = {
             field: getattr(old_instance, field)
             for field in serializer.validated_data.keys()
@@ -1,14 +1,40 @@
 # backend/apps/audit/views.py
 
+import uuid
+from datetime import datetime, time
+
+from django.contrib.contenttypes.models import ContentType
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from rest_framework import viewsets
-from rest_framework.permissions import IsAdminUser
+from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 from .models import AuditLog
-from .serializers import AuditLogSerializer
+from .serializers import AuditExportSerializer, AuditLogSerializer, AuditTimelineSerializer
+
+
+class TimelinePagination(CursorPagination):
+    """
+    Pagination par curseur (keyset) sur (timestamp, id) décroissants : chaque page
+    est lue directement dans l'index de chronologie, à latence constante quelle
+    que soit la profondeur (pas d'OFFSET ni de COUNT). Les actions qui l'utilisent
+    n'ont pas de filter_backends : l'OrderingFilter imposerait l'ordre du ViewSet.
+    """
+    ordering = ('-timestamp', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 200
+
 
 class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Lecture seule des logs d'audit.
-    Réservé exclusivement aux administrateurs.
+    Réservé aux administrateurs, sauf les chronologies (timeline) ouvertes
+    au responsable du dossier concerné.
     """
     queryset = AuditLog.objects.all().select_related('user')
     serializer_class = AuditLogSerializer
@@ -17,4 +43,260 @@ class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
     # Optionnel : filtrage par date, utilisateur, action, etc.
     filterset_fields = ['action_type', 'user', 'timestamp']
     ordering_fields = ['timestamp']
-    ordering = ['-timestamp']
\ No newline at end of file
+    ordering = ['-timestamp']
+
+    def get_queryset(self):
+        """?since= / ?until= (date ou date-heure ISO) : période bornée, lue sur les seules partitions concernées"""
+        return super().get_queryset().between(
+            self._moment(self.request.query_params.get('since')),
+            self._moment(self.request.query_params.get('until')),
+        )
+
+    @staticmethod
+    def _moment(value):
+        if not value:
+            return None
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValidationError({'date': f"Date invalide : {value}"})
+            moment = datetime.combine(day, time.min)
+        return timezone.make_aware(moment) if timezone.is_naive(moment) else moment
+
+    @action(
+        detail=False, methods=['get'], url_path='timeline',
+        permission_classes=[IsAuthenticated], pagination_class=TimelinePagination, filter_backends=[]
+    )
+    def object_timeline(self, request):
+        """
+        Chronologie d'un objet : GET /audit/timeline/?content_type=documents.document&object_id=<uuid>
+        Accessible aux administrateurs et au responsable du dossier de rattachement
+        (objets sans dossier : administrateurs seulement). ?since= / ?until= / ?limit= / ?cursor=
+        """
+        content_type = self._content_type(request.query_params.get('content_type', ''))
+        object_id = self._uuid(request.query_params.get('object_id'), 'object_id')
+
+        queryset = self.get_queryset().filter(content_type=content_type, object_id=object_id)
+        # Dossier de rattachement lu sur l'entrée la plus récente : vaut aussi pour un objet supprimé
+        dossier_id = queryset.order_by('-timestamp', '-id').values_list('dossier_id', flat=True).first()
+        self._check_timeline_access(request.user, dossier_id)
+        return self._timeline(queryset)
+
+    @action(
+        detail=False, methods=['get'], url_path=r'timeline/dossier/(?P<dossier_id>[^/.]+)',
+        permission_classes=[IsAuthenticated], pagination_class=TimelinePagination, filter_backends=[]
+    )
+    def dossier_timeline(self, request, dossier_id=None):
+        """
+        Chronologie d'un dossier et de ses objets rattachés : GET /audit/timeline/dossier/<uuid>/
+        Accessible aux administrateurs et au responsable du dossier.
+        """
+        dossier_id = self._uuid(dossier_id, 'dossier')
+        self._check_timeline_access(request.user, dossier_id)
+        return self._timeline(self.get_queryset().for_dossier(dossier_id))
+
+    def _timeline(self, queryset):
+        page = self.paginate_queryset(queryset)
+        serializer = AuditTimelineSerializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @staticmethod
+    def _check_timeline_access(user, dossier_id):
+        from apps.dossiers.access import has_global_access
+        from apps.dossiers.models import Dossier
+
+        if has_global_access(user):
+            return
+        if dossier_id and Dossier.objects.filter(pk=dossier_id, responsible=user).exists():
+            return
+        raise PermissionDenied("Chronologie réservée aux administrateurs et au responsable du dossier")
+
+    @staticmethod
+    def _content_type(label):
+        """Type d'objet au format app_label.model"""
+        try:
+            app_label, model = label.lower().split('.')
+            return ContentType.objects.get_by_natural_key(app_label, model)
+        except (ValueError, ContentType.DoesNotExist):
+            raise ValidationError({'content_type': f"Type d'objet inconnu : {label}"})
+
+    @staticmethod
+    def _uuid(value, field):
+        try:
+            return uuid.UUID(str(value))
+        except ValueError:
+            raise ValidationError({field: f"Identifiant invalide : {value}"})
+
+    @action(detail=False, methods=['get'], url_path='rollups', pagination_class=None, filter_backends=[])
+    def rollups(self, request):
+        """
+        Agrégats pour tableaux de bord : GET /audit/rollups/
+        ?granularity=hour|day (défaut day), since / until, user, action_type (répétable),
+        content_type=app.model, group_by=user,action_type,content_type (défaut : les trois)
+        """
+        from . import rollups
+        from .models import AuditRollup
+
+        granularity = self._granularity(request, rollups.DAY)
+        dimensions = {'user': 'user_id', 'action_type': 'action_type', 'content_type': 'content_type_id'}
+        group_by = [
+            name.strip() for name in request.query_params.get('group_by', ','.join(dimensions)).split(',')
+            if name.strip()
+        ]
+        unknown = set(group_by) - set(dimensions)
+        if unknown:
+            raise ValidationError({'group_by': f"Dimensions inconnues : {', '.join(sorted(unknown))}"})
+
+        queryset = AuditRollup.objects.filter(granularity=granularity)
+        params = request.query_params
+        if params.get('user'):
+            queryset = queryset.filter(user_id=self._uuid(params['user'], 'user'))
+        if params.getlist('action_type'):
+            queryset = queryset.filter(action_type__in=params.getlist('action_type'))
+        if params.get('content_type'):
+            queryset = queryset.filter(content_type=self._content_type(params['content_type']))
+
+        rows = rollups.summarize(
+            queryset, [dimensions[name] for name in group_by],
+            since=self._moment(params.get('since')) or rollups.default_since(granularity),
+            until=self._moment(params.get('until')),
+        )
+        results = []
+        for row in rows:
+            item = {'bucket': row['bucket']}
+            for name in group_by:
+                value = row[dimensions[name]]
+                if name == 'content_type':
+                    content_type = ContentType.objects.get_for_id(value)
+                    value = f"{content_type.app_label}.{content_type.model}"
+                item[name] = value
+            item['count'] = row['total']
+            results.append(item)
+        return Response({'granularity': granularity, 'results': results})
+
+    @action(detail=False, methods=['get'], url_path='rollups/ip', pagination_class=None, filter_backends=[])
+    def ip_rollups(self, request):
+        """
+        Comptes par adresse IP : GET /audit/rollups/ip/?action_type=LOGIN_FAILED&granularity=hour&min_count=5
+        ?granularity=hour|day (défaut hour), since / until, action_type (répétable), min_count
+        """
+        from . import rollups
+        from .models import AuditIpRollup
+
+        granularity = self._granularity(request, rollups.HOUR)
+        params = request.query_params
+        queryset = AuditIpRollup.objects.filter(granularity=granularity)
+        if params.getlist('action_type'):
+            queryset = queryset.filter(action_type__in=params.getlist('action_type'))
+
+        rows = rollups.summarize(
+            queryset, ['ip_address', 'action_type'],
+            since=self._moment(params.get('since')) or rollups.default_since(granularity),
+            until=self._moment(params.get('until')),
+        )
+        try:
+            min_count = int(params.get('min_count', 1))
+        except ValueError:
+            raise ValidationError({'min_count': "Entier attendu"})
+        if min_count > 1:
+            rows = rows.filter(total__gte=min_count)
+        results = [
+            {'bucket': row['bucket'], 'ip_address': row['ip_address'],
+             'action_type': row['action_type'], 'count': row['total']}
+            for row in rows
+        ]
+        return Response({'granularity': granularity, 'results': results})
+
+    @staticmethod
+    def _granularity(request, default):
+        from .rollups import GRANULARITIES
+
+        granularity = request.query_params.get('granularity', default)
+        if granularity not in GRANULARITIES:
+            raise ValidationError({'granularity': f"Valeurs possibles : {', '.join(GRANULARITIES)}"})
+        return granularity
+
+    @action(detail=False, methods=['get'], url_path='alerts', pagination_class=TimelinePagination, filter_backends=[])
+    def alerts(self, request):
+        """
+        Fil des alertes du détecteur d'anomalies (entrées ANOMALY), plus récentes d'abord.
+        ?since= / ?until= / ?rule= / ?limit= / ?cursor=
+        """
+        from .anomalies import ALERT_ACTION
+
+        queryset = self.get_queryset().filter(action_type=ALERT_ACTION)
+        if request.query_params.get('rule'):
+            queryset = queryset.filter(changes__rule=request.query_params['rule'])
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'], url_path='writer-metrics')
+    def writer_metrics(self, request):
+        """État de l'écriture différée : mode, profondeur de file, entrées abandonnées"""
+        from .writer import writer
+
+        return Response(writer.metrics())
+
+    @action(detail=False, methods=['post'], url_path='export')
+    def export(self, request):
+        """
+        Export en flux (CSV ou JSONL) pour le barreau, l'autorité de protection
+        des données ou un auditeur. POST /audit/export/
+
+        Body :
+        - dossier / client (UUID) : entrées de l'objet et des objets rattachés
+        - user (UUID), action_types (liste), since / until (date-heure ISO)
+        - format : 'csv' (défaut) ou 'jsonl'
+        - sign (bool, défaut vrai) : ligne finale HMAC-SHA256
+        - passphrase : chiffrement (Fernet, clé dérivée de la phrase secrète)
+
+        L'export est lui-même journalisé (filtres, sans la phrase secrète).
+        """
+        from . import export as audit_export
+        from .utils import log_action
+
+        serializer = AuditExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        passphrase = params.pop('passphrase', None)
+
+        queryset = audit_export.build_queryset(
+            dossier=params.get('dossier'),
+            client=params.get('client'),
+            user=params.get('user'),
+            action_types=params.get('action_types'),
+            since=params.get('since'),
+            until=params.get('until'),
+        )
+
+        log_action(
+            user=request.user,
+            obj=self._export_subject(params) or request.user,
+            action_type='READ',
+            description="Export du journal d'audit",
+            changes={
+                key: [str(item) for item in value] if isinstance(value, list) else str(value)
+                for key, value in params.items()
+            } | {'encrypted': bool(passphrase)},
+            request=request
+        )
+
+        fmt = params['format']
+        response = StreamingHttpResponse(
+            audit_export.stream(queryset, fmt, sign=params['sign'], passphrase=passphrase),
+            content_type='application/octet-stream' if passphrase else audit_export.CONTENT_TYPES[fmt]
+        )
+        response['Content-Disposition'] = f'attachment; filename="{audit_export.filename(fmt, passphrase)}"'
+        return response
+
+    @staticmethod
+    def _export_subject(params):
+        """Objet de l'entrée d'audit de l'export : le dossier ou le client visé"""
+        if params.get('dossier'):
+            from apps.dossiers.models import Dossier
+            return Dossier.objects.filter(pk=params['dossier']).first()
+        if params.get('client'):
+            from apps.clients.models import Client
+            return Client.objects.filter(pk=params['client']).first()
+        return None
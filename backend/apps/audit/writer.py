@@ -0,0 +1,228 @@
+"""
+Écriture différée du journal d'audit.
+
+L'entrée est construite (et anonymisée) dans le thread de la requête, puis
+confiée à un writer selon settings.AUDIT_WRITE_MODE :
+
+- 'strict'    : INSERT immédiat dans la transaction de la requête (annulé avec elle) ;
+                seule la tête de la chaîne du thread reste verrouillée jusqu'au commit ;
+- 'on_commit' : mise en file au commit de la transaction (rien si elle est annulée),
+                les événements de sécurité étant mis en file immédiatement ;
+- 'async'     : mise en file immédiate.
+
+Un thread d'arrière-plan (un par processus, démarré à la première entrée)
+vide la file par bulk_create (entrées chaînées, voir chain.py), dès qu'un
+lot est complet ou au plus tard toutes les AUDIT_FLUSH_INTERVAL secondes.
+La file est bornée (AUDIT_QUEUE_SIZE) : si elle est pleine, l'entrée est
+abandonnée, journalisée et comptée (voir metrics()). Le reste de la file
+est écrit à l'arrêt du processus.
+"""
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+STRICT = 'strict'
+ON_COMMIT = 'on_commit'
+ASYNC = 'async'
+MODES = (STRICT, ON_COMMIT, ASYNC)
+
+# Conservés même si la transaction de la requête est annulée (mode on_commit)
+SECURITY_ACTIONS = {'LOGIN_FAILED', 'PERMISSION_DENIED', 'INTEGRITY_FAILURE', 'ANOMALY'}
+
+
+def get_mode() -> str:
+    mode = getattr(settings, 'AUDIT_WRITE_MODE', STRICT)
+    return mode if mode in MODES else STRICT
+
+
+class AuditWriter:
+    """File bornée d'entrées d'audit, vidée par lots depuis un thread dédié"""
+
+    def __init__(self, maxsize=10000, batch_size=200, flush_interval=2.0, autostart=True):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        # Sans thread, la file n'est vidée que par flush()
+        self.autostart = autostart
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stats = {
+            'enqueued': 0,
+            'written': 0,
+            'dropped': 0,
+            'failed': 0,
+            'flushes': 0,
+            'last_flush_at': None,
+        }
+
+    # ─── Production ────────────────────────────────────────────────────────
+
+    def submit(self, entry) -> bool:
+        """Met une entrée en file ; False si la file est pleine (entrée abandonnée)"""
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(entry)
+        except queue.Full:
+            self._count('dropped')
+            logger.error(
+                "File d'audit pleine (%s entrées) : entrée abandonnée (%s %s)",
+                self.queue.maxsize, entry.action_type, entry.object_repr,
+            )
+            return False
+        self._count('enqueued')
+        return True
+
+    # ─── Consommation ──────────────────────────────────────────────────────
+
+    def _ensure_thread(self):
+        if not self.autostart:
+            return
+        # Après un fork (workers gunicorn), le thread du parent n'existe plus
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch:
+                # Connexion propre au thread : fermée si obsolète (CONN_MAX_AGE), comme après une requête
+                close_old_connections()
+                self._write(batch)
+                close_old_connections()
+
+    def _collect(self):
+        """Attend un lot complet ou la fin de l'intervalle de vidage"""
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                return batch
+
+    def _write(self, batch):
+        from .chain import insert
+
+        try:
+            insert(batch)
+            self._count('written', len(batch))
+        except Exception:
+            # Une entrée invalide (utilisateur supprimé entre-temps...) ne doit pas perdre le lot
+            logger.exception("Échec de l'écriture groupée de %s entrées d'audit", len(batch))
+            for entry in batch:
+                try:
+                    insert([entry])
+                    self._count('written')
+                except Exception:
+                    self._count('failed')
+                    logger.error("Entrée d'audit perdue : %s %s", entry.action_type, entry.object_repr)
+        with self._lock:
+            self._stats['flushes'] += 1
+            self._stats['last_flush_at'] = time.time()
+
+    def flush(self) -> int:
+        """Écrit immédiatement les entrées en attente (arrêt, tests, commandes)"""
+        written = 0
+        while True:
+            batch = self._drain()
+            if not batch:
+                return written
+            for start in range(0, len(batch), self.batch_size):
+                self._write(batch[start:start + self.batch_size])
+            written += len(batch)
+
+    # ─── Métriques ─────────────────────────────────────────────────────────
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def metrics(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'mode': get_mode(),
+            'queue_depth': self.queue.qsize(),
+            'queue_max': self.queue.maxsize,
+            'worker_alive': bool(self._thread and self._thread.is_alive() and self._pid == os.getpid()),
+        })
+        return stats
+
+
+writer = AuditWriter(
+    maxsize=getattr(settings, 'AUDIT_QUEUE_SIZE', 10000),
+    batch_size=getattr(settings, 'AUDIT_BATCH_SIZE', 200),
+    flush_interval=getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2.0),
+)
+
+atexit.register(writer.flush)
+
+
+def write(entry):
+    """Enregistre une entrée d'audit construite par AuditLog.build_entry selon le mode configuré"""
+    mode = get_mode()
+    if mode == STRICT:
+        entry.save()
+    elif mode == ON_COMMIT and entry.action_type not in SECURITY_ACTIONS:
+        transaction.on_commit(lambda: writer.submit(entry))
+    else:
+        writer.submit(entry)
+    return entry
+
+
+def write_detached(entry):
+    """
+    Événement de sécurité d'une requête dont la transaction sera annulée (refus
+    d'accès, échec de connexion : ATOMIC_REQUESTS et set_rollback de DRF). En
+    mode strict, mis en file plutôt qu'inséré dans cette transaction.
+    """
+    if get_mode() == STRICT and transaction.get_connection().in_atomic_block:
+        writer.submit(entry)
+        return entry
+    return write(entry)
+
+
+def write_many(entries):
+    """Équivalent groupé de write() (log_bulk_action)"""
+    mode = get_mode()
+    if mode == STRICT:
+        from .chain import insert
+
+        return insert(entries)
+
+    def submit_all():
+        for entry in entries:
+            writer.submit(entry)
+
+    if mode == ON_COMMIT:
+        transaction.on_commit(submit_all)
+    else:
+        submit_all()
+    return entries
@@ -25,12 +25,4 @@ class ClientAdmin(admin.ModelAdmin):
         ('RGPD & Suivi', {'fields': ('consent_given', 'consent_date', 'data_source', 'retention_period_years', 'notes', 'is_active')}),
     )
 
-    readonly_fields = ('display_name', 'full_address')
-
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(dossier_count=models.Count('dossiers'))
-
-    def dossier_count(self, obj):
-        return obj.dossier_count
-    dossier_count.short_description = "Nb dossiers"
-    dossier_count.admin_order_field = 'dossier_count'
\ No newline at end of file
+    readonly_fields = ('display_name', 'full_address', 'dossier_count')
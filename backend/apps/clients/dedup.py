@@ -0,0 +1,190 @@
+"""
+Détection des doublons clients par blocage.
+
+Chaque client reçoit quelques clés de blocage (nom phonétique, nom + année de
+naissance, téléphone normalisé, pièce d'identité) stockées dans une table indexée.
+Seuls les clients partageant au moins une clé sont comparés deux à deux, ce qui
+évite la comparaison quadratique de toute la base.
+"""
+import re
+from collections import defaultdict
+from itertools import combinations
+
+from apps.core.utils import normalize_phone, normalize_search_text, trigrams
+
+
+# Formes juridiques ignorées dans les raisons sociales
+COMPANY_STOPWORDS = {
+    'sa', 'sarl', 'sas', 'sasu', 'suarl', 'gie', 'ets', 'etablissements', 'ste',
+    'societe', 'cie', 'compagnie', 'groupe', 'et', 'de', 'des', 'du', 'la', 'le', 'les',
+}
+
+# Chiffres conservés pour comparer les téléphones (sans indicatif pays)
+PHONE_KEY_DIGITS = 8
+
+# Au-delà, un bloc est trop peu discriminant (ex: nom très répandu) et ignoré
+MAX_BLOCK_SIZE = 50
+
+DEFAULT_MIN_SCORE = 60
+
+
+def phonetic_key(word: str) -> str:
+    """
+    Clé phonétique simplifiée adaptée aux noms francophones et gabonais :
+    "N'Dong" / "Ndong", "Nguéma" / "Nguema", "Essono" / "Esono" donnent la même clé.
+    """
+    word = re.sub(r'[^a-z]', '', normalize_search_text(word))
+    if not word:
+        return ''
+
+    for pattern, replacement in (
+        (r'ph', 'f'), (r'qu', 'k'), (r'q', 'k'), (r'ck', 'k'),
+        (r'c(?=[eiy])', 's'), (r'c', 'k'), (r'g(?=[eiy])', 'j'),
+        (r'gu(?=[eiy])', 'g'), (r'z', 's'), (r'w', 'v'), (r'y', 'i'), (r'h', ''),
+    ):
+        word = re.sub(pattern, replacement, word)
+
+    # Lettres doublées puis voyelles (hors initiale)
+    word = re.sub(r'(.)\1+', r'\1', word)
+    key = word[0] + re.sub(r'[aeiou]', '', word[1:])
+    return key[:6]
+
+
+def name_tokens(client) -> list:
+    """Mots significatifs du nom (personne physique) ou de la raison sociale"""
+    if getattr(client, 'client_type', None) == 'MORALE':
+        words = normalize_search_text(client.company_name).split()
+        return [word for word in words if word not in COMPANY_STOPWORDS]
+    return normalize_search_text(f"{client.first_name} {client.last_name}").split()
+
+
+def name_key(client) -> str:
+    """Clé de nom indépendante de l'ordre prénom/nom"""
+    return '-'.join(sorted(filter(None, (phonetic_key(word) for word in name_tokens(client)))))
+
+
+def phone_keys(client) -> set:
+    keys = set()
+    for value in (client.phone_primary, client.phone_secondary):
+        digits = normalize_phone(value)
+        if len(digits) >= PHONE_KEY_DIGITS:
+            keys.add(digits[-PHONE_KEY_DIGITS:])
+    return keys
+
+
+def blocking_keys(client) -> set:
+    """Ensemble des couples (type, clé) d'un client"""
+    keys = set()
+    name = name_key(client)
+    if name:
+        keys.add(('NAME', name))
+        if client.date_of_birth:
+            keys.add(('NAME_YEAR', f"{name}:{client.date_of_birth.year}"))
+    keys.update(('PHONE', phone) for phone in phone_keys(client))
+    ni_number = id_key(client)
+    if ni_number:
+        keys.add(('ID', ni_number))
+    return keys
+
+
+def id_key(client) -> str:
+    """N° de pièce d'identité sans séparateurs"""
+    return normalize_search_text(client.ni_number).replace(' ', '')
+
+
+def similarity_score(a, b) -> tuple:
+    """
+    Score de 0 à 100 et motifs, pour deux clients d'un même bloc.
+    Nom (similarité trigramme) pondéré à 50, le reste en indices concordants.
+    """
+    reasons = []
+    grams_a = trigrams(' '.join(name_tokens(a)))
+    grams_b = trigrams(' '.join(name_tokens(b)))
+    name_similarity = len(grams_a & grams_b) / len(grams_a | grams_b) if grams_a and grams_b else 0.0
+    score = 50 * name_similarity
+    if name_similarity >= 0.5:
+        reasons.append(f"nom similaire ({name_similarity:.0%})")
+
+    if a.date_of_birth and b.date_of_birth:
+        if a.date_of_birth == b.date_of_birth:
+            score += 25
+            reasons.append("même date de naissance")
+        elif a.date_of_birth.year == b.date_of_birth.year:
+            score += 10
+            reasons.append("même année de naissance")
+        else:
+            score -= 20
+
+    if phone_keys(a) & phone_keys(b):
+        score += 25
+        reasons.append("téléphone commun")
+
+    if a.email and b.email and a.email.strip().lower() == b.email.strip().lower():
+        score += 15
+        reasons.append("même email")
+
+    if id_key(a) and id_key(a) == id_key(b):
+        score += 30
+        reasons.append("même pièce d'identité")
+
+    return max(0, min(100, round(score))), reasons
+
+
+def find_duplicates(client=None, min_score=DEFAULT_MIN_SCORE, limit=200):
+    """
+    Paires de doublons probables, triées par score décroissant.
+
+    Args:
+        client: Limiter aux paires impliquant ce client
+        min_score: Score minimal retenu
+        limit: Nombre maximal de paires retournées
+
+    Returns:
+        Liste de dicts {'client_a', 'client_b', 'score', 'reasons'}
+    """
+    from django.db.models import Count
+    from .models import Client, ClientBlockingKey
+
+    entries = ClientBlockingKey.objects.filter(client__is_active=True)
+    if client is not None:
+        own_keys = set(ClientBlockingKey.objects.filter(client=client).values_list('key', flat=True))
+        if not own_keys:
+            return []
+        entries = entries.filter(key__in=own_keys)
+    else:
+        shared_keys = (
+            ClientBlockingKey.objects.filter(client__is_active=True)
+            .values('kind', 'key')
+            .annotate(size=Count('client'))
+            .filter(size__gt=1, size__lte=MAX_BLOCK_SIZE)
+            .values('key')
+        )
+        entries = entries.filter(key__in=shared_keys)
+
+    blocks = defaultdict(set)
+    for kind, key, client_id in entries.values_list('kind', 'key', 'client_id').iterator():
+        blocks[(kind, key)].add(client_id)
+
+    pairs = set()
+    for members in blocks.values():
+        if 1 < len(members) <= MAX_BLOCK_SIZE:
+            pairs.update(combinations(sorted(members, key=str), 2))
+    if client is not None:
+        pairs = {pair for pair in pairs if client.pk in pair}
+    if not pairs:
+        return []
+
+    clients = Client.objects.in_bulk({pk for pair in pairs for pk in pair})
+    results = []
+    for id_a, id_b in pairs:
+        score, reasons = similarity_score(clients[id_a], clients[id_b])
+        if score >= min_score:
+            results.append({
+                'client_a': clients[id_a],
+                'client_b': clients[id_b],
+                'score': score,
+                'reasons': reasons,
+            })
+
+    results.sort(key=lambda item: -item['score'])
+    return results[:limit]
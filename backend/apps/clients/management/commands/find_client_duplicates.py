@@ -0,0 +1,47 @@
+# backend/apps/clients/management/commands/find_client_duplicates.py
+
+from django.core.management.base import BaseCommand
+
+from apps.clients.dedup import DEFAULT_MIN_SCORE, find_duplicates
+from apps.clients.models import Client, ClientBlockingKey
+
+
+class Command(BaseCommand):
+    help = "Liste les clients probablement en doublon (comparaison limitée aux blocs de clés communes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-score',
+            type=int,
+            default=DEFAULT_MIN_SCORE,
+            help=f'Score minimal de 0 à 100 (défaut: {DEFAULT_MIN_SCORE})'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=200,
+            help='Nombre maximal de paires affichées (défaut: 200)'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Recalcule au préalable les clés de blocage de tous les clients'
+        )
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            total = 0
+            for client in Client.objects.all().iterator(chunk_size=500):
+                ClientBlockingKey.objects.refresh(client)
+                total += 1
+            self.stdout.write(f"  {total} client(s) réindexé(s)")
+
+        candidates = find_duplicates(min_score=options['min_score'], limit=options['limit'])
+        for candidate in candidates:
+            self.stdout.write(
+                f"  {candidate['score']:>3}  {candidate['client_a'].display_name} ({candidate['client_a'].pk})"
+                f"  ⇄  {candidate['client_b'].display_name} ({candidate['client_b'].pk})"
+                f"  — {', '.join(candidate['reasons'])}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(f"✅ {len(candidates)} doublon(s) probable(s) trouvé(s)"))
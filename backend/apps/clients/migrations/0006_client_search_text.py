@@ -0,0 +1,75 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_search_text(apps, schema_editor):
+    """Calcule search_text (et l'index de repli hors PostgreSQL) des clients existants"""
+    from apps.clients.models import build_search_text
+    from apps.core.utils import trigrams
+
+    Client = apps.get_model('clients', 'Client')
+    ClientSearchTrigram = apps.get_model('clients', 'ClientSearchTrigram')
+    use_fallback = schema_editor.connection.vendor != 'postgresql'
+
+    for client in Client.objects.all().iterator(chunk_size=500):
+        search_text = build_search_text(client)
+        Client.objects.filter(pk=client.pk).update(search_text=search_text)
+        if use_fallback:
+            ClientSearchTrigram.objects.bulk_create(
+                [ClientSearchTrigram(client_id=client.pk, trigram=gram) for gram in trigrams(search_text)],
+                ignore_conflicts=True
+            )
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS client_search_text_trgm_idx '
+        'ON clients_client USING gin (search_text gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS client_search_text_trgm_idx')
+
+
+class Migration(migrations.Migration):
+    """
+    Colonne de recherche normalisée + index trigramme.
+    PostgreSQL : extension pg_trgm et index GIN (gin_trgm_ops).
+    Autres moteurs : table ClientSearchTrigram (index inversé équivalent).
+    """
+
+    dependencies = [
+        ('clients', '0005_remove_client_unique_ni_per_individual_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False, verbose_name='Texte de recherche'),
+        ),
+        migrations.CreateModel(
+            name='ClientSearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_trigrams', to='clients.client')),
+            ],
+            options={
+                'verbose_name': 'Trigramme de recherche client',
+                'verbose_name_plural': 'Trigrammes de recherche client',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='clientsearchtrigram',
+            constraint=models.UniqueConstraint(fields=('trigram', 'client'), name='unique_client_trigram'),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(backfill_search_text, migrations.RunPython.noop),
+    ]
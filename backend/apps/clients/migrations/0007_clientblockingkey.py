@@ -0,0 +1,53 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_blocking_keys(apps, schema_editor):
+    """Calcule les clés de blocage des clients existants"""
+    from apps.clients.dedup import blocking_keys
+
+    Client = apps.get_model('clients', 'Client')
+    ClientBlockingKey = apps.get_model('clients', 'ClientBlockingKey')
+
+    batch = []
+    for client in Client.objects.all().iterator(chunk_size=500):
+        batch.extend(
+            ClientBlockingKey(client_id=client.pk, kind=kind, key=key)
+            for kind, key in blocking_keys(client)
+        )
+        if len(batch) >= 2000:
+            ClientBlockingKey.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    ClientBlockingKey.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0006_client_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientBlockingKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('NAME', 'Nom phonétique'), ('NAME_YEAR', 'Nom phonétique + année de naissance'), ('PHONE', 'Téléphone normalisé'), ('ID', "Pièce d'identité")], max_length=10)),
+                ('key', models.CharField(max_length=100)),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='blocking_keys', to='clients.client')),
+            ],
+            options={
+                'verbose_name': 'Clé de dédoublonnage',
+                'verbose_name_plural': 'Clés de dédoublonnage',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='clientblockingkey',
+            index=models.Index(fields=['key', 'kind'], name='client_blocking_key_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='clientblockingkey',
+            constraint=models.UniqueConstraint(fields=('kind', 'key', 'client'), name='unique_client_blocking_key'),
+        ),
+        migrations.RunPython(backfill_blocking_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Nombre de dossiers dénormalisé (remplace Count('dossiers') sur chaque liste).
+    Valeurs initiales calculées par la migration dossiers 0006.
+    """
+
+    dependencies = [
+        ('clients', '0007_clientblockingkey'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='client',
+            name='dossier_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Nb dossiers'),
+        ),
+    ]
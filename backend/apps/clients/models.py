@@ -1,10 +1,98 @@
+import math
+import re
 import uuid
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator, EmailValidator
-from django.db import models
+from django.db import connection, models
+from django.db.models import Case, Count, FloatField, Q, Value, When
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from apps.core.utils import normalize_phone, normalize_search_text, trigrams
+
+
+# Champs texte repris dans la colonne de recherche normalisée
+SEARCH_TEXT_FIELDS = [
+    'last_name', 'first_name', 'company_name', 'representative_name',
+    'nif', 'rccm', 'ni_number', 'email',
+]
+SEARCH_PHONE_FIELDS = ['phone_primary', 'phone_secondary']
+
+# Champs dont dépendent les clés de blocage (détection des doublons)
+BLOCKING_KEY_FIELDS = [
+    'client_type', 'first_name', 'last_name', 'company_name', 'date_of_birth',
+    'phone_primary', 'phone_secondary', 'ni_number',
+]
+
+# Seuil par défaut de pg_trgm pour l'opérateur <% (word_similarity)
+SEARCH_SIMILARITY_THRESHOLD = 0.6
+
+# Candidats classés au plus par la recherche de repli (hors PostgreSQL)
+SEARCH_MAX_CANDIDATES = 500
+
+
+def build_search_text(client) -> str:
+    """
+    Colonne de recherche : texte sans accents ni casse, téléphones réduits aux chiffres.
+    Fonction libre pour être utilisable depuis les migrations (modèles historiques).
+    """
+    parts = [normalize_search_text(getattr(client, name, '')) for name in SEARCH_TEXT_FIELDS]
+    parts += [normalize_phone(getattr(client, name, '')) for name in SEARCH_PHONE_FIELDS]
+    return ' '.join(part for part in parts if part)
+
+
+def normalize_search_query(query: str) -> str:
+    """Normalise une saisie utilisateur ; un numéro de téléphone est réduit à ses chiffres"""
+    if re.fullmatch(r'[\d\s+().-]+', query or '') and len(normalize_phone(query)) >= 4:
+        return normalize_phone(query)
+    return normalize_search_text(query)
+
+
+class ClientQuerySet(models.QuerySet):
+
+    def fuzzy_search(self, query):
+        """
+        Recherche approchée classée par similarité (annotation `search_rank`, 0 à 1).
+        
+        PostgreSQL : index GIN pg_trgm sur search_text (opérateur <% et LIKE indexé).
+        Autres moteurs : index inversé ClientSearchTrigram, même calcul de trigrammes.
+        """
+        normalized = normalize_search_query(query)
+        if not normalized:
+            return self
+
+        if connection.vendor == 'postgresql':
+            # Import local : psycopg n'est requis qu'en production
+            from django.contrib.postgres.lookups import TrigramWordSimilar
+            from django.contrib.postgres.search import TrigramWordSimilarity
+            return self.filter(
+                Q(TrigramWordSimilar(models.F('search_text'), Value(normalized)))
+                | Q(search_text__contains=normalized)
+            ).annotate(
+                search_rank=TrigramWordSimilarity(normalized, 'search_text')
+            ).order_by('-search_rank')
+
+        grams = trigrams(normalized)
+        needed = max(1, math.ceil(len(grams) * SEARCH_SIMILARITY_THRESHOLD))
+        rows = (
+            ClientSearchTrigram.objects.filter(trigram__in=grams)
+            .values('client_id')
+            .annotate(shared=Count('trigram'))
+            .filter(shared__gte=needed)
+            .order_by('-shared')[:SEARCH_MAX_CANDIDATES]
+        )
+        ranks = {row['client_id']: row['shared'] / len(grams) for row in rows}
+        if not ranks:
+            return self.none()
+
+        return self.filter(pk__in=ranks).annotate(
+            search_rank=Case(
+                *[When(pk=pk, then=Value(rank)) for pk, rank in ranks.items()],
+                default=Value(0.0),
+                output_field=FloatField(),
+            )
+        ).order_by('-search_rank')
+
 
 class Client(models.Model):
     """
@@ -42,13 +130,20 @@ class Client(models.Model):
     ni_number = models.CharField(
         max_length=50,
         blank=True,
+        null=True,
         verbose_name=_("N° pièce d'identité (CNI / Passeport)"),
         help_text=_("Ex. : 123456789 pour CNI gabonaise")
     )
     ni_type = models.CharField(
         max_length=20,
-        choices=[("CNI", "Carte Nationale d'Identité"), ("PASSPORT", "Passeport")],
+        choices=[
+            ("CNI", "Carte Nationale d'Identité"),
+            ("PASSPORT", "Passeport"),
+            ("RESIDENCE_PERMIT", "Permis de séjour"),
+            ("OTHER", "Autre"),
+        ],
         blank=True,
+        null=True,
         verbose_name=_("Type de pièce")
     )
 
@@ -146,6 +241,14 @@ class Client(models.Model):
 
     notes = models.TextField(blank=True, verbose_name=_("Notes internes (confidentielles)"))
 
+    # Compteur dénormalisé (voir apps.dossiers.counters)
+    dossier_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Nb dossiers"))
+
+    # Texte normalisé pour la recherche approchée (index trigramme, voir fuzzy_search)
+    search_text = models.TextField(blank=True, default='', editable=False, verbose_name=_("Texte de recherche"))
+
+    objects = ClientQuerySet.as_manager()
+
     class Meta:
         verbose_name = _("Client")
         verbose_name_plural = _("Clients")
@@ -153,7 +256,7 @@ class Client(models.Model):
         constraints = [
             models.UniqueConstraint(
                 fields=['ni_number', 'ni_type'],
-                condition=models.Q(client_type='PHYSIQUE'),
+                condition=models.Q(client_type='PHYSIQUE', ni_number__isnull=False),
                 name='unique_ni_per_individual'
             )
         ]
@@ -217,6 +320,134 @@ class Client(models.Model):
 
         super().clean()
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_search_text = instance.__dict__.get('search_text')
+        return instance
+
     def save(self, *args, **kwargs):
+        # Pièce non renseignée : NULL, pour ne pas entrer dans la contrainte d'unicité
+        self.ni_number = self.ni_number or None
+        self.ni_type = self.ni_type or None
+        self.search_text = build_search_text(self)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None and not self._state.adding:
+            # Le compteur est tenu par UPDATE relatifs : ne pas l'écraser avec une valeur périmée
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields if not f.primary_key and f.name != 'dossier_count'
+            ]
+        elif update_fields is not None and set(update_fields) & set(SEARCH_TEXT_FIELDS + SEARCH_PHONE_FIELDS):
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
+
         self.full_clean()  # Applique la validation personnalisée
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+        if self.search_text != getattr(self, '_loaded_search_text', None):
+            ClientSearchTrigram.objects.refresh(self)
+            self._loaded_search_text = self.search_text
+
+        if update_fields is None or set(update_fields) & set(BLOCKING_KEY_FIELDS):
+            ClientBlockingKey.objects.refresh(self)
+
+
+class ClientSearchTrigramManager(models.Manager):
+
+    def refresh(self, client):
+        """Réindexe un client (sans effet sous PostgreSQL, servi par l'index GIN)"""
+        if connection.vendor == 'postgresql':
+            return
+        self.filter(client_id=client.pk).delete()
+        self.bulk_create(
+            [self.model(client_id=client.pk, trigram=gram) for gram in trigrams(client.search_text)],
+            ignore_conflicts=True
+        )
+
+    def index_new(self, clients):
+        """Indexe des clients insérés par bulk_create (aucune ligne existante)"""
+        if connection.vendor == 'postgresql':
+            return
+        self.bulk_create(
+            [self.model(client_id=client.pk, trigram=gram) for client in clients for gram in trigrams(client.search_text)],
+            batch_size=2000,
+            ignore_conflicts=True
+        )
+
+
+class ClientSearchTrigram(models.Model):
+    """
+    Index inversé de trigrammes pour les bases sans pg_trgm (SQLite en développement).
+    Reproduit le découpage de pg_trgm afin de classer les résultats de la même façon.
+    """
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='search_trigrams')
+    trigram = models.CharField(max_length=3)
+
+    objects = ClientSearchTrigramManager()
+
+    class Meta:
+        verbose_name = _("Trigramme de recherche client")
+        verbose_name_plural = _("Trigrammes de recherche client")
+        constraints = [
+            models.UniqueConstraint(fields=['trigram', 'client'], name='unique_client_trigram'),
+        ]
+
+
+class ClientBlockingKeyManager(models.Manager):
+
+    def refresh(self, client):
+        """Met à jour les clés d'un client (insertion/suppression des seules différences)"""
+        from .dedup import blocking_keys
+
+        wanted = blocking_keys(client)
+        current = set(self.filter(client_id=client.pk).values_list('kind', 'key'))
+        stale = current - wanted
+        if stale:
+            condition = Q()
+            for kind, key in stale:
+                condition |= Q(kind=kind, key=key)
+            self.filter(condition, client_id=client.pk).delete()
+        if wanted - current:
+            self.bulk_create(
+                [self.model(client_id=client.pk, kind=kind, key=key) for kind, key in wanted - current],
+                ignore_conflicts=True
+            )
+
+    def index_new(self, clients):
+        """Clés des clients insérés par bulk_create (aucune ligne existante)"""
+        from .dedup import blocking_keys
+
+        self.bulk_create(
+            [self.model(client_id=client.pk, kind=kind, key=key) for client in clients for kind, key in blocking_keys(client)],
+            batch_size=2000,
+            ignore_conflicts=True
+        )
+
+
+class ClientBlockingKey(models.Model):
+    """
+    Clé de blocage pour la détection des doublons (voir apps.clients.dedup).
+    Deux clients ne sont comparés que s'ils partagent au moins une clé.
+    """
+
+    class Kind(models.TextChoices):
+        NAME = "NAME", _("Nom phonétique")
+        NAME_YEAR = "NAME_YEAR", _("Nom phonétique + année de naissance")
+        PHONE = "PHONE", _("Téléphone normalisé")
+        ID = "ID", _("Pièce d'identité")
+
+    client = models.ForeignKey(Client, on_delete=models.CASCADE, related_name='blocking_keys')
+    kind = models.CharField(max_length=10, choices=Kind.choices)
+    key = models.CharField(max_length=100)
+
+    objects = ClientBlockingKeyManager()
+
+    class Meta:
+        verbose_name = _("Clé de dédoublonnage")
+        verbose_name_plural = _("Clés de dédoublonnage")
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key', 'client'], name='unique_client_blocking_key'),
+        ]
+        indexes = [
+            models.Index(fields=['key', 'kind'], name='client_blocking_key_idx'),
+        ]
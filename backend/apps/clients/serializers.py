@@ -8,7 +8,7 @@ class ClientListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Client
-        fields = ['id', 'display_name', 'client_type', 'phone_primary', 'email', 'city', 'is_active']
+        fields = ['id', 'display_name', 'client_type', 'phone_primary', 'email', 'city', 'is_active', 'dossier_count']
 
 
 class ClientSerializer(serializers.ModelSerializer):
@@ -26,7 +26,14 @@ class ClientSerializer(serializers.ModelSerializer):
             'email', 'phone_primary', 'phone_secondary',
             'address_line', 'neighborhood', 'city', 'country', 'full_address',
             'data_source', 'consent_given', 'consent_date',
-            'retention_period_years', 'notes', 'is_active',
+            'retention_period_years', 'notes', 'is_active', 'dossier_count',
             'created_at', 'updated_at'
         ]
-        read_only_fields = ['id', 'created_at', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['id', 'dossier_count', 'created_at', 'updated_at']
+
+class DuplicateCandidateSerializer(serializers.Serializer):
+    """Paire de clients probablement en doublon (voir apps.clients.dedup)"""
+    client_a = ClientListSerializer(read_only=True)
+    client_b = ClientListSerializer(read_only=True)
+    score = serializers.IntegerField(read_only=True)
+    reasons = serializers.ListField(child=serializers.CharField(), read_only=True)
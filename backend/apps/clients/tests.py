@@ -0,0 +1,118 @@
+from django.contrib.auth import get_user_model
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from apps.clients.models import Client, ClientBlockingKey, ClientSearchTrigram
+
+User = get_user_model()
+
+
+class ClientFuzzySearchTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='searchuser',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='SRCH/2026/001'
+        )
+        self.ndong = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Éloïse',
+            last_name="N'Dong",
+            phone_primary='+24177000030',
+        )
+        self.obame = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Jean',
+            last_name='Obame',
+            phone_primary='+24166000031',
+        )
+        self.company = Client.objects.create(
+            client_type='MORALE',
+            company_name='Société Gabonaise des Bois',
+            phone_primary='+24101000032',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def search(self, query):
+        response = self.client.get('/api/clients/', {'search': query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results'] if isinstance(response.data, dict) else response.data
+        return [item['id'] for item in results]
+
+    def test_search_text_is_normalized(self):
+        self.assertEqual(self.ndong.search_text, "ndong eloise 24177000030")
+        self.assertTrue(ClientSearchTrigram.objects.filter(client=self.ndong, trigram='ndo').exists())
+
+    def test_accent_and_apostrophe_variants(self):
+        self.assertEqual(self.search('Ndong'), [str(self.ndong.pk)])
+        self.assertEqual(self.search('eloise'), [str(self.ndong.pk)])
+        self.assertEqual(self.search('gabonaise'), [str(self.company.pk)])
+
+    def test_typo_tolerance_and_ranking(self):
+        self.assertEqual(self.search('Obamé')[0], str(self.obame.pk))
+        self.assertEqual(self.search('Obamme'), [str(self.obame.pk)])
+
+    def test_phone_digits(self):
+        self.assertEqual(self.search('+241 66 00 00 31'), [str(self.obame.pk)])
+
+    def test_index_follows_updates(self):
+        self.obame.last_name = 'Mintsa'
+        self.obame.save()
+        self.assertEqual(self.search('Obame'), [])
+        self.assertEqual(self.search('Mintsa'), [str(self.obame.pk)])
+
+
+class ClientDuplicateDetectionTest(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='dedupuser',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='DEDUP/2026/001'
+        )
+        self.original = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Pierre',
+            last_name='Nguema',
+            date_of_birth='1980-05-12',
+            phone_primary='+24177000040',
+        )
+        self.typo = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Piere',
+            last_name='Nguéma',
+            date_of_birth='1980-05-12',
+            phone_primary='077000040',
+        )
+        self.homonym = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Pierre',
+            last_name='Nguema',
+            date_of_birth='1955-01-01',
+            phone_primary='+24166000041',
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_blocking_keys_are_indexed(self):
+        keys = set(ClientBlockingKey.objects.filter(client=self.original).values_list('kind', 'key'))
+        self.assertIn(('PHONE', '77000040'), keys)
+        self.assertIn(('NAME_YEAR', 'ngm-pr:1980'), keys)
+
+    def test_report_scores_typo_pair(self):
+        response = self.client.get('/api/clients/doublons/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pairs = [
+            {item['client_a']['id'], item['client_b']['id']} for item in response.data['results']
+        ]
+        self.assertEqual(pairs, [{str(self.original.pk), str(self.typo.pk)}])
+        self.assertGreaterEqual(response.data['results'][0]['score'], 90)
+
+    def test_keys_refresh_on_save(self):
+        self.typo.phone_primary = '+24162000099'
+        self.typo.save()
+        self.assertFalse(ClientBlockingKey.objects.filter(client=self.typo, key='77000040').exists())
+
+        response = self.client.get(f'/api/clients/{self.original.pk}/doublons/')
+        self.assertEqual(response.data['count'], 1)
+        self.assertLess(response.data['results'][0]['score'], 100)
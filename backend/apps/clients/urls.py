@@ -12,4 +12,6 @@ urlpatterns = [
     # Actions supplémentaires :
     # POST   /clients/<id>/grant-consent/
     # GET    /clients/stats/
+    # GET    /clients/doublons/
+    # GET    /clients/<id>/doublons/
 ]
\ No newline at end of file
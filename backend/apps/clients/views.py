@@ -4,16 +4,37 @@ from rest_framework import viewsets, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Q
+from rest_framework.settings import api_settings
+from django.db.models import Q
 from django.utils import timezone
 
 from django_filters.rest_framework import DjangoFilterBackend
 
 from .models import Client
-from .serializers import ClientSerializer, ClientListSerializer
+from .serializers import ClientSerializer, ClientListSerializer, DuplicateCandidateSerializer
+from .dedup import DEFAULT_MIN_SCORE, find_duplicates
 from apps.audit.utils import log_action  # Fonction helper pour audit (à créer si pas déjà fait)
 
 
+class ClientSearchFilter(filters.SearchFilter):
+    """
+    Recherche approchée (?search=) sur la colonne normalisée des clients.
+    Tolère accents, apostrophes et fautes de frappe ("N'Dong", "Ndong", "Ndongg") ;
+    les résultats sont classés par similarité sauf si ?ordering= est fourni.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = ' '.join(self.get_search_terms(request))
+        if not query:
+            return queryset
+
+        ranked = queryset.fuzzy_search(query)
+        if request.query_params.get(api_settings.ORDERING_PARAM):
+            # Conserver le tri explicite demandé, le rang départage
+            return ranked.order_by(*queryset.query.order_by, '-search_rank')
+        return ranked
+
+
 class ClientViewSet(viewsets.ModelViewSet):
     """
     ViewSet complet pour la gestion des clients (Personnes Physiques et Morales).
@@ -36,10 +57,11 @@ class ClientViewSet(viewsets.ModelViewSet):
         return ClientSerializer
 
     # Filtrage, recherche et tri
+    # La recherche passe en dernier pour imposer le classement par similarité
     filter_backends = [
         DjangoFilterBackend,
-        filters.SearchFilter,
         filters.OrderingFilter,
+        ClientSearchFilter,
     ]
 
     # Filtres utiles pour un cabinet à Libreville ou ailleurs au Gabon
@@ -52,19 +74,9 @@ class ClientViewSet(viewsets.ModelViewSet):
         'created_at': ['gte', 'lte', 'exact'],
     }
 
-    # Recherche plein texte performante sur les champs clés
-    search_fields = [
-        'first_name',
-        'last_name',
-        'company_name',
-        'rccm',
-        'nif',
-        'ni_number',
-        'email',
-        'phone_primary',
-        'phone_secondary',
-        'representative_name',
-    ]
+    # Recherche approchée sur search_text (voir ClientSearchFilter) : nom, prénom,
+    # raison sociale, représentant, NIF, RCCM, pièce d'identité, email, téléphones
+    search_fields = ['search_text']
 
     # Tri par défaut et autorisé
     ordering_fields = [
@@ -76,20 +88,18 @@ class ClientViewSet(viewsets.ModelViewSet):
         'nif',
         'rccm',
         'is_active',
+        'dossier_count',
     ]
     ordering = ['-created_at']
 
     def get_queryset(self):
         """
-        Optimisation + annotations utiles pour la liste
-        - Compte le nombre de dossiers par client (très utile dans l'interface)
+        Liste des clients
+        - Nombre de dossiers lu depuis la colonne dénormalisée dossier_count
         - Filtre les clients inactifs en option
         """
         qs = Client.objects.all()
 
-        # Annotation : nombre de dossiers liés
-        qs = qs.annotate(dossier_count=Count('dossiers'))
-
         # Optionnel : cacher les clients inactifs par défaut (toggle via filtre)
         if not self.request.query_params.get('is_active') in ['false', '0']:
             qs = qs.filter(is_active=True)
@@ -102,20 +112,19 @@ class ClientViewSet(viewsets.ModelViewSet):
         log_action(
             user=self.request.user,
             obj=client,
-            action='CREATE',
+            action_type='CREATE',
             description="Création d'un nouveau client",
             request=self.request
         )
 
     def perform_update(self, serializer):
         """Modification avec audit des changements"""
-        old_client = self.get_object()
         client = serializer.save()
         log_action(
             user=self.request.user,
             obj=client,
-            action='UPDATE',
-            changes=serializer.validated_data,
+            action_type='UPDATE',
+            changes={field: str(value) for field, value in serializer.validated_data.items()},
             description="Modification des informations client",
             request=self.request
         )
@@ -131,7 +140,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         log_action(
             user=self.request.user,
             obj=instance,
-            action='DELETE',
+            action_type='DELETE',
             description="Désactivation du client (soft delete)",
             request=self.request
         )
@@ -155,7 +164,7 @@ class ClientViewSet(viewsets.ModelViewSet):
         log_action(
             user=request.user,
             obj=client,
-            action='CONSENT',
+            action_type='CONSENT',
             description="Consentement RGPD accordé pour le client",
             request=request
         )
@@ -182,4 +191,37 @@ class ClientViewSet(viewsets.ModelViewSet):
             "avec_dossiers": qs.filter(dossier_count__gt=0).count(),
         }
 
-        return Response(stats)
\ No newline at end of file
+        return Response(stats)
+
+    def _min_score(self, request):
+        try:
+            return max(0, min(100, int(request.query_params.get('min_score', DEFAULT_MIN_SCORE))))
+        except ValueError:
+            return DEFAULT_MIN_SCORE
+
+    @action(detail=False, methods=['get'], url_path='doublons')
+    def duplicates(self, request):
+        """
+        Rapport des doublons probables sur l'ensemble des clients actifs.
+        GET /clients/doublons/?min_score=60
+        
+        Seuls les clients partageant une clé de blocage sont comparés.
+        """
+        candidates = find_duplicates(min_score=self._min_score(request))
+        return Response({
+            'count': len(candidates),
+            'results': DuplicateCandidateSerializer(candidates, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'], url_path='doublons')
+    def client_duplicates(self, request, pk=None):
+        """
+        Doublons probables d'un client (ex: avant validation d'une création).
+        GET /clients/{id}/doublons/
+        """
+        client = self.get_object()
+        candidates = find_duplicates(client=client, min_score=self._min_score(request))
+        return Response({
+            'count': len(candidates),
+            'results': DuplicateCandidateSerializer(candidates, many=True).data,
+        })
@@ -0,0 +1,80 @@
+"""
+Consumers WebSocket (Django Channels).
+
+ws(s)://<hôte>/api/ws/changes/?token=<access JWT>
+Les navigateurs ne pouvant pas fixer d'en-tête Authorization sur un
+WebSocket, le jeton d'accès passe en paramètre ; à défaut, la session
+Django (admin) est utilisée.
+"""
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+
+from . import realtime
+
+# Codes de fermeture applicatifs (plage 4000-4999)
+CLOSE_UNAUTHORIZED = 4401
+
+
+@database_sync_to_async
+def _user_from_token(raw_token):
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    user_id = token.get(api_settings.USER_ID_CLAIM)
+    return get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id}, is_active=True).first()
+
+
+class JWTAuthMiddleware:
+    """Authentifie la connexion par le jeton d'accès SimpleJWT (?token=...)"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = (params.get('token') or [None])[0]
+        if raw_token:
+            scope = dict(scope, user=await _user_from_token(raw_token) or AnonymousUser())
+        return await self.inner(scope, receive, send)
+
+
+class ChangeConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Flux des changements visibles par l'utilisateur (voir realtime.py).
+    Le client peut envoyer {"type": "ping"} pour maintenir la connexion.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated or not user.is_active:
+            await self.close(code=CLOSE_UNAUTHORIZED)
+            return
+
+        from apps.dossiers.access import has_global_access
+
+        self.subscribed_groups = [realtime.ALL_GROUP, realtime.user_group(user.pk)]
+        if has_global_access(user):
+            self.subscribed_groups.append(realtime.STAFF_GROUP)
+        for group in self.subscribed_groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, 'subscribed_groups', []):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def change_event(self, event):
+        await self.send_json(event['payload'])
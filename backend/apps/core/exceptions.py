@@ -61,6 +61,29 @@ class DossierClosedError(GEDException):
     default_code = 'dossier_closed'
 
 
+class ConflictOfInterestError(GEDException):
+    """Conflit d'intérêts potentiel détecté à l'ouverture d'un dossier"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Conflit d'intérêts potentiel : confirmation requise"
+    default_code = 'conflict_of_interest'
+    
+    def __init__(self, hits, subject=None, detail=None, code=None):
+        self.hits = hits
+        self.subject = subject  # Objet concerné (client), pour l'audit
+        super().__init__(detail, code)
+
+
+class SchedulingConflictError(GEDException):
+    """Un des intervenants est déjà occupé sur le créneau de l'événement"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Conflit d'agenda : un intervenant est déjà occupé sur ce créneau"
+    default_code = 'scheduling_conflict'
+
+    def __init__(self, conflicts, detail=None, code=None):
+        self.conflicts = conflicts
+        super().__init__(detail, code)
+
+
 class ValidationError(GEDException):
     """Erreur de validation métier"""
     status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
@@ -132,5 +155,19 @@ def custom_exception_handler(exc, context):
             }
         
         response.data = custom_response_data
+        
+        if response.status_code == status.HTTP_403_FORBIDDEN and context.get('request') is not None:
+            _log_permission_denied(context['request'], custom_response_data['message'])
+    
+    return response
+
+
+def _log_permission_denied(request, detail):
+    """Trace d'audit des refus d'accès (détection d'anomalies) ; ne bloque jamais la réponse"""
+    import logging
+    from apps.audit.utils import log_permission_denied
     
-    return response
\ No newline at end of file
+    try:
+        log_permission_denied(request, str(detail))
+    except Exception:
+        logging.getLogger(__name__).exception("Échec de la journalisation d'un refus d'accès")
\ No newline at end of file
@@ -49,9 +49,10 @@ class AuditTrailMixin:
 
     def perform_update(self, serializer):
         """Override update pour ajouter audit avec changements"""
-        old_instance = self.get_object()
+        # serializer.instance est l'objet déjà chargé par update() : pas de second get_object()
+        old_instance = serializer.instance
 
-        # Capturer les changements
+        # Capturer les changements (avant save(), qui modifie l'instance en place)
         changes = {}
         for field in serializer.validated_data.keys():
             old_value = getattr(old_instance, field, None)
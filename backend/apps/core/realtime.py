@@ -0,0 +1,96 @@
+"""
+Diffusion temps réel des changements (WebSocket, voir consumers.py).
+
+Chaque connexion rejoint le groupe de son utilisateur, le groupe commun
+et, pour un accès global (staff/superuser), le groupe staff. Un changement
+sur un dossier est envoyé, après commit, aux groupes des membres du dossier
+(DossierMembership) et au groupe staff ; un changement sans dossier (agenda
+du cabinet) au groupe commun.
+
+Messages compacts : {"type": "document.uploaded", "dossier": "<uuid>", "id": "<uuid>", ...}
+Le client met à jour ses listes à partir du message, sans tout recharger.
+"""
+import logging
+
+from asgiref.sync import async_to_sync
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Type du message côté channel layer (méthode change_event du consumer)
+HANDLER = 'change.event'
+
+ALL_GROUP = 'realtime.all'
+STAFF_GROUP = 'realtime.staff'
+
+
+def user_group(user_id) -> str:
+    return f"realtime.user.{getattr(user_id, 'hex', str(user_id).replace('-', ''))}"
+
+
+def _channel_layer():
+    try:
+        from channels.layers import get_channel_layer
+    except ImportError:
+        return None
+    return get_channel_layer()
+
+
+def _clean(payload):
+    """Valeurs JSON natives (UUID, dates) : le channel layer Redis sérialise en msgpack"""
+    encoder = DjangoJSONEncoder()
+    return {
+        key: value if value is None or isinstance(value, (str, int, float, bool)) else encoder.default(value)
+        for key, value in payload.items()
+    }
+
+
+def _send(groups, payload):
+    layer = _channel_layer()
+    if layer is None:
+        return
+    message = {'type': HANDLER, 'payload': payload}
+    for group in groups:
+        try:
+            async_to_sync(layer.group_send)(group, message)
+        except Exception:
+            # Un channel layer indisponible ne doit pas faire échouer l'écriture d'origine
+            logger.warning("Diffusion temps réel impossible (%s)", group, exc_info=True)
+
+
+def recipients(dossier_id) -> list:
+    """Groupes destinataires d'un changement sur un dossier (None : agenda du cabinet)"""
+    if dossier_id is None:
+        return [ALL_GROUP]
+    from apps.dossiers.models import DossierMembership
+
+    user_ids = DossierMembership.objects.filter(dossier_id=dossier_id).values_list('user_id', flat=True)
+    return [STAFF_GROUP] + [user_group(user_id) for user_id in user_ids]
+
+
+def publish(change: str, dossier_id=None, **data) -> None:
+    """
+    Diffuse un changement après commit de la transaction courante.
+
+    Args:
+        change: Type du message (ex: 'dossier.status_changed')
+        dossier_id: Dossier concerné, qui détermine les destinataires
+        **data: Champs compacts du message (id, version, dates...)
+    """
+    payload = _clean({'type': change, 'dossier': dossier_id, **data})
+
+    def send():
+        _send(recipients(dossier_id), payload)
+
+    transaction.on_commit(send)
+
+
+def publish_staff(change: str, **data) -> None:
+    """Diffuse au seul groupe staff (alertes de sécurité), après commit"""
+    payload = _clean({'type': change, **data})
+
+    def send():
+        _send([STAFF_GROUP], payload)
+
+    transaction.on_commit(send)
@@ -0,0 +1,9 @@
+# backend/apps/core/routing.py
+
+from django.urls import path
+
+from .consumers import ChangeConsumer
+
+websocket_urlpatterns = [
+    path('api/ws/changes/', ChangeConsumer.as_asgi()),
+]
@@ -1,7 +1,7 @@
 """
 Tests unitaires pour l'application Core.
 """
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase
 from django.utils import timezone
 from apps.core.utils import (
     generate_reference_code,
@@ -253,4 +253,81 @@ class PermissionsTestCase(TestCase):
         
         self.assertTrue(
             permission.has_object_permission(request, None, obj)
-        )
\ No newline at end of file
+        )
+
+class RealtimeConsumerTestCase(TransactionTestCase):
+    """Diffusion WebSocket des changements aux seuls membres du dossier"""
+
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from apps.clients.models import Client
+        from apps.dossiers.models import Dossier
+
+        User = get_user_model()
+        self.member = User.objects.create_user(
+            username='membre', password='testpass123', role='AVOCAT', professional_id='RT/2026/001'
+        )
+        self.outsider = User.objects.create_user(
+            username='externe', password='testpass123', role='AVOCAT', professional_id='RT/2026/002'
+        )
+        client = Client.objects.create(
+            client_type='MORALE', company_name='Temps Réel SARL',
+            rccm='GA-LBV-2026-B12-00002', nif='202601-A', phone_primary='+24166000003'
+        )
+        self.dossier = Dossier.objects.create(
+            title="Dossier temps réel", reference_code="RT-2026-0001",
+            client=client, responsible=self.member, category='IMMOBILIER'
+        )
+
+    def _connect(self, user=None):
+        """Connexion WebSocket brute (asgiref) : (communicator, premier message du serveur)"""
+        from asgiref.testing import ApplicationCommunicator
+        from channels.routing import URLRouter
+        from rest_framework_simplejwt.tokens import AccessToken
+        from apps.core.consumers import JWTAuthMiddleware
+        from apps.core.routing import websocket_urlpatterns
+
+        application = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+        communicator = ApplicationCommunicator(application, {
+            'type': 'websocket',
+            'path': '/api/ws/changes/',
+            'query_string': f"token={AccessToken.for_user(user)}".encode() if user else b'',
+            'headers': [],
+            'subprotocols': [],
+        })
+        return communicator
+
+    async def _open(self, user=None):
+        communicator = self._connect(user)
+        await communicator.send_input({'type': 'websocket.connect'})
+        return communicator, await communicator.receive_output(timeout=2)
+
+    async def test_status_change_reaches_members_only(self):
+        import json
+        from channels.db import database_sync_to_async
+
+        _, response = await self._open()
+        self.assertEqual((response['type'], response['code']), ('websocket.close', 4401))
+
+        member, response = await self._open(self.member)
+        self.assertEqual(response['type'], 'websocket.accept')
+        outsider, response = await self._open(self.outsider)
+        self.assertEqual(response['type'], 'websocket.accept')
+
+        def suspend_dossier():
+            self.dossier.status = 'SUSPENDU'
+            self.dossier.save()
+
+        await database_sync_to_async(suspend_dossier)()
+
+        message = json.loads((await member.receive_output(timeout=2))['text'])
+        self.assertEqual(message['type'], 'dossier.status_changed')
+        self.assertEqual(message['dossier'], str(self.dossier.pk))
+        self.assertEqual((message['status'], message['previous_status']), ('SUSPENDU', 'OUVERT'))
+        self.assertTrue(await outsider.receive_nothing(timeout=0.2))
+
+        await member.send_input({'type': 'websocket.receive', 'text': json.dumps({'type': 'ping'})})
+        self.assertEqual(json.loads((await member.receive_output(timeout=2))['text']), {'type': 'pong'})
+        for communicator in (member, outsider):
+            await communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+            await communicator.wait(timeout=2)
@@ -2,6 +2,7 @@
 Utilitaires et fonctions helpers pour l'application GED Cabinet.
 """
 import hashlib
+import ipaddress
 import secrets
 import string
 from datetime import datetime, timedelta
@@ -163,12 +164,20 @@ def get_client_ip(request) -> Optional[str]:
     x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
     
     if x_forwarded_for:
-        # Prendre la première IP (client réel)
-        ip = x_forwarded_for.split(',')[0].strip()
-    else:
-        ip = request.META.get('REMOTE_ADDR')
+        # Prendre la première IP (client réel) ; en-tête fourni par le client : à valider
+        ip = _valid_ip(x_forwarded_for.split(',')[0].strip())
+        if ip:
+            return ip
     
-    return ip
+    return _valid_ip(request.META.get('REMOTE_ADDR'))
+
+
+def _valid_ip(value) -> Optional[str]:
+    """Adresse IP normalisée, ou None si la valeur n'en est pas une"""
+    try:
+        return ipaddress.ip_address(value).compressed if value else None
+    except ValueError:
+        return None
 
 
 def sanitize_filename(filename: str) -> str:
@@ -200,6 +209,53 @@ def sanitize_filename(filename: str) -> str:
     return f"{name}{ext}"
 
 
+def normalize_search_text(value: Optional[str]) -> str:
+    """
+    Forme canonique pour la recherche approchée : sans accents, minuscules,
+    apostrophes supprimées ("N'Dong" → "ndong"), ponctuation remplacée par des espaces.
+    
+    Args:
+        value: Texte brut
+    
+    Returns:
+        Texte normalisé (mots séparés par un espace)
+    """
+    import re
+    import unicodedata
+    
+    if not value:
+        return ''
+    
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(ch for ch in text if not unicodedata.combining(ch)).lower()
+    text = re.sub(r"['’`´]", '', text)
+    text = re.sub(r'[^a-z0-9]+', ' ', text)
+    return ' '.join(text.split())
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """
+    Ne conserve que les chiffres d'un numéro de téléphone.
+    
+    Exemple : "+241 01-23-45-67" → "24101234567"
+    """
+    if not value:
+        return ''
+    return ''.join(ch for ch in str(value) if ch.isdigit())
+
+
+def trigrams(text: str) -> set:
+    """
+    Trigrammes d'un texte normalisé, calculés mot par mot comme pg_trgm
+    (deux espaces en tête, un en fin : "ndong" → "  n", " nd", "ndo", "don", "ong", "ng ").
+    """
+    grams = set()
+    for word in text.split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
 def is_document_expired(retention_until: datetime) -> bool:
     """
     Vérifie si un document a dépassé sa période de rétention.
@@ -5,7 +5,7 @@ from .models import Folder, Document
 
 @admin.register(Folder)
 class FolderAdmin(admin.ModelAdmin):
-    list_display = ('name', 'dossier', 'parent', 'created_at')
+    list_display = ('name', 'full_path', 'dossier', 'parent', 'created_at')
     list_filter = ('dossier',)
     search_fields = ('name', 'dossier__reference_code')
 
@@ -0,0 +1,203 @@
+"""
+Export ZIP en flux d'un dossier, d'une sous-arborescence ou d'une sélection de documents.
+
+L'archive est produite au fil de l'eau (StreamingHttpResponse) : les fichiers
+sont déchiffrés par un pool de threads borné, en avance de quelques fichiers
+seulement sur l'écriture, et aucun fichier n'est jamais écrit sur disque.
+"""
+import hashlib
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.utils import timezone
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Formats déjà compressés : stockés tels quels pour ne pas gaspiller de CPU
+STORED_EXTENSIONS = {
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.zip', '.gz', '.7z', '.rar',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.mp3', '.mp4', '.mov',
+}
+
+CHUNK_SIZE = 64 * 1024
+
+INTEGRITY_REPORT_NAME = '_ECHECS_INTEGRITE.txt'
+
+
+def get_max_workers() -> int:
+    return max(1, int(getattr(settings, 'DOCUMENT_EXPORT_MAX_WORKERS', 4)))
+
+
+class _StreamSink:
+    """
+    Pseudo-fichier non positionnable : zipfile y écrit, le générateur vide le tampon.
+    L'absence de seek() force zipfile à utiliser des descripteurs de données.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _read_document(document):
+    """Exécuté dans le pool : déchiffrement + contrôle d'intégrité (aucun accès base)"""
+    data = document.file.storage.read_decrypted(document.file.name)
+    return data, hashlib.sha256(data).hexdigest() == document.file_hash
+
+
+def iter_decrypted(documents, max_workers=None):
+    """
+    Déchiffre les documents en parallèle en conservant l'ordre.
+    Au plus `max_workers` fichiers sont en mémoire en plus de celui en cours d'écriture.
+
+    Yields:
+        (document, data | None, erreur | None)
+    """
+    max_workers = max_workers or get_max_workers()
+    iterator = iter(documents)
+    pending = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='doc-export') as pool:
+        def submit_next():
+            document = next(iterator, None)
+            if document is not None:
+                pending.append((document, pool.submit(_read_document, document)))
+
+        for _ in range(max_workers):
+            submit_next()
+
+        try:
+            while pending:
+                document, future = pending.popleft()
+                submit_next()
+                try:
+                    data, intact = future.result()
+                except Exception as e:
+                    logger.error(f"Export : lecture impossible du document {document.pk}: {e}")
+                    yield document, None, str(e)
+                    continue
+                if not intact:
+                    yield document, None, "empreinte SHA-256 différente"
+                else:
+                    yield document, data, None
+        finally:
+            # Client déconnecté : on abandonne les lectures non démarrées
+            for _, future in pending:
+                future.cancel()
+
+
+class ArchiveLayout:
+    """Calcule les chemins dans l'archive en reproduisant l'arborescence des Folder"""
+
+    # Segments qui, dans un chemin d'archive, remonteraient l'arborescence à l'extraction
+    UNSAFE_SEGMENTS = {'', '.', '..'}
+
+    def __init__(self, root: str, all_versions: bool = False):
+        self.root = self._segment(root) if self._clean(root) else 'export'
+        self.all_versions = all_versions
+        self._used = set()
+
+    @staticmethod
+    def _clean(name: str) -> str:
+        return name.replace('\\', '_').strip().strip('/')
+
+    @classmethod
+    def _segment(cls, name: str) -> str:
+        """Un seul segment de chemin, jamais vide ni relatif (« . », « .. »)"""
+        segment = cls._clean(name).replace('/', '_')
+        return '_' if segment in cls.UNSAFE_SEGMENTS else segment
+
+    def folder_path(self, folder) -> str:
+        if folder is None:
+            return self.root
+        segments = [self._segment(s) for s in folder.get_full_path().split(folder.PATH_SEPARATOR)]
+        return '/'.join([self.root, *segments])
+
+    def document_path(self, document) -> str:
+        filename = self._segment(PurePosixPath(self._clean(document.original_filename) or str(document.pk)).name)
+        if self.all_versions:
+            path = PurePosixPath(filename)
+            filename = f"{path.stem} (v{document.version}){path.suffix}"
+
+        candidate = f"{self.folder_path(document.folder)}/{filename}"
+        counter = 1
+        while candidate.lower() in self._used:
+            path = PurePosixPath(filename)
+            candidate = f"{self.folder_path(document.folder)}/{path.stem} ({counter}){path.suffix}"
+            counter += 1
+        self._used.add(candidate.lower())
+        return candidate
+
+
+def stream_zip(documents, folders=(), root='export', all_versions=False, max_workers=None, summary=None):
+    """
+    Générateur d'octets produisant l'archive ZIP.
+
+    Args:
+        documents: Documents à exporter (folder pré-chargé), dans l'ordre d'écriture
+        folders: Folder à matérialiser, y compris vides
+        root: Répertoire racine de l'archive (référence du dossier)
+        all_versions: Suffixe « (vN) » pour distinguer les versions
+        summary: dict optionnel complété au fil de l'export (exported, failed, bytes)
+    """
+    summary = summary if summary is not None else {}
+    summary.update({'exported': 0, 'failed': [], 'bytes': 0})
+    layout = ArchiveLayout(root, all_versions=all_versions)
+    sink = _StreamSink()
+    now = timezone.localtime().timetuple()[:6]
+
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        directories = {layout.root} | {layout.folder_path(folder) for folder in folders}
+        for directory in sorted(directories):
+            archive.writestr(zipfile.ZipInfo(f"{directory}/", date_time=now), b'')
+        yield sink.drain()
+
+        for document, data, error in iter_decrypted(documents, max_workers=max_workers):
+            if error is not None:
+                summary['failed'].append({'id': str(document.pk), 'title': document.title, 'error': error})
+                continue
+
+            info = zipfile.ZipInfo(layout.document_path(document), date_time=now)
+            info.compress_type = (
+                zipfile.ZIP_STORED if document.file_extension.lower() in STORED_EXTENSIONS
+                else zipfile.ZIP_DEFLATED
+            )
+            info.file_size = len(data)
+            view = memoryview(data)
+            with archive.open(info, mode='w', force_zip64=len(data) > zipfile.ZIP64_LIMIT) as entry:
+                for offset in range(0, len(view), CHUNK_SIZE):
+                    entry.write(view[offset:offset + CHUNK_SIZE])
+                    chunk = sink.drain()
+                    if chunk:
+                        yield chunk
+            del view, data
+            summary['exported'] += 1
+            summary['bytes'] += info.file_size
+            yield sink.drain()
+
+        if summary['failed']:
+            report = "\n".join(f"{item['id']}\t{item['title']}\t{item['error']}" for item in summary['failed'])
+            archive.writestr(zipfile.ZipInfo(f"{layout.root}/{INTEGRITY_REPORT_NAME}", date_time=now), report)
+
+    yield sink.drain()
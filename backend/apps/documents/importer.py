@@ -0,0 +1,336 @@
+"""
+Import en masse d'une arborescence existante (répertoire ou archive ZIP) dans un dossier.
+
+Chaque sous-répertoire devient un Folder, chaque fichier un Document (version 1).
+Le hachage et le chiffrement sont répartis sur plusieurs processus ; les lignes
+sont insérées par lots. L'import est reprenable : les fichiers déjà présents
+(même emplacement et même taille, ou même empreinte SHA-256) sont ignorés.
+"""
+import hashlib
+import mimetypes
+import os
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path, PurePosixPath
+
+from django.conf import settings
+from django.db import transaction
+
+from apps.dossiers import counters
+from .models import Document, Folder
+from .serializers import DocumentSerializer
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+IGNORED_NAMES = {'.ds_store', 'thumbs.db', 'desktop.ini'}
+
+
+# ─── Fonctions exécutées dans les processus du pool (sans accès à Django) ───
+
+_archive = None
+
+
+def _init_worker(archive_path):
+    """Chaque processus ouvre l'archive une seule fois (pas de relecture du répertoire central)"""
+    global _archive
+    _archive = zipfile.ZipFile(archive_path) if archive_path else None
+
+
+def _read_source(source_root, relative_path):
+    if _archive is not None:
+        return _archive.read(relative_path)
+    with open(os.path.join(source_root, relative_path), 'rb') as source:
+        return source.read()
+
+
+def _hash_file(source_root, relative_path):
+    digest = hashlib.sha256(_read_source(source_root, relative_path)).hexdigest()
+    return relative_path, digest
+
+
+def _encrypt_file(source_root, relative_path, key, destination):
+    """Chiffre vers `destination` (chemin absolu) ; retourne l'empreinte pour contrôle"""
+    from cryptography.fernet import Fernet
+
+    data = _read_source(source_root, relative_path)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with open(destination, 'wb') as target:
+        target.write(Fernet(key).encrypt(data))
+    return relative_path, hashlib.sha256(data).hexdigest()
+
+
+# ─── Orchestration ───
+
+@dataclass
+class SourceFile:
+    relative_path: str
+    folder_path: str
+    name: str
+    size: int
+
+
+@dataclass
+class ImportReport:
+    folders_created: int = 0
+    imported: int = 0
+    skipped_existing: int = 0
+    duplicates: int = 0
+    renamed: int = 0
+    rejected: list = field(default_factory=list)
+    bytes: int = 0
+
+
+class DossierTreeImporter:
+    """
+    Usage:
+        importer = DossierTreeImporter(dossier, '/srv/archives/cabinet/Dupont', user=admin)
+        report = importer.run()
+    """
+
+    def __init__(self, dossier, source, user, workers=None, batch_size=200,
+                 sensitivity='internal', dry_run=False, progress=None):
+        self.dossier = dossier
+        self.source = Path(source)
+        self.user = user
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.sensitivity = sensitivity
+        self.dry_run = dry_run
+        self.progress = progress or (lambda message: None)
+        self.report = ImportReport()
+
+        root = Path(settings.DOCUMENT_IMPORT_ROOT).resolve()
+        self.source = self.source.resolve()
+        if not self.source.is_relative_to(root):
+            raise ValueError(f"Source hors de la racine d'import autorisée ({root}) : {self.source}")
+
+        self.is_archive = self.source.is_file() and zipfile.is_zipfile(self.source)
+        if not self.is_archive and not self.source.is_dir():
+            raise ValueError(f"Source introuvable ou non supportée : {self.source}")
+
+        self.storage = Document._meta.get_field('file').storage
+
+    # Inventaire
+
+    def scan(self):
+        """Retourne (répertoires, fichiers) relatifs à la racine, en ordre stable"""
+        directories, files = set(), []
+
+        if self.is_archive:
+            with zipfile.ZipFile(self.source) as archive:
+                entries = [
+                    (info.filename.rstrip('/'), info.is_dir(), info.file_size)
+                    for info in archive.infolist()
+                ]
+        else:
+            entries = []
+            for root, dirnames, filenames in os.walk(self.source):
+                dirnames.sort()
+                relative_root = Path(root).relative_to(self.source).as_posix()
+                for dirname in dirnames:
+                    entries.append((self._join(relative_root, dirname), True, 0))
+                for filename in sorted(filenames):
+                    if os.path.islink(os.path.join(root, filename)):
+                        # Un lien symbolique pourrait désigner un fichier hors de la racine d'import
+                        continue
+                    path = self._join(relative_root, filename)
+                    entries.append((path, False, os.path.getsize(os.path.join(root, filename))))
+
+        for path, is_dir, size in entries:
+            parts = PurePosixPath(path).parts
+            if not parts or any(part.startswith('.') or part.lower() in IGNORED_NAMES for part in parts):
+                continue
+            parents = ['/'.join(parts[:i]) for i in range(1, len(parts) if not is_dir else len(parts) + 1)]
+            directories.update(parents)
+            if not is_dir:
+                files.append(SourceFile(path, '/'.join(parts[:-1]), parts[-1], size))
+
+        return sorted(directories, key=lambda p: (p.count('/'), p)), files
+
+    @staticmethod
+    def _join(root, name):
+        return name if root in ('', '.') else f"{root}/{name}"
+
+    # Répertoires
+
+    def create_folders(self, directories):
+        """
+        Crée les Folder manquants niveau par niveau (un bulk_create par profondeur).
+        Les chemins matérialisés sont calculés ici, save() n'étant pas appelé.
+        """
+        sep = Folder.PATH_SEPARATOR
+        existing = {
+            folder.full_path: folder
+            for folder in Folder.objects.filter(dossier=self.dossier)
+        }
+        by_path = {}
+        for path in directories:
+            if path in existing:
+                by_path[path] = existing[path]
+                continue
+            parent_path, _, name = path.rpartition('/')
+            parent = by_path.get(parent_path)
+            folder = Folder(id=uuid.uuid4(), name=name[:150], dossier=self.dossier, parent=parent,
+                            created_by=self.user)
+            folder.tree_path, folder.full_path, folder.depth = (
+                (f"{parent.tree_path}{folder.pk.hex}{sep}", f"{parent.full_path}{sep}{folder.name}", parent.depth + 1)
+                if parent else (f"{folder.pk.hex}{sep}", folder.name, 0)
+            )
+            by_path[path] = folder
+
+        new_folders = [folder for path, folder in by_path.items() if path not in existing]
+        if new_folders and not self.dry_run:
+            for depth in sorted({folder.depth for folder in new_folders}):
+                Folder.objects.bulk_create([f for f in new_folders if f.depth == depth], batch_size=500)
+            # bulk_create n'émet pas post_save : compteurs du dossier mis à jour ici
+            counters.add_folders(self.dossier.pk, len(new_folders))
+        self.report.folders_created = len(new_folders)
+        return by_path
+
+    # Fichiers
+
+    def _filter_files(self, files, folders):
+        """Écarte les fichiers refusés et ceux déjà importés (reprise sans rehachage)"""
+        already = set(
+            Document.objects.filter(dossier=self.dossier).values_list('folder_id', 'original_filename', 'file_size')
+        )
+        allowed = set(DocumentSerializer.ALLOWED_EXTENSIONS)
+        pending = []
+        for source_file in files:
+            extension = PurePosixPath(source_file.name).suffix.lower()
+            if extension not in allowed:
+                self.report.rejected.append((source_file.relative_path, f"extension '{extension}' non autorisée"))
+            elif source_file.size > DocumentSerializer.MAX_FILE_SIZE:
+                self.report.rejected.append((source_file.relative_path, "fichier trop volumineux"))
+            else:
+                folder = folders.get(source_file.folder_path)
+                key = (folder.pk if folder else None, source_file.name, source_file.size)
+                if key in already:
+                    self.report.skipped_existing += 1
+                else:
+                    pending.append(source_file)
+        return pending
+
+    def run(self):
+        directories, files = self.scan()
+        self.progress(f"{len(directories)} répertoire(s), {len(files)} fichier(s) trouvés")
+
+        with transaction.atomic():
+            folders = self.create_folders(directories)
+        pending = self._filter_files(files, folders)
+        self.progress(f"{len(pending)} fichier(s) à importer, {self.report.skipped_existing} déjà présent(s)")
+
+        if self.dry_run or not pending:
+            return self.report
+
+        used_names = set(
+            Document.objects.filter(dossier=self.dossier, is_current_version=True)
+            .values_list('original_filename', flat=True)
+        )
+        source_root = str(self.source)
+        archive_path = source_root if self.is_archive else None
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(archive_path,)) as pool:
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                self._import_batch(pool, source_root, batch, folders, used_names)
+                self.progress(
+                    f"{min(start + self.batch_size, len(pending))}/{len(pending)} traités "
+                    f"({self.report.imported} importés, {self.report.duplicates} doublons)"
+                )
+
+        return self.report
+
+    def _import_batch(self, pool, source_root, batch, folders, used_names):
+        # 1. Empreintes en parallèle, puis dédoublonnage contre le dossier et dans le lot
+        # (une même pièce figure légitimement dans plusieurs dossiers)
+        hashes = dict(pool.map(_hash_file, [source_root] * len(batch), [f.relative_path for f in batch]))
+        known = set(
+            Document.objects.filter(dossier=self.dossier, file_hash__in=set(hashes.values()))
+            .values_list('file_hash', flat=True)
+        )
+
+        to_encrypt = []
+        for source_file in batch:
+            digest = hashes[source_file.relative_path]
+            if digest in known:
+                self.report.duplicates += 1
+                continue
+            known.add(digest)
+            stored_name = self.storage._generate_secure_filename(source_file.name)
+            to_encrypt.append((source_file, digest, stored_name))
+
+        if not to_encrypt:
+            return
+
+        # 2. Chiffrement en parallèle directement vers le stockage
+        key = settings.FILE_ENCRYPTION_KEY
+        destinations = [self.storage.path(name) for _, _, name in to_encrypt]
+        try:
+            results = pool.map(
+                _encrypt_file,
+                [source_root] * len(to_encrypt),
+                [source_file.relative_path for source_file, _, _ in to_encrypt],
+                [key] * len(to_encrypt),
+                destinations,
+            )
+            for (source_file, digest, _), (_, encrypted_digest) in zip(to_encrypt, results):
+                if encrypted_digest != digest:
+                    raise ValueError(f"Fichier modifié pendant l'import : {source_file.relative_path}")
+
+            # 3. Insertion groupée
+            documents = [
+                self._build_document(source_file, digest, stored_name, folders, used_names)
+                for source_file, digest, stored_name in to_encrypt
+            ]
+            with transaction.atomic():
+                Document.objects.bulk_create(documents, batch_size=500)
+                counters.add_documents(
+                    self.dossier.pk,
+                    documents=len(documents),
+                    size=sum(document.file_size for document in documents),
+                    uploaded_at=max(document.uploaded_at for document in documents),
+                )
+        except BaseException:
+            # Pas de fichier chiffré orphelin : la reprise repartira de ce lot
+            for destination in destinations:
+                try:
+                    os.remove(destination)
+                except OSError:
+                    pass
+            raise
+
+        self.report.imported += len(documents)
+        self.report.bytes += sum(document.file_size for document in documents)
+
+    def _build_document(self, source_file, digest, stored_name, folders, used_names):
+        # Contrainte : un seul document courant par nom de fichier dans un dossier
+        path = PurePosixPath(source_file.name)
+        filename, counter = source_file.name, 2
+        while filename in used_names:
+            filename = f"{path.stem} ({counter}){path.suffix}"
+            counter += 1
+        if filename != source_file.name:
+            self.report.renamed += 1
+        used_names.add(filename)
+
+        extension = path.suffix.lower()
+        return Document(
+            dossier=self.dossier,
+            folder=folders.get(source_file.folder_path),
+            uploaded_by=self.user,
+            file=stored_name,
+            title=path.stem[:300],
+            description=f"Import : {source_file.relative_path}",
+            original_filename=filename[:255],
+            file_extension=extension,
+            file_size=source_file.size,
+            mime_type=mimetypes.guess_type(source_file.name)[0] or 'application/octet-stream',
+            file_hash=digest,
+            sensitivity=self.sensitivity,
+        )
@@ -0,0 +1,111 @@
+# backend/apps/documents/management/commands/import_dossier_tree.py
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.audit.utils import log_action
+from apps.documents.importer import DossierTreeImporter
+from apps.documents.models import Document
+from apps.dossiers.models import Dossier
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe une arborescence existante (répertoire ou archive ZIP) dans un dossier : "
+        "sous-répertoires → Folder, fichiers → Document chiffrés. Relançable après interruption."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('dossier', help='Référence (GAB-YYYY-NNNN) ou UUID du dossier cible')
+        parser.add_argument('source', help='Répertoire ou archive .zip à importer')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help="Nom d'utilisateur enregistré comme auteur de l'import"
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Processus de hachage/chiffrement (défaut: nombre de cœurs)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Fichiers traités et insérés par lot (défaut: 200)'
+        )
+        parser.add_argument(
+            '--sensitivity',
+            choices=[choice for choice, _ in Document.SENSITIVITY_CHOICES],
+            default='internal',
+            help='Niveau de sensibilité des documents importés (défaut: internal)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Inventaire seulement, sans rien écrire"
+        )
+
+    def handle(self, *args, **options):
+        dossier = Dossier.objects.filter(reference_code=options['dossier']).first()
+        if dossier is None:
+            try:
+                dossier = Dossier.objects.get(pk=options['dossier'])
+            except (Dossier.DoesNotExist, ValidationError):
+                raise CommandError(f"Dossier introuvable : {options['dossier']}")
+
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Utilisateur introuvable : {options['user']}")
+
+        try:
+            importer = DossierTreeImporter(
+                dossier,
+                options['source'],
+                user=user,
+                workers=options['workers'],
+                batch_size=options['batch_size'],
+                sensitivity=options['sensitivity'],
+                dry_run=options['dry_run'],
+                progress=lambda message: self.stdout.write(f"  {message}"),
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        report = importer.run()
+
+        for path, reason in report.rejected:
+            self.stdout.write(self.style.WARNING(f"  ⚠️  {path} : {reason}"))
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Simulation : {report.folders_created} répertoire(s) à créer, "
+                f"{len(report.rejected)} fichier(s) refusé(s)"
+            ))
+            return
+
+        log_action(
+            user=user,
+            obj=dossier,
+            action_type='UPLOAD',
+            description=f"Import d'arborescence : {report.imported} document(s)",
+            changes={
+                'source': str(options['source']),
+                'folders_created': report.folders_created,
+                'imported': report.imported,
+                'skipped_existing': report.skipped_existing,
+                'duplicates': report.duplicates,
+                'renamed': report.renamed,
+                'rejected': len(report.rejected),
+                'bytes': report.bytes,
+            }
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report.imported} document(s) importé(s) dans {dossier.reference_code} "
+            f"({report.folders_created} répertoire(s) créé(s), {report.skipped_existing} déjà présent(s), "
+            f"{report.duplicates} doublon(s), {report.renamed} renommé(s), {len(report.rejected)} refusé(s))"
+        ))
@@ -0,0 +1,55 @@
+from django.db import migrations, models
+
+
+def backfill_folder_paths(apps, schema_editor):
+    """Calcule tree_path/full_path/depth des dossiers existants, niveau par niveau."""
+    Folder = apps.get_model('documents', 'Folder')
+    sep = '/'
+
+    paths = {}
+    level = list(Folder.objects.filter(parent__isnull=True))
+    depth = 0
+    while level:
+        for folder in level:
+            parent_paths = paths.get(folder.parent_id)
+            if parent_paths:
+                folder.tree_path = f"{parent_paths[0]}{folder.pk.hex}{sep}"
+                folder.full_path = f"{parent_paths[1]}{sep}{folder.name}"
+            else:
+                folder.tree_path = f"{folder.pk.hex}{sep}"
+                folder.full_path = folder.name
+            folder.depth = depth
+            paths[folder.pk] = (folder.tree_path, folder.full_path)
+        Folder.objects.bulk_update(level, ['tree_path', 'full_path', 'depth'], batch_size=500)
+        level = list(Folder.objects.filter(parent_id__in=[f.pk for f in level]))
+        depth += 1
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0002_update_sensitivity_choices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='tree_path',
+            field=models.CharField(default='', editable=False, max_length=1024, verbose_name='Chemin matérialisé'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='full_path',
+            field=models.CharField(default='', editable=False, max_length=2000, verbose_name='Chemin complet'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False, verbose_name='Profondeur'),
+        ),
+        migrations.RunPython(backfill_folder_paths, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['tree_path'], name='folder_tree_path_idx', opclasses=['varchar_pattern_ops']),
+        ),
+    ]
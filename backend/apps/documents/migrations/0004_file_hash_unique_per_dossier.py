@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    L'empreinte SHA-256 n'est plus unique que par dossier : un même contrat ou
+    modèle figure légitimement dans plusieurs affaires (import d'arborescences).
+    """
+
+    dependencies = [
+        ('documents', '0003_folder_materialized_path'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='document',
+            name='file_hash',
+            field=models.CharField(
+                help_text="Empreinte cryptographique garantissant l'intégrité",
+                max_length=64,
+                verbose_name='Hash SHA-256',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='document',
+            constraint=models.UniqueConstraint(fields=('dossier', 'file_hash'), name='unique_file_hash_per_dossier'),
+        ),
+    ]
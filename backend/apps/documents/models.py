@@ -6,7 +6,9 @@ import hashlib
 import uuid
 from pathlib import Path
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Concat, Length, Substr
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
@@ -34,8 +36,39 @@ def secure_document_upload_path(instance, filename):
     return f"documents/{dossier_id}/{now.year}/{now.month:02d}/{safe_filename}"
 
 
+class FolderQuerySet(models.QuerySet):
+    """Requêtes arborescentes s'appuyant sur le chemin matérialisé"""
+    
+    def subtree(self, folder, include_self=True):
+        """Tous les descendants d'un dossier en une seule requête (préfixe indexé)"""
+        qs = self.filter(dossier_id=folder.dossier_id, tree_path__startswith=folder.tree_path)
+        if not include_self:
+            qs = qs.exclude(pk=folder.pk)
+        return qs
+    
+    def with_documents_count(self):
+        """Annote le nombre de documents courants par dossier (agrégat unique)"""
+        return self.annotate(
+            documents_count=models.Count(
+                'documents',
+                filter=models.Q(documents__is_current_version=True)
+            )
+        )
+
+
 class Folder(BaseModel):
-    """Structure hiérarchique pour organiser les documents"""
+    """
+    Structure hiérarchique pour organiser les documents.
+    
+    Chaque dossier conserve un chemin matérialisé (`tree_path`, identifiants
+    des ancêtres) et son chemin lisible (`full_path`), mis à jour à la création
+    et au déplacement/renommage : lecture du chemin, sous-arbre, déplacement
+    d'une branche et comptage des documents se font en un nombre constant de requêtes.
+    """
+    
+    PATH_SEPARATOR = '/'
+    # tree_path : 33 caractères par niveau (identifiant hexadécimal + séparateur) sur 1024
+    MAX_DEPTH = 1024 // 33 - 1
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=150, verbose_name="Nom du dossier")
@@ -63,13 +96,45 @@ class Folder(BaseModel):
         verbose_name="Créé par"
     )
     
+    # Chemin matérialisé : identifiants hexadécimaux des ancêtres puis du dossier lui-même
+    tree_path = models.CharField(
+        max_length=1024,
+        editable=False,
+        default='',
+        verbose_name="Chemin matérialisé"
+    )
+    
+    # Chemin lisible dénormalisé (ex: "Procédure/Pièces/Expertise")
+    full_path = models.CharField(
+        max_length=2000,
+        editable=False,
+        default='',
+        verbose_name="Chemin complet"
+    )
+    
+    depth = models.PositiveSmallIntegerField(
+        default=0,
+        editable=False,
+        verbose_name="Profondeur"
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = FolderQuerySet.as_manager()
+    
     class Meta:
         db_table = 'documents_folder'
         verbose_name = "Dossier"
         verbose_name_plural = "Dossiers"
         ordering = ['name']
+        indexes = [
+            # Recherche par préfixe (sous-arbre) ; varchar_pattern_ops pour LIKE 'x%' sous PostgreSQL
+            models.Index(
+                fields=['tree_path'],
+                name='folder_tree_path_idx',
+                opclasses=['varchar_pattern_ops'],
+            ),
+        ]
         constraints = [
             # Éviter les boucles infinies dans la hiérarchie
             models.CheckConstraint(
@@ -81,26 +146,165 @@ class Folder(BaseModel):
     def __str__(self):
         return f"{self.dossier.reference_code}/{self.get_full_path()}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Mémorise les chemins chargés pour propager un déplacement/renommage
+        instance._loaded_paths = (instance.__dict__.get('tree_path'), instance.__dict__.get('full_path'))
+        instance._loaded_placement = (instance.__dict__.get('dossier_id'), instance.__dict__.get('depth'))
+        return instance
+    
     def get_full_path(self) -> str:
-        """Retourne le chemin complet du dossier"""
-        path_parts = [self.name]
-        current = self.parent
+        """Retourne le chemin complet du dossier (sans requête)"""
+        if self.full_path:
+            return self.full_path
+        return self._build_paths()[1]
+    
+    def _build_paths(self):
+        """Calcule (tree_path, full_path, depth) à partir du parent direct"""
+        sep = self.PATH_SEPARATOR
+        if self.parent_id:
+            parent = self.parent
+            return (
+                f"{parent.tree_path}{self.pk.hex}{sep}",
+                f"{parent.get_full_path()}{sep}{self.name}",
+                parent.depth + 1,
+            )
+        return f"{self.pk.hex}{sep}", self.name, 0
+    
+    def check_placement(self, parent=None, dossier_id=None, name=None):
+        """
+        Valide l'emplacement (création, déplacement, renommage) : nom sans
+        séparateur de chemin, même dossier juridique qu'au chargement,
+        profondeur et chemin complet de toute la branche dans les limites des
+        colonnes. Lève ValidationError.
+        """
+        dossier_id = dossier_id or self.dossier_id
+        name = self.name if name is None else name
+        self.check_name(name)
+        loaded_dossier_id, loaded_depth = getattr(self, '_loaded_placement', (None, None))
+        if loaded_dossier_id is not None and loaded_dossier_id != dossier_id:
+            raise ValidationError({
+                'dossier': "Un dossier ne peut pas changer de dossier juridique"
+            })
         
-        while current:
-            path_parts.insert(0, current.name)
-            current = current.parent
+        depth = parent.depth + 1 if parent else 0
+        full_length = (len(parent.get_full_path()) + len(self.PATH_SEPARATOR) if parent else 0) + len(name)
+        old_tree_path, old_full_path = getattr(self, '_loaded_paths', (None, None))
+        if old_tree_path:
+            # Branche existante : ses descendants suivent le déplacement
+            branch = Folder.objects.filter(
+                dossier_id=loaded_dossier_id, tree_path__startswith=old_tree_path
+            ).aggregate(depth=models.Max('depth'), full=models.Max(Length('full_path')))
+            depth += (branch['depth'] or loaded_depth) - loaded_depth
+            full_length += (branch['full'] or len(old_full_path)) - len(old_full_path)
         
-        return '/'.join(path_parts)
+        if depth > self.MAX_DEPTH:
+            raise ValidationError({
+                'parent': f"Profondeur maximale de l'arborescence atteinte ({self.MAX_DEPTH + 1} niveaux)"
+            })
+        if full_length > self._meta.get_field('full_path').max_length:
+            raise ValidationError({'name': "Chemin complet trop long pour cet emplacement"})
+    
+    @classmethod
+    def check_name(cls, name):
+        """full_path joint les noms par PATH_SEPARATOR : un nom ne peut pas le contenir"""
+        if cls.PATH_SEPARATOR in (name or ''):
+            raise ValidationError({
+                'name': f"Le nom d'un dossier ne peut pas contenir « {cls.PATH_SEPARATOR} »"
+            })
+    
+    def is_descendant_of(self, other) -> bool:
+        """True si ce dossier est situé sous `other` (ou est `other`)"""
+        return bool(other.tree_path) and self.tree_path.startswith(other.tree_path)
     
     def clean(self):
         """Validation personnalisée"""
         super().clean()
+        self.check_name(self.name)
         
         # Vérifier que le parent appartient au même dossier juridique
         if self.parent and self.parent.dossier_id != self.dossier_id:
             raise ValidationError({
                 'parent': "Le dossier parent doit appartenir au même dossier juridique"
             })
+        
+        # Interdire le déplacement d'une branche sous l'un de ses descendants
+        if self.parent and self.tree_path and self.parent.is_descendant_of(self):
+            raise ValidationError({
+                'parent': "Un dossier ne peut pas être déplacé dans l'un de ses sous-dossiers"
+            })
+    
+    @transaction.atomic
+    def save(self, *args, **kwargs):
+        """Maintient le chemin matérialisé et le propage à la branche en une requête"""
+        old_tree_path, old_full_path = getattr(self, '_loaded_paths', (None, None))
+        old_depth = self.depth
+        
+        tree_path, full_path, depth = self._build_paths()
+        if (tree_path, full_path) != (old_tree_path, old_full_path):
+            self.check_placement(self.parent if self.parent_id else None)
+        self.tree_path, self.full_path, self.depth = tree_path, full_path, depth
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'tree_path', 'full_path', 'depth'}
+        
+        super().save(*args, **kwargs)
+        
+        if old_tree_path and (old_tree_path, old_full_path) != (self.tree_path, self.full_path):
+            self._rebase_descendants(old_tree_path, old_full_path, self.depth - old_depth)
+        
+        self._loaded_paths = (self.tree_path, self.full_path)
+        self._loaded_placement = (self.dossier_id, self.depth)
+    
+    def _rebase_descendants(self, old_tree_path, old_full_path, depth_delta):
+        """Réécrit les préfixes de chemin de tous les descendants (UPDATE unique)"""
+        sep = self.PATH_SEPARATOR
+        Folder.objects.filter(
+            dossier_id=self.dossier_id,
+            tree_path__startswith=old_tree_path,
+        ).exclude(pk=self.pk).update(
+            tree_path=Concat(
+                Value(self.tree_path),
+                Substr('tree_path', len(old_tree_path) + 1),
+                output_field=models.CharField(),
+            ),
+            full_path=Concat(
+                Value(self.full_path + sep),
+                Substr('full_path', len(old_full_path) + len(sep) + 1),
+                output_field=models.CharField(),
+            ),
+            depth=models.F('depth') + depth_delta,
+        )
+    
+    def build_tree(self):
+        """
+        Arborescence complète sous ce dossier.
+        Deux requêtes quelle que soit la taille : sous-arbre annoté + assemblage en mémoire.
+        """
+        nodes = list(
+            Folder.objects.subtree(self)
+            .with_documents_count()
+            .order_by('depth', 'name')
+            .values('id', 'parent_id', 'name', 'created_at', 'documents_count')
+        )
+        
+        by_id = {}
+        for node in nodes:
+            by_id[node['id']] = {
+                'id': str(node['id']),
+                'name': node['name'],
+                'created_at': node['created_at'],
+                'subfolders': [],
+                'documents_count': node['documents_count'],
+            }
+        
+        for node in nodes:
+            if node['id'] != self.pk and node['parent_id'] in by_id:
+                by_id[node['parent_id']]['subfolders'].append(by_id[node['id']])
+        
+        return by_id.get(self.pk)
 
 
 class Document(BaseModel):
@@ -160,7 +364,6 @@ class Document(BaseModel):
     # Intégrité cryptographique
     file_hash = models.CharField(
         max_length=64,
-        unique=True,
         verbose_name="Hash SHA-256",
         help_text="Empreinte cryptographique garantissant l'intégrité"
     )
@@ -219,6 +422,11 @@ class Document(BaseModel):
                 condition=models.Q(is_current_version=True),
                 name='unique_current_version_per_dossier'
             ),
+            # Un contenu une seule fois par dossier (une même pièce peut figurer dans plusieurs dossiers)
+            models.UniqueConstraint(
+                fields=['dossier', 'file_hash'],
+                name='unique_file_hash_per_dossier'
+            ),
             # Version 1 ne doit pas avoir de précédente
             models.CheckConstraint(
                 check=(
@@ -241,6 +449,14 @@ class Document(BaseModel):
     def __str__(self):
         return f"{self.title} (v{self.version})"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Détection des changements de version courante (compteurs du dossier)
+        instance._loaded_is_current_version = instance.__dict__.get('is_current_version')
+        return instance
+    
+    @transaction.atomic
     def save(self, *args, **kwargs):
         """Calcul automatique du hash et des métadonnées"""
         if self.file and not self.file_hash:
@@ -14,7 +14,7 @@ from .models import Document, Folder
 class FolderSerializer(serializers.ModelSerializer):
     """Serializer pour les dossiers avec chemin complet"""
     
-    full_path = serializers.SerializerMethodField()
+    full_path = serializers.CharField(read_only=True)
     created_by_name = serializers.CharField(source='created_by.get_full_name', read_only=True)
     
     class Meta:
@@ -25,19 +25,33 @@ class FolderSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at']
     
-    def get_full_path(self, obj):
-        return obj.get_full_path()
-    
     def validate(self, attrs):
         """Validation de la hiérarchie"""
         parent = attrs.get('parent')
-        dossier = attrs.get('dossier')
+        dossier = attrs.get('dossier', getattr(self.instance, 'dossier', None))
         
         if parent and parent.dossier != dossier:
             raise serializers.ValidationError({
                 'parent': "Le dossier parent doit appartenir au même dossier juridique"
             })
         
+        # Déplacement : la cible ne peut pas se trouver dans la branche déplacée
+        if parent and self.instance and parent.is_descendant_of(self.instance):
+            raise serializers.ValidationError({
+                'parent': "Un dossier ne peut pas être déplacé dans l'un de ses sous-dossiers"
+            })
+        
+        # Même dossier juridique, profondeur et longueur du chemin de la branche
+        folder = self.instance or Folder()
+        try:
+            folder.check_placement(
+                parent=attrs.get('parent', folder.parent if self.instance else None),
+                dossier_id=getattr(dossier, 'pk', None),
+                name=attrs.get('name', folder.name),
+            )
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError(exc.message_dict)
+        
         return attrs
 
 
@@ -72,7 +86,7 @@ class DocumentSerializer(serializers.ModelSerializer):
     
     # Champs en lecture seule calculés
     uploaded_by_name = serializers.CharField(source='uploaded_by.get_full_name', read_only=True)
-    folder_path = serializers.CharField(source='folder.get_full_path', read_only=True, allow_null=True)
+    folder_path = serializers.CharField(source='folder.full_path', read_only=True, allow_null=True)
     file_size_human = serializers.SerializerMethodField()
     integrity_verified = serializers.SerializerMethodField()
     download_url = serializers.SerializerMethodField()
@@ -272,3 +286,32 @@ class DocumentVersionCreateSerializer(serializers.Serializer):
         """Réutilise la validation stricte de DocumentSerializer"""
         doc_serializer = DocumentSerializer()
         return doc_serializer.validate_file(file)
+
+
+class DocumentExportSerializer(serializers.Serializer):
+    """
+    Paramètres de l'export ZIP.
+    Utilisé pour l'endpoint POST /documents/export/
+    
+    Exactement un périmètre : dossier entier, sous-arborescence ou liste de documents
+    (tous rattachés au même dossier).
+    """
+    
+    dossier = serializers.UUIDField(required=False)
+    folder = serializers.UUIDField(required=False)
+    documents = serializers.ListField(
+        child=serializers.UUIDField(),
+        required=False,
+        allow_empty=False,
+        max_length=5000
+    )
+    all_versions = serializers.BooleanField(default=False)
+    
+    def validate(self, attrs):
+        scopes = [key for key in ('dossier', 'folder', 'documents') if attrs.get(key)]
+        if len(scopes) != 1:
+            raise serializers.ValidationError(
+                "Indiquez exactement un périmètre : 'dossier', 'folder' ou 'documents'"
+            )
+        attrs['scope'] = scopes[0]
+        return attrs
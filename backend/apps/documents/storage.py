@@ -9,6 +9,7 @@ from pathlib import Path
 from typing import Optional
 
 from django.conf import settings
+from django.db import transaction
 from django.core.files.storage import FileSystemStorage
 from django.core.files.base import File, ContentFile
 from cryptography.fernet import Fernet
@@ -128,6 +129,25 @@ class EncryptedFileStorage(FileSystemStorage):
         except Exception as e:
             raise ValueError(f"Échec du déchiffrement du fichier {name}: {str(e)}")
     
+    def read_decrypted(self, name: str) -> bytes:
+        """
+        Lit et déchiffre un fichier sans passer par _open (pas d'audit unitaire).
+        Réservé aux traitements en lot qui journalisent eux-mêmes un résumé.
+        
+        Un jeton Fernet n'est authentifiable qu'en entier : le déchiffrement
+        porte donc sur le fichier complet, jamais sur un fragment.
+        """
+        encrypted_file = FileSystemStorage._open(self, name, 'rb')
+        try:
+            encrypted_data = encrypted_file.read()
+        finally:
+            encrypted_file.close()
+        
+        try:
+            return self.cipher.decrypt(encrypted_data)
+        except Exception as e:
+            raise ValueError(f"Échec du déchiffrement du fichier {name}: {str(e)}")
+    
     def get_available_name(self, name: str, max_length: Optional[int] = None) -> str:
         """
         Surcharge pour éviter les collisions de noms.
@@ -177,12 +197,14 @@ class AuditedFileStorage(EncryptedFileStorage):
         from django.contrib.contenttypes.models import ContentType
         
         try:
-            AuditLog.objects.create(
-                user=user,
-                action_type='FILE_ACCESS',
-                description=f"{action} - {file_path}",
-                changes={'action': action, 'path': file_path}
-            )
+            # Point de sauvegarde : un échec d'audit ne doit pas invalider la transaction en cours
+            with transaction.atomic():
+                AuditLog.objects.create(
+                    user=user,
+                    action_type='FILE_ACCESS',
+                    description=f"{action} - {file_path}",
+                    changes={'action': action, 'path': file_path}
+                )
         except Exception:
             # Ne pas bloquer les opérations si l'audit échoue
             pass
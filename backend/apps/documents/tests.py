@@ -0,0 +1,307 @@
+import io
+import os
+import shutil
+import tempfile
+import zipfile
+
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from rest_framework.test import APITestCase
+from apps.audit.models import AuditLog
+from apps.documents.models import Document, Folder
+from apps.dossiers.models import Dossier
+from apps.clients.models import Client
+
+User = get_user_model()
+
+
+class FolderTreeTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='folderuser',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='FOLD/2026/001'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Marie',
+            last_name='Nze',
+            phone_primary='+24177000010',
+        )
+        self.dossier = Dossier.objects.create(
+            title="Dossier arborescence",
+            client=self.client_obj,
+            responsible=self.user,
+            category='CONTENTIEUX'
+        )
+        self.root = self._folder("Procédure")
+        self.pieces = self._folder("Pièces", self.root)
+        self.expertise = self._folder("Expertise", self.pieces)
+        self.archives = self._folder("Archives")
+
+    def _folder(self, name, parent=None):
+        return Folder.objects.create(name=name, dossier=self.dossier, parent=parent, created_by=self.user)
+
+    def test_full_path_is_materialized(self):
+        self.assertEqual(self.expertise.full_path, "Procédure/Pièces/Expertise")
+        self.assertEqual(self.expertise.depth, 2)
+        self.assertTrue(self.expertise.tree_path.startswith(self.root.tree_path))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.expertise.get_full_path(), "Procédure/Pièces/Expertise")
+
+    def test_subtree_single_query(self):
+        with self.assertNumQueries(1):
+            names = set(Folder.objects.subtree(self.root).values_list('name', flat=True))
+        self.assertEqual(names, {"Procédure", "Pièces", "Expertise"})
+
+    def test_move_branch_rewrites_descendants(self):
+        pieces = Folder.objects.get(pk=self.pieces.pk)
+        pieces.parent = self.archives
+        pieces.save()
+
+        expertise = Folder.objects.get(pk=self.expertise.pk)
+        self.assertEqual(expertise.full_path, "Archives/Pièces/Expertise")
+        self.assertTrue(expertise.is_descendant_of(self.archives))
+        self.assertFalse(expertise.is_descendant_of(self.root))
+
+    def test_rename_branch_rewrites_descendants(self):
+        root = Folder.objects.get(pk=self.root.pk)
+        root.name = "Contentieux"
+        root.save()
+
+        self.assertEqual(Folder.objects.get(pk=self.expertise.pk).full_path, "Contentieux/Pièces/Expertise")
+
+    def test_cross_dossier_move_is_rejected(self):
+        other = Dossier.objects.create(
+            title="Autre dossier", client=self.client_obj, responsible=self.user, category='CONTENTIEUX'
+        )
+        pieces = Folder.objects.get(pk=self.pieces.pk)
+        pieces.dossier, pieces.parent = other, None
+        with self.assertRaises(ValidationError):
+            pieces.save()
+
+    def test_depth_limit_covers_moved_branch(self):
+        folder = self.expertise
+        while folder.depth < Folder.MAX_DEPTH:
+            folder = self._folder(f"Niveau {folder.depth + 1}", folder)
+        with self.assertRaises(ValidationError):
+            self._folder("Trop profond", folder)
+        # La branche Procédure (profondeur max) ne peut pas descendre d'un niveau
+        root = Folder.objects.get(pk=self.root.pk)
+        root.parent = self.archives
+        with self.assertRaises(ValidationError):
+            root.save()
+        self.assertEqual(Folder.objects.get(pk=folder.pk).depth, Folder.MAX_DEPTH)
+
+    def test_separator_in_name_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            Folder.objects.create(name="Pièces/2026", dossier=self.dossier, created_by=self.user)
+        self.expertise.name = "Expertise/contre-expertise"
+        with self.assertRaises(ValidationError):
+            self.expertise.save()
+
+    def test_build_tree(self):
+        with self.assertNumQueries(1):
+            tree = self.root.build_tree()
+        self.assertEqual(tree['subfolders'][0]['name'], "Pièces")
+        self.assertEqual(tree['subfolders'][0]['subfolders'][0]['name'], "Expertise")
+        self.assertEqual(tree['documents_count'], 0)
+
+
+class DocumentExportTest(APITestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            username='exportuser',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='EXP/2026/001'
+        )
+        client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Paul',
+            last_name='Mba',
+            phone_primary='+24177000011',
+        )
+        self.dossier = Dossier.objects.create(
+            title="Dossier export",
+            client=client_obj,
+            responsible=self.user,
+            category='CONTENTIEUX'
+        )
+        self.root = Folder.objects.create(name="Procédure", dossier=self.dossier, created_by=self.user)
+        self.pieces = Folder.objects.create(
+            name="Pièces", dossier=self.dossier, parent=self.root, created_by=self.user
+        )
+        Folder.objects.create(name="Vide", dossier=self.dossier, created_by=self.user)
+        self.assignation = self._document("assignation.txt", b"Assignation", self.root)
+        self.piece = self._document("piece1.txt", b"Piece 1", self.pieces)
+        self.piece_v2 = self.piece.create_new_version(
+            ContentFile(b"Piece 1 corrigee", name="piece1.txt"), self.user
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _document(self, filename, content, folder):
+        return Document.objects.create(
+            dossier=self.dossier,
+            folder=folder,
+            uploaded_by=self.user,
+            file=ContentFile(content, name=filename),
+            title=filename,
+            original_filename=filename,
+            file_extension='.txt',
+            mime_type='text/plain',
+        )
+
+    def _export(self, **payload):
+        response = self.client.post('/api/documents/documents/export/', payload, format='json')
+        self.assertEqual(response.status_code, 200)
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_export_dossier_keeps_hierarchy(self):
+        before = AuditLog.objects.count()
+        archive = self._export(dossier=str(self.dossier.pk))
+        root = self.dossier.reference_code
+        self.assertEqual(archive.read(f"{root}/Procédure/assignation.txt"), b"Assignation")
+        self.assertEqual(archive.read(f"{root}/Procédure/Pièces/piece1.txt"), b"Piece 1 corrigee")
+        self.assertIn(f"{root}/Vide/", archive.namelist())
+        # Une seule entrée d'audit (et pas de FILE_ACCESS par fichier)
+        self.assertEqual(AuditLog.objects.count(), before + 1)
+        # Dossier entier : compteurs seulement, pas de liste d'identifiants
+        changes = AuditLog.objects.get(action_type='DOWNLOAD').changes
+        self.assertEqual(changes['document_count'], 2)
+        self.assertNotIn('documents', changes)
+
+    def test_export_folder_all_versions(self):
+        archive = self._export(folder=str(self.pieces.pk), all_versions=True)
+        names = {name.rsplit('/', 1)[-1] for name in archive.namelist() if not name.endswith('/')}
+        self.assertEqual(names, {"piece1 (v1).txt", "piece1 (v2).txt"})
+
+    def test_export_neutralizes_relative_segments(self):
+        Folder.objects.filter(pk=self.pieces.pk).update(full_path="Procédure/..")
+        self.pieces.refresh_from_db()
+        dots = Folder.objects.create(name=".", dossier=self.dossier, created_by=self.user)
+        self._document("note.txt", b"Note", dots)
+        archive = self._export(dossier=str(self.dossier.pk))
+        root = self.dossier.reference_code
+        names = archive.namelist()
+        self.assertIn(f"{root}/Procédure/_/piece1.txt", names)
+        self.assertIn(f"{root}/_/note.txt", names)
+        self.assertFalse([name for name in names if '..' in name.split('/') or '.' in name.split('/')])
+
+    def test_export_reports_integrity_failure(self):
+        Document.objects.filter(pk=self.assignation.pk).update(file_hash='0' * 64)
+        archive = self._export(documents=[str(self.assignation.pk), str(self.piece_v2.pk)])
+        root = self.dossier.reference_code
+        self.assertNotIn(f"{root}/Procédure/assignation.txt", archive.namelist())
+        self.assertIn(str(self.assignation.pk), archive.read(f"{root}/_ECHECS_INTEGRITE.txt").decode())
+        self.assertTrue(AuditLog.objects.filter(action_type='INTEGRITY_FAILURE').exists())
+        changes = AuditLog.objects.get(action_type='DOWNLOAD').changes
+        self.assertEqual(set(changes['documents']), {str(self.assignation.pk), str(self.piece_v2.pk)})
+
+
+class ImportDossierTreeTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.source = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root, DOCUMENT_IMPORT_ROOT=os.path.dirname(self.source)
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_user(
+            username='importuser',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='IMP/2026/001'
+        )
+        client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Alice',
+            last_name='Ndong',
+            phone_primary='+24177000012',
+        )
+        self.dossier = Dossier.objects.create(
+            title="Dossier import",
+            client=client_obj,
+            responsible=self.user,
+            category='CONTENTIEUX'
+        )
+        self._write("Procédure/assignation.txt", b"Assignation")
+        self._write("Procédure/Pièces/piece1.txt", b"Piece 1")
+        self._write("Procédure/Pièces/copie.txt", b"Piece 1")
+        self._write("Courriers/assignation.txt", b"Lettre")
+        self._write("Courriers/script.exe", b"MZ")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+        shutil.rmtree(self.source, ignore_errors=True)
+
+    def _write(self, relative_path, content):
+        path = os.path.join(self.source, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as target:
+            target.write(content)
+
+    def _import(self):
+        output = io.StringIO()
+        call_command(
+            'import_dossier_tree', self.dossier.reference_code, self.source,
+            user='importuser', workers=2, stdout=output
+        )
+        return output.getvalue()
+
+    def test_import_tree(self):
+        self._import()
+
+        paths = set(Folder.objects.filter(dossier=self.dossier).values_list('full_path', flat=True))
+        self.assertEqual(paths, {"Procédure", "Procédure/Pièces", "Courriers"})
+        pieces = Folder.objects.get(dossier=self.dossier, full_path="Procédure/Pièces")
+        self.assertTrue(pieces.is_descendant_of(Folder.objects.get(dossier=self.dossier, full_path="Procédure")))
+
+        documents = Document.objects.filter(dossier=self.dossier)
+        # Doublon de contenu ignoré, .exe refusé, homonyme renommé
+        self.assertEqual(documents.count(), 3)
+        self.assertEqual(
+            set(documents.values_list('original_filename', flat=True)),
+            {"assignation.txt", "assignation (2).txt", "copie.txt"}
+        )
+        document = documents.get(folder__full_path="Procédure")
+        self.assertTrue(document.verify_integrity())
+        self.assertEqual(document.file.read(), b"Assignation")
+
+    def test_import_is_resumable(self):
+        self._import()
+        output = self._import()
+        self.assertIn("0 document(s) importé(s)", output)
+        self.assertEqual(Document.objects.filter(dossier=self.dossier).count(), 3)
+        self.assertEqual(Folder.objects.filter(dossier=self.dossier).count(), 3)
+
+    def test_same_file_is_imported_in_each_dossier(self):
+        self._import()
+        first = self.dossier
+        self.dossier = Dossier.objects.create(
+            title="Autre dossier", client=first.client, responsible=self.user, category='CONTENTIEUX'
+        )
+        output = self._import()
+        self.assertIn("3 document(s) importé(s)", output)
+        self.assertEqual(
+            set(Document.objects.filter(dossier=self.dossier).values_list('file_hash', flat=True)),
+            set(Document.objects.filter(dossier=first).values_list('file_hash', flat=True)),
+        )
+
+    def test_source_outside_import_root_is_refused(self):
+        with override_settings(DOCUMENT_IMPORT_ROOT=self.media_root):
+            with self.assertRaisesMessage(CommandError, "hors de la racine"):
+                self._import()
+        self.assertFalse(Document.objects.filter(dossier=self.dossier).exists())
@@ -3,9 +3,10 @@
 """
 ViewSets pour gestion des documents avec sécurité renforcée.
 """
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, StreamingHttpResponse
 from django.db import transaction
 from django.db.models import Q
+from django.utils import timezone
 from django.utils.decorators import method_decorator
 from django.views.decorators.cache import cache_page
 from django_filters.rest_framework import DjangoFilterBackend
@@ -17,7 +18,6 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.throttling import UserRateThrottle
 from rest_framework.exceptions import PermissionDenied, ValidationError
 
-from guardian.shortcuts import get_objects_for_user, assign_perm
 
 from .models import Document, Folder
 from .serializers import (
@@ -25,9 +25,11 @@ from .serializers import (
     DocumentUploadSerializer,
     DocumentVersionCreateSerializer,
     DocumentVersionHistorySerializer,
+    DocumentExportSerializer,
     FolderSerializer
 )
-from apps.dossiers.models import Dossier
+from .export import stream_zip
+from apps.dossiers.access import filter_by_accessible_dossiers
 from apps.audit.utils import log_action
 
 import logging
@@ -61,28 +63,8 @@ class FolderViewSet(viewsets.ModelViewSet):
     ordering = ['name']
     
     def get_queryset(self):
-        """Filtrage par permissions utilisateur"""
-        user = self.request.user
-        
-        if user.is_superuser or user.is_staff:
-            return self.queryset
-        
-        # Récupère les dossiers auxquels l'utilisateur a accès
-        try:
-            accessible_dossiers = get_objects_for_user(
-                user,
-                'dossiers.view_dossier',
-                klass=Dossier,
-                accept_global_perms=False
-            )
-            
-            if not accessible_dossiers.exists():
-                return self.queryset.none()
-            
-            return self.queryset.filter(dossier__in=accessible_dossiers)
-        except Exception as e:
-            logger.error(f"Erreur Guardian folders pour user {user.id}: {str(e)}")
-            return self.queryset.none()
+        """Filtrage par dossiers accessibles (ensemble mis en cache)"""
+        return filter_by_accessible_dossiers(self.queryset, self.request.user)
     
     def perform_create(self, serializer):
         """Attribution automatique du créateur et des permissions"""
@@ -101,23 +83,27 @@ class FolderViewSet(viewsets.ModelViewSet):
         """
         Retourne l'arborescence complète sous ce dossier.
         GET /folders/{id}/tree/
+        
+        Nombre de requêtes constant (chemin matérialisé + comptage agrégé).
         """
         folder = self.get_object()
+        return Response(folder.build_tree())
+    
+    @action(detail=True, methods=['get'])
+    def descendants(self, request, pk=None):
+        """
+        Liste à plat de tous les sous-dossiers (profondeur quelconque).
+        GET /folders/{id}/descendants/
+        """
+        folder = self.get_object()
+        queryset = Folder.objects.subtree(folder, include_self=False).select_related(
+            'dossier', 'parent', 'created_by'
+        ).order_by('tree_path')
         
-        def build_tree(folder_obj):
-            """Construction récursive de l'arbre"""
-            return {
-                'id': str(folder_obj.id),
-                'name': folder_obj.name,
-                'created_at': folder_obj.created_at,
-                'subfolders': [
-                    build_tree(sub) for sub in folder_obj.subfolders.all()
-                ],
-                'documents_count': folder_obj.documents.filter(is_current_version=True).count()
-            }
-        
-        tree_data = build_tree(folder)
-        return Response(tree_data)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(queryset, many=True).data)
 
 
 class DocumentViewSet(viewsets.ModelViewSet):
@@ -149,18 +135,19 @@ class DocumentViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """
-        Filtrage par permissions Guardian avec fallbacks et optimisations.
+        Filtrage par dossiers accessibles avec optimisations.
         
         Logique de permissions :
-        1. Superusers : accès à tous les documents
-        2. Staff/Admins : accès à tous les documents
-        3. Utilisateurs normaux : uniquement les dossiers accessibles via Guardian
-        4. Fallback : si aucun dossier accessible, retourne queryset vide (pas d'erreur)
+        1. Superusers et staff : accès à tous les documents
+        2. Utilisateurs normaux : documents des dossiers accessibles
+           (responsable, collaborateur ou permission Guardian) et documents propres
+        3. Aucun dossier accessible : uniquement les documents propres
         
         Optimisations :
         - select_related et prefetch_related pour éviter N+1
         - Filtre par versions courantes par défaut (paramètre all_versions pour override)
-        - Cache des permissions Guardian (optionnel)
+        - Ensemble des dossiers accessibles mis en cache par utilisateur
+          (voir apps.dossiers.access), filtre IN sans jointure ni distinct()
         """
         user = self.request.user
         queryset = self.queryset
@@ -170,48 +157,8 @@ class DocumentViewSet(viewsets.ModelViewSet):
         if not show_all_versions:
             queryset = queryset.filter(is_current_version=True)
         
-        # 2. Superusers : accès total
-        if user.is_superuser:
-            return queryset
-        
-        # 3. Staff : accès total (administrateurs du cabinet)
-        if user.is_staff:
-            return queryset
-        
-        # 4. Utilisateurs normaux : filtrage par permissions Guardian
-        try:
-            # Récupérer les dossiers accessibles via Guardian
-            accessible_dossiers = get_objects_for_user(
-                user,
-                'dossiers.view_dossier',
-                klass=Dossier,
-                accept_global_perms=False  # Uniquement permissions objet
-            )
-            
-            # IMPORTANT : Vérifier si l'utilisateur a accès à au moins un dossier
-            if not accessible_dossiers.exists():
-                # Fallback : retourner queryset vide plutôt qu'une erreur
-                # L'utilisateur verra simplement "Aucun document" dans l'interface
-                logger.info(f"User {user.id} n'a accès à aucun dossier")
-                return queryset.none()
-            
-            # 5. Filtrage additionnel : documents uploadés par l'utilisateur
-            # Même si le dossier n'est plus accessible, on peut voir ses propres uploads
-            own_documents = Q(uploaded_by=user)
-            
-            # Combiner : documents des dossiers accessibles OU documents propres
-            queryset = queryset.filter(
-                Q(dossier__in=accessible_dossiers) | own_documents
-            )
-            
-            return queryset.distinct()  # Éviter les doublons
-            
-        except Exception as e:
-            # En cas d'erreur Guardian, logger et retourner vide pour sécurité
-            logger.error(f"Erreur Guardian pour user {user.id}: {str(e)}", exc_info=True)
-            
-            # Fallback sécurisé : retourner uniquement les documents propres
-            return queryset.filter(uploaded_by=user)
+        # 2. Dossiers accessibles OU documents uploadés par l'utilisateur
+        return filter_by_accessible_dossiers(queryset, user, extra=Q(uploaded_by=user))
     
     def get_throttles(self):
         """Rate limiting différencié selon l'action"""
@@ -375,4 +322,111 @@ class DocumentViewSet(viewsets.ModelViewSet):
             return response
         except Exception as e:
             logger.error(f"Erreur téléchargement document {document.id}: {str(e)}")
-            raise Http404("Document introuvable")
\ No newline at end of file
+            raise Http404("Document introuvable")
+    
+    @action(detail=False, methods=['post'])
+    def export(self, request):
+        """
+        Export ZIP en flux, arborescence des sous-dossiers conservée.
+        POST /documents/export/
+        
+        Body (un seul périmètre) :
+        - dossier (UUID) : tout le dossier
+        - folder (UUID) : le sous-dossier et ses descendants
+        - documents (liste d'UUID) : sélection explicite, d'un même dossier
+        - all_versions (bool) : toutes les versions au lieu des seules courantes
+        
+        Une seule entrée d'audit résume l'export (pas de log par document).
+        """
+        serializer = DocumentExportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        documents = filter_by_accessible_dossiers(
+            Document.objects.select_related('dossier', 'folder'),
+            request.user,
+            extra=Q(uploaded_by=request.user)
+        )
+        if not params['all_versions']:
+            documents = documents.filter(is_current_version=True)
+        
+        folders = Folder.objects.none()
+        scope = params['scope']
+        if scope == 'dossier':
+            from apps.dossiers.models import Dossier
+            dossier = filter_by_accessible_dossiers(Dossier.objects.all(), request.user, field='pk').filter(
+                pk=params['dossier']
+            ).first()
+            if dossier is None:
+                raise Http404("Dossier introuvable")
+            documents = documents.filter(dossier=dossier)
+            folders = Folder.objects.filter(dossier=dossier)
+        elif scope == 'folder':
+            folder = filter_by_accessible_dossiers(
+                Folder.objects.select_related('dossier'), request.user
+            ).filter(pk=params['folder']).first()
+            if folder is None:
+                raise Http404("Sous-dossier introuvable")
+            dossier = folder.dossier
+            folders = Folder.objects.subtree(folder)
+            documents = documents.filter(folder__in=folders.values('pk'))
+        else:
+            requested = set(params['documents'])
+            documents = documents.filter(pk__in=requested)
+        
+        documents = list(documents.order_by('folder__tree_path', 'original_filename', 'version'))
+        if scope == 'documents':
+            missing = requested - {doc.pk for doc in documents}
+            if missing:
+                return Response(
+                    {'detail': "Documents introuvables", 'missing': sorted(str(pk) for pk in missing)},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            if len({doc.dossier_id for doc in documents}) > 1:
+                raise ValidationError({'documents': "La sélection doit appartenir à un seul dossier"})
+            dossier = documents[0].dossier
+            folders = {doc.folder for doc in documents if doc.folder_id}
+        
+        changes = {
+            'scope': scope,
+            'all_versions': params['all_versions'],
+            'folder': str(params['folder']) if scope == 'folder' else None,
+            'document_count': len(documents),
+            'total_size': sum(doc.file_size for doc in documents),
+        }
+        if scope == 'documents':
+            # Sélection explicite (bornée par le sérialiseur) : les dossiers et
+            # sous-arborescences se retrouvent par leur périmètre, sans liste
+            changes['documents'] = [str(doc.pk) for doc in documents]
+        log_action(
+            user=request.user,
+            obj=dossier,
+            action_type='DOWNLOAD',
+            description=f"Export ZIP de {len(documents)} document(s) ({scope})",
+            changes=changes,
+            request=request
+        )
+        
+        summary = {}
+        
+        def content():
+            yield from stream_zip(
+                documents,
+                folders=folders,
+                root=dossier.reference_code,
+                all_versions=params['all_versions'],
+                summary=summary
+            )
+            if summary['failed']:
+                log_action(
+                    user=request.user,
+                    obj=dossier,
+                    action_type='INTEGRITY_FAILURE',
+                    description=f"Export ZIP : {len(summary['failed'])} document(s) exclu(s)",
+                    changes={'failed': summary['failed']}
+                )
+        
+        filename = f"{dossier.reference_code}_{timezone.now():%Y%m%d_%H%M}.zip"
+        response = StreamingHttpResponse(content(), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,225 @@
+"""
+Résolution centralisée des dossiers accessibles par utilisateur.
+
+Un utilisateur non-staff accède à un dossier s'il en est le responsable,
+s'il figure parmi les collaborateurs assignés, ou s'il détient la permission
+objet Guardian `view_dossier` (directement ou via un groupe). Ces trois
+sources sont consolidées dans la table indexée `DossierMembership`.
+
+L'ensemble des identifiants est mis en cache (cache partagé) et invalidé
+par les signaux déclarés dans `apps.dossiers.signals`.
+"""
+import threading
+import uuid
+from contextlib import contextmanager
+from typing import Optional, FrozenSet
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+
+
+CACHE_KEY_PREFIX = 'dossiers:accessible_ids'
+CACHE_TIMEOUT = getattr(settings, 'DOSSIER_ACCESS_CACHE_TIMEOUT', 60 * 15)
+
+# Synchronisations différées (opérations en masse), par thread
+_deferred = threading.local()
+
+# Émis à chaque invalidation (argument user_ids) : les caches dérivés des
+# adhésions (flux iCalendar de l'agenda) s'y abonnent sans que l'accès en dépende
+access_invalidated = Signal()
+
+# Au-delà, on filtre par semi-jointure sur DossierMembership plutôt que par liste IN littérale
+INLINE_IDS_MAX = getattr(settings, 'DOSSIER_ACCESS_INLINE_IDS_MAX', 500)
+
+
+def _cache_key(user_id) -> str:
+    return f"{CACHE_KEY_PREFIX}:{user_id}"
+
+
+def has_global_access(user) -> bool:
+    """Superusers et staff (secrétariat global) voient tous les dossiers"""
+    return bool(user.is_superuser or user.is_staff)
+
+
+def compute_accessible_dossier_ids(user) -> FrozenSet[uuid.UUID]:
+    """Calcule (sans cache) les identifiants des dossiers accessibles"""
+    from .models import DossierMembership
+
+    return frozenset(
+        DossierMembership.objects.filter(user=user).values_list('dossier_id', flat=True)
+    )
+
+
+def get_accessible_dossier_ids(user) -> Optional[FrozenSet[uuid.UUID]]:
+    """
+    Identifiants des dossiers accessibles par l'utilisateur.
+    
+    Returns:
+        None si l'accès est global (staff/superuser), sinon un frozenset d'UUID
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+
+    if has_global_access(user):
+        return None
+
+    key = _cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None:
+        return frozenset(uuid.UUID(pk) for pk in cached)
+
+    ids = compute_accessible_dossier_ids(user)
+    cache.set(key, [str(pk) for pk in ids], CACHE_TIMEOUT)
+    return ids
+
+
+def filter_by_accessible_dossiers(queryset, user, field: str = 'dossier', extra: Optional[Q] = None):
+    """
+    Restreint un queryset aux objets rattachés à un dossier accessible.
+    
+    Args:
+        queryset: QuerySet à filtrer
+        user: Utilisateur courant
+        field: Chemin vers le dossier ('dossier', 'pk' pour Dossier lui-même…)
+        extra: Condition supplémentaire combinée en OU (ex: documents propres)
+    """
+    ids = get_accessible_dossier_ids(user)
+    if ids is None:
+        return queryset
+
+    if len(ids) > INLINE_IDS_MAX:
+        # Semi-jointure sur l'index unique (user, dossier) de DossierMembership
+        from .models import DossierMembership
+        ids = DossierMembership.objects.filter(user=user).values('dossier_id')
+
+    lookup = 'pk__in' if field == 'pk' else f"{field}_id__in"
+    condition = Q(**{lookup: ids})
+    if extra is not None:
+        condition |= extra
+    elif isinstance(ids, frozenset) and not ids:
+        return queryset.none()
+
+    return queryset.filter(condition)
+
+
+def invalidate_user_access(*users) -> None:
+    """Invalide le cache d'accès d'un ou plusieurs utilisateurs (instances ou identifiants)"""
+    user_ids = [getattr(user, 'pk', user) for user in users if user is not None]
+    keys = [_cache_key(user_id) for user_id in user_ids]
+    if keys:
+        cache.delete_many(keys)
+        # Seconde invalidation après commit : une requête concurrente a pu
+        # remettre en cache l'état antérieur avant la fin de la transaction
+        transaction.on_commit(lambda: cache.delete_many(keys))
+        access_invalidated.send(sender=invalidate_user_access, user_ids=user_ids)
+
+
+def sync_memberships(dossier_ids=None, user_ids=None) -> None:
+    """Resynchronise DossierMembership sur le périmètre donné et invalide les caches touchés"""
+    from .models import DossierMembership
+
+    pending = getattr(_deferred, 'pending', None)
+    if pending is not None:
+        pending.append((dossier_ids, user_ids))
+        return
+
+    affected = DossierMembership.objects.sync(dossier_ids=dossier_ids, user_ids=user_ids)
+    invalidate_user_access(*affected)
+
+
+def _merge_scopes(scopes):
+    """Union des périmètres différés (None = sans restriction sur cet axe)"""
+    merged = [set(), set()]
+    for scope in scopes:
+        for axis, values in enumerate(scope):
+            if merged[axis] is None:
+                continue
+            merged[axis] = None if values is None else merged[axis] | set(values)
+    return merged
+
+
+@contextmanager
+def deferred_membership_sync():
+    """
+    Regroupe les synchronisations déclenchées par les signaux en une seule,
+    exécutée à la sortie du bloc (opérations en masse).
+    """
+    if getattr(_deferred, 'pending', None) is not None:
+        yield
+        return
+
+    _deferred.pending = []
+    try:
+        yield
+        scopes = _deferred.pending
+    finally:
+        _deferred.pending = None
+
+    if scopes:
+        dossier_ids, user_ids = _merge_scopes(scopes)
+        sync_memberships(dossier_ids=dossier_ids, user_ids=user_ids)
+
+
+COLLABORATOR_PERMISSIONS = {'view': 'view_dossier', 'change': 'change_dossier'}
+
+
+@transaction.atomic
+def assign_collaborators(dossiers, users, permissions=('view',)):
+    """
+    Ajoute des collaborateurs à plusieurs dossiers en une transaction.
+    
+    La permission 'change' n'est accordée qu'aux professionnels du droit.
+    
+    Args:
+        dossiers: QuerySet de Dossier
+        users: Liste d'utilisateurs
+        permissions: Sous-ensemble de ('view', 'change')
+    """
+    from guardian.shortcuts import assign_perm
+    from .models import Dossier
+
+    dossier_ids = list(dossiers.values_list('pk', flat=True))
+    Through = Dossier.assigned_users.through
+
+    with deferred_membership_sync():
+        Through.objects.bulk_create(
+            [Through(dossier_id=dossier_id, user_id=user.pk) for dossier_id in dossier_ids for user in users],
+            ignore_conflicts=True,
+        )
+
+        targets = Dossier.objects.filter(pk__in=dossier_ids)
+        for key in permissions:
+            codename = COLLABORATOR_PERMISSIONS.get(key)
+            if codename is None:
+                continue
+            for user in users:
+                if key == 'change' and not user.is_legal_professional:
+                    continue
+                assign_perm(codename, user, targets)
+
+        sync_memberships(dossier_ids=dossier_ids, user_ids=[user.pk for user in users])
+
+
+@transaction.atomic
+def remove_collaborators(dossiers, users):
+    """
+    Retire des collaborateurs de plusieurs dossiers en une transaction.
+    Le responsable d'un dossier n'en est jamais retiré.
+    """
+    from guardian.shortcuts import remove_perm
+    from .models import Dossier
+
+    dossier_ids = list(dossiers.values_list('pk', flat=True))
+    Through = Dossier.assigned_users.through
+
+    with deferred_membership_sync():
+        for user in users:
+            targets = Dossier.objects.filter(pk__in=dossier_ids).exclude(responsible=user)
+            Through.objects.filter(user_id=user.pk, dossier__in=targets).delete()
+            for codename in COLLABORATOR_PERMISSIONS.values():
+                remove_perm(codename, user, targets)
+
+        sync_memberships(dossier_ids=dossier_ids, user_ids=[user.pk for user in users])
@@ -1,7 +1,9 @@
 # backend/apps/dossiers/admin.py
 
 from django.contrib import admin
-from .models import Dossier
+
+from .models import Dossier, DossierMembership
+
 
 @admin.register(Dossier)
 class DossierAdmin(admin.ModelAdmin):
@@ -34,4 +36,12 @@ class DossierAdmin(admin.ModelAdmin):
     def is_overdue(self, obj):
         return obj.is_overdue
     is_overdue.boolean = True
-    is_overdue.short_description = "En retard"
\ No newline at end of file
+    is_overdue.short_description = "En retard"
+
+
+@admin.register(DossierMembership)
+class DossierMembershipAdmin(admin.ModelAdmin):
+    list_display = ('dossier', 'user', 'level')
+    list_filter = ('level',)
+    search_fields = ('dossier__reference_code', 'user__username', 'user__last_name')
+    raw_id_fields = ('dossier', 'user')
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class DossiersConfig(AppConfig):
+    default_auto_field = "django.db.models.BigAutoField"
+    name = "apps.dossiers"
+
+    def ready(self):
+        # Invalidation du cache des dossiers accessibles
+        import apps.dossiers.signals  # noqa: F401
@@ -0,0 +1,528 @@
+"""
+Import en masse de clients et de dossiers depuis un tableur (CSV ou XLSX).
+
+Les lignes sont lues en flux et traitées par lots :
+- conversion et validation des champs sans requête (clean_fields/clean) ;
+- unicité contrôlée contre des ensembles préchargés une fois en mémoire,
+  complétés au fil du fichier (doublons internes) ;
+- insertion par bulk_create, références de dossiers réservées par bloc.
+
+bulk_create n'émettant pas de signaux, les index dérivés (recherche, doublons,
+conflits d'intérêts, accès, compteurs) et l'audit sont alimentés par lot.
+"""
+import codecs
+import csv
+import io
+import os
+import zipfile
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from itertools import chain, islice
+from pathlib import PurePosixPath
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from apps.agenda import reminders
+from apps.audit.utils import log_bulk_action
+from apps.clients.models import Client, ClientBlockingKey, ClientSearchTrigram, build_search_text
+from apps.core.utils import normalize_search_text
+from . import counters
+from .access import sync_memberships
+from .models import ConflictParty, Dossier
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_BATCH_SIZE = 500
+
+# Au-delà, les lignes en erreur sont comptées mais plus détaillées
+MAX_REPORTED_ERRORS = 1000
+
+# Formats de date des tableurs francophones (en plus de AAAA-MM-JJ)
+DATE_INPUT_FORMATS = ('%d/%m/%Y', '%d-%m-%Y', '%d.%m.%Y')
+
+TRUE_VALUES = {'1', 'true', 'vrai', 'oui', 'o', 'yes', 'y', 'x'}
+FALSE_VALUES = {'0', 'false', 'faux', 'non', 'n', 'no'}
+
+
+# ─── Lecture en flux ───
+
+def read_rows(source, filename=None, encoding='utf-8-sig'):
+    """
+    Itère sur les lignes d'un fichier CSV ou XLSX (en-têtes en première ligne).
+
+    Args:
+        source: Chemin ou fichier binaire ouvert (ex: fichier uploadé)
+        filename: Nom servant à déterminer le format (défaut: nom de la source)
+        encoding: Encodage des CSV (les exports Excel français sont souvent en cp1252)
+
+    Yields:
+        (numéro de ligne, dict en-tête → valeur)
+    """
+    name = filename or getattr(source, 'name', None) or str(source)
+    suffix = PurePosixPath(name).suffix.lower()
+    if suffix == '.xlsx':
+        return _read_xlsx(source)
+    if suffix in ('.csv', '.txt'):
+        try:
+            codecs.lookup(encoding)
+        except LookupError:
+            raise ValueError(f"Encodage inconnu : '{encoding}'")
+        return _read_csv(source, encoding)
+    raise ValueError(f"Format non supporté : '{suffix or name}' (CSV ou XLSX attendu)")
+
+
+def _read_csv(source, encoding):
+    owned = isinstance(source, (str, os.PathLike))
+    binary = open(source, 'rb') if owned else source
+    text = io.TextIOWrapper(binary, encoding=encoding, newline='')
+    try:
+        header = text.readline()
+        # Excel en français exporte avec « ; »
+        delimiter = ';' if header.count(';') > header.count(',') else ','
+        reader = csv.reader(chain([header], text), delimiter=delimiter)
+        headers = next(reader, [])
+        for values in reader:
+            if any(value.strip() for value in values):
+                yield reader.line_num, dict(zip(headers, values))
+    finally:
+        # Le fichier appartient à l'appelant (upload) : on ne le ferme pas avec l'adaptateur
+        text.detach()
+        if owned:
+            binary.close()
+
+
+def _read_xlsx(source):
+    try:
+        import openpyxl
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ValueError("La lecture des fichiers XLSX nécessite le paquet openpyxl")
+
+    try:
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, InvalidFileException, KeyError) as e:
+        # KeyError : archive ZIP valide sans les parties d'un classeur
+        raise ValueError(f"Fichier XLSX illisible ou corrompu ({e})")
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = [str(value or '') for value in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield line, dict(zip(headers, values))
+    finally:
+        workbook.close()
+
+
+# ─── Rapport ───
+
+@dataclass
+class BulkImportReport:
+    schema: str
+    dry_run: bool = False
+    total: int = 0
+    created: int = 0
+    failed: int = 0
+    errors: list = field(default_factory=list)
+    ignored_columns: list = field(default_factory=list)
+
+    def add_error(self, line, error):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            messages = error.message_dict if hasattr(error, 'error_dict') else {'__all__': error.messages}
+            self.errors.append({'line': line, 'errors': messages})
+
+    def as_dict(self):
+        return {
+            'schema': self.schema,
+            'dry_run': self.dry_run,
+            'total': self.total,
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'ignored_columns': self.ignored_columns,
+        }
+
+
+# ─── Importeurs ───
+
+class BaseImporter:
+    """
+    Usage:
+        importer = ClientImporter(user=request.user)
+        report = importer.run(read_rows(fichier))
+    """
+
+    schema = None
+    model = None
+    fields = ()
+    # En-têtes supplémentaires acceptés (normalisés) → champ
+    aliases = {}
+
+    def __init__(self, user, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        self.user = user
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.report = BulkImportReport(schema=self.schema, dry_run=dry_run)
+        self._columns = None
+        self.preload()
+
+    def preload(self):
+        """Charge en mémoire les valeurs nécessaires aux contrôles d'unicité"""
+
+    def run(self, rows):
+        iterator = iter(rows)
+        while True:
+            batch = list(islice(iterator, self.batch_size))
+            if not batch:
+                break
+            self._process_batch(batch)
+        return self.report
+
+    # Colonnes
+
+    def _header_map(self):
+        mapping = {}
+        for name in self.fields:
+            model_field = self.model._meta.get_field(name)
+            for alias in (name, name.replace('_', ' '), str(model_field.verbose_name)):
+                mapping[normalize_search_text(alias)] = name
+        mapping.update(self.aliases)
+        return mapping
+
+    def _resolve_columns(self, headers):
+        mapping = self._header_map()
+        columns = {}
+        for header in headers:
+            name = mapping.get(normalize_search_text(header))
+            if name:
+                columns[header] = name
+            elif header:
+                self.report.ignored_columns.append(header)
+        if not columns:
+            raise ValueError("Aucune colonne reconnue : vérifiez la ligne d'en-têtes")
+        return columns
+
+    def map_row(self, row):
+        if self._columns is None:
+            self._columns = self._resolve_columns(list(row))
+        values = {}
+        for header, name in self._columns.items():
+            value = row.get(header)
+            if isinstance(value, str):
+                value = value.strip()
+            if value not in (None, ''):
+                values[name] = value
+        return values
+
+    # Conversion
+
+    def convert(self, name, value):
+        model_field = self.model._meta.get_field(name)
+        if model_field.choices:
+            return self._convert_choice(model_field, value)
+        if isinstance(model_field, models.BooleanField):
+            text = str(value).strip().lower()
+            if text in TRUE_VALUES:
+                return True
+            if text in FALSE_VALUES:
+                return False
+            raise ValidationError(f"Valeur « {value} » non reconnue (oui/non attendu)")
+        if isinstance(model_field, models.DateField) and not isinstance(model_field, models.DateTimeField):
+            return self._convert_date(model_field, value)
+        if isinstance(model_field, (models.CharField, models.TextField)):
+            return str(value)
+        return model_field.to_python(value)
+
+    @staticmethod
+    def _convert_choice(model_field, value):
+        text = str(value).strip()
+        for code, label in model_field.flatchoices:
+            if text.lower() in (str(code).lower(), str(label).lower()):
+                return code
+        raise ValidationError(f"Valeur « {text} » hors des choix autorisés")
+
+    @staticmethod
+    def _convert_date(model_field, value):
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        for date_format in DATE_INPUT_FORMATS:
+            try:
+                return datetime.strptime(str(value), date_format).date()
+            except ValueError:
+                continue
+        return model_field.to_python(str(value))
+
+    def build(self, values):
+        """Instance non sauvegardée, convertie et validée (ValidationError sinon)"""
+        errors, converted = {}, {}
+        for name, value in values.items():
+            try:
+                converted[name] = self.convert(name, value)
+            except ValidationError as e:
+                errors[name] = e.messages
+        if errors:
+            raise ValidationError(errors)
+
+        instance = self.model(**converted)
+        self.prepare(instance, values)
+        # Sans validate_unique/validate_constraints : une requête par ligne, remplacées par check_unique
+        instance.clean_fields(exclude=self.clean_exclude())
+        instance.clean()
+        return instance
+
+    def clean_exclude(self):
+        return []
+
+    def prepare(self, instance, values):
+        """Complète l'instance avant validation (relations, champs calculés)"""
+
+    def check_unique(self, instance):
+        """Lève ValidationError si l'instance entre en conflit avec la base ou le fichier"""
+
+    def remember(self, instance):
+        """Enregistre les valeurs uniques d'une ligne acceptée"""
+
+    def insert(self, instances):
+        raise NotImplementedError
+
+    # Traitement d'un lot
+
+    def _process_batch(self, batch):
+        valid = []
+        for line, row in batch:
+            self.report.total += 1
+            try:
+                instance = self.build(self.map_row(row))
+                self.check_unique(instance)
+            except ValidationError as e:
+                self.report.add_error(line, e)
+                continue
+            self.remember(instance)
+            valid.append((line, instance))
+
+        if not valid:
+            return
+        if not self.dry_run:
+            instances = [instance for _, instance in valid]
+            try:
+                with transaction.atomic():
+                    self.insert(instances)
+                    log_bulk_action(
+                        user=self.user,
+                        objects=instances,
+                        action_type='CREATE',
+                        description=f"Import en masse ({self.schema})",
+                    )
+            except IntegrityError as e:
+                # Écriture concurrente depuis le préchargement : le lot entier est refusé
+                logger.warning(f"Import {self.schema} : lot refusé ({e})")
+                for line, _ in valid:
+                    self.report.add_error(line, ValidationError(f"Conflit d'unicité lors de l'insertion : {e}"))
+                return
+        self.report.created += len(valid)
+
+
+class ClientImporter(BaseImporter):
+    schema = 'clients'
+    model = Client
+    fields = (
+        'client_type', 'first_name', 'last_name', 'date_of_birth', 'place_of_birth',
+        'ni_number', 'ni_type', 'company_name', 'rccm', 'nif',
+        'representative_name', 'representative_role',
+        'email', 'phone_primary', 'phone_secondary',
+        'address_line', 'neighborhood', 'city', 'country',
+        'data_source', 'consent_given', 'retention_period_years', 'notes',
+    )
+    aliases = {
+        'type': 'client_type',
+        'prenom': 'first_name',
+        'nom': 'last_name',
+        'telephone': 'phone_primary',
+        'adresse': 'address_line',
+    }
+
+    # Champs uniques contrôlés en mémoire
+    UNIQUE_FIELDS = ('rccm', 'nif', 'email')
+
+    def preload(self):
+        self.seen = {}
+        for name in self.UNIQUE_FIELDS:
+            self.seen[name] = set(
+                Client.objects.exclude(**{f"{name}__isnull": True}).values_list(name, flat=True).iterator()
+            )
+        self.seen['ni'] = set(
+            Client.objects.filter(client_type=Client.ClientType.INDIVIDUAL, ni_number__isnull=False)
+            .values_list('ni_number', 'ni_type').iterator()
+        )
+
+    def prepare(self, instance, values):
+        # Mêmes normalisations que Client.save(), plus les espaces des numéros saisis au tableur
+        instance.ni_number = instance.ni_number or None
+        instance.ni_type = instance.ni_type or None
+        instance.phone_primary = (instance.phone_primary or '').replace(' ', '')
+        instance.phone_secondary = (instance.phone_secondary or '').replace(' ', '') or None
+        if instance.consent_given:
+            instance.consent_date = timezone.now()
+        instance.search_text = build_search_text(instance)
+
+    def _ni_key(self, instance):
+        if instance.client_type == Client.ClientType.INDIVIDUAL and instance.ni_number:
+            return (instance.ni_number, instance.ni_type)
+        return None
+
+    def check_unique(self, instance):
+        errors = {}
+        for name in self.UNIQUE_FIELDS:
+            value = getattr(instance, name)
+            if value and value in self.seen[name]:
+                errors[name] = [f"« {value} » existe déjà"]
+        if self._ni_key(instance) in self.seen['ni']:
+            errors['ni_number'] = ["Pièce d'identité déjà enregistrée"]
+        if errors:
+            raise ValidationError(errors)
+
+    def remember(self, instance):
+        for name in self.UNIQUE_FIELDS:
+            if getattr(instance, name):
+                self.seen[name].add(getattr(instance, name))
+        if self._ni_key(instance):
+            self.seen['ni'].add(self._ni_key(instance))
+
+    def insert(self, instances):
+        Client.objects.bulk_create(instances, batch_size=self.batch_size)
+        ClientSearchTrigram.objects.index_new(instances)
+        ClientBlockingKey.objects.index_new(instances)
+        ConflictParty.objects.index_new(clients=instances)
+
+
+class DossierImporter(BaseImporter):
+    schema = 'dossiers'
+    model = Dossier
+    fields = (
+        'title', 'client', 'responsible', 'category', 'status', 'description',
+        'opponent', 'jurisdiction', 'critical_deadline', 'legal_basis',
+        'retention_period_years', 'opening_date', 'closing_date',
+    )
+    aliases = {
+        'intitule': 'title',
+        'client id': 'client',
+        'responsable': 'responsible',
+        'partie adverse': 'opponent',
+        'juridiction': 'jurisdiction',
+    }
+
+    def preload(self):
+        """
+        Index des clients par UUID, NIF, RCCM, email et nom exact (ambigu → None),
+        et des utilisateurs pouvant être responsables par identifiant et email.
+        """
+        self.clients = {}
+        names = defaultdict(set)
+        for pk, client_type, first_name, last_name, company_name, nif, rccm, email in Client.objects.values_list(
+            'pk', 'client_type', 'first_name', 'last_name', 'company_name', 'nif', 'rccm', 'email'
+        ).iterator():
+            for key in (str(pk), nif, rccm, (email or '').lower()):
+                if key:
+                    self.clients[key] = pk
+            name = company_name if client_type == Client.ClientType.COMPANY else f"{first_name} {last_name}"
+            names[normalize_search_text(name)].add(pk)
+        self.client_names = {name: (pks.pop() if len(pks) == 1 else None) for name, pks in names.items()}
+
+        roles = Dossier._meta.get_field('responsible').get_limit_choices_to().get('role__in', [])
+        self.responsibles = {}
+        self.default_responsible = None
+        for pk, username, email in get_user_model().objects.filter(role__in=roles, is_active=True).values_list(
+            'pk', 'username', 'email'
+        ):
+            self.responsibles[username.lower()] = pk
+            if email:
+                self.responsibles[email.lower()] = pk
+            if self.user is not None and pk == self.user.pk:
+                self.default_responsible = pk
+
+    def build(self, values):
+        client_ref = values.pop('client', '')
+        responsible_ref = values.pop('responsible', '')
+        errors = {}
+
+        client_id = self._resolve_client(str(client_ref))
+        if client_id is None:
+            errors['client'] = [f"Client introuvable ou ambigu : « {client_ref} »" if client_ref else "Client obligatoire"]
+
+        # Sans colonne responsable : l'auteur de l'import, s'il est habilité
+        responsible_id = (
+            self.responsibles.get(str(responsible_ref).lower()) if responsible_ref else self.default_responsible
+        )
+        if responsible_id is None:
+            errors['responsible'] = [f"Responsable introuvable ou non habilité : « {responsible_ref} »"]
+
+        try:
+            instance = super().build(values)
+        except ValidationError as e:
+            errors.update(e.message_dict if hasattr(e, 'error_dict') else {'__all__': e.messages})
+            instance = None
+        if errors:
+            raise ValidationError(errors)
+
+        instance.client_id = client_id
+        instance.responsible_id = responsible_id
+        return instance
+
+    def _resolve_client(self, reference):
+        reference = reference.strip()
+        return self.clients.get(reference) or self.clients.get(reference.lower()) or self.client_names.get(
+            normalize_search_text(reference)
+        )
+
+    def clean_exclude(self):
+        # Relations résolues depuis les index préchargés ; référence attribuée à l'insertion
+        return ['client', 'responsible', 'reference_code']
+
+    def prepare(self, instance, values):
+        if instance.status == Dossier.Status.ARCHIVED:
+            instance.archived_date = timezone.now()
+
+    def insert(self, instances):
+        # Références GAB-AAAA-NNNN réservées par bloc, selon l'année d'ouverture
+        by_year = defaultdict(list)
+        for instance in instances:
+            by_year[instance.opening_date.year].append(instance)
+        for year, group in by_year.items():
+            for instance, code in zip(group, Dossier.allocate_reference_codes(len(group), year=year)):
+                instance.reference_code = code
+
+        Dossier.objects.bulk_create(instances, batch_size=self.batch_size)
+        dossier_ids = [instance.pk for instance in instances]
+        sync_memberships(dossier_ids=dossier_ids, user_ids={instance.responsible_id for instance in instances})
+        ConflictParty.objects.index_new(dossiers=instances)
+        counters.recompute_clients({instance.client_id for instance in instances})
+        reminders.schedule_new_deadlines(instances, batch_size=self.batch_size)
+
+
+IMPORTERS = {
+    ClientImporter.schema: ClientImporter,
+    DossierImporter.schema: DossierImporter,
+}
+
+
+def run_import(schema, source, user, filename=None, batch_size=DEFAULT_BATCH_SIZE, dry_run=False,
+               encoding='utf-8-sig'):
+    """Point d'entrée commun à la commande et à l'API ; ValueError si fichier ou schéma invalide"""
+    try:
+        importer_class = IMPORTERS[schema]
+    except KeyError:
+        raise ValueError(f"Schéma inconnu : '{schema}' ({', '.join(IMPORTERS)})")
+    importer = importer_class(user=user, batch_size=batch_size, dry_run=dry_run)
+    try:
+        return importer.run(read_rows(source, filename=filename, encoding=encoding))
+    except UnicodeDecodeError:
+        raise ValueError(f"Encodage du fichier non reconnu (attendu : {encoding})")
@@ -0,0 +1,141 @@
+"""
+Vérification des conflits d'intérêts.
+
+Index ConflictParty alimenté par signaux : clients (nom ou raison sociale),
+représentants légaux et chaque partie adverse saisie dans Dossier.opponent.
+Avant l'ouverture d'un dossier :
+- la partie adverse ne doit pas être un client du cabinet ;
+- le client ne doit pas avoir été partie adverse dans un de nos dossiers.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, Value, When
+
+from apps.clients.dedup import COMPANY_STOPWORDS, phonetic_key
+from apps.core.utils import normalize_search_text, trigrams
+
+# Similarité minimale (trigrammes, 0 à 1) pour signaler un conflit
+CONFLICT_MIN_SIMILARITY = 0.5
+
+# Une correspondance phonétique exacte n'est jamais classée sous ce score
+PHONETIC_MATCH_SCORE = 0.8
+
+MAX_HITS = 20
+
+# Civilités et formes juridiques ignorées ("Mme Marie N'Dong" = "Marie Ndong", "SOGATRA SA" = "Sogatra")
+PARTY_STOPWORDS = COMPANY_STOPWORDS | {
+    'm', 'mr', 'mme', 'mlle', 'me', 'maitre', 'dr', 'monsieur', 'madame', 'mademoiselle',
+}
+
+# Séparateurs entre plusieurs parties adverses dans un même champ
+OPPONENT_SEPARATORS = re.compile(r'[,;/\n]|\bet\b|\bc/', re.IGNORECASE)
+
+
+def split_opponents(value: str) -> list:
+    """ "SOGATRA SA; Mme N'Dong et M. Obame" → ['SOGATRA SA', "Mme N'Dong", 'M. Obame'] """
+    return [part.strip() for part in OPPONENT_SEPARATORS.split(value or '') if part and part.strip()]
+
+
+def party_keys(name: str) -> tuple:
+    """(nom normalisé, clé phonétique indépendante de l'ordre des mots)"""
+    words = normalize_search_text(name).split()
+    normalized = ' '.join(word for word in words if word not in PARTY_STOPWORDS) or ' '.join(words)
+    key = '-'.join(sorted(filter(None, (phonetic_key(word) for word in normalized.split()))))
+    return normalized, key
+
+
+def similarity(a: str, b: str) -> float:
+    grams_a, grams_b = trigrams(a), trigrams(b)
+    if not grams_a or not grams_b:
+        return 0.0
+    return len(grams_a & grams_b) / len(grams_a | grams_b)
+
+
+def _candidates(queryset, normalized, key):
+    """
+    Présélection indexée : trigrammes sous PostgreSQL, clé phonétique/nom exact ailleurs.
+    Les plus proches d'abord (nom exact, clé phonétique, similarité) : la limite
+    ne doit écarter que les correspondances les plus lointaines.
+    """
+    condition = Q(normalized_name=normalized) | Q(phonetic_key=key)
+    queryset = queryset.annotate(
+        exact_match=Case(When(normalized_name=normalized, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        phonetic_match=Case(When(phonetic_key=key, then=Value(1)), default=Value(0), output_field=IntegerField()),
+    )
+    ordering = ['-exact_match', '-phonetic_match']
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.lookups import TrigramSimilar
+        from django.contrib.postgres.search import TrigramSimilarity
+        condition |= Q(TrigramSimilar(F('normalized_name'), Value(normalized)))
+        queryset = queryset.annotate(trigram_similarity=TrigramSimilarity('normalized_name', normalized))
+        ordering.append('-trigram_similarity')
+    return queryset.filter(condition).select_related('client', 'dossier').order_by(*ordering, 'pk')[:MAX_HITS * 5]
+
+
+def search_parties(name: str, kinds, exclude_client=None, exclude_dossier=None):
+    """Correspondances classées pour un nom parmi les parties des types donnés"""
+    from .models import ConflictParty
+
+    normalized, key = party_keys(name)
+    if not normalized:
+        return []
+
+    queryset = ConflictParty.objects.filter(kind__in=kinds)
+    if exclude_client is not None:
+        queryset = queryset.exclude(client=exclude_client)
+    if exclude_dossier is not None:
+        queryset = queryset.exclude(dossier=exclude_dossier)
+
+    hits = []
+    for party in _candidates(queryset, normalized, key):
+        score = similarity(normalized, party.normalized_name)
+        if key and party.phonetic_key == key:
+            score = max(score, PHONETIC_MATCH_SCORE)
+        if score >= CONFLICT_MIN_SIMILARITY:
+            hits.append({
+                'query': name,
+                'kind': party.kind,
+                'name': party.display_name,
+                'score': round(score, 2),
+                'client_id': str(party.client_id) if party.client_id else None,
+                'dossier_id': str(party.dossier_id) if party.dossier_id else None,
+                'dossier_reference': party.dossier.reference_code if party.dossier_id else None,
+            })
+    return hits
+
+
+def check_conflicts(client=None, client_name: str = '', opponent: str = '', exclude_dossier=None) -> list:
+    """
+    Conflits potentiels pour l'ouverture (ou la modification) d'un dossier.
+
+    Args:
+        client: Client du futur dossier (ses noms sont cherchés parmi les parties adverses)
+        client_name: Nom libre, si le client n'existe pas encore
+        opponent: Contenu du champ partie adverse (éventuellement plusieurs noms)
+        exclude_dossier: Dossier en cours de modification, ignoré
+
+    Returns:
+        Liste de hits triés par score décroissant
+    """
+    from .models import ConflictParty
+
+    hits = []
+    client_names = [client_name] if client_name else []
+    if client is not None:
+        client_names += [client.display_name, client.representative_name]
+    for name in filter(None, client_names):
+        hits += search_parties(name, [ConflictParty.Kind.OPPONENT], exclude_dossier=exclude_dossier)
+
+    for name in split_opponents(opponent):
+        hits += search_parties(
+            name,
+            [ConflictParty.Kind.CLIENT, ConflictParty.Kind.REPRESENTATIVE],
+            exclude_client=client,
+        )
+
+    # Dédoublonnage (un même dossier/client peut sortir pour plusieurs noms)
+    unique = {}
+    for hit in sorted(hits, key=lambda item: -item['score']):
+        unique.setdefault((hit['kind'], hit['client_id'], hit['dossier_id'], hit['name']), hit)
+    return list(unique.values())[:MAX_HITS]
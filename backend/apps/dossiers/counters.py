@@ -0,0 +1,140 @@
+"""
+Compteurs dénormalisés des dossiers et des clients.
+
+Dossier : documents courants, sous-dossiers, volume stocké (toutes versions),
+dernier dépôt et prochain événement. Client : nombre de dossiers.
+
+Mis à jour par UPDATE relatifs (F()) depuis les signaux (voir signals.py), dans
+la transaction de l'écriture d'origine. Les insertions groupées (bulk_create)
+appellent directement les fonctions ci-dessous. `recompute` recalcule tout en
+requêtes ensemblistes (commande recompute_counters).
+"""
+from django.db.models import (
+    BigIntegerField, Count, DateTimeField, F, IntegerField, OuterRef, Subquery, Sum, Value,
+)
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Dossier
+
+
+def _aggregate_subquery(queryset, expression, output_field):
+    """Sous-requête corrélée scalaire (0 si aucune ligne)"""
+    aggregate = Count('pk') if expression == 'count' else Sum(expression)
+    subquery = Subquery(
+        queryset.filter(dossier=OuterRef('pk')).order_by().values('dossier').annotate(value=aggregate).values('value'),
+        output_field=output_field,
+    )
+    return Coalesce(subquery, Value(0), output_field=output_field)
+
+
+def _next_event_subquery(today):
+    from apps.agenda.models import Event
+
+    return Subquery(
+        Event.objects.filter(dossier=OuterRef('pk'), start_date__gte=today)
+        .order_by('start_date').values('start_date')[:1]
+    )
+
+
+def _last_upload_subquery():
+    from apps.documents.models import Document
+
+    return Subquery(
+        Document.objects.filter(dossier=OuterRef('pk')).order_by('-uploaded_at').values('uploaded_at')[:1]
+    )
+
+
+# ─── Mises à jour incrémentales ───
+
+def add_documents(dossier_id, documents=0, size=0, uploaded_at=None):
+    """Ajoute (ou retire, valeurs négatives) des documents courants et des octets"""
+    changes = {}
+    if documents:
+        changes['document_count'] = F('document_count') + documents
+    if size:
+        changes['storage_bytes'] = F('storage_bytes') + size
+    if uploaded_at is not None:
+        # Coalesce : MAX(NULL, x) vaut NULL sous SQLite
+        changes['last_upload_at'] = Greatest(
+            Coalesce('last_upload_at', Value(uploaded_at), output_field=DateTimeField()),
+            Value(uploaded_at),
+            output_field=DateTimeField(),
+        )
+    if changes:
+        Dossier.objects.filter(pk=dossier_id).update(**changes)
+
+
+def add_folders(dossier_id, count):
+    if count:
+        Dossier.objects.filter(pk=dossier_id).update(folder_count=F('folder_count') + count)
+
+
+def add_client_dossiers(client_id, count):
+    from apps.clients.models import Client
+
+    if client_id and count:
+        Client.objects.filter(pk=client_id).update(dossier_count=F('dossier_count') + count)
+
+
+def refresh_last_upload(dossier_id, removed_at=None):
+    """
+    Recalcule la date du dernier dépôt après suppression d'un document.
+    Sans effet si le document retiré n'était pas le plus récent.
+    """
+    queryset = Dossier.objects.filter(pk=dossier_id)
+    if removed_at is not None:
+        queryset = queryset.filter(last_upload_at__lte=removed_at)
+    queryset.update(last_upload_at=_last_upload_subquery())
+
+
+def refresh_next_events(dossier_ids=None, stale_only=False):
+    """
+    Recalcule la date du prochain événement.
+
+    Args:
+        dossier_ids: Dossiers concernés (None = tous)
+        stale_only: Seulement les dossiers dont la date enregistrée est passée
+
+    Returns:
+        Nombre de dossiers mis à jour
+    """
+    today = timezone.localdate()
+    queryset = Dossier.objects.all()
+    if dossier_ids is not None:
+        queryset = queryset.filter(pk__in=[pk for pk in dossier_ids if pk])
+    if stale_only:
+        queryset = queryset.filter(next_event_date__lt=today)
+    return queryset.update(next_event_date=_next_event_subquery(today))
+
+
+# ─── Recalcul complet ───
+
+def recompute(dossier_ids=None):
+    """Recalcule tous les compteurs des dossiers donnés (None = tous), une requête par lot"""
+    from apps.documents.models import Document, Folder
+
+    queryset = Dossier.objects.all()
+    if dossier_ids is not None:
+        queryset = queryset.filter(pk__in=dossier_ids)
+    return queryset.update(
+        document_count=_aggregate_subquery(Document.objects.filter(is_current_version=True), 'count', IntegerField()),
+        folder_count=_aggregate_subquery(Folder.objects.all(), 'count', IntegerField()),
+        storage_bytes=_aggregate_subquery(Document.objects.all(), 'file_size', BigIntegerField()),
+        last_upload_at=_last_upload_subquery(),
+        next_event_date=_next_event_subquery(timezone.localdate()),
+    )
+
+
+def recompute_clients(client_ids=None):
+    from apps.clients.models import Client
+
+    queryset = Client.objects.all()
+    if client_ids is not None:
+        queryset = queryset.filter(pk__in=client_ids)
+    dossier_count = Subquery(
+        Dossier.objects.filter(client=OuterRef('pk')).order_by().values('client')
+        .annotate(value=Count('pk')).values('value'),
+        output_field=IntegerField(),
+    )
+    return queryset.update(dossier_count=Coalesce(dossier_count, Value(0)))
@@ -0,0 +1,71 @@
+# backend/apps/dossiers/management/commands/import_spreadsheet.py
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.dossiers.bulk_import import DEFAULT_BATCH_SIZE, IMPORTERS, run_import
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe en masse des clients ou des dossiers depuis un fichier CSV ou XLSX "
+        "(validation par lots, erreurs détaillées par ligne)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('schema', choices=list(IMPORTERS), help='Type de lignes importées')
+        parser.add_argument('source', help='Fichier .csv ou .xlsx (en-têtes en première ligne)')
+        parser.add_argument(
+            '--user',
+            required=True,
+            help="Nom d'utilisateur enregistré comme auteur (responsable par défaut des dossiers)"
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Lignes validées et insérées par lot (défaut: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--encoding',
+            default='utf-8-sig',
+            help='Encodage des fichiers CSV (défaut: utf-8-sig ; cp1252 pour les exports Excel)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Validation seulement, sans rien écrire"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Utilisateur introuvable : {options['user']}")
+
+        try:
+            report = run_import(
+                options['schema'],
+                options['source'],
+                user=user,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+                encoding=options['encoding'],
+            )
+        except (ValueError, OSError) as e:
+            raise CommandError(str(e))
+
+        if report.ignored_columns:
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Colonnes ignorées : {', '.join(report.ignored_columns)}"))
+        for error in report.errors:
+            details = '; '.join(
+                f"{name}: {' '.join(messages)}" if name != '__all__' else ' '.join(messages)
+                for name, messages in error['errors'].items()
+            )
+            self.stdout.write(self.style.WARNING(f"  ⚠️  Ligne {error['line']} : {details}"))
+
+        verb = "valide(s)" if options['dry_run'] else "importé(e)(s)"
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {report.created}/{report.total} ligne(s) {verb} ({options['schema']}), "
+            f"{report.failed} en erreur"
+        ))
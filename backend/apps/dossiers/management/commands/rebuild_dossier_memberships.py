@@ -0,0 +1,63 @@
+# backend/apps/dossiers/management/commands/rebuild_dossier_memberships.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.dossiers.access import invalidate_user_access
+from apps.dossiers.models import Dossier, DossierMembership
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit la table DossierMembership depuis les responsables, "
+        "les collaborateurs assignés et les permissions Guardian"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de dossiers traités par lot (défaut: 500)'
+        )
+        parser.add_argument(
+            '--dossier',
+            action='append',
+            dest='dossiers',
+            help='Limiter à un dossier (UUID, option répétable)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        dossier_ids = options.get('dossiers')
+
+        queryset = Dossier.objects.order_by('pk').values_list('pk', flat=True)
+        if dossier_ids:
+            queryset = queryset.filter(pk__in=dossier_ids)
+
+        total_dossiers = 0
+        affected_users = set()
+        batch = []
+
+        for pk in queryset.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                affected_users |= self._sync_batch(batch)
+                total_dossiers += len(batch)
+                batch = []
+
+        if batch:
+            affected_users |= self._sync_batch(batch)
+            total_dossiers += len(batch)
+
+        invalidate_user_access(*affected_users)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {total_dossiers} dossier(s) synchronisé(s), "
+            f"{len(affected_users)} utilisateur(s) mis à jour, "
+            f"{DossierMembership.objects.count()} accès au total"
+        ))
+
+    @transaction.atomic
+    def _sync_batch(self, dossier_ids):
+        return DossierMembership.objects.sync(dossier_ids=dossier_ids)
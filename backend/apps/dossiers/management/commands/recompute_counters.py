@@ -0,0 +1,73 @@
+# backend/apps/dossiers/management/commands/recompute_counters.py
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.clients.models import Client
+from apps.dossiers import counters
+from apps.dossiers.models import Dossier
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcule les compteurs dénormalisés des dossiers (documents, sous-dossiers, volume, "
+        "dernier dépôt, prochain événement) et des clients (nombre de dossiers)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Nombre de dossiers/clients recalculés par requête (défaut: 500)'
+        )
+        parser.add_argument(
+            '--dossier',
+            action='append',
+            dest='dossiers',
+            help='Limiter à un dossier (UUID, option répétable)'
+        )
+        parser.add_argument(
+            '--events-only',
+            action='store_true',
+            help="Seulement les dates de prochain événement déjà passées (à planifier chaque nuit)"
+        )
+
+    def handle(self, *args, **options):
+        if options['events_only']:
+            updated = counters.refresh_next_events(options.get('dossiers'), stale_only=True)
+            self.stdout.write(self.style.SUCCESS(f"✅ {updated} prochain(s) événement(s) recalculé(s)"))
+            return
+
+        batch_size = options['batch_size']
+        dossiers = Dossier.objects.order_by('pk').values_list('pk', flat=True)
+        if options.get('dossiers'):
+            dossiers = dossiers.filter(pk__in=options['dossiers'])
+
+        total_dossiers = self._run_batches(dossiers, batch_size, counters.recompute)
+
+        clients = Client.objects.order_by('pk').values_list('pk', flat=True)
+        if options.get('dossiers'):
+            clients = clients.filter(dossiers__pk__in=options['dossiers']).distinct()
+        total_clients = self._run_batches(clients, batch_size, counters.recompute_clients)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Compteurs recalculés : {total_dossiers} dossier(s), {total_clients} client(s)"
+        ))
+
+    def _run_batches(self, queryset, batch_size, recompute):
+        total = 0
+        batch = []
+        for pk in queryset.iterator(chunk_size=batch_size):
+            batch.append(pk)
+            if len(batch) >= batch_size:
+                total += self._recompute_batch(recompute, batch)
+                batch = []
+        if batch:
+            total += self._recompute_batch(recompute, batch)
+        return total
+
+    @staticmethod
+    @transaction.atomic
+    def _recompute_batch(recompute, ids):
+        return recompute(ids)
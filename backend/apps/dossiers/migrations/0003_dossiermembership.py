@@ -0,0 +1,115 @@
+import uuid
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_memberships(apps, schema_editor):
+    """Construit les adhésions depuis responsable, collaborateurs et permissions Guardian."""
+    Dossier = apps.get_model('dossiers', 'Dossier')
+    DossierMembership = apps.get_model('dossiers', 'DossierMembership')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    UserObjectPermission = apps.get_model('guardian', 'UserObjectPermission')
+    GroupObjectPermission = apps.get_model('guardian', 'GroupObjectPermission')
+
+    VIEW, CHANGE, RESPONSIBLE = 10, 20, 30
+    levels = {}
+
+    def grant(user_id, dossier_id, level):
+        if level > levels.get((user_id, dossier_id), 0):
+            levels[(user_id, dossier_id)] = level
+
+    for dossier_id, user_id in Dossier.objects.values_list('pk', 'responsible_id').iterator():
+        grant(user_id, dossier_id, RESPONSIBLE)
+    for dossier_id, user_id in Dossier.assigned_users.through.objects.values_list('dossier_id', 'user_id').iterator():
+        grant(user_id, dossier_id, VIEW)
+
+    content_type = ContentType.objects.filter(app_label='dossiers', model='dossier').first()
+    if content_type:
+        perm_levels = {'view_dossier': VIEW, 'change_dossier': CHANGE}
+        perm_filter = {'content_type': content_type, 'permission__codename__in': list(perm_levels)}
+        rows = list(UserObjectPermission.objects.filter(**perm_filter).values_list(
+            'user_id', 'object_pk', 'permission__codename'
+        ))
+        # Permissions accordées à un groupe : une ligne par membre
+        rows += list(GroupObjectPermission.objects.filter(**perm_filter).values_list(
+            'group__user', 'object_pk', 'permission__codename'
+        ))
+        existing = set(Dossier.objects.values_list('pk', flat=True))
+        for user_id, object_pk, codename in rows:
+            if user_id is None:
+                continue
+            try:
+                dossier_id = uuid.UUID(str(object_pk))
+            except ValueError:
+                continue
+            if dossier_id in existing:
+                grant(user_id, dossier_id, perm_levels[codename])
+
+    DossierMembership.objects.bulk_create(
+        [
+            DossierMembership(user_id=user_id, dossier_id=dossier_id, level=level)
+            for (user_id, dossier_id), level in levels.items()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dossiers", "0002_add_collaboration_permissions"),
+        ("guardian", "0002_generic_permissions_index"),
+        ("contenttypes", "0002_remove_content_type_name"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DossierMembership",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                (
+                    "level",
+                    models.PositiveSmallIntegerField(
+                        choices=[(10, "Consultation"), (20, "Modification"), (30, "Responsable")],
+                        default=10,
+                        verbose_name="Niveau d'accès",
+                    ),
+                ),
+                (
+                    "dossier",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="memberships",
+                        to="dossiers.dossier",
+                        verbose_name="Dossier",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dossier_memberships",
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name="Utilisateur",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Accès dossier",
+                "verbose_name_plural": "Accès dossiers",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="dossiermembership",
+            index=models.Index(fields=["dossier", "level"], name="membership_dossier_level_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="dossiermembership",
+            constraint=models.UniqueConstraint(fields=("user", "dossier"), name="unique_membership_per_user_dossier"),
+        ),
+        migrations.RunPython(backfill_memberships, migrations.RunPython.noop),
+    ]
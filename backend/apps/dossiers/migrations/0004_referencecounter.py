@@ -0,0 +1,28 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Compteur de références par préfixe annuel : remplace le scan du plus grand
+    code existant (collisions en cas de créations concurrentes).
+    Les compteurs sont amorcés paresseusement à la première allocation.
+    """
+
+    dependencies = [
+        ('dossiers', '0003_dossiermembership'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReferenceCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=30, unique=True, verbose_name='Préfixe')),
+                ('last_value', models.PositiveIntegerField(default=0, verbose_name='Dernier numéro attribué')),
+            ],
+            options={
+                'verbose_name': 'Compteur de références',
+                'verbose_name_plural': 'Compteurs de références',
+            },
+        ),
+    ]
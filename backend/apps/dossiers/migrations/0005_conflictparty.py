@@ -0,0 +1,82 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_parties(apps, schema_editor):
+    """Indexe les clients et parties adverses existants"""
+    from apps.dossiers.conflicts import party_keys, split_opponents
+
+    Client = apps.get_model('clients', 'Client')
+    Dossier = apps.get_model('dossiers', 'Dossier')
+    ConflictParty = apps.get_model('dossiers', 'ConflictParty')
+
+    def build(kind, name, **links):
+        normalized, key = party_keys(name)
+        if normalized:
+            return ConflictParty(kind=kind, display_name=name[:255], normalized_name=normalized[:255],
+                                 phonetic_key=key[:100], **links)
+
+    parties = []
+    for client in Client.objects.all().iterator(chunk_size=500):
+        # Équivalent de Client.display_name (propriété absente du modèle historique)
+        if client.client_type == 'MORALE' and client.company_name:
+            display_name = client.company_name
+        else:
+            display_name = f"{client.first_name} {client.last_name}".strip()
+        parties += [
+            build('CLIENT', display_name, client_id=client.pk),
+            build('REPRESENTANT', client.representative_name, client_id=client.pk),
+        ]
+    for dossier in Dossier.objects.exclude(opponent='').only('pk', 'opponent').iterator(chunk_size=500):
+        parties += [build('ADVERSE', name, dossier_id=dossier.pk) for name in split_opponents(dossier.opponent)]
+
+    ConflictParty.objects.bulk_create([party for party in parties if party is not None], batch_size=1000)
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS conflict_party_name_trgm_idx '
+        'ON dossiers_conflictparty USING gin (normalized_name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS conflict_party_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clients', '0007_clientblockingkey'),
+        ('dossiers', '0004_referencecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConflictParty',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('CLIENT', 'Client'), ('REPRESENTANT', "Représentant d'un client"), ('ADVERSE', 'Partie adverse')], max_length=15, verbose_name='Type de partie')),
+                ('display_name', models.CharField(max_length=255, verbose_name='Nom')),
+                ('normalized_name', models.CharField(max_length=255, verbose_name='Nom normalisé')),
+                ('phonetic_key', models.CharField(blank=True, max_length=100, verbose_name='Clé phonétique')),
+                ('client', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conflict_parties', to='clients.client')),
+                ('dossier', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conflict_parties', to='dossiers.dossier')),
+            ],
+            options={
+                'verbose_name': "Partie (conflits d'intérêts)",
+                'verbose_name_plural': "Parties (conflits d'intérêts)",
+                'indexes': [
+                    models.Index(fields=['normalized_name'], name='conflict_party_name_idx'),
+                    models.Index(fields=['phonetic_key'], name='conflict_party_phonetic_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+        migrations.RunPython(backfill_parties, migrations.RunPython.noop),
+    ]
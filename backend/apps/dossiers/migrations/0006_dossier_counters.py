@@ -0,0 +1,79 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+
+def backfill_counters(apps, schema_editor):
+    """Calcule les compteurs existants (mêmes requêtes que counters.recompute)"""
+    Dossier = apps.get_model('dossiers', 'Dossier')
+    Client = apps.get_model('clients', 'Client')
+    Document = apps.get_model('documents', 'Document')
+    Folder = apps.get_model('documents', 'Folder')
+    Event = apps.get_model('agenda', 'Event')
+
+    def aggregate(queryset, expression, field):
+        subquery = queryset.filter(dossier=OuterRef('pk')).order_by().values('dossier') \
+            .annotate(value=expression).values('value')
+        return Coalesce(Subquery(subquery, output_field=field), Value(0))
+
+    Dossier.objects.update(
+        document_count=aggregate(Document.objects.filter(is_current_version=True), Count('pk'), models.IntegerField()),
+        folder_count=aggregate(Folder.objects.all(), Count('pk'), models.IntegerField()),
+        storage_bytes=aggregate(Document.objects.all(), Sum('file_size'), models.BigIntegerField()),
+        last_upload_at=Subquery(
+            Document.objects.filter(dossier=OuterRef('pk')).order_by('-uploaded_at').values('uploaded_at')[:1]
+        ),
+        next_event_date=Subquery(
+            Event.objects.filter(dossier=OuterRef('pk'), start_date__gte=timezone.localdate())
+            .order_by('start_date').values('start_date')[:1]
+        ),
+    )
+    Client.objects.update(dossier_count=Coalesce(Subquery(
+        Dossier.objects.filter(client=OuterRef('pk')).order_by().values('client')
+        .annotate(value=Count('pk')).values('value'),
+        output_field=models.IntegerField(),
+    ), Value(0)))
+
+
+class Migration(migrations.Migration):
+    """
+    Compteurs dénormalisés sur Dossier (documents, sous-dossiers, volume,
+    dernier dépôt, prochain événement), lus directement par les listes.
+    """
+
+    dependencies = [
+        ('dossiers', '0005_conflictparty'),
+        ('clients', '0008_client_dossier_count'),
+        ('documents', '0003_folder_materialized_path'),
+        ('agenda', '0002_event_priority_reminder'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='dossier',
+            name='document_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Documents'),
+        ),
+        migrations.AddField(
+            model_name='dossier',
+            name='folder_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Sous-dossiers'),
+        ),
+        migrations.AddField(
+            model_name='dossier',
+            name='storage_bytes',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Volume stocké (octets)'),
+        ),
+        migrations.AddField(
+            model_name='dossier',
+            name='last_upload_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Dernier dépôt'),
+        ),
+        migrations.AddField(
+            model_name='dossier',
+            name='next_event_date',
+            field=models.DateField(blank=True, editable=False, null=True, verbose_name='Prochain événement'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
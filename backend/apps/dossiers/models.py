@@ -1,7 +1,7 @@
 import uuid
 from django.core.exceptions import ValidationError
 from django.core.validators import RegexValidator
-from django.db import models
+from django.db import IntegrityError, connection, models, transaction
 from django.conf import settings
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -141,6 +141,13 @@ class Dossier(models.Model):
     closing_date = models.DateField(null=True, blank=True, verbose_name=_("Date de clôture"))
     archived_date = models.DateTimeField(null=True, blank=True, editable=False)
 
+    # Compteurs dénormalisés (maintenus par signaux, voir counters.py)
+    document_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Documents"))
+    folder_count = models.PositiveIntegerField(default=0, editable=False, verbose_name=_("Sous-dossiers"))
+    storage_bytes = models.BigIntegerField(default=0, editable=False, verbose_name=_("Volume stocké (octets)"))
+    last_upload_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name=_("Dernier dépôt"))
+    next_event_date = models.DateField(null=True, blank=True, editable=False, verbose_name=_("Prochain événement"))
+
     created_at = models.DateTimeField(default=timezone.now, editable=False)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -182,23 +189,25 @@ class Dossier(models.Model):
     def full_reference(self):
         return self.reference_code
 
-    def generate_reference_code(self):
-        """Génère une référence unique : GAB-YYYY-NNNN"""
-        year = timezone.now().year
-        prefix = f"GAB-{year}-"
-        last_dossier = Dossier.objects.filter(
-            reference_code__startswith=prefix
-        ).order_by('-reference_code').first()
+    REFERENCE_PREFIX = "GAB"
 
-        if last_dossier and last_dossier.reference_code.startswith(prefix):
-            try:
-                num = int(last_dossier.reference_code.split('-')[-1]) + 1
-            except ValueError:
-                num = 1
-        else:
-            num = 1
+    # Tenus par UPDATE relatifs (voir counters.py), jamais réécrits par save()
+    COUNTER_FIELDS = ('document_count', 'folder_count', 'storage_bytes', 'last_upload_at', 'next_event_date')
 
-        return f"{prefix}{str(num).zfill(4)}"
+    @classmethod
+    def allocate_reference_codes(cls, count=1, year=None):
+        """
+        Réserve `count` références consécutives GAB-YYYY-NNNN sans scan ni collision
+        (compteur atomique par préfixe et par année, voir ReferenceCounter).
+        """
+        year = year or timezone.now().year
+        prefix = f"{cls.REFERENCE_PREFIX}-{year}-"
+        numbers = ReferenceCounter.objects.allocate(prefix, count)
+        return [f"{prefix}{str(num).zfill(4)}" for num in numbers]
+
+    def generate_reference_code(self):
+        """Génère une référence unique : GAB-YYYY-NNNN"""
+        return self.allocate_reference_codes(1)[0]
 
     def clean(self):
         errors = {}
@@ -221,8 +230,16 @@ class Dossier(models.Model):
         if self.status == self.Status.ARCHIVED and not self.archived_date:
             self.archived_date = timezone.now()
 
+        if kwargs.get('update_fields') is None and not self._state.adding:
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+            ]
+
         self.full_clean()
-        super().save(*args, **kwargs)
+        # Atomique : les compteurs du client sont mis à jour par signal dans la même transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
     class Meta:
@@ -258,4 +275,359 @@ class Dossier(models.Model):
                       models.Q(closing_date__isnull=True),
                 name='closing_date_after_opening'
             )
-        ]
\ No newline at end of file
+        ]
+
+class ReferenceCounterManager(models.Manager):
+    """Allocation atomique de numéros de référence"""
+
+    def allocate(self, prefix, count=1):
+        """
+        Réserve `count` numéros pour `prefix` et les retourne (liste d'entiers).
+        
+        PostgreSQL : séquence dédiée par préfixe (nextval est non transactionnel,
+        aucune attente entre créations concurrentes). Autres moteurs : ligne
+        compteur incrémentée par UPDATE atomique, verrouillée jusqu'au commit.
+        """
+        if count < 1:
+            return []
+        if connection.vendor == 'postgresql':
+            return self._allocate_from_sequence(prefix, count)
+        return self._allocate_from_row(prefix, count)
+
+    def _seed(self, prefix):
+        """Plus grand numéro déjà attribué pour ce préfixe (lu une seule fois à l'initialisation)"""
+        # Tri numérique : l'ordre lexical placerait "9999" après "10000"
+        numbers = [0]
+        for code in Dossier.objects.filter(reference_code__startswith=prefix).values_list(
+            'reference_code', flat=True
+        ).iterator():
+            suffix = code[len(prefix):]
+            if suffix.isdigit():
+                numbers.append(int(suffix))
+        return max(numbers)
+
+    def _allocate_from_row(self, prefix, count):
+        with transaction.atomic():
+            updated = self.filter(prefix=prefix).update(last_value=models.F('last_value') + count)
+            if not updated:
+                try:
+                    with transaction.atomic():
+                        self.create(prefix=prefix, last_value=self._seed(prefix) + count)
+                except IntegrityError:
+                    # Compteur créé en parallèle : on incrémente celui-ci
+                    self.filter(prefix=prefix).update(last_value=models.F('last_value') + count)
+            last_value = self.filter(prefix=prefix).values_list('last_value', flat=True).get()
+        return list(range(last_value - count + 1, last_value + 1))
+
+    def _sequence_name(self, prefix):
+        slug = ''.join(ch if ch.isalnum() else '_' for ch in prefix.lower()).strip('_')
+        return f"dossier_ref_{slug}"
+
+    def _allocate_from_sequence(self, prefix, count):
+        sequence = self._sequence_name(prefix)
+        exists = "SELECT 1 FROM pg_class WHERE relkind = 'S' AND relname = %s"
+        with connection.cursor() as cursor:
+            cursor.execute(exists, [sequence])
+            if cursor.fetchone() is None:
+                # Première référence du préfixe : amorçage et création sérialisés par un verrou
+                # consultatif (deux CREATE SEQUENCE IF NOT EXISTS concurrents peuvent se heurter
+                # sur pg_type/pg_class), puis nouvelle vérification une fois le verrou obtenu
+                with transaction.atomic():
+                    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", [sequence])
+                    cursor.execute(exists, [sequence])
+                    if cursor.fetchone() is None:
+                        cursor.execute(
+                            f'CREATE SEQUENCE "{sequence}" START WITH {self._seed(prefix) + 1}'
+                        )
+                        self.get_or_create(prefix=prefix)
+            cursor.execute(
+                f'SELECT nextval(\'"{sequence}"\') FROM generate_series(1, %s)', [count]
+            )
+            return sorted(row[0] for row in cursor.fetchall())
+
+
+class ReferenceCounter(models.Model):
+    """
+    Compteur de références par préfixe annuel (ex: "GAB-2026-").
+    Sous PostgreSQL, la ligne ne fait que recenser la séquence associée.
+    """
+
+    prefix = models.CharField(max_length=30, unique=True, verbose_name=_("Préfixe"))
+    last_value = models.PositiveIntegerField(default=0, verbose_name=_("Dernier numéro attribué"))
+
+    objects = ReferenceCounterManager()
+
+    class Meta:
+        verbose_name = _("Compteur de références")
+        verbose_name_plural = _("Compteurs de références")
+
+    def __str__(self):
+        return f"{self.prefix}{self.last_value}"
+
+
+class DossierMembershipManager(models.Manager):
+    """Synchronisation des adhésions depuis les trois sources d'accès"""
+
+    def compute_levels(self, dossier_ids=None, user_ids=None):
+        """
+        Calcule le niveau d'accès effectif par couple (user_id, dossier_id)
+        depuis le responsable, les collaborateurs assignés et les permissions Guardian.
+        
+        Args:
+            dossier_ids: Restreint aux dossiers donnés (None = tous)
+            user_ids: Restreint aux utilisateurs donnés (None = tous)
+        """
+        from django.contrib.contenttypes.models import ContentType
+        from guardian.models import UserObjectPermission, GroupObjectPermission
+
+        Level = DossierMembership.Level
+        levels = {}
+
+        def grant(user_id, dossier_id, level):
+            key = (user_id, dossier_id)
+            if level > levels.get(key, 0):
+                levels[key] = level
+
+        dossiers = Dossier.objects.all()
+        assignments = Dossier.assigned_users.through.objects.all()
+        if dossier_ids is not None:
+            dossiers = dossiers.filter(pk__in=dossier_ids)
+            assignments = assignments.filter(dossier_id__in=dossier_ids)
+        if user_ids is not None:
+            dossiers = dossiers.filter(responsible_id__in=user_ids)
+            assignments = assignments.filter(user_id__in=user_ids)
+
+        for dossier_id, user_id in dossiers.values_list('pk', 'responsible_id').iterator():
+            grant(user_id, dossier_id, Level.RESPONSIBLE)
+        for dossier_id, user_id in assignments.values_list('dossier_id', 'user_id').iterator():
+            grant(user_id, dossier_id, Level.VIEW)
+
+        perm_levels = {'view_dossier': Level.VIEW, 'change_dossier': Level.CHANGE}
+        perm_filter = {
+            'content_type': ContentType.objects.get_for_model(Dossier),
+            'permission__codename__in': list(perm_levels),
+        }
+        if dossier_ids is not None:
+            perm_filter['object_pk__in'] = [str(pk) for pk in dossier_ids]
+
+        user_perms = UserObjectPermission.objects.filter(**perm_filter)
+        group_perms = GroupObjectPermission.objects.filter(**perm_filter)
+        if user_ids is not None:
+            user_perms = user_perms.filter(user_id__in=user_ids)
+            group_perms = group_perms.filter(group__user__in=user_ids)
+
+        rows = list(user_perms.values_list('user_id', 'object_pk', 'permission__codename'))
+        rows += list(group_perms.values_list('group__user', 'object_pk', 'permission__codename'))
+        for user_id, object_pk, codename in rows:
+            if user_id is None or (user_ids is not None and user_id not in user_ids):
+                continue
+            try:
+                dossier_id = uuid.UUID(str(object_pk))
+            except ValueError:
+                continue
+            grant(user_id, dossier_id, perm_levels[codename])
+
+        return levels
+
+    def sync(self, dossier_ids=None, user_ids=None):
+        """
+        Aligne la table sur les sources pour le périmètre donné.
+        
+        Returns:
+            Ensemble des user_id dont l'adhésion a changé
+        """
+        if dossier_ids is not None:
+            dossier_ids = {uuid.UUID(str(pk)) for pk in dossier_ids}
+        if user_ids is not None:
+            user_ids = set(user_ids)
+        if dossier_ids == set() or user_ids == set():
+            return set()
+
+        levels = self.compute_levels(dossier_ids, user_ids)
+
+        existing = self.all()
+        if dossier_ids is not None:
+            existing = existing.filter(dossier_id__in=dossier_ids)
+        if user_ids is not None:
+            existing = existing.filter(user_id__in=user_ids)
+
+        stale, changed = [], []
+        for membership in existing:
+            level = levels.pop((membership.user_id, membership.dossier_id), None)
+            if level is None:
+                stale.append(membership.pk)
+            elif level != membership.level:
+                membership.level = level
+                changed.append(membership)
+
+        created = [
+            DossierMembership(user_id=user_id, dossier_id=dossier_id, level=level)
+            for (user_id, dossier_id), level in levels.items()
+        ]
+
+        affected = set()
+        if stale:
+            affected.update(self.filter(pk__in=stale).values_list('user_id', flat=True))
+            self.filter(pk__in=stale).delete()
+        if changed:
+            self.bulk_update(changed, ['level'], batch_size=500)
+            affected.update(m.user_id for m in changed)
+        if created:
+            self.bulk_create(created, batch_size=500, ignore_conflicts=True)
+            affected.update(m.user_id for m in created)
+
+        return affected
+
+
+class DossierMembership(models.Model):
+    """
+    Table d'accès compacte et indexée : source unique de vérité pour le
+    filtrage par permissions (dossiers, documents, agenda).
+    
+    Dérivée du responsable, des collaborateurs assignés et des permissions
+    objet Guardian ; maintenue par les signaux de `apps.dossiers.signals`.
+    """
+
+    class Level(models.IntegerChoices):
+        VIEW = 10, _("Consultation")
+        CHANGE = 20, _("Modification")
+        RESPONSIBLE = 30, _("Responsable")
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="dossier_memberships",
+        verbose_name=_("Utilisateur")
+    )
+
+    dossier = models.ForeignKey(
+        Dossier,
+        on_delete=models.CASCADE,
+        related_name="memberships",
+        verbose_name=_("Dossier")
+    )
+
+    level = models.PositiveSmallIntegerField(
+        choices=Level.choices,
+        default=Level.VIEW,
+        verbose_name=_("Niveau d'accès")
+    )
+
+    objects = DossierMembershipManager()
+
+    class Meta:
+        verbose_name = _("Accès dossier")
+        verbose_name_plural = _("Accès dossiers")
+        constraints = [
+            # L'index unique (user, dossier) sert aussi les semi-jointures de filtrage
+            models.UniqueConstraint(fields=['user', 'dossier'], name='unique_membership_per_user_dossier')
+        ]
+        indexes = [
+            models.Index(fields=['dossier', 'level'], name='membership_dossier_level_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} → {self.dossier_id} ({self.get_level_display()})"
+
+
+class ConflictPartyManager(models.Manager):
+    """Alimentation de l'index des parties (voir apps.dossiers.conflicts)"""
+
+    def _build(self, kind, name, **links):
+        from .conflicts import party_keys
+
+        normalized, key = party_keys(name)
+        if not normalized:
+            return None
+        return self.model(
+            kind=kind,
+            display_name=name[:255],
+            normalized_name=normalized[:255],
+            phonetic_key=key[:100],
+            **links
+        )
+
+    def refresh_client(self, client):
+        """Nom/raison sociale et représentant légal d'un client"""
+        self.filter(client=client).delete()
+        parties = [
+            self._build(self.model.Kind.CLIENT, client.display_name, client=client),
+            self._build(self.model.Kind.REPRESENTATIVE, client.representative_name, client=client),
+        ]
+        self.bulk_create([party for party in parties if party is not None])
+
+    def refresh_dossier(self, dossier):
+        """
+        Parties adverses d'un dossier (une ligne par nom). Les anciennes parties
+        adverses restent indexées : avoir été adversaire du cabinet suffit au conflit.
+        """
+        from .conflicts import split_opponents
+
+        known = set(self.filter(dossier=dossier).values_list('normalized_name', flat=True))
+        parties = []
+        for name in split_opponents(dossier.opponent):
+            party = self._build(self.model.Kind.OPPONENT, name, dossier=dossier)
+            if party is not None and party.normalized_name not in known:
+                known.add(party.normalized_name)
+                parties.append(party)
+        self.bulk_create(parties)
+
+    def index_new(self, clients=(), dossiers=()):
+        """Indexe des clients et dossiers insérés par bulk_create"""
+        from .conflicts import split_opponents
+
+        parties = []
+        for client in clients:
+            parties.append(self._build(self.model.Kind.CLIENT, client.display_name, client=client))
+            parties.append(self._build(self.model.Kind.REPRESENTATIVE, client.representative_name, client=client))
+        for dossier in dossiers:
+            parties.extend(
+                self._build(self.model.Kind.OPPONENT, name, dossier=dossier)
+                for name in split_opponents(dossier.opponent)
+            )
+        self.bulk_create([party for party in parties if party is not None], batch_size=2000)
+
+
+class ConflictParty(models.Model):
+    """
+    Partie connue du cabinet, normalisée pour la vérification des conflits d'intérêts.
+    Rattachée soit à un client (CLIENT, REPRESENTATIVE), soit à un dossier (OPPONENT).
+    """
+
+    class Kind(models.TextChoices):
+        CLIENT = "CLIENT", _("Client")
+        REPRESENTATIVE = "REPRESENTANT", _("Représentant d'un client")
+        OPPONENT = "ADVERSE", _("Partie adverse")
+
+    kind = models.CharField(max_length=15, choices=Kind.choices, verbose_name=_("Type de partie"))
+    display_name = models.CharField(max_length=255, verbose_name=_("Nom"))
+    normalized_name = models.CharField(max_length=255, verbose_name=_("Nom normalisé"))
+    phonetic_key = models.CharField(max_length=100, blank=True, verbose_name=_("Clé phonétique"))
+
+    client = models.ForeignKey(
+        Client,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="conflict_parties"
+    )
+    dossier = models.ForeignKey(
+        Dossier,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="conflict_parties"
+    )
+
+    objects = ConflictPartyManager()
+
+    class Meta:
+        verbose_name = _("Partie (conflits d'intérêts)")
+        verbose_name_plural = _("Parties (conflits d'intérêts)")
+        indexes = [
+            models.Index(fields=['normalized_name'], name='conflict_party_name_idx'),
+            models.Index(fields=['phonetic_key'], name='conflict_party_phonetic_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} : {self.display_name}"
@@ -1,13 +1,16 @@
 # dossiers/serializers.py
+import codecs
+
 from rest_framework import serializers
 from .models import Dossier
 from apps.documents.models import Folder
 from apps.users.serializers import UserMinimalSerializer
+from apps.clients.models import Client
 from apps.clients.serializers import ClientSerializer
 
 
 class FolderSerializer(serializers.ModelSerializer):
-    full_path = serializers.CharField(source="full_path", read_only=True)
+    full_path = serializers.CharField(read_only=True)
     created_by_name = serializers.CharField(source="created_by.get_full_name", read_only=True, allow_null=True)
 
     class Meta:
@@ -17,11 +20,25 @@ class FolderSerializer(serializers.ModelSerializer):
 
 
 class FolderTreeSerializer(FolderSerializer):
-    """Pour afficher l'arborescence complète"""
+    """
+    Pour afficher l'arborescence complète.
+    Passer `context={'children': ...}` (voir `for_subtree`) pour éviter une requête par nœud.
+    """
     subfolders = serializers.SerializerMethodField()
 
+    @classmethod
+    def for_subtree(cls, folder, **kwargs):
+        """Sérialise la branche sous `folder` à partir d'une seule requête"""
+        children = {}
+        for node in Folder.objects.subtree(folder, include_self=False).select_related('created_by').order_by('name'):
+            children.setdefault(node.parent_id, []).append(node)
+        context = {**kwargs.pop('context', {}), 'children': children}
+        return cls(folder, context=context, **kwargs)
+
     def get_subfolders(self, obj):
-        return FolderTreeSerializer(obj.subfolders.all(), many=True).data
+        children = self.context.get('children')
+        subfolders = children.get(obj.pk, []) if children is not None else obj.subfolders.all()
+        return FolderTreeSerializer(subfolders, many=True, context=self.context).data
 
     class Meta(FolderSerializer.Meta):
         fields = FolderSerializer.Meta.fields + ['subfolders']
@@ -38,12 +55,16 @@ class DossierListSerializer(serializers.ModelSerializer):
             'id', 'reference_code', 'title', 'category', 'status',
             'client', 'client_name', 'responsible', 'responsible_name',
             'opening_date', 'closing_date', 'critical_deadline', 'is_overdue',
+            'document_count', 'folder_count', 'storage_bytes', 'last_upload_at', 'next_event_date',
             'created_at'
         ]
 
 
 class DossierDetailSerializer(serializers.ModelSerializer):
     client = ClientSerializer(read_only=True)
+    client_id = serializers.PrimaryKeyRelatedField(
+        source='client', queryset=Client.objects.all(), write_only=True
+    )
     responsible = UserMinimalSerializer(read_only=True)
     assigned_users = UserMinimalSerializer(many=True, read_only=True)
     is_overdue = serializers.BooleanField(read_only=True)
@@ -51,4 +72,65 @@ class DossierDetailSerializer(serializers.ModelSerializer):
     class Meta:
         model = Dossier
         fields = '__all__'
-        read_only_fields = ['id', 'reference_code', 'opening_date', 'created_at', 'updated_at', 'archived_date']
\ No newline at end of file
+        read_only_fields = ['id', 'reference_code', 'opening_date', 'created_at', 'updated_at', 'archived_date']
+
+
+class CollaboratorBulkSerializer(serializers.Serializer):
+    """
+    Affectation ou retrait en masse de collaborateurs sur plusieurs dossiers.
+    Utilisé pour l'endpoint POST /dossiers/bulk-collaborateurs/
+    """
+    OPERATION_CHOICES = [('assign', 'Ajouter'), ('remove', 'Retirer')]
+    MAX_ITEMS = 500
+
+    operation = serializers.ChoiceField(choices=OPERATION_CHOICES, default='assign')
+    dossier_ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=MAX_ITEMS
+    )
+    user_ids = serializers.ListField(
+        child=serializers.UUIDField(), allow_empty=False, max_length=MAX_ITEMS
+    )
+    permissions = serializers.MultipleChoiceField(
+        choices=[('view', 'Consultation'), ('change', 'Modification')],
+        default=['view']
+    )
+
+
+class ConflictCheckSerializer(serializers.Serializer):
+    """
+    Vérification de conflits d'intérêts avant ouverture d'un dossier.
+    Utilisé pour l'endpoint POST /dossiers/conflict-check/
+    """
+    client = serializers.PrimaryKeyRelatedField(queryset=Client.objects.all(), required=False, allow_null=True)
+    client_name = serializers.CharField(required=False, allow_blank=True, max_length=255)
+    opponent = serializers.CharField(required=False, allow_blank=True, max_length=255)
+
+    def validate(self, attrs):
+        if not (attrs.get('client') or attrs.get('client_name') or attrs.get('opponent')):
+            raise serializers.ValidationError("Indiquez un client, un nom de client ou une partie adverse")
+        return attrs
+
+
+class BulkImportSerializer(serializers.Serializer):
+    """
+    Import en masse depuis un tableur (voir bulk_import.py).
+    Utilisé pour l'endpoint POST /dossiers/import/
+    """
+    SCHEMA_CHOICES = [('clients', 'Clients'), ('dossiers', 'Dossiers')]
+
+    schema = serializers.ChoiceField(choices=SCHEMA_CHOICES)
+    file = serializers.FileField()
+    dry_run = serializers.BooleanField(default=False)
+    encoding = serializers.CharField(default='utf-8-sig', max_length=30)
+
+    def validate_encoding(self, value):
+        try:
+            codecs.lookup(value)
+        except LookupError:
+            raise serializers.ValidationError(f"Encodage inconnu : '{value}'")
+        return value
+
+    def validate_file(self, value):
+        if not value.name.lower().endswith(('.csv', '.xlsx')):
+            raise serializers.ValidationError("Fichier CSV ou XLSX attendu")
+        return value
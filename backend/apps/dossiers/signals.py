@@ -0,0 +1,332 @@
+"""
+Synchronisation de DossierMembership et invalidation du cache des dossiers
+accessibles (voir access.py) à partir des trois sources d'accès :
+responsable, collaborateurs assignés et permissions objet Guardian.
+
+Maintient aussi l'index ConflictParty (voir conflicts.py), les compteurs
+dénormalisés des dossiers et clients (voir counters.py) et la version des
+flux iCalendar (voir apps/agenda/feeds.py), planifie les rappels
+(voir apps/agenda/reminders.py) et diffuse les changements en temps réel
+(voir apps/core/realtime.py).
+"""
+from django.conf import settings
+from django.contrib.auth.models import Group
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete, m2m_changed
+from django.dispatch import receiver
+from guardian.models import UserObjectPermission, GroupObjectPermission
+
+from apps.agenda import feeds, reminders
+from apps.clients.models import Client
+from apps.core import realtime
+from . import counters
+from .access import invalidate_user_access, sync_memberships
+from .models import ConflictParty, Dossier
+
+# Champs client repris dans l'index des conflits d'intérêts
+CONFLICT_CLIENT_FIELDS = {'client_type', 'first_name', 'last_name', 'company_name', 'representative_name'}
+
+# Champs dossier repris dans les flux iCalendar (échéances critiques)
+FEED_DOSSIER_FIELDS = {'critical_deadline', 'status', 'title', 'reference_code'}
+
+# Champs dossier déterminant l'alerte d'échéance critique
+DEADLINE_FIELDS = {'critical_deadline', 'status'}
+
+
+def _is_dossier_permission(instance) -> bool:
+    return (
+        instance.content_type.app_label == Dossier._meta.app_label
+        and instance.content_type.model == Dossier._meta.model_name
+    )
+
+
+@receiver(pre_save, sender=Dossier)
+def remember_previous_responsible(sender, instance, update_fields=None, **kwargs):
+    """
+    Mémorise l'ancien responsable, l'ancien client et l'ancien statut pour
+    resynchroniser accès et compteurs et signaler les changements de statut
+    """
+    instance._previous_responsible_id = instance._previous_client_id = instance._previous_status = None
+    if instance._state.adding or (
+        update_fields is not None and not {'responsible', 'client', 'status'} & set(update_fields)
+    ):
+        return
+    (
+        instance._previous_responsible_id, instance._previous_client_id, instance._previous_status
+    ) = (
+        Dossier.objects.filter(pk=instance.pk).values_list('responsible_id', 'client_id', 'status').first()
+        or (None, None, None)
+    )
+
+
+@receiver(post_save, sender=Dossier)
+def dossier_saved(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_responsible_id', None)
+    if created or previous != instance.responsible_id:
+        user_ids = {uid for uid in (instance.responsible_id, previous) if uid}
+        sync_memberships(dossier_ids=[instance.pk], user_ids=user_ids)
+
+    previous_client = getattr(instance, '_previous_client_id', None)
+    if created:
+        counters.add_client_dossiers(instance.client_id, 1)
+    elif previous_client is not None and previous_client != instance.client_id:
+        counters.add_client_dossiers(previous_client, -1)
+        counters.add_client_dossiers(instance.client_id, 1)
+
+
+@receiver(pre_delete, sender=Dossier)
+def dossier_deleted(sender, instance, **kwargs):
+    # Les adhésions disparaissent en cascade ; seuls les caches sont à invalider
+    invalidate_user_access(*instance.memberships.values_list('user_id', flat=True))
+
+
+@receiver(post_delete, sender=Dossier)
+def dossier_removed_counters(sender, instance, **kwargs):
+    counters.add_client_dossiers(instance.client_id, -1)
+
+
+@receiver(m2m_changed, sender=Dossier.assigned_users.through)
+def assigned_users_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # Mémorise le périmètre avant suppression pour la resynchronisation post_clear
+        related = instance.accessible_dossiers if reverse else instance.assigned_users
+        instance._cleared_pks = set(related.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    pks = pk_set if action != 'post_clear' else getattr(instance, '_cleared_pks', set())
+    if reverse:
+        # user.accessible_dossiers.add(...) : l'instance est l'utilisateur
+        sync_memberships(dossier_ids=pks, user_ids=[instance.pk])
+    else:
+        sync_memberships(dossier_ids=[instance.pk], user_ids=pks)
+
+
+@receiver(post_save, sender=UserObjectPermission)
+@receiver(post_delete, sender=UserObjectPermission)
+def user_object_permission_changed(sender, instance, **kwargs):
+    if _is_dossier_permission(instance):
+        sync_memberships(dossier_ids=[instance.object_pk], user_ids=[instance.user_id])
+
+
+@receiver(post_save, sender=GroupObjectPermission)
+@receiver(post_delete, sender=GroupObjectPermission)
+def group_object_permission_changed(sender, instance, **kwargs):
+    if _is_dossier_permission(instance):
+        sync_memberships(
+            dossier_ids=[instance.object_pk],
+            user_ids=set(instance.group.user_set.values_list('pk', flat=True)),
+        )
+
+
+@receiver(m2m_changed, sender=Group.user_set.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # group.user_set.clear() : les membres sont à mémoriser avant suppression
+        instance._cleared_user_ids = (
+            set(instance.user_set.values_list('pk', flat=True)) if isinstance(instance, Group) else {instance.pk}
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        user_ids = getattr(instance, '_cleared_user_ids', set())
+    else:
+        user_ids = pk_set if isinstance(instance, Group) else [instance.pk]
+    if user_ids:
+        sync_memberships(user_ids=user_ids)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    """Changement de rôle ou de statut : les droits dérivés doivent être recalculés"""
+    if not created:
+        invalidate_user_access(instance)
+
+
+# ─── Index des parties pour la vérification des conflits d'intérêts ───
+
+@receiver(post_save, sender=Client)
+def client_saved_conflict_index(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or set(update_fields) & CONFLICT_CLIENT_FIELDS:
+        ConflictParty.objects.refresh_client(instance)
+
+
+@receiver(post_save, sender=Dossier)
+def dossier_saved_conflict_index(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is None or 'opponent' in update_fields:
+        ConflictParty.objects.refresh_dossier(instance)
+
+
+# ─── Compteurs dénormalisés (documents, sous-dossiers, agenda) ───
+
+@receiver(post_save, sender='documents.Document')
+def document_saved_counters(sender, instance, created, **kwargs):
+    if created:
+        counters.add_documents(
+            instance.dossier_id,
+            documents=1 if instance.is_current_version else 0,
+            size=instance.file_size or 0,
+            uploaded_at=instance.uploaded_at,
+        )
+    else:
+        # Nouvelle version : l'ancienne quitte le décompte des documents courants
+        was_current = getattr(instance, '_loaded_is_current_version', None)
+        if was_current is not None and was_current != instance.is_current_version:
+            counters.add_documents(instance.dossier_id, documents=1 if instance.is_current_version else -1)
+    instance._loaded_is_current_version = instance.is_current_version
+
+
+@receiver(post_delete, sender='documents.Document')
+def document_deleted_counters(sender, instance, **kwargs):
+    counters.add_documents(
+        instance.dossier_id,
+        documents=-1 if instance.is_current_version else 0,
+        size=-(instance.file_size or 0),
+    )
+    counters.refresh_last_upload(instance.dossier_id, removed_at=instance.uploaded_at)
+
+
+@receiver(post_save, sender='documents.Folder')
+def folder_saved_counters(sender, instance, created, **kwargs):
+    if created:
+        counters.add_folders(instance.dossier_id, 1)
+
+
+@receiver(post_delete, sender='documents.Folder')
+def folder_deleted_counters(sender, instance, **kwargs):
+    counters.add_folders(instance.dossier_id, -1)
+
+
+@receiver(pre_save, sender='agenda.Event')
+def remember_previous_event_dossier(sender, instance, **kwargs):
+    instance._previous_dossier_id = instance._previous_schedule = None
+    instance._was_shared = False
+    if not instance._state.adding:
+        row = sender.objects.filter(pk=instance.pk).values_list(
+            'dossier_id', 'start_date', 'start_time', 'end_date', 'end_time'
+        ).first()
+        if row is not None:
+            instance._previous_dossier_id = row[0]
+            instance._previous_schedule = row[1:]
+            # Événement de l'agenda du cabinet (présent dans tous les flux)
+            instance._was_shared = row[0] is None
+
+
+@receiver(post_save, sender='agenda.Event')
+@receiver(post_delete, sender='agenda.Event')
+def event_changed_counters(sender, instance, **kwargs):
+    dossier_ids = {instance.dossier_id, getattr(instance, '_previous_dossier_id', None)} - {None}
+    if dossier_ids:
+        counters.refresh_next_events(dossier_ids)
+
+
+# ─── Flux iCalendar ───
+
+@receiver(post_save, sender='agenda.Event')
+@receiver(post_delete, sender='agenda.Event')
+def event_changed_feeds(sender, instance, **kwargs):
+    if instance.dossier_id is None or getattr(instance, '_was_shared', False):
+        feeds.invalidate_all_feeds()
+    feeds.invalidate_dossier_feeds(
+        [instance.dossier_id, getattr(instance, '_previous_dossier_id', None)],
+        extra_users=[instance.created_by_id],
+    )
+
+
+@receiver(post_save, sender=Dossier)
+def dossier_saved_feeds(sender, instance, created, update_fields=None, **kwargs):
+    if not created and (update_fields is None or set(update_fields) & FEED_DOSSIER_FIELDS):
+        feeds.invalidate_dossier_feeds([instance.pk])
+
+
+# ─── Rappels et alertes d'échéance ───
+
+@receiver(post_save, sender='agenda.Event')
+def event_saved_reminders(sender, instance, **kwargs):
+    reminders.schedule_event(instance)
+
+
+@receiver(post_save, sender=Dossier)
+def dossier_saved_reminders(sender, instance, created, update_fields=None, **kwargs):
+    if created and not instance.critical_deadline:
+        return
+    if update_fields is None or set(update_fields) & DEADLINE_FIELDS:
+        reminders.schedule_deadline(instance)
+
+
+# ─── Diffusion temps réel (WebSocket) ───
+
+def _event_data(event):
+    return {
+        'id': event.pk,
+        'title': event.title,
+        'event_type': event.type,
+        'start_date': event.start_date,
+        'start_time': event.start_time,
+        'end_date': event.end_date,
+        'end_time': event.end_time,
+        'all_day': event.all_day,
+    }
+
+
+@receiver(post_save, sender=Dossier)
+def dossier_saved_realtime(sender, instance, created, **kwargs):
+    if created:
+        realtime.publish(
+            'dossier.created', instance.pk, id=instance.pk,
+            reference_code=instance.reference_code, title=instance.title, status=instance.status,
+        )
+        return
+    previous = getattr(instance, '_previous_status', None)
+    if previous is not None and previous != instance.status:
+        realtime.publish(
+            'dossier.status_changed', instance.pk, id=instance.pk,
+            status=instance.status, previous_status=previous,
+        )
+
+
+@receiver(post_save, sender='documents.Document')
+def document_saved_realtime(sender, instance, created, **kwargs):
+    if not created:
+        return
+    realtime.publish(
+        'document.version' if instance.previous_version_id else 'document.uploaded',
+        instance.dossier_id,
+        id=instance.pk,
+        title=instance.title,
+        version=instance.version,
+        previous_version=instance.previous_version_id,
+        folder=instance.folder_id,
+        file_size=instance.file_size,
+        uploaded_by=instance.uploaded_by_id,
+    )
+
+
+@receiver(post_delete, sender='documents.Document')
+def document_deleted_realtime(sender, instance, **kwargs):
+    realtime.publish('document.deleted', instance.dossier_id, id=instance.pk)
+
+
+@receiver(post_save, sender='agenda.Event')
+def event_saved_realtime(sender, instance, created, **kwargs):
+    if created:
+        change = 'event.created'
+    elif getattr(instance, '_previous_schedule', None) not in (
+        None, (instance.start_date, instance.start_time, instance.end_date, instance.end_time)
+    ):
+        change = 'event.moved'
+    else:
+        change = 'event.updated'
+
+    previous_dossier = getattr(instance, '_previous_dossier_id', None)
+    if previous_dossier is not None and instance.dossier_id is not None and previous_dossier != instance.dossier_id:
+        # Rattaché à un autre dossier : il disparaît pour les membres de l'ancien
+        # (publié avant la mise à jour, que les membres des deux dossiers recevront en dernier)
+        realtime.publish('event.deleted', previous_dossier, id=instance.pk)
+    realtime.publish(change, instance.dossier_id, **_event_data(instance))
+
+
+@receiver(post_delete, sender='agenda.Event')
+def event_deleted_realtime(sender, instance, **kwargs):
+    realtime.publish('event.deleted', instance.dossier_id, id=instance.pk)
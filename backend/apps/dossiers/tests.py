@@ -0,0 +1,454 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+from guardian.shortcuts import assign_perm, remove_perm
+
+from apps.audit.models import AuditLog
+from apps.clients.models import Client
+from apps.documents.models import Document, Folder
+from apps.dossiers.access import get_accessible_dossier_ids
+from django.core.management import call_command
+
+from apps.dossiers.models import ConflictParty, Dossier, DossierMembership, ReferenceCounter
+
+User = get_user_model()
+
+
+class DossierTestMixin:
+    def setUp(self):
+        cache.clear()
+        self.avocat = User.objects.create_user(
+            username='avocat',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='BAR/2026/001'
+        )
+        self.clerc = User.objects.create_user(
+            username='clerc',
+            password='testpass123',
+            role='SECRETAIRE'
+        )
+        self.client_obj = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Jean',
+            last_name='Obame',
+            phone_primary='+24177000020',
+        )
+        self.dossier = Dossier.objects.create(
+            title="Succession Obame",
+            client=self.client_obj,
+            responsible=self.avocat,
+            category='SUCCESSION'
+        )
+
+
+class AccessibleDossierCacheTest(DossierTestMixin, TestCase):
+    def test_responsible_has_access(self):
+        self.assertEqual(get_accessible_dossier_ids(self.avocat), {self.dossier.pk})
+
+    def test_cached_after_first_resolution(self):
+        get_accessible_dossier_ids(self.clerc)
+        with self.assertNumQueries(0):
+            get_accessible_dossier_ids(self.clerc)
+
+    def test_assignment_invalidates_cache(self):
+        self.assertEqual(get_accessible_dossier_ids(self.clerc), frozenset())
+        self.dossier.assigned_users.add(self.clerc)
+        self.assertEqual(get_accessible_dossier_ids(self.clerc), {self.dossier.pk})
+        self.dossier.assigned_users.remove(self.clerc)
+        self.assertEqual(get_accessible_dossier_ids(self.clerc), frozenset())
+
+    def test_guardian_permission_invalidates_cache(self):
+        self.assertEqual(get_accessible_dossier_ids(self.clerc), frozenset())
+        assign_perm('view_dossier', self.clerc, self.dossier)
+        self.assertEqual(get_accessible_dossier_ids(self.clerc), {self.dossier.pk})
+        remove_perm('view_dossier', self.clerc, self.dossier)
+        self.assertEqual(get_accessible_dossier_ids(self.clerc), frozenset())
+
+    def test_group_clear_revokes_access(self):
+        group = Group.objects.create(name='Contentieux')
+        assign_perm('view_dossier', group, self.dossier)
+        for clear in (lambda: self.clerc.groups.clear(), lambda: group.user_set.clear()):
+            self.clerc.groups.add(group)
+            self.assertEqual(get_accessible_dossier_ids(self.clerc), {self.dossier.pk})
+            clear()
+            self.assertEqual(get_accessible_dossier_ids(self.clerc), frozenset())
+
+    def test_staff_has_global_access(self):
+        self.clerc.is_staff = True
+        self.assertIsNone(get_accessible_dossier_ids(self.clerc))
+
+
+class DossierMembershipTest(DossierTestMixin, TestCase):
+    def level(self, user):
+        membership = DossierMembership.objects.filter(user=user, dossier=self.dossier).first()
+        return membership.level if membership else None
+
+    def test_responsible_membership_created(self):
+        self.assertEqual(self.level(self.avocat), DossierMembership.Level.RESPONSIBLE)
+
+    def test_sources_are_merged(self):
+        self.dossier.assigned_users.add(self.clerc)
+        self.assertEqual(self.level(self.clerc), DossierMembership.Level.VIEW)
+        assign_perm('change_dossier', self.clerc, self.dossier)
+        self.assertEqual(self.level(self.clerc), DossierMembership.Level.CHANGE)
+        remove_perm('change_dossier', self.clerc, self.dossier)
+        self.assertEqual(self.level(self.clerc), DossierMembership.Level.VIEW)
+        self.dossier.assigned_users.clear()
+        self.assertIsNone(self.level(self.clerc))
+
+    def test_migration_backfill_includes_group_permissions(self):
+        from importlib import import_module
+
+        from django.apps import apps
+
+        group = Group.objects.create(name='Secrétariat')
+        group.user_set.add(self.clerc)
+        assign_perm('change_dossier', group, self.dossier)
+        DossierMembership.objects.all().delete()
+        import_module('apps.dossiers.migrations.0003_dossiermembership').backfill_memberships(apps, None)
+        self.assertEqual(self.level(self.avocat), DossierMembership.Level.RESPONSIBLE)
+        self.assertEqual(self.level(self.clerc), DossierMembership.Level.CHANGE)
+
+    def test_rebuild_command_repairs_table(self):
+        self.dossier.assigned_users.add(self.clerc)
+        DossierMembership.objects.all().delete()
+        call_command('rebuild_dossier_memberships', stdout=StringIO())
+        self.assertEqual(self.level(self.avocat), DossierMembership.Level.RESPONSIBLE)
+        self.assertEqual(self.level(self.clerc), DossierMembership.Level.VIEW)
+
+
+class ReferenceCounterTest(DossierTestMixin, TestCase):
+    def test_counter_seeded_from_existing_codes(self):
+        prefix = self.dossier.reference_code.rsplit('-', 1)[0] + '-'
+        ReferenceCounter.objects.all().delete()
+        Dossier.objects.filter(pk=self.dossier.pk).update(reference_code=f"{prefix}0009")
+        codes = Dossier.allocate_reference_codes(3)
+        self.assertEqual(codes, [f"{prefix}0010", f"{prefix}0011", f"{prefix}0012"])
+        self.assertEqual(ReferenceCounter.objects.get(prefix=prefix).last_value, 12)
+
+    def test_sequential_creations_do_not_collide(self):
+        codes = {
+            Dossier.objects.create(
+                title=f"Dossier {i}", client=self.client_obj, responsible=self.avocat,
+            ).reference_code
+            for i in range(3)
+        }
+        codes.add(self.dossier.reference_code)
+        self.assertEqual(len(codes), 4)
+
+
+class CollaboratorAPITest(DossierTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.second = Dossier.objects.create(
+            title="Bail commercial",
+            client=self.client_obj,
+            responsible=self.avocat,
+            category='COMMERCIAL'
+        )
+        self.collaborateur = User.objects.create_user(
+            username='collab',
+            password='testpass123',
+            role='AVOCAT',
+            professional_id='BAR/2026/002'
+        )
+        self.client.force_authenticate(user=self.avocat)
+
+    def bulk(self, **data):
+        return self.client.post('/api/dossiers/bulk-collaborateurs/', data, format='json')
+
+    def test_bulk_assign_and_remove(self):
+        response = self.bulk(
+            dossier_ids=[str(self.dossier.pk), str(self.second.pk)],
+            user_ids=[str(self.clerc.pk), str(self.collaborateur.pk)],
+            permissions=['view', 'change'],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(self.second.assigned_users.all()), {self.clerc, self.collaborateur})
+        self.assertTrue(self.collaborateur.has_perm('change_dossier', self.second))
+        # 'change' réservé aux professionnels du droit
+        self.assertFalse(self.clerc.has_perm('change_dossier', self.second))
+
+        response = self.bulk(
+            operation='remove',
+            dossier_ids=[str(self.dossier.pk), str(self.second.pk)],
+            user_ids=[str(self.clerc.pk), str(self.avocat.pk)],
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(self.second.assigned_users.all()), [self.collaborateur])
+        # Le responsable n'est jamais retiré
+        self.assertEqual(get_accessible_dossier_ids(self.avocat), {self.dossier.pk, self.second.pk})
+
+    def test_bulk_requires_responsible(self):
+        self.client.force_authenticate(user=self.collaborateur)
+        assign_perm('view_dossier', self.collaborateur, self.dossier)
+        response = self.bulk(dossier_ids=[str(self.dossier.pk)], user_ids=[str(self.clerc.pk)])
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_list_collaborateurs_single_query(self):
+        self.bulk(dossier_ids=[str(self.dossier.pk)], user_ids=[str(self.clerc.pk), str(self.collaborateur.pk)])
+        response = self.client.get(f'/api/dossiers/{self.dossier.pk}/collaborateurs/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['responsable']['id'], str(self.avocat.pk))
+        self.assertEqual(response.data['total_collaborateurs'], 2)
+
+
+class ConflictOfInterestTest(DossierTestMixin, APITestCase):
+    def setUp(self):
+        super().setUp()
+        Dossier.objects.filter(pk=self.dossier.pk).update(opponent="SOGATRA SA; Mme Marie N'Dong")
+        self.dossier.refresh_from_db()
+        self.dossier.save()
+        self.new_client = Client.objects.create(
+            client_type='PHYSIQUE',
+            first_name='Marie',
+            last_name='Ndong',
+            phone_primary='+24177000021',
+        )
+        self.client.force_authenticate(user=self.avocat)
+
+    def create_dossier(self, **extra):
+        payload = {
+            'title': "Divorce Ndong",
+            'client_id': str(self.new_client.pk),
+            'opponent': "M. Jean Obamé",
+            'category': 'CONTENTIEUX',
+            **extra,
+        }
+        return self.client.post('/api/dossiers/', payload, format='json')
+
+    def test_index_follows_opponents(self):
+        names = set(ConflictParty.objects.filter(dossier=self.dossier).values_list('normalized_name', flat=True))
+        self.assertEqual(names, {"sogatra", "marie ndong"})
+
+    def test_previous_opponents_stay_indexed(self):
+        self.dossier.opponent = "Banque Gabonaise"
+        self.dossier.save()
+        names = set(ConflictParty.objects.filter(dossier=self.dossier).values_list('normalized_name', flat=True))
+        self.assertEqual(names, {"sogatra", "marie ndong", "banque gabonaise"})
+
+    def test_exact_match_survives_candidate_limit(self):
+        from apps.dossiers import conflicts
+
+        exact = ConflictParty.objects.get(dossier=self.dossier, normalized_name="sogatra")
+        ConflictParty.objects.filter(pk=exact.pk).delete()
+        ConflictParty.objects.bulk_create([
+            ConflictParty(
+                kind=ConflictParty.Kind.OPPONENT, dossier=self.dossier, display_name=f"Zeta {i}",
+                normalized_name=f"zeta {i}", phonetic_key=exact.phonetic_key,
+            )
+            for i in range(conflicts.MAX_HITS * 5)
+        ])
+        exact.pk = None
+        exact.save()
+        hits = conflicts._candidates(ConflictParty.objects.all(), "sogatra", exact.phonetic_key)
+        self.assertEqual(hits[0].normalized_name, "sogatra")
+
+    def test_creation_blocked_then_confirmed(self):
+        response = self.create_dossier()
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        kinds = {hit['kind'] for hit in response.data['conflicts']}
+        self.assertEqual(kinds, {ConflictParty.Kind.OPPONENT, ConflictParty.Kind.CLIENT})
+        self.assertFalse(Dossier.objects.filter(title="Divorce Ndong").exists())
+        # La tentative reste tracée
+        self.assertTrue(AuditLog.objects.filter(object_id=str(self.new_client.pk), action_type='READ').exists())
+
+        response = self.create_dossier(confirm_conflicts=True)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_conflict_check_endpoint(self):
+        response = self.client.post('/api/dossiers/conflict-check/', {'opponent': 'Sogatra'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 0)
+
+        response = self.client.post('/api/dossiers/conflict-check/', {'client_name': 'SOGATRA'}, format='json')
+        self.assertEqual(response.data['conflicts'][0]['dossier_reference'], self.dossier.reference_code)
+
+
+class DossierCountersTest(DossierTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def _document(self, filename, content, folder=None):
+        return Document.objects.create(
+            dossier=self.dossier,
+            folder=folder,
+            uploaded_by=self.avocat,
+            file=ContentFile(content, name=filename),
+            title=filename,
+            original_filename=filename,
+            file_extension='.txt',
+            mime_type='text/plain',
+        )
+
+    def counters(self):
+        return Dossier.objects.values(*Dossier.COUNTER_FIELDS[:3]).get(pk=self.dossier.pk)
+
+    def test_documents_folders_and_versions(self):
+        folder = Folder.objects.create(name="Pièces", dossier=self.dossier, created_by=self.avocat)
+        Folder.objects.create(name="Expertise", dossier=self.dossier, parent=folder, created_by=self.avocat)
+        self._document("assignation.txt", b"Assignation", folder)
+        piece = self._document("piece.txt", b"Piece")
+        piece_v2 = piece.create_new_version(ContentFile(b"Piece corrigee", name="piece.txt"), self.avocat)
+
+        self.assertEqual(self.counters(), {'document_count': 2, 'folder_count': 2, 'storage_bytes': 30})
+        self.dossier.refresh_from_db()
+        self.assertEqual(self.dossier.last_upload_at, piece_v2.uploaded_at)
+
+        # Suppression en cascade de la branche et de la version courante
+        folder.delete()
+        piece_v2.delete()
+        self.assertEqual(self.counters(), {'document_count': 1, 'folder_count': 0, 'storage_bytes': 16})
+
+    def test_full_save_does_not_overwrite_counters(self):
+        stale = Dossier.objects.get(pk=self.dossier.pk)
+        self._document("note.txt", b"Note")
+        stale.title = "Succession Obame (renommé)"
+        stale.save()
+        self.assertEqual(self.counters()['document_count'], 1)
+
+        stale_client = Client.objects.get(pk=self.client_obj.pk)
+        Dossier.objects.create(title="Bail", client=self.client_obj, responsible=self.avocat)
+        stale_client.city = "Port-Gentil"
+        stale_client.save()
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).dossier_count, 2)
+
+    def test_client_reassignment_and_recompute(self):
+        other = Client.objects.create(
+            client_type='PHYSIQUE', first_name='Paul', last_name='Mba', phone_primary='+24177000022'
+        )
+        self.dossier.client = other
+        self.dossier.save()
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).dossier_count, 0)
+        self.assertEqual(Client.objects.get(pk=other.pk).dossier_count, 1)
+
+        self._document("note.txt", b"Note")
+        Dossier.objects.update(document_count=42, storage_bytes=0)
+        Client.objects.update(dossier_count=7)
+        call_command('recompute_counters', stdout=StringIO())
+        self.assertEqual(self.counters(), {'document_count': 1, 'folder_count': 0, 'storage_bytes': 4})
+        self.assertEqual(Client.objects.get(pk=other.pk).dossier_count, 1)
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).dossier_count, 0)
+
+
+class BulkImportTest(DossierTestMixin, APITestCase):
+    CLIENTS_CSV = (
+        "Type;Prénom;Nom;Téléphone;Email;Raison sociale;NIF;Date de naissance\n"
+        "PHYSIQUE;Aimée;Mintsa;+241 77 00 00 30;aimee@example.ga;;;12/03/1985\n"
+        "Personne Morale;;;+24177000031;contact@sobea.ga;SOBEA;123456-A;\n"
+        "MORALE;;;+24177000032;autre@sobea.ga;SOBEA Bis;123456-A;\n"
+        "PHYSIQUE;Luc;Ella;abc;;;;\n"
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.admin = User.objects.create_user(
+            username='admin', password='testpass123', role='ADMIN', is_staff=True
+        )
+
+    def _import(self, schema, content, user=None, **extra):
+        self.client.force_authenticate(user=user or self.admin)
+        upload = SimpleUploadedFile(f"{schema}.csv", content.encode('utf-8'), content_type='text/csv')
+        return self.client.post(
+            '/api/dossiers/import/', {'schema': schema, 'file': upload, **extra}, format='multipart'
+        )
+
+    def test_clients_validated_in_memory(self):
+        response = self._import('clients', self.CLIENTS_CSV)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+        errors = {error['line']: error['errors'] for error in response.data['errors']}
+        self.assertIn('nif', errors[4])
+        self.assertIn('phone_primary', errors[5])
+
+        aimee = Client.objects.get(email='aimee@example.ga')
+        self.assertEqual(aimee.phone_primary, '+24177000030')
+        self.assertEqual(str(aimee.date_of_birth), '1985-03-12')
+        # Index dérivés alimentés malgré bulk_create
+        self.assertEqual(Client.objects.fuzzy_search("mintsa").first(), aimee)
+        self.assertTrue(aimee.blocking_keys.exists())
+        self.assertTrue(ConflictParty.objects.filter(client=aimee).exists())
+        self.assertEqual(AuditLog.objects.filter(action_type='CREATE', object_id=str(aimee.pk)).count(), 1)
+
+    def test_dry_run_and_permissions(self):
+        response = self._import('clients', self.CLIENTS_CSV, dry_run=True)
+        self.assertEqual(response.data['created'], 2)
+        self.assertFalse(Client.objects.filter(email='aimee@example.ga').exists())
+
+        response = self._import('clients', self.CLIENTS_CSV, user=self.avocat)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_invalid_encoding_or_file_is_a_client_error(self):
+        response = self._import('clients', self.CLIENTS_CSV, encoding='nope')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('encoding', response.data['validation_errors'])
+
+        from apps.dossiers.bulk_import import read_rows
+
+        with self.assertRaises(ValueError):
+            list(read_rows(BytesIO(b"pas un classeur"), filename="clients.xlsx"))
+        with self.assertRaises(ValueError):
+            read_rows(StringIO(self.CLIENTS_CSV), filename='clients.csv', encoding='nope')
+
+    def test_dossiers_resolve_clients_and_allocate_references(self):
+        content = (
+            "Intitulé,Client,Responsable,Catégorie,Date d'ouverture,Partie adverse\n"
+            "Bail commercial,Jean Obame,avocat,CONTENTIEUX,15/01/2024,SOGATRA SA\n"
+            "Recouvrement,Jean Obame,avocat,Recouvrement de créances,2024-02-01,\n"
+            "Sans client,Inconnu,avocat,AUTRE,,\n"
+            "Mauvais responsable,Jean Obame,clerc,AUTRE,,\n"
+        )
+        response = self._import('dossiers', content)
+        self.assertEqual((response.data['created'], response.data['failed']), (2, 2))
+
+        imported = Dossier.objects.filter(title__in=["Bail commercial", "Recouvrement"]).order_by('reference_code')
+        self.assertEqual([d.reference_code for d in imported], ["GAB-2024-0001", "GAB-2024-0002"])
+        self.assertEqual(Client.objects.get(pk=self.client_obj.pk).dossier_count, 3)
+        self.assertIn(imported[0].pk, get_accessible_dossier_ids(self.avocat))
+        self.assertTrue(ConflictParty.objects.filter(dossier=imported[0], normalized_name="sogatra").exists())
+
+    def test_imported_deadlines_are_scheduled(self):
+        from datetime import timedelta
+
+        from django.utils import timezone
+
+        from apps.agenda.models import Reminder
+
+        deadline = timezone.localdate() + timedelta(days=30)
+        content = (
+            "Intitulé,Client,Responsable,Catégorie,critical_deadline\n"
+            f"Appel,Jean Obame,avocat,CONTENTIEUX,{deadline:%d/%m/%Y}\n"
+            "Conseil,Jean Obame,avocat,AUTRE,\n"
+        )
+        response = self._import('dossiers', content)
+        self.assertEqual(response.data['created'], 2)
+        reminder = Reminder.objects.get(dossier__title="Appel")
+        self.assertEqual(reminder.kind, Reminder.Kind.DEADLINE)
+        self.assertFalse(Reminder.objects.filter(dossier__title="Conseil").exists())
+
+    def test_command(self):
+        path = os.path.join(tempfile.mkdtemp(), 'clients.csv')
+        with open(path, 'w', encoding='utf-8') as handle:
+            handle.write(self.CLIENTS_CSV)
+        out = StringIO()
+        call_command('import_spreadsheet', 'clients', path, '--user', 'admin', stdout=out)
+        self.assertIn("2/4", out.getvalue())
+        shutil.rmtree(os.path.dirname(path))
@@ -5,6 +5,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, DjangoObjectPermissions
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.parsers import FormParser, MultiPartParser
 
 from django.db.models import Count, Prefetch, Q
 from django.utils import timezone
@@ -25,27 +26,35 @@ except ImportError:
         def filter_queryset(self, request, queryset, view):
             return queryset
 
-from .models import Dossier
+from .models import Dossier, DossierMembership
+from .access import filter_by_accessible_dossiers, assign_collaborators, remove_collaborators
 from apps.documents.models import Folder
-from .serializers import DossierListSerializer, DossierDetailSerializer, FolderSerializer
-from apps.audit.utils import log_action
+from .serializers import (
+    DossierListSerializer, DossierDetailSerializer, FolderSerializer, CollaboratorBulkSerializer,
+    ConflictCheckSerializer, BulkImportSerializer
+)
+from .bulk_import import run_import
+from .conflicts import check_conflicts
+from apps.core.exceptions import ConflictOfInterestError
+from apps.audit.utils import log_action, log_bulk_action
 from apps.users.models import User
+from apps.users.views import IsAdminUser
 
 import logging
 logger = logging.getLogger(__name__)
 
 
-from django.db.models import Count, Q, OuterRef, Subquery, IntegerField
+from django.db.models import Count, Q
 from django.utils.translation import gettext_lazy as _
 from rest_framework import viewsets, filters, permissions
 from django_filters.rest_framework import DjangoFilterBackend
 from .models import Dossier
-from apps.documents.models import Folder, Document
+from apps.documents.models import Folder
 
 class DossierViewSet(viewsets.ModelViewSet):
     """
     ViewSet optimisé pour la gestion des dossiers juridiques.
-    Performance : Utilise des Subqueries pour les compteurs et évite le problème N+1.
+    Performance : compteurs dénormalisés (voir counters.py) et pas de problème N+1.
     """
     permission_classes = [permissions.IsAuthenticated] # + Tes permissions custom si besoin
     serializer_class = DossierDetailSerializer
@@ -71,9 +80,19 @@ class DossierViewSet(viewsets.ModelViewSet):
         'client__last_name', 'client__company_name', 'client__nif'
     ]
 
-    ordering_fields = ['opening_date', 'critical_deadline', 'status', 'created_at']
+    ordering_fields = [
+        'opening_date', 'critical_deadline', 'status', 'created_at',
+        'document_count', 'storage_bytes', 'last_upload_at', 'next_event_date',
+    ]
     ordering = ['-opening_date']
 
+    # Permissions exposées selon le niveau d'accès (DossierMembership.Level)
+    MEMBERSHIP_PERMISSIONS = {
+        DossierMembership.Level.VIEW: ['view'],
+        DossierMembership.Level.CHANGE: ['view', 'change'],
+        DossierMembership.Level.RESPONSIBLE: ['view', 'change', 'delete', 'assign'],
+    }
+
     def get_serializer_class(self):
         if self.action == 'list':
             return DossierListSerializer
@@ -82,22 +101,13 @@ class DossierViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         user = self.request.user
         
-        # --- 1. OPTIMISATION DES COMPTEURS (Subqueries) ---
-        # Cette technique évite le produit cartésien et est beaucoup plus performante
-        # que d'utiliser annotate(Count(...)) sur plusieurs relations.
-        
-        docs_qs = Document.objects.filter(dossier=OuterRef('pk')).values('dossier')
-        count_docs = docs_qs.annotate(cnt=Count('pk')).values('cnt')
-
-        folders_qs = Folder.objects.filter(dossier=OuterRef('pk')).values('dossier')
-        count_folders = folders_qs.annotate(cnt=Count('pk')).values('cnt')
+        # --- 1. COMPTEURS ---
+        # document_count, folder_count, storage_bytes... sont des colonnes tenues
+        # à jour par signaux (voir counters.py) : aucune sous-requête par ligne.
 
         # Base QuerySet avec select_related (FK simples)
         # On ne charge PAS les ManyToMany (assigned_users) ici pour la liste !
-        qs = Dossier.objects.select_related('client', 'responsible').annotate(
-            document_count=Subquery(count_docs, output_field=IntegerField()),
-            folder_count=Subquery(count_folders, output_field=IntegerField())
-        )
+        qs = Dossier.objects.select_related('client', 'responsible')
 
         # --- 2. OPTIMISATION VUE DÉTAIL VS LISTE ---
         # On ne fetch les relations lourdes que si on demande un dossier précis
@@ -105,22 +115,35 @@ class DossierViewSet(viewsets.ModelViewSet):
             qs = qs.prefetch_related('assigned_users', 'folders')
 
         # --- 3. LOGIQUE DE PERMISSION (RBAC) ---
-        
-        # Cas 1 : Superadmin ou Staff (Secrétariat global)
-        if user.is_superuser or user.is_staff:
-            return qs
+        # Staff/superuser : tout. Sinon responsable, collaborateur ou permission
+        # Guardian, résolus une fois puis servis depuis le cache partagé.
+        return filter_by_accessible_dossiers(qs, user, field='pk')
 
-        # Cas 2 : Avocats / Notaires (Voir ses dossiers + ceux où on collabore)
-        # On utilise des constantes si possible, sinon strings
-        LEGAL_ROLES = ['AVOCAT', 'NOTAIRE', 'CONSEIL_JURIDIQUE']
-        
-        if getattr(user, 'role', '') in LEGAL_ROLES:
-            return qs.filter(
-                Q(responsible=user) | Q(assigned_users=user)
-            ).distinct()
-
-        # Cas 3 : Collaborateurs simples / Stagiaires
-        return qs.filter(assigned_users=user).distinct()
+    def create(self, request, *args, **kwargs):
+        """
+        Création avec vérification des conflits d'intérêts (voir perform_create).
+        Un conflit non confirmé renvoie 409 sans lever d'exception, pour que
+        l'entrée d'audit de la tentative ne soit pas annulée avec la transaction.
+        """
+        try:
+            return super().create(request, *args, **kwargs)
+        except ConflictOfInterestError as exc:
+            data = request.data
+            log_action(
+                user=request.user,
+                obj=exc.subject,
+                action_type='READ',
+                description="Conflit d'intérêts potentiel : ouverture du dossier suspendue",
+                changes={'opponent': data.get('opponent', ''), 'conflicts': exc.hits},
+                request=request
+            )
+            return Response({
+                'error': True,
+                'status_code': exc.status_code,
+                'message': str(exc.detail),
+                'error_code': exc.default_code,
+                'conflicts': exc.hits,
+            }, status=exc.status_code)
 
     def perform_create(self, serializer):
         """
@@ -129,7 +152,17 @@ class DossierViewSet(viewsets.ModelViewSet):
         Le créateur devient automatiquement :
         - Le responsable du dossier
         - Obtient toutes les permissions sur ce dossier
+        
+        Conflits d'intérêts vérifiés au préalable (client vs parties adverses,
+        partie adverse vs clients) ; passer "confirm_conflicts": true pour
+        ouvrir le dossier malgré des correspondances, tracées dans l'audit.
         """
+        client = serializer.validated_data['client']
+        conflicts = check_conflicts(client=client, opponent=serializer.validated_data.get('opponent', ''))
+        confirmed = str(self.request.data.get('confirm_conflicts', '')).lower() in ('true', '1')
+        if conflicts and not confirmed:
+            raise ConflictOfInterestError(conflicts, subject=client)
+        
         dossier = serializer.save(responsible=self.request.user)
         
         # Attribution des permissions Guardian au responsable
@@ -142,9 +175,74 @@ class DossierViewSet(viewsets.ModelViewSet):
             user=self.request.user,
             obj=dossier,
             action_type='CREATE',
-            description=f"Création du dossier {dossier.reference_code}"
+            description=f"Création du dossier {dossier.reference_code}",
+            changes={'conflicts_checked': True, 'conflicts_confirmed': conflicts},
+            request=self.request
         )
 
+    @action(detail=False, methods=['post'], url_path='conflict-check')
+    def conflict_check(self, request):
+        """
+        Vérification des conflits d'intérêts sans créer de dossier.
+        POST /dossiers/conflict-check/
+        
+        Body: {"client": "uuid", "client_name": "...", "opponent": "SOGATRA; M. Obame"}
+        """
+        serializer = ConflictCheckSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        conflicts = check_conflicts(
+            client=params.get('client'),
+            client_name=params.get('client_name', ''),
+            opponent=params.get('opponent', '')
+        )
+        
+        log_action(
+            user=request.user,
+            obj=params.get('client') or request.user,
+            action_type='READ',
+            description=f"Vérification des conflits d'intérêts ({len(conflicts)} correspondance(s))",
+            changes={
+                'client_name': params.get('client_name', ''),
+                'opponent': params.get('opponent', ''),
+                'conflicts': conflicts,
+            },
+            request=request
+        )
+        
+        return Response({'count': len(conflicts), 'conflicts': conflicts})
+
+    @action(
+        detail=False, methods=['post'], url_path='import',
+        parser_classes=[MultiPartParser, FormParser], permission_classes=[IsAdminUser]
+    )
+    def bulk_import(self, request):
+        """
+        Import en masse de clients ou de dossiers depuis un fichier CSV/XLSX.
+        POST /dossiers/import/ (multipart)
+        
+        Champs: schema ("clients" | "dossiers"), file, dry_run (optionnel)
+        Réponse: rapport avec les erreurs par numéro de ligne
+        """
+        serializer = BulkImportSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+        
+        try:
+            report = run_import(
+                params['schema'],
+                params['file'],
+                user=request.user,
+                filename=params['file'].name,
+                dry_run=params['dry_run'],
+                encoding=params['encoding'],
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response(report.as_dict())
+
     @action(detail=True, methods=['post'], url_path='assign-user')
     def assign_user(self, request, pk=None):
         """
@@ -174,16 +272,8 @@ class DossierViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_404_NOT_FOUND
             )
         
-        # Ajouter à la liste des collaborateurs
-        dossier.assigned_users.add(user_to_assign)
-        
-        # Attribution des permissions Guardian
-        if 'view' in permissions:
-            assign_perm('view_dossier', user_to_assign, dossier)
-        
-        if 'change' in permissions:
-            if user_to_assign.role in ['AVOCAT', 'NOTAIRE', 'CONSEIL_JURIDIQUE']:
-                assign_perm('change_dossier', user_to_assign, dossier)
+        # Ajout + permissions Guardian ('change' réservé aux professionnels du droit)
+        assign_collaborators(Dossier.objects.filter(pk=dossier.pk), [user_to_assign], permissions)
         
         # Log audit
         log_action(
@@ -230,12 +320,8 @@ class DossierViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Retirer des collaborateurs
-        dossier.assigned_users.remove(user_to_remove)
-        
-        # Retirer les permissions Guardian
-        remove_perm('view_dossier', user_to_remove, dossier)
-        remove_perm('change_dossier', user_to_remove, dossier)
+        # Retrait de la liste et des permissions Guardian
+        remove_collaborators(Dossier.objects.filter(pk=dossier.pk), [user_to_remove])
         
         # Log audit
         log_action(
@@ -258,31 +344,26 @@ class DossierViewSet(viewsets.ModelViewSet):
         """
         dossier = self.get_object()
         
-        # Responsable principal
-        responsable = {
-            'id': str(dossier.responsible.id),
-            'name': dossier.responsible.get_full_name(),
-            'role': dossier.responsible.get_role_display(),
-            'is_responsible': True,
-            'permissions': ['view', 'change', 'delete', 'assign']
-        }
+        # Une seule requête : table d'accès indexée jointe aux utilisateurs
+        memberships = DossierMembership.objects.filter(dossier=dossier).select_related('user')
         
-        # Collaborateurs
+        responsable = None
         collaborateurs = []
-        for user in dossier.assigned_users.all():
-            perms = []
-            if user.has_perm('view_dossier', dossier):
-                perms.append('view')
-            if user.has_perm('change_dossier', dossier):
-                perms.append('change')
-            
-            collaborateurs.append({
+        for membership in memberships:
+            user = membership.user
+            entry = {
                 'id': str(user.id),
                 'name': user.get_full_name(),
                 'role': user.get_role_display(),
-                'is_responsible': False,
-                'permissions': perms
-            })
+                'is_responsible': user.pk == dossier.responsible_id,
+                'permissions': self.MEMBERSHIP_PERMISSIONS[membership.level],
+            }
+            if entry['is_responsible']:
+                responsable = entry
+            else:
+                collaborateurs.append(entry)
+        
+        collaborateurs.sort(key=lambda c: c['name'])
         
         return Response({
             'responsable': responsable,
@@ -290,6 +371,75 @@ class DossierViewSet(viewsets.ModelViewSet):
             'total_collaborateurs': len(collaborateurs)
         })
 
+    @action(detail=False, methods=['post'], url_path='bulk-collaborateurs')
+    def bulk_collaborateurs(self, request):
+        """
+        Ajoute ou retire plusieurs collaborateurs sur plusieurs dossiers
+        en une seule transaction.
+        
+        POST /dossiers/bulk-collaborateurs/
+        Body: {
+            "operation": "assign",            # ou "remove"
+            "dossier_ids": ["uuid", ...],
+            "user_ids": ["uuid", ...],
+            "permissions": ["view", "change"] # Optionnel (assign)
+        }
+        """
+        serializer = CollaboratorBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        
+        dossier_ids = set(data['dossier_ids'])
+        dossiers = self.get_queryset().filter(pk__in=dossier_ids).select_related('client')
+        found_ids = set(dossiers.values_list('pk', flat=True))
+        if found_ids != dossier_ids:
+            return Response(
+                {'error': 'Dossiers introuvables', 'dossier_ids': sorted(str(pk) for pk in dossier_ids - found_ids)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        # Seul le responsable de chaque dossier (ou un admin) peut gérer les collaborateurs
+        if not request.user.is_staff and dossiers.exclude(responsible=request.user).exists():
+            raise PermissionDenied(
+                "Seul le responsable du dossier peut gérer les collaborateurs"
+            )
+        
+        user_ids = set(data['user_ids'])
+        users = list(User.objects.filter(pk__in=user_ids))
+        missing_users = user_ids - {user.pk for user in users}
+        if missing_users:
+            return Response(
+                {'error': 'Utilisateurs introuvables', 'user_ids': sorted(str(pk) for pk in missing_users)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if data['operation'] == 'assign':
+            assign_collaborators(dossiers, users, sorted(data['permissions']))
+            action_type, verb = 'ASSIGN_USER', 'Ajout'
+        else:
+            remove_collaborators(dossiers, users)
+            action_type, verb = 'REMOVE_USER', 'Retrait'
+        
+        names = ', '.join(user.get_full_name() or user.username for user in users)
+        log_bulk_action(
+            user=request.user,
+            objects=dossiers,
+            action_type=action_type,
+            description=f"{verb} en masse de collaborateurs : {names}",
+            changes={
+                'user_ids': sorted(str(user.pk) for user in users),
+                'permissions': sorted(data['permissions']),
+            },
+            request=request
+        )
+        
+        return Response({
+            'message': f"{verb} de {len(users)} collaborateur(s) sur {len(found_ids)} dossier(s)",
+            'operation': data['operation'],
+            'dossiers': len(found_ids),
+            'users': len(users),
+        })
+
     @action(detail=True, methods=['post'])
     def cloturer(self, request, pk=None):
         """Clôturer un dossier"""
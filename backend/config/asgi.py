@@ -1,6 +1,28 @@
+"""
+Point d'entrée ASGI : WebSocket (Channels), HTTP pour le développement.
+Production : daphne -b 0.0.0.0 -p 8001 config.asgi:application, derrière nginx
+pour /api/ws/ seulement ; le HTTP reste servi par gunicorn (config.wsgi), les
+réponses en flux synchrones étant mises en mémoire sous ASGI.
+"""
 import os
+
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+# Initialiser Django avant d'importer les consumers (modèles)
+django_asgi_app = get_asgi_application()
+
+from channels.auth import AuthMiddlewareStack  # noqa: E402
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+
+from apps.core.consumers import JWTAuthMiddleware  # noqa: E402
+from apps.core.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        AuthMiddlewareStack(JWTAuthMiddleware(URLRouter(websocket_urlpatterns)))
+    ),
+})
@@ -56,6 +56,7 @@ INSTALLED_APPS = [
     'corsheaders',
     'django_filters',
     'guardian',
+    'channels',
     
     # Local apps
     'apps.core',
@@ -160,6 +161,64 @@ else:
     }
     print("💾 Cache local en mémoire activé")
 
+# ═══════════════════════════════════════════════════════════════════════════
+# CHANNELS (WebSocket : diffusion des changements, voir apps/core/realtime.py)
+# ═══════════════════════════════════════════════════════════════════════════
+ASGI_APPLICATION = 'config.asgi.application'
+
+CHANNELS_REDIS_URL = os.environ.get('CHANNELS_REDIS_URL')
+
+if CHANNELS_REDIS_URL:
+    # Diffusion entre processus/serveurs
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [CHANNELS_REDIS_URL]},
+        }
+    }
+else:
+    # Mono-processus : suffisant en développement
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}
+    }
+
+# Durée de vie du cache des dossiers accessibles par utilisateur (invalidé par signaux)
+DOSSIER_ACCESS_CACHE_TIMEOUT = int(os.environ.get('DOSSIER_ACCESS_CACHE_TIMEOUT', 60 * 15))
+
+# Durée de vie du flux iCalendar personnel en cache (régénéré dès qu'il change)
+AGENDA_FEED_CACHE_TIMEOUT = int(os.environ.get('AGENDA_FEED_CACHE_TIMEOUT', 60 * 60 * 24))
+
+# Rappels d'agenda (commande send_reminders) : canaux de distribution et paliers d'échéance (jours)
+AGENDA_REMINDER_CHANNELS = [
+    'apps.agenda.reminders.InAppChannel',
+    'apps.agenda.reminders.EmailChannel',
+]
+AGENDA_DEADLINE_ALERT_DAYS = (7, 1, 0)
+
+# Journal d'audit (apps/audit/writer.py) : 'strict' (INSERT dans la transaction de la requête),
+# 'on_commit' ou 'async' (file bornée vidée par lots en arrière-plan).
+# SQLite n'acceptant qu'un écrivain à la fois, l'écriture y reste synchrone par défaut.
+AUDIT_WRITE_MODE = os.environ.get('AUDIT_WRITE_MODE', 'strict' if USE_SQLITE else 'on_commit')
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+AUDIT_BATCH_SIZE = int(os.environ.get('AUDIT_BATCH_SIZE', 200))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get('AUDIT_FLUSH_INTERVAL', 2.0))
+# Conservation du journal d'audit en mois (partitions mensuelles PostgreSQL,
+# purgées par la commande manage_audit_partitions ; 0 : aucune purge)
+AUDIT_RETENTION_MONTHS = int(os.environ.get('AUDIT_RETENTION_MONTHS', 120))
+# Chaîne d'intégrité du journal d'audit (apps/audit/chain.py) : clé HMAC distincte de
+# SECRET_KEY conseillée (ne jamais la changer sans re-chaîner), nombre de chaînes parallèles
+AUDIT_CHAIN_KEY = os.environ.get('AUDIT_CHAIN_KEY') or SECRET_KEY
+AUDIT_CHAIN_SHARDS = int(os.environ.get('AUDIT_CHAIN_SHARDS', 16))
+# Signature HMAC des exports du journal d'audit (apps/audit/export.py)
+AUDIT_EXPORT_KEY = os.environ.get('AUDIT_EXPORT_KEY') or AUDIT_CHAIN_KEY
+# Agrégats horaires/journaliers du journal d'audit tenus à l'écriture (apps/audit/rollups.py)
+AUDIT_ROLLUPS_ENABLED = os.environ.get('AUDIT_ROLLUPS_ENABLED', 'True').lower() == 'true'
+# Détection d'anomalies en flux (apps/audit/anomalies.py) : état en mémoire du processus
+# ('memory') ou partagé par le cache Django ('cache') ; règles : AUDIT_ANOMALY_RULES
+AUDIT_ANOMALY_DETECTION = os.environ.get('AUDIT_ANOMALY_DETECTION', 'True').lower() == 'true'
+AUDIT_ANOMALY_STORE = os.environ.get('AUDIT_ANOMALY_STORE', 'memory')
+AUDIT_ANOMALY_RULES = {}
+
 # ═══════════════════════════════════════════════════════════════════════════
 # PASSWORD VALIDATION
 # ═══════════════════════════════════════════════════════════════════════════
@@ -345,6 +404,11 @@ if not FILE_ENCRYPTION_KEY:
 BACKUP_ENCRYPTION_KEY = os.environ.get('BACKUP_ENCRYPTION_KEY', FILE_ENCRYPTION_KEY)
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', FILE_ENCRYPTION_KEY)
 
+# Export ZIP : nombre de fichiers déchiffrés en parallèle (et donc en mémoire)
+DOCUMENT_EXPORT_MAX_WORKERS = int(os.environ.get('DOCUMENT_EXPORT_MAX_WORKERS', 4))
+# Import d'arborescences (commande import_dossier_tree) : seules les sources sous cette racine sont acceptées
+DOCUMENT_IMPORT_ROOT = Path(os.environ.get('DOCUMENT_IMPORT_ROOT', BASE_DIR / 'imports'))
+
 # ═══════════════════════════════════════════════════════════════════════════
 # SECURITY SETTINGS
 # ═══════════════════════════════════════════════════════════════════════════
@@ -420,7 +484,12 @@ LOGGING = {
 # ═══════════════════════════════════════════════════════════════════════════
 # EMAIL CONFIGURATION
 # ═══════════════════════════════════════════════════════════════════════════
-EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend'
+# Développement : EMAIL_BACKEND=django.core.mail.backends.smtp.EmailBackend avec un
+# serveur SMTP local de test (EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_TLS=False)
+EMAIL_BACKEND = os.environ.get(
+    'EMAIL_BACKEND',
+    'django.core.mail.backends.console.EmailBackend' if DEBUG else 'django.core.mail.backends.smtp.EmailBackend'
+)
 EMAIL_HOST = os.environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT = int(os.environ.get('EMAIL_PORT', '587'))
 EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True').lower() == 'true'